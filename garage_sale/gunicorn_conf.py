@@ -0,0 +1,211 @@
+"""
+Gunicorn configuration for the garage sale project.
+
+Load it with ``gunicorn -c python:garage_sale.gunicorn_conf``. Every setting
+can be overridden through a ``GUNICORN_*`` environment variable so that the
+same versioned profile can be used on a laptop, a till or a larger server.
+
+For more information on these settings, see
+https://docs.gunicorn.org/en/stable/settings.html
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import sys
+from os import environ
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from gunicorn.arbiter import Arbiter
+    from gunicorn.workers.base import Worker
+
+# worker classes that handle concurrency with threads rather than with extra
+# processes; green thread workers would need gevent or eventlet installed and
+# the database drivers patched, so they aren't offered
+THREADED_WORKER_CLASSES = {"gthread"}
+SUPPORTED_WORKER_CLASSES = {"sync"} | THREADED_WORKER_CLASSES
+
+
+def _env_int(name: str, default: int) -> int:
+    """
+    Read a positive integer from the environment.
+
+    Args:
+        name (str): Name of the environment variable.
+        default (int): Value used when the variable is unset or empty.
+
+    Returns:
+        int: The parsed value, or the default.
+    """
+    value = environ.get(name, "")
+    if len(value) == 0:
+        return default
+    return max(1, int(value))
+
+
+def _env_bool(name: str, *, default: bool) -> bool:
+    """
+    Read a boolean flag from the environment.
+
+    Args:
+        name (str): Name of the environment variable.
+        default (bool): Value used when the variable is unset or empty.
+
+    Returns:
+        bool: Whether the flag is switched on.
+    """
+    value = environ.get(name, "")
+    if len(value) == 0:
+        return default
+    return value.lower() in {"1", "true", "yes", "on"}
+
+
+def default_workers(cpu_count: int, worker_class: str) -> int:
+    """
+    Return the default number of worker processes for this machine.
+
+    Sync workers follow gunicorn's ``2 * CPUs + 1`` rule of thumb. Threaded
+    workers multiplex requests inside each process, so one process per CPU is
+    enough and keeps memory use down.
+
+    Args:
+        cpu_count (int): Number of CPUs available to the server.
+        worker_class (str): Gunicorn worker class name.
+
+    Returns:
+        int: Number of worker processes to start.
+    """
+    if worker_class in THREADED_WORKER_CLASSES:
+        return max(1, cpu_count)
+    return 2 * cpu_count + 1
+
+
+def default_threads(cpu_count: int, worker_class: str) -> int:
+    """
+    Return the default number of threads per worker process.
+
+    Args:
+        cpu_count (int): Number of CPUs available to the server.
+        worker_class (str): Gunicorn worker class name.
+
+    Returns:
+        int: Number of threads per worker process.
+    """
+    if worker_class in THREADED_WORKER_CLASSES:
+        return 2 * cpu_count + 2
+    return 1
+
+
+worker_class = environ.get("GUNICORN_WORKER_CLASS", "gthread")
+if worker_class not in SUPPORTED_WORKER_CLASSES:
+    msg = (
+        f"Unsupported GUNICORN_WORKER_CLASS {worker_class!r}, expected one of "
+        f"{sorted(SUPPORTED_WORKER_CLASSES)}"
+    )
+    raise ValueError(msg)
+
+_cpu_count = multiprocessing.cpu_count()
+
+bind = environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = _env_int(
+    "GUNICORN_WORKERS", default_workers(_cpu_count, worker_class)
+)
+threads = _env_int(
+    "GUNICORN_THREADS", default_threads(_cpu_count, worker_class)
+)
+worker_connections = _env_int("GUNICORN_WORKER_CONNECTIONS", 1000)
+timeout = _env_int("GUNICORN_TIMEOUT", 30)
+graceful_timeout = _env_int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+keepalive = _env_int("GUNICORN_KEEPALIVE", 5)
+
+# recycle workers periodically so slow leaks can't build up; the jitter keeps
+# every worker from restarting at the same time
+max_requests = _env_int("GUNICORN_MAX_REQUESTS", 2000)
+max_requests_jitter = _env_int("GUNICORN_MAX_REQUESTS_JITTER", 200)
+
+# import the Django application once in the arbiter so that forked workers
+# share its memory pages copy-on-write instead of each importing it again
+preload_app = _env_bool("GUNICORN_PRELOAD", default=True)
+
+# keep worker heartbeat files off of disk-backed /tmp when possible
+_shm_dir = Path("/dev/shm")  # noqa: S108
+worker_tmp_dir = environ.get(
+    "GUNICORN_WORKER_TMP_DIR", str(_shm_dir) if _shm_dir.is_dir() else None
+)
+
+accesslog = environ.get("GUNICORN_ACCESS_LOG", "-")
+errorlog = environ.get("GUNICORN_ERROR_LOG", "-")
+loglevel = environ.get("GUNICORN_LOG_LEVEL", "info")
+
+
+def when_ready(server: Arbiter) -> None:
+    """
+    Log the effective worker profile once the arbiter is ready.
+
+    Args:
+        server (Arbiter): The gunicorn arbiter.
+    """
+    server.log.info(
+        "Worker profile: class=%s workers=%d threads=%d preload=%s",
+        worker_class,
+        workers,
+        threads,
+        preload_app,
+    )
+
+
+def pre_fork(server: Arbiter, worker: Worker) -> None:  # noqa: ARG001
+    """
+    Close database connections in the arbiter before forking a worker.
+
+    A connection opened while the application was preloaded would otherwise be
+    inherited by every worker and used by several processes at once.
+
+    Args:
+        server (Arbiter): The gunicorn arbiter.
+        worker (Worker): The worker about to be forked.
+    """
+    _close_db_connections()
+
+
+def post_fork(server: Arbiter, worker: Worker) -> None:  # noqa: ARG001
+    """
+    Reset database connections in a freshly forked worker.
+
+    Args:
+        server (Arbiter): The gunicorn arbiter.
+        worker (Worker): The worker that was just forked.
+    """
+    _close_db_connections()
+
+
+def post_worker_init(worker: Worker) -> None:  # noqa: ARG001
+    """
+    Prepare the shop in a freshly started worker.
+
+    The typeahead index is built in a background thread, so the worker can
+    serve other requests in the meantime, and the worker starts listening
+    for ``manage.py profile_worker``.
+
+    Args:
+        worker (Worker): The worker that has loaded the application.
+    """
+    if "django" not in sys.modules:
+        return
+    from shop.profiler import install_signal_handler
+    from shop.typeahead import warm_typeahead
+
+    warm_typeahead()
+    install_signal_handler()
+
+
+def _close_db_connections() -> None:
+    """Close every Django database connection held by this process."""
+    if "django" not in sys.modules:
+        return
+    from django.db import connections
+
+    for connection in connections.all(initialized_only=True):
+        connection.close()
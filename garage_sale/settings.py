@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 import logging
 import sys
+import tempfile
 from os import environ
 from pathlib import Path
 
@@ -59,6 +60,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "shop.request_log.RequestLogMiddleware",
+    "shop.compression.CompressionMiddleware",
     "django_browser_reload.middleware.BrowserReloadMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -67,6 +70,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "shop.profiler.ProfilerMiddleware",
 ]
 
 ROOT_URLCONF = "garage_sale.urls"
@@ -97,9 +101,162 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # wait for other processes, such as background workers, to release
+        # the write lock instead of failing right away
+        "OPTIONS": {"timeout": 20},
     }
 }
 
+# Carts, cart lines, orders and till sales can be sharded by user across
+# SHOP_SHARDS extra SQLite files, so checkouts by different users don't all
+# queue on one write lock. Items and users stay in the default database.
+# Migrate each shard with `manage.py migrate --database shardN`.
+
+SHOP_SHARDS = int(environ.get("SHOP_SHARDS", "0"))
+SHARD_DATABASES = [f"shard{i}" for i in range(SHOP_SHARDS)]
+for _i in range(SHOP_SHARDS):
+    DATABASES[f"shard{_i}"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / f"shard{_i}.sqlite3",
+        "OPTIONS": {"timeout": 20},
+    }
+DATABASE_ROUTERS = ["shop.sharding.ShardRouter"]
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Rate limits and search-as-you-type updates are kept in the cache, so
+# deployments running several worker processes should point it at a shared
+# cache such as Redis.
+
+CACHES = {
+    "default": {
+        "BACKEND": environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": environ.get("CACHE_LOCATION", "garage-sale"),
+    }
+}
+
+
+# Sessions
+# https://docs.djangoproject.com/en/5.1/topics/http/sessions/
+# Sessions are stored in the database. With CACHE_BACKEND pointing at a shared
+# cache, set SESSION_ENGINE to django.contrib.sessions.backends.cached_db to
+# read them from the cache, so the cart views don't query the session table on
+# every request; a cache local to each process would keep serving sessions
+# ended in other processes. Set it to
+# django.contrib.sessions.backends.signed_cookies to keep sessions out of the
+# database entirely. Expired sessions are purged by the background worker
+# every SESSION_PURGE_INTERVAL seconds.
+
+SESSION_ENGINE = environ.get(
+    "SESSION_ENGINE", "django.contrib.sessions.backends.db"
+)
+SESSION_PURGE_INTERVAL = int(environ.get("SESSION_PURGE_INTERVAL", "3600"))
+
+
+# Markdown rules are applied by the background worker every
+# MARKDOWN_INTERVAL seconds.
+
+MARKDOWN_INTERVAL = int(environ.get("MARKDOWN_INTERVAL", "60"))
+
+
+# Deleted items are only hidden. Those deleted more than ITEM_PURGE_AFTER
+# seconds ago and never sold are purged by the background worker every
+# ITEM_PURGE_INTERVAL seconds.
+
+ITEM_PURGE_AFTER = int(environ.get("ITEM_PURGE_AFTER", str(30 * 24 * 3600)))
+ITEM_PURGE_INTERVAL = int(environ.get("ITEM_PURGE_INTERVAL", "3600"))
+
+
+# Active carts left untouched for CART_EXPIRE_AFTER seconds are expired by the
+# background worker every CART_EXPIRE_INTERVAL seconds.
+
+CART_EXPIRE_AFTER = int(environ.get("CART_EXPIRE_AFTER", str(14 * 24 * 3600)))
+CART_EXPIRE_INTERVAL = int(environ.get("CART_EXPIRE_INTERVAL", "3600"))
+
+
+# Idempotency keys of cart and checkout requests are kept in the database for
+# ten minutes, and expired ones are purged by the background worker every
+# IDEMPOTENCY_PURGE_INTERVAL seconds.
+
+IDEMPOTENCY_PURGE_INTERVAL = int(
+    environ.get("IDEMPOTENCY_PURGE_INTERVAL", "3600")
+)
+
+
+# Structured request logging
+# With REQUEST_LOG switched on, the default outside debug mode, every request
+# is logged as a line of JSON. In a SLOW_QUERY_SAMPLE_RATE fraction of
+# requests, queries that take SLOW_QUERY_MS milliseconds or more are logged
+# too, with their EXPLAIN output.
+
+REQUEST_LOG = (
+    environ.get("REQUEST_LOG", "false" if DEBUG else "true").lower() == "true"
+)
+SLOW_QUERY_MS = float(environ.get("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_SAMPLE_RATE = float(environ.get("SLOW_QUERY_SAMPLE_RATE", "0.1"))
+
+# Sampling profiler
+# With PROFILER switched on, staff can profile a running worker from
+# /shop/profile/ or with the profile_worker command, which leaves its request
+# in PROFILE_DIR.
+
+PROFILER = environ.get("PROFILER", "false").lower() == "true"
+PROFILE_DIR = environ.get(
+    "PROFILE_DIR", Path(tempfile.gettempdir()) / "garage-sale-profiles"
+)
+
+# Text responses of at least COMPRESS_MIN_SIZE bytes are compressed with
+# brotli, if the brotli package is installed, or gzip.
+
+COMPRESS_MIN_SIZE = int(environ.get("COMPRESS_MIN_SIZE", "1024"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {"json": {"()": "shop.request_log.JsonFormatter"}},
+    "handlers": {
+        "json": {"class": "logging.StreamHandler", "formatter": "json"},
+    },
+    "loggers": {
+        "shop.access": {
+            "handlers": ["json"],
+            "level": "INFO",
+            "propagate": False,
+        },
+        "shop.slow_query": {
+            "handlers": ["json"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
+}
+
+
+# Rate limiting and admission control for the shop's write endpoints
+# Each user may make WRITE_RATE write requests per second with bursts of up
+# to WRITE_BURST, each client IP WRITE_IP_RATE with bursts of WRITE_IP_BURST,
+# and at most MAX_CONCURRENT_WRITES write requests run at once across every
+# worker process and thread on the server; 0 switches the cap off. SQLite only
+# has one writer at a time, and concurrent writers mostly wait on each other
+# or fail with "database is locked", so the cap defaults to 1; raise it on a
+# database with row-level locking. Write requests over the cap wait up to
+# WRITE_QUEUE_TIMEOUT seconds for a slot before being shed. The slots are
+# locks on files in WRITE_SLOT_DIR. Behind TRUSTED_PROXIES reverse proxies
+# appending to X-Forwarded-For, the client IP is taken from that header.
+
+WRITE_RATE = float(environ.get("WRITE_RATE", "10"))
+WRITE_BURST = int(environ.get("WRITE_BURST", "30"))
+WRITE_IP_RATE = float(environ.get("WRITE_IP_RATE", "50"))
+WRITE_IP_BURST = int(environ.get("WRITE_IP_BURST", "150"))
+MAX_CONCURRENT_WRITES = int(environ.get("MAX_CONCURRENT_WRITES", "1"))
+WRITE_QUEUE_TIMEOUT = float(environ.get("WRITE_QUEUE_TIMEOUT", "2"))
+WRITE_SLOT_DIR = environ.get(
+    "WRITE_SLOT_DIR", Path(tempfile.gettempdir()) / "garage-sale-write-slots"
+)
+TRUSTED_PROXIES = int(environ.get("TRUSTED_PROXIES", "0"))
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -138,6 +295,26 @@ USE_TZ = True
 STATIC_URL = "static/"
 STATIC_ROOT = "static"
 
+# Uploaded files (Item images)
+
+MEDIA_ROOT = environ.get("MEDIA_ROOT", BASE_DIR / "media")
+
+# Email (order receipts)
+# https://docs.djangoproject.com/en/5.1/topics/email/
+
+EMAIL_BACKEND = environ.get(
+    "EMAIL_BACKEND",
+    "django.core.mail.backends.console.EmailBackend"
+    if DEBUG
+    else "django.core.mail.backends.smtp.EmailBackend",
+)
+EMAIL_HOST = environ.get("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(environ.get("EMAIL_PORT", "25"))
+EMAIL_HOST_USER = environ.get("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = environ.get("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = environ.get("EMAIL_USE_TLS", "false").lower() == "true"
+DEFAULT_FROM_EMAIL = environ.get("DEFAULT_FROM_EMAIL", "garage-sale@localhost")
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
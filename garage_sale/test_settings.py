@@ -0,0 +1,18 @@
+"""
+Django settings for running the garage sale project's test suite.
+
+They extend the project's settings with two shard databases, so the tests
+can exercise the sharded code paths by switching ``SHARD_DATABASES`` on with
+``override_settings``, whether or not ``SHOP_SHARDS`` is set.
+"""
+
+from .settings import *  # noqa: F403
+from .settings import DATABASES
+
+TEST_SHARDS = 2
+
+for _i in range(TEST_SHARDS):
+    DATABASES.setdefault(
+        f"shard{_i}",
+        {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"},
+    )
@@ -7,7 +7,9 @@ import sys
 
 def main() -> None:
     """Run administrative tasks."""
-    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "garage_sale.settings")
+    # tests run with extra shard databases
+    settings = "test_settings" if sys.argv[1:2] == ["test"] else "settings"
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", f"garage_sale.{settings}")
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+"""
+Benchmark gunicorn worker profiles against the shop endpoints.
+
+Starts gunicorn once per profile using ``garage_sale.gunicorn_conf``, drives
+the shop pages with concurrent HTTP clients for a fixed duration and prints
+the throughput and latency percentiles for each profile.
+
+Run it from the repository root after migrating the database::
+
+    python scripts/bench_server.py --duration 10 --concurrency 16
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, field
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# gunicorn environment overrides for each benchmarked profile
+PROFILES = {
+    "sync-1": {"GUNICORN_WORKER_CLASS": "sync", "GUNICORN_WORKERS": "1"},
+    "sync": {"GUNICORN_WORKER_CLASS": "sync"},
+    "sync-nopreload": {
+        "GUNICORN_WORKER_CLASS": "sync",
+        "GUNICORN_PRELOAD": "false",
+    },
+    "gthread": {"GUNICORN_WORKER_CLASS": "gthread"},
+}
+
+ENDPOINTS = ["/", "/shop/", "/shop/?include_sold=true", "/shop/?filter=a"]
+
+
+@dataclass
+class Result:
+    """Latencies and error count collected while benchmarking a profile."""
+
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+def wait_until_ready(url: str, timeout: float) -> bool:
+    """
+    Poll a URL until the server answers or the timeout expires.
+
+    Args:
+        url (str): URL to poll.
+        timeout (float): Seconds to wait before giving up.
+
+    Returns:
+        bool: Whether the server answered in time.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):  # noqa: S310
+                return True
+        except (urllib.error.URLError, ConnectionError):  # noqa: PERF203
+            time.sleep(0.1)
+    return False
+
+
+def client(base_url: str, deadline: float, result: Result) -> None:
+    """
+    Request the shop endpoints in a loop until the deadline.
+
+    Args:
+        base_url (str): Base URL of the server under test.
+        deadline (float): ``time.monotonic()`` value to stop at.
+        result (Result): Shared result object to record latencies in.
+    """
+    i = 0
+    while time.monotonic() < deadline:
+        url = base_url + ENDPOINTS[i % len(ENDPOINTS)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=10) as response:  # noqa: S310
+                response.read()
+        except (urllib.error.URLError, ConnectionError):
+            with result.lock:
+                result.errors += 1
+            continue
+        elapsed = time.perf_counter() - start
+        with result.lock:
+            result.latencies.append(elapsed)
+
+
+def run_profile(
+    name: str, overrides: dict[str, str], args: argparse.Namespace
+) -> Result | None:
+    """
+    Start gunicorn with a profile and benchmark it.
+
+    Args:
+        name (str): Name of the profile.
+        overrides (dict[str, str]): Environment overrides for the profile.
+        args (argparse.Namespace): Parsed command line arguments.
+
+    Returns:
+        Result | None: The benchmark result, or None if the server failed to
+        start.
+    """
+    bind = f"127.0.0.1:{args.port}"
+    env = {
+        **os.environ,
+        **overrides,
+        "GUNICORN_BIND": bind,
+        "GUNICORN_ACCESS_LOG": "/dev/null",
+    }
+    server = subprocess.Popen(  # noqa: S603
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "-c",
+            "python:garage_sale.gunicorn_conf",
+            "garage_sale.wsgi:application",
+        ],
+        cwd=BASE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://{bind}"
+    try:
+        if not wait_until_ready(base_url + "/shop/", timeout=15):
+            sys.stderr.write(f"{name}: server did not start, skipping\n")
+            return None
+        result = Result()
+        deadline = time.monotonic() + args.duration
+        threads = [
+            threading.Thread(target=client, args=(base_url, deadline, result))
+            for _ in range(args.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return result
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def report(name: str, result: Result, duration: float) -> str:
+    """
+    Format a benchmark result as a table row.
+
+    Args:
+        name (str): Name of the profile.
+        result (Result): The benchmark result.
+        duration (float): Duration of the benchmark in seconds.
+
+    Returns:
+        str: The formatted table row.
+    """
+    latencies = sorted(result.latencies)
+    if not latencies:
+        return f"{name:<16}{'-':>10}{'-':>10}{'-':>10}{result.errors:>8}"
+    quantiles = statistics.quantiles(latencies, n=100)
+    return (
+        f"{name:<16}{len(latencies) / duration:>10.1f}"
+        f"{quantiles[49] * 1000:>10.1f}{quantiles[98] * 1000:>10.1f}"
+        f"{result.errors:>8}"
+    )
+
+
+def main() -> None:
+    """Parse the command line and benchmark each requested profile."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--profile",
+        action="append",
+        choices=sorted(PROFILES),
+        help="profile to benchmark, may be repeated (default: all)",
+    )
+    args = parser.parse_args()
+
+    sys.stdout.write(
+        f"{'profile':<16}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}"
+        f"{'errors':>8}\n"
+    )
+    for name in args.profile or PROFILES:
+        result = run_profile(name, PROFILES[name], args)
+        if result is not None:
+            sys.stdout.write(report(name, result, args.duration) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+"""
+Benchmark rate limiting and admission control under write overload.
+
+Starts gunicorn once with the write limits effectively switched off and once
+with the configured limits, hammers the add-to-cart endpoint from many
+logged-in clients for a fixed duration and prints the throughput and latency
+of accepted requests, and how many requests were shed and how quickly.
+
+The server runs as one threaded worker, so the limiter state held in the
+default in-memory cache is shared by every request. Bench users and items are
+created before the runs and deleted afterwards.
+
+Run it from the repository root after migrating the database::
+
+    python scripts/bench_throttle.py --duration 10 --concurrency 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import secrets
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+# environment overrides for each benchmarked run
+PROFILES = {
+    "unlimited": {
+        "WRITE_RATE": "1e9",
+        "WRITE_BURST": "1000000000",
+        "WRITE_IP_RATE": "1e9",
+        "WRITE_IP_BURST": "1000000000",
+        "MAX_CONCURRENT_WRITES": "0",
+    },
+    "limited": {},
+}
+
+
+@dataclass
+class Result:
+    """Latencies collected during a run, by response status."""
+
+    latencies: dict[int, list[float]] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, status: int, latency: float) -> None:
+        """
+        Record the outcome of a request.
+
+        Args:
+            status (int): The response's status code, or 0 if it failed.
+            latency (float): Seconds the request took.
+        """
+        with self.lock:
+            self.latencies.setdefault(status, []).append(latency)
+
+
+class NoRedirects(urllib.request.HTTPRedirectHandler):
+    """Redirect handler that reports redirects instead of following them."""
+
+    def redirect_request(self, *args: list) -> None:  # noqa: ARG002
+        """
+        Refuse to follow a redirect.
+
+        Args:
+            args (list): The redirect's details.
+        """
+        return
+
+
+def wait_until_ready(url: str, timeout: float) -> bool:
+    """
+    Poll a URL until the server answers or the timeout expires.
+
+    Args:
+        url (str): URL to poll.
+        timeout (float): Seconds to wait before giving up.
+
+    Returns:
+        bool: Whether the server answered in time.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):  # noqa: S310
+                return True
+        except (urllib.error.URLError, ConnectionError):  # noqa: PERF203
+            time.sleep(0.1)
+    return False
+
+
+def set_up(concurrency: int) -> list[tuple[str, int]]:
+    """
+    Create a logged-in session and an item for each client.
+
+    Args:
+        concurrency (int): Number of clients.
+
+    Returns:
+        list[tuple[str, int]]: Each client's session key and item ID.
+    """
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.test import Client
+
+    from shop.models import Item
+
+    clients = []
+    for i in range(concurrency):
+        user = User.objects.create_user(username=f"bench-throttle-{i}")
+        item = Item.objects.create(
+            name=f"Bench {i}", description="", price_in_cents=100
+        )
+        browser = Client()
+        browser.force_login(user)
+        session = browser.cookies[settings.SESSION_COOKIE_NAME].value
+        clients.append((session, item.id))
+    return clients
+
+
+def tear_down() -> None:
+    """Delete the bench users, their carts and the bench items."""
+    from django.contrib.auth.models import User
+
+    from shop.models import Cart, Item
+
+    Cart.objects.filter(user__username__startswith="bench-throttle-").delete()
+    Item.objects.filter(name__startswith="Bench ", description="").delete()
+    User.objects.filter(username__startswith="bench-throttle-").delete()
+
+
+def client(
+    url: str, session: str, item_id: int, deadline: float, result: Result
+) -> None:
+    """
+    Add an item to a cart in a loop until the deadline.
+
+    Args:
+        url (str): URL of the add-to-cart endpoint.
+        session (str): The client's session key.
+        item_id (int): ID of the item to add.
+        deadline (float): ``time.monotonic()`` value to stop at.
+        result (Result): Shared result object to record latencies in.
+    """
+    opener = urllib.request.build_opener(NoRedirects)
+    token = secrets.token_hex(16)
+    request = urllib.request.Request(  # noqa: S310
+        url,
+        data=urllib.parse.urlencode({"item_id": item_id}).encode(),
+        headers={
+            "Cookie": f"sessionid={session}; csrftoken={token}",
+            "X-CSRFToken": token,
+        },
+    )
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            with opener.open(request, timeout=30) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except (urllib.error.URLError, ConnectionError):
+            status = 0
+        result.record(status, time.perf_counter() - start)
+
+
+def run_profile(
+    name: str,
+    overrides: dict[str, str],
+    clients: list[tuple[str, int]],
+    args: argparse.Namespace,
+) -> Result | None:
+    """
+    Start gunicorn with a profile's limits and benchmark it.
+
+    Args:
+        name (str): Name of the profile.
+        overrides (dict[str, str]): Environment overrides for the profile.
+        clients (list[tuple[str, int]]): Each client's session and item.
+        args (argparse.Namespace): Parsed command line arguments.
+
+    Returns:
+        Result | None: The benchmark result, or None if the server failed to
+        start.
+    """
+    bind = f"127.0.0.1:{args.port}"
+    env = {
+        **os.environ,
+        **overrides,
+        "GUNICORN_WORKER_CLASS": "gthread",
+        "GUNICORN_WORKERS": "1",
+        "GUNICORN_THREADS": str(len(clients)),
+        "GUNICORN_BIND": bind,
+        "GUNICORN_ACCESS_LOG": "/dev/null",
+    }
+    server = subprocess.Popen(  # noqa: S603
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "-c",
+            "python:garage_sale.gunicorn_conf",
+            "garage_sale.wsgi:application",
+        ],
+        cwd=BASE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://{bind}"
+    try:
+        if not wait_until_ready(base_url + "/shop/", timeout=15):
+            sys.stderr.write(f"{name}: server did not start, skipping\n")
+            return None
+        result = Result()
+        deadline = time.monotonic() + args.duration
+        threads = [
+            threading.Thread(
+                target=client,
+                args=(
+                    base_url + "/shop/cart/add/",
+                    session,
+                    item_id,
+                    deadline,
+                    result,
+                ),
+            )
+            for session, item_id in clients
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return result
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def percentile(latencies: list[float], n: int) -> str:
+    """
+    Format a percentile of some latencies in milliseconds.
+
+    Args:
+        latencies (list[float]): Latencies in seconds.
+        n (int): The percentile.
+
+    Returns:
+        str: The percentile, or "-" if there are too few latencies.
+    """
+    if len(latencies) < 2:  # noqa: PLR2004
+        return "-"
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return f"{quantiles[n - 1] * 1000:.1f}"
+
+
+def report(name: str, result: Result, duration: float) -> str:
+    """
+    Format a benchmark result as a table row.
+
+    Args:
+        name (str): Name of the profile.
+        result (Result): The benchmark result.
+        duration (float): Duration of the benchmark in seconds.
+
+    Returns:
+        str: The formatted table row.
+    """
+    counts = Counter({s: len(v) for s, v in result.latencies.items()})
+    ok = result.latencies.get(HTTPStatus.FOUND, [])
+    shed = result.latencies.get(
+        HTTPStatus.TOO_MANY_REQUESTS, []
+    ) + result.latencies.get(HTTPStatus.SERVICE_UNAVAILABLE, [])
+    errors = counts.total() - len(ok) - len(shed)
+    return (
+        f"{name:<12}{len(ok) / duration:>8.1f}"
+        f"{percentile(ok, 50):>9}{percentile(ok, 99):>9}"
+        f"{counts[HTTPStatus.TOO_MANY_REQUESTS]:>7}"
+        f"{counts[HTTPStatus.SERVICE_UNAVAILABLE]:>7}"
+        f"{percentile(shed, 99):>10}{errors:>8}"
+    )
+
+
+def main() -> None:
+    """Parse the command line and benchmark each profile."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "garage_sale.settings")
+    import django
+
+    django.setup()
+    clients = set_up(args.concurrency)
+    try:
+        sys.stdout.write(
+            f"{'profile':<12}{'ok/s':>8}{'p50 ms':>9}{'p99 ms':>9}"
+            f"{'429':>7}{'503':>7}{'shed p99':>10}{'errors':>8}\n"
+        )
+        for name, overrides in PROFILES.items():
+            result = run_profile(name, overrides, clients, args)
+            if result is not None:
+                sys.stdout.write(report(name, result, args.duration) + "\n")
+    finally:
+        tear_down()
+
+
+if __name__ == "__main__":
+    main()
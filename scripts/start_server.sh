@@ -1,4 +1,6 @@
 #!/usr/bin/env sh
 
 python manage.py collectstatic --no-input
-gunicorn garage_sale.wsgi:application --bind 0.0.0.0
+# worker count, threads, worker class and preloading are configured by the
+# versioned profile in garage_sale/gunicorn_conf.py (see GUNICORN_* variables)
+gunicorn -c python:garage_sale.gunicorn_conf garage_sale.wsgi:application
@@ -1,7 +1,822 @@
 """Admin settings for the shop application."""
 
-from django.contrib import admin
+from __future__ import annotations
 
-from .models import Item
+import json
+from functools import cached_property
+from typing import TYPE_CHECKING
 
-admin.site.register(Item)
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.views.main import (
+    ALL_VAR,
+    ERROR_FLAG,
+    IS_POPUP_VAR,
+    ORDER_VAR,
+    PAGE_VAR,
+    TO_FIELD_VAR,
+)
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections, models, transaction
+from django.utils import timezone
+
+from .conditional import bump_catalogue_version
+from .facets import invalidate_price_facets
+from .models import (
+    Cart,
+    CartItem,
+    Item,
+    ItemImage,
+    MarkdownRule,
+    Order,
+    PriceChange,
+    Seller,
+)
+from .pricing import scaled_price
+from .sharding import shards
+from .typeahead import invalidate_typeahead
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from django.contrib.admin.views.main import ChangeList
+    from django.http import HttpRequest
+
+# tables with fewer rows than this are always counted exactly
+ESTIMATE_THRESHOLD = 10_000
+# seconds a large table's exact count is cached for on databases without row
+# estimates
+COUNT_CACHE_TTL = 5 * 60
+# changelist parameter picking the shard a sharded model's rows are listed
+# from
+SHARD_VAR = "shard"
+# changelist parameters that don't filter or search the objects
+UNFILTERED_PARAMS = frozenset(
+    {
+        ALL_VAR,
+        ERROR_FLAG,
+        IS_POPUP_VAR,
+        ORDER_VAR,
+        PAGE_VAR,
+        SHARD_VAR,
+        TO_FIELD_VAR,
+    }
+)
+
+
+def estimated_count(queryset: models.QuerySet) -> int:
+    """
+    Return a cheap estimate of the number of rows an unfiltered queryset has.
+
+    Tables with fewer than ``ESTIMATE_THRESHOLD`` rows are always counted
+    exactly. On PostgreSQL, larger ones are estimated by the planner from
+    the queryset's own plan, so rows its manager hides, such as deleted
+    Items, aren't counted. Other databases keep no row estimates, so large
+    counts are cached for a few minutes instead; small counts are cheap and
+    aren't cached, so they are never stale.
+
+    Args:
+        queryset (QuerySet): An unfiltered queryset of the model.
+
+    Returns:
+        int: The estimated number of rows.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql":
+        plan = json.loads(queryset.explain(format="json"))
+        estimate = plan[0]["Plan"]["Plan Rows"]
+        if estimate >= ESTIMATE_THRESHOLD:
+            return int(estimate)
+        return queryset.count()
+    key = f"admin-count:{queryset.db}:{queryset.model._meta.label_lower}"  # noqa: SLF001
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        if count >= ESTIMATE_THRESHOLD:
+            cache.set(key, count, COUNT_CACHE_TTL)
+    return count
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that can estimate the number of objects."""
+
+    def __init__(
+        self, *args: list, estimate: bool = False, **kwargs: dict
+    ) -> None:
+        """
+        Create the paginator.
+
+        Args:
+            args (list): Positional arguments for ``Paginator``.
+            estimate (bool): Whether the objects are a whole table, whose
+                size may be estimated.
+            kwargs (dict): Keyword arguments for ``Paginator``.
+        """
+        super().__init__(*args, **kwargs)
+        self.estimate = estimate
+
+    @cached_property
+    def count(self) -> int:
+        """
+        Return the number of objects, estimated for a whole table.
+
+        Returns:
+            int: The (estimated) number of objects.
+        """
+        if self.estimate and isinstance(self.object_list, models.QuerySet):
+            return estimated_count(self.object_list)
+        return super().count
+
+
+def changelist_is_filtered(request: HttpRequest) -> bool:
+    """
+    Return whether a changelist request filters or searches the objects.
+
+    The queryset can't tell, as managers may filter it themselves, e.g. to
+    hide deleted Items.
+
+    Args:
+        request (HttpRequest): The changelist request.
+
+    Returns:
+        bool: Whether any filter or search term is set.
+    """
+    return any(
+        value
+        for name, value in request.GET.items()
+        if name not in UNFILTERED_PARAMS
+    )
+
+
+class EstimatedCountAdmin(admin.ModelAdmin):
+    """Admin whose unfiltered changelist estimates the number of rows."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_paginator(
+        self,
+        request: HttpRequest,
+        queryset: models.QuerySet,
+        per_page: int,
+        orphans: int = 0,
+        allow_empty_first_page: bool = True,  # noqa: FBT001, FBT002
+    ) -> EstimatedCountPaginator:
+        """
+        Return the changelist's paginator.
+
+        Args:
+            request (HttpRequest): The changelist request.
+            queryset (QuerySet): The listed objects.
+            per_page (int): Number of objects per page.
+            orphans (int): Number of objects allowed on a short last page.
+            allow_empty_first_page (bool): Whether the first page may be
+                empty.
+
+        Returns:
+            EstimatedCountPaginator: The paginator.
+        """
+        return self.paginator(
+            queryset,
+            per_page,
+            orphans,
+            allow_empty_first_page,
+            estimate=not changelist_is_filtered(request),
+        )
+
+
+def _admin_shard(request: HttpRequest) -> str:
+    """
+    Return the shard a sharded model's changelist lists rows from.
+
+    Args:
+        request (HttpRequest): The changelist request.
+
+    Returns:
+        str: The shard picked with the ``shard`` parameter, the first shard
+        by default.
+    """
+    aliases = shards()
+    alias = request.GET.get(SHARD_VAR)
+    return alias if alias in aliases else aliases[0]
+
+
+class ShardListFilter(admin.SimpleListFilter):
+    """Pick the shard a sharded model's changelist lists rows from."""
+
+    title = "shard"
+    parameter_name = SHARD_VAR
+
+    def lookups(
+        self,
+        request: HttpRequest,  # noqa: ARG002
+        model_admin: admin.ModelAdmin,  # noqa: ARG002
+    ) -> list[tuple[str, str]]:
+        """
+        Return the filter's choices.
+
+        Args:
+            request (HttpRequest): The HTTP request.
+            model_admin (ModelAdmin): The sharded model's admin.
+
+        Returns:
+            list[tuple[str, str]]: The shards' aliases, as values and labels.
+        """
+        return [(alias, alias) for alias in shards()]
+
+    def queryset(
+        self,
+        request: HttpRequest,  # noqa: ARG002
+        queryset: models.QuerySet,
+    ) -> models.QuerySet:
+        """
+        Return the rows unchanged; the admin already reads from the shard.
+
+        Args:
+            request (HttpRequest): The HTTP request.
+            queryset (QuerySet): The rows.
+
+        Returns:
+            QuerySet: The same rows.
+        """
+        return queryset
+
+    def choices(self, changelist: ChangeList) -> Iterator[dict]:
+        """
+        Yield one choice per shard, without a choice for every shard.
+
+        Args:
+            changelist (ChangeList): The changelist.
+
+        Yields:
+            dict: Each shard's choice.
+        """
+        selected = self.value() or shards()[0]
+        for alias, title in self.lookup_choices:
+            yield {
+                "selected": alias == selected,
+                "query_string": changelist.get_query_string(
+                    {self.parameter_name: alias}
+                ),
+                "display": title,
+            }
+
+
+class ShardedAdmin(EstimatedCountAdmin):
+    """
+    Admin for a model whose rows are stored in the shards.
+
+    With sharding switched on, the changelist lists one shard at a time,
+    picked with a ``shard`` filter, and objects are looked up in every shard,
+    whose IDs don't overlap. Objects loaded from a shard are saved and
+    deleted there by the router.
+    """
+
+    def get_queryset(self, request: HttpRequest) -> models.QuerySet:
+        """
+        Get the rows of the shard the changelist lists.
+
+        Args:
+            request (HttpRequest): The HTTP request.
+
+        Returns:
+            QuerySet: The rows.
+        """
+        queryset = super().get_queryset(request)
+        if settings.SHARD_DATABASES:
+            queryset = queryset.using(_admin_shard(request))
+        return queryset
+
+    def get_list_filter(self, request: HttpRequest) -> tuple:
+        """
+        Return the changelist's filters, with the shard filter first.
+
+        Args:
+            request (HttpRequest): The HTTP request.
+
+        Returns:
+            tuple: The filters.
+        """
+        list_filter = tuple(super().get_list_filter(request))
+        if settings.SHARD_DATABASES:
+            list_filter = (ShardListFilter, *list_filter)
+        return list_filter
+
+    def get_object(
+        self,
+        request: HttpRequest,
+        object_id: str,
+        from_field: str | None = None,
+    ) -> models.Model | None:
+        """
+        Find an object in whichever shard holds it.
+
+        Args:
+            request (HttpRequest): The HTTP request.
+            object_id (str): The object's ID, or value of ``from_field``.
+            from_field (str | None): Field the object is looked up by, the
+                primary key by default.
+
+        Returns:
+            Model | None: The object, or None if no shard has it.
+        """
+        if not settings.SHARD_DATABASES:
+            return super().get_object(request, object_id, from_field)
+        queryset = super().get_queryset(request)
+        meta = queryset.model._meta  # noqa: SLF001
+        field = meta.pk if from_field is None else meta.get_field(from_field)
+        try:
+            object_id = field.to_python(object_id)
+        except (ValidationError, ValueError):
+            return None
+        for alias in shards():
+            obj = (
+                queryset.using(alias).filter(**{field.name: object_id}).first()
+            )
+            if obj is not None:
+                return obj
+        return None
+
+    def get_formset_kwargs(
+        self,
+        request: HttpRequest,
+        obj: models.Model,
+        inline: admin.options.InlineModelAdmin,
+        prefix: str,
+    ) -> dict:
+        """
+        Read an object's inline rows from its shard.
+
+        Args:
+            request (HttpRequest): The HTTP request.
+            obj (Model): The edited object.
+            inline (InlineModelAdmin): The inline.
+            prefix (str): The formset's prefix.
+
+        Returns:
+            dict: Keyword arguments for the inline formset.
+        """
+        kwargs = super().get_formset_kwargs(request, obj, inline, prefix)
+        if settings.SHARD_DATABASES and obj._state.db is not None:  # noqa: SLF001
+            kwargs["queryset"] = kwargs["queryset"].using(obj._state.db)  # noqa: SLF001
+        return kwargs
+
+
+class RepriceActionForm(ActionForm):
+    """Action form with the percentage used by the reprice action."""
+
+    percentage = forms.IntegerField(
+        required=False,
+        min_value=-100,
+        max_value=1000,
+        help_text="Percentage to change prices by, e.g. -25",
+    )
+
+
+class SoldListFilter(admin.SimpleListFilter):
+    """Filter Items by whether they are sold."""
+
+    title = "sold"
+    parameter_name = "sold"
+
+    def lookups(
+        self,
+        request: HttpRequest,  # noqa: ARG002
+        model_admin: admin.ModelAdmin,  # noqa: ARG002
+    ) -> list[tuple[str, str]]:
+        """
+        Return the filter's choices.
+
+        Args:
+            request (HttpRequest): The HTTP request.
+            model_admin (ModelAdmin): The Item admin.
+
+        Returns:
+            list[tuple[str, str]]: The choices' values and labels.
+        """
+        return [("no", "Unsold"), ("yes", "Sold")]
+
+    def queryset(
+        self,
+        request: HttpRequest,  # noqa: ARG002
+        queryset: models.QuerySet,
+    ) -> models.QuerySet:
+        """
+        Filter the Items by the selected sold state.
+
+        Args:
+            request (HttpRequest): The HTTP request.
+            queryset (QuerySet): The Items.
+
+        Returns:
+            QuerySet: The filtered Items.
+        """
+        if self.value() == "no":
+            return queryset.filter(sold_at__isnull=True)
+        if self.value() == "yes":
+            return queryset.filter(sold_at__isnull=False)
+        return queryset
+
+
+class ItemImageInline(admin.TabularInline):
+    """Inline listing an Item's photos."""
+
+    model = ItemImage
+    extra = 0
+    fields = ("digest", "extension", "width", "height", "thumbnails_ready")
+    readonly_fields = fields
+
+
+class PriceChangeInline(admin.TabularInline):
+    """Inline listing an Item's price history."""
+
+    model = PriceChange
+    extra = 0
+    fields = ("effective_at", "price_in_cents", "rule")
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(
+        self,
+        request: HttpRequest,  # noqa: ARG002
+        obj: Item | None = None,  # noqa: ARG002
+    ) -> bool:
+        """
+        Refuse to add entries, since the price history is append-only.
+
+        Args:
+            request (HttpRequest): The HTTP request.
+            obj (Item | None): The Item being edited.
+
+        Returns:
+            bool: Always False.
+        """
+        return False
+
+
+@admin.register(Item)
+class ItemAdmin(EstimatedCountAdmin):
+    """
+    Admin for Items.
+
+    Bulk actions, including deletion, run as single set-based ``UPDATE``
+    statements, so they bypass the Item signals and start a new catalogue
+    version and invalidate the typeahead index instead. Deleted Items are
+    only hidden; they are physically deleted by the background purge.
+    """
+
+    list_display = ("id", "name", "seller", "price", "sold_at")
+    list_select_related = ("seller",)
+    list_filter = (SoldListFilter, ("sold_at", admin.DateFieldListFilter))
+    search_fields = ("=id", "^name")
+    raw_id_fields = ("seller",)
+    readonly_fields = ("version",)
+    inlines = (ItemImageInline, PriceChangeInline)
+    actions = ("mark_sold", "mark_unsold", "reprice")
+    action_form = RepriceActionForm
+
+    @admin.display(description="price", ordering="price_in_cents")
+    def price(self, item: Item) -> str:
+        """
+        Return the Item's formatted price.
+
+        Args:
+            item (Item): The Item.
+
+        Returns:
+            str: The formatted price.
+        """
+        return item.format_price()
+
+    @admin.action(description="Mark selected items as sold")
+    def mark_sold(
+        self, request: HttpRequest, queryset: models.QuerySet
+    ) -> None:
+        """
+        Mark the selected unsold Items as sold with one ``UPDATE``.
+
+        Args:
+            request (HttpRequest): The HTTP request.
+            queryset (QuerySet): The selected Items.
+        """
+        with transaction.atomic():
+            updated = queryset.filter(sold_at__isnull=True).update(
+                sold_at=timezone.now(), version=models.F("version") + 1
+            )
+            bump_catalogue_version()
+            invalidate_price_facets()
+        transaction.on_commit(invalidate_typeahead)
+        self.message_user(request, f"Marked {updated} items as sold.")
+
+    @admin.action(description="Mark selected items as unsold")
+    def mark_unsold(
+        self, request: HttpRequest, queryset: models.QuerySet
+    ) -> None:
+        """
+        Mark the selected sold Items as unsold with one ``UPDATE``.
+
+        Args:
+            request (HttpRequest): The HTTP request.
+            queryset (QuerySet): The selected Items.
+        """
+        with transaction.atomic():
+            updated = queryset.filter(sold_at__isnull=False).update(
+                sold_at=None, version=models.F("version") + 1
+            )
+            bump_catalogue_version()
+            invalidate_price_facets()
+        transaction.on_commit(invalidate_typeahead)
+        self.message_user(request, f"Marked {updated} items as unsold.")
+
+    @admin.action(description="Reprice selected unsold items by percentage")
+    def reprice(self, request: HttpRequest, queryset: models.QuerySet) -> None:
+        """
+        Change the prices of the selected unsold Items with one ``UPDATE``.
+
+        Prices are rounded to the nearest cent and recorded in the price
+        history. Lines already in carts keep the prices they captured.
+
+        Args:
+            request (HttpRequest): The HTTP request.
+            queryset (QuerySet): The selected Items.
+        """
+        form = RepriceActionForm(request.POST)
+        form.fields["action"].choices = self.get_action_choices(request)
+        if not form.is_valid() or form.cleaned_data["percentage"] is None:
+            self.message_user(
+                request,
+                "Enter a percentage between -100 and 1000 to reprice by.",
+                messages.ERROR,
+            )
+            return
+        percentage = form.cleaned_data["percentage"]
+        unsold = queryset.filter(sold_at__isnull=True)
+        with transaction.atomic():
+            updated = unsold.update(
+                price_in_cents=scaled_price(percentage),
+                version=models.F("version") + 1,
+            )
+            PriceChange.record(unsold, timezone.now())
+            bump_catalogue_version()
+            invalidate_price_facets()
+        self.message_user(
+            request, f"Repriced {updated} items by {percentage}%."
+        )
+
+    def delete_model(
+        self,
+        request: HttpRequest,  # noqa: ARG002
+        obj: Item,
+    ) -> None:
+        """
+        Soft-delete an Item, leaving its cart lines to the background purge.
+
+        Args:
+            request (HttpRequest): The HTTP request.
+            obj (Item): The Item.
+        """
+        obj.soft_delete()
+
+    def delete_queryset(
+        self,
+        request: HttpRequest,  # noqa: ARG002
+        queryset: models.QuerySet,
+    ) -> None:
+        """
+        Soft-delete the selected Items with one ``UPDATE``.
+
+        Their cart lines, photos and price history are left to the
+        background purge.
+
+        Args:
+            request (HttpRequest): The HTTP request.
+            queryset (QuerySet): The selected Items.
+        """
+        with transaction.atomic():
+            queryset.update(
+                deleted_at=timezone.now(), version=models.F("version") + 1
+            )
+            bump_catalogue_version()
+            invalidate_price_facets()
+        transaction.on_commit(invalidate_typeahead)
+
+
+class CartItemInline(admin.TabularInline):
+    """Inline listing a Cart's lines."""
+
+    model = CartItem
+    extra = 0
+    raw_id_fields = ("item",)
+
+
+@admin.register(Cart)
+class CartAdmin(ShardedAdmin):
+    """Admin for Carts."""
+
+    list_display = ("id", "user", "active", "total")
+    list_select_related = ("user",)
+    list_filter = ("active",)
+    search_fields = ("=id", "=user__username")
+    raw_id_fields = ("user",)
+    exclude = ("total_in_cents",)
+    inlines = (CartItemInline,)
+
+    @admin.display(description="total", ordering="total_in_cents")
+    def total(self, cart: Cart) -> str:
+        """
+        Return the Cart's formatted total.
+
+        Args:
+            cart (Cart): The Cart.
+
+        Returns:
+            str: The formatted total.
+        """
+        return cart.format_total()
+
+    def get_queryset(self, request: HttpRequest) -> models.QuerySet:
+        """
+        Get the Carts, fetching their users separately when sharded.
+
+        Args:
+            request (HttpRequest): The HTTP request.
+
+        Returns:
+            QuerySet: The Carts.
+        """
+        queryset = super().get_queryset(request)
+        if settings.SHARD_DATABASES:
+            queryset = queryset.prefetch_related("user")
+        return queryset
+
+    def get_list_select_related(self, request: HttpRequest) -> tuple:
+        """
+        Return the relations joined in the changelist's query.
+
+        Users stay in the default database, so a shard can't join them; they
+        are prefetched instead.
+
+        Args:
+            request (HttpRequest): The HTTP request.
+
+        Returns:
+            tuple: The joined relations.
+        """
+        if settings.SHARD_DATABASES:
+            return ()
+        return super().get_list_select_related(request)
+
+    def get_search_fields(self, request: HttpRequest) -> tuple:
+        """
+        Return the fields searched in the shard's own table.
+
+        Args:
+            request (HttpRequest): The HTTP request.
+
+        Returns:
+            tuple: The searched fields.
+        """
+        if settings.SHARD_DATABASES:
+            return ("=id",)
+        return super().get_search_fields(request)
+
+    def get_search_results(
+        self,
+        request: HttpRequest,
+        queryset: models.QuerySet,
+        search_term: str,
+    ) -> tuple[models.QuerySet, bool]:
+        """
+        Search the Carts, finding users by name in the default database.
+
+        Args:
+            request (HttpRequest): The HTTP request.
+            queryset (QuerySet): The Carts.
+            search_term (str): The search term.
+
+        Returns:
+            tuple[QuerySet, bool]: The matching Carts, and whether they may
+            contain duplicates.
+        """
+        results, may_have_duplicates = super().get_search_results(
+            request, queryset, search_term
+        )
+        if settings.SHARD_DATABASES and search_term:
+            users = list(
+                User.objects.filter(username=search_term.strip()).values_list(
+                    "id", flat=True
+                )
+            )
+            if users:
+                results |= queryset.filter(user_id__in=users)
+        return results, may_have_duplicates
+
+    def save_related(
+        self,
+        request: HttpRequest,
+        form: forms.ModelForm,
+        formsets: list,
+        change: bool,  # noqa: FBT001
+    ) -> None:
+        """
+        Save the Cart's lines, then recompute its total.
+
+        Args:
+            request (HttpRequest): The HTTP request.
+            form (ModelForm): The Cart form.
+            formsets (list): The inline formsets.
+            change (bool): Whether an existing Cart was changed.
+        """
+        super().save_related(request, form, formsets, change)
+        form.instance.update_total()
+
+
+@admin.register(Order)
+class OrderAdmin(ShardedAdmin):
+    """Admin for Orders."""
+
+    list_display = (
+        "id",
+        "first_name",
+        "last_name",
+        "email",
+        "total",
+        "created_at",
+        "receipt_sent_at",
+    )
+    list_select_related = ("cart",)
+    list_filter = (("created_at", admin.DateFieldListFilter),)
+    search_fields = ("=id", "^email", "^last_name")
+    raw_id_fields = ("cart",)
+
+    @admin.display(description="total", ordering="cart__total_in_cents")
+    def total(self, order: Order) -> str:
+        """
+        Return the formatted total of the Order's Cart.
+
+        Args:
+            order (Order): The Order.
+
+        Returns:
+            str: The formatted total.
+        """
+        return order.cart.format_total()
+
+    def get_readonly_fields(
+        self, request: HttpRequest, obj: Order | None = None
+    ) -> tuple:
+        """
+        Return the read-only fields, including the Cart when sharded.
+
+        The Cart field only offers the default database's Carts, so with
+        sharding switched on an Order keeps the Cart it was checked out with.
+
+        Args:
+            request (HttpRequest): The HTTP request.
+            obj (Order | None): The edited Order.
+
+        Returns:
+            tuple: The read-only fields.
+        """
+        readonly_fields = tuple(super().get_readonly_fields(request, obj))
+        if settings.SHARD_DATABASES:
+            readonly_fields += ("cart",)
+        return readonly_fields
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        """
+        Refuse to add Orders by hand when sharding is switched on.
+
+        Args:
+            request (HttpRequest): The HTTP request.
+
+        Returns:
+            bool: Whether Orders may be added.
+        """
+        if settings.SHARD_DATABASES:
+            return False
+        return super().has_add_permission(request)
+
+
+@admin.register(MarkdownRule)
+class MarkdownRuleAdmin(admin.ModelAdmin):
+    """Admin for markdown rules."""
+
+    list_display = (
+        "name",
+        "percentage",
+        "starts_at",
+        "min_listed_for",
+        "active",
+        "applied_at",
+    )
+    list_filter = ("active",)
+    readonly_fields = ("applied_at",)
+
+
+admin.site.register(Seller)
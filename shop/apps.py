@@ -1,6 +1,37 @@
 """Apps for the shop application."""
 
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+if TYPE_CHECKING:
+    from django.db.backends.base.base import BaseDatabaseWrapper
+
+
+def configure_sqlite(
+    sender: type,  # noqa: ARG001
+    connection: BaseDatabaseWrapper,
+    **kwargs: dict,  # noqa: ARG001
+) -> None:
+    """
+    Switch new SQLite connections to write-ahead logging.
+
+    With WAL, readers no longer block the writer, so web workers and
+    background job workers can share the database file.
+
+    Args:
+        sender (type): The database wrapper class.
+        connection (BaseDatabaseWrapper): The new database connection.
+        kwargs (dict): Additional signal arguments.
+    """
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
 
 
 class ShopConfig(AppConfig):
@@ -8,3 +39,15 @@ class ShopConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "shop"
+
+    def ready(self) -> None:
+        """Connect the application's signal handlers and checks."""
+        from . import (  # noqa: F401
+            checks,
+            conditional,
+            facets,
+            receipts,
+            typeahead,
+        )
+
+        connection_created.connect(configure_sqlite)
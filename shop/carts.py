@@ -0,0 +1,116 @@
+"""
+Expiry of abandoned Carts.
+
+Every user who looks at their cart gets an active Cart, and most are never
+checked out. Active Carts whose lines haven't changed for
+``CART_EXPIRE_AFTER`` seconds, empty or not, are deleted with their lines by
+the background worker, in small batches that each hold a database's write
+lock only briefly. The user gets a new empty Cart when they next need one.
+Checked out Carts belong to their Orders and are never expired.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Cart, CartItem
+from .sharding import shards
+
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+
+# number of Carts expired per transaction
+EXPIRE_BATCH = 500
+
+
+@dataclass(frozen=True)
+class CartExpiryStats:
+    """Statistics about a run of ``expire_stale_carts``."""
+
+    carts: int
+    lines: int
+
+    @property
+    def rows(self) -> int:
+        """
+        Return the number of rows deleted.
+
+        Returns:
+            int: The number of Carts and cart lines deleted.
+        """
+        return self.carts + self.lines
+
+
+def _expire_batch(
+    stale: QuerySet[Cart], cart_ids: list[int], using: str
+) -> tuple[int, int]:
+    """
+    Delete a batch of stale Carts and their lines from one database.
+
+    The lines are deleted first, so the transaction starts with a write and
+    waits for the write lock rather than failing to upgrade a read. Carts
+    changed since they were picked no longer match ``stale`` and are kept.
+
+    Args:
+        stale (QuerySet[Cart]): The Carts that may be expired.
+        cart_ids (list[int]): IDs of the Carts in the batch.
+        using (str): Alias of the database holding the Carts.
+
+    Returns:
+        tuple[int, int]: Number of Carts and of cart lines deleted.
+    """
+    batch = stale.using(using).filter(id__in=cart_ids)
+    with transaction.atomic(using=using):
+        lines, _ = (
+            CartItem.objects.using(using).filter(cart__in=batch).delete()
+        )
+        _, deleted = batch.delete()
+    return deleted.get(Cart._meta.label, 0), lines  # noqa: SLF001
+
+
+def expire_stale_carts(
+    older_than: timedelta | None = None, batch_size: int = EXPIRE_BATCH
+) -> CartExpiryStats:
+    """
+    Delete the active Carts left untouched for a while, in every shard.
+
+    Args:
+        older_than (timedelta | None): How long ago the Carts must have last
+            changed, ``CART_EXPIRE_AFTER`` by default.
+        batch_size (int): Number of Carts deleted per transaction.
+
+    Returns:
+        CartExpiryStats: The number of Carts and cart lines deleted.
+    """
+    if older_than is None:
+        older_than = timedelta(seconds=settings.CART_EXPIRE_AFTER)
+    stale = Cart.objects.filter(
+        active=True, updated_at__lt=timezone.now() - older_than
+    )
+    carts = lines = 0
+    for using in shards():
+        last_id = 0
+        while True:
+            cart_ids = list(
+                stale.using(using)
+                .filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if cart_ids:
+                deleted_carts, deleted_lines = _expire_batch(
+                    stale, cart_ids, using
+                )
+                carts += deleted_carts
+                lines += deleted_lines
+                last_id = cart_ids[-1]
+            # a short batch was the last one
+            if len(cart_ids) < batch_size:
+                break
+    return CartExpiryStats(carts=carts, lines=lines)
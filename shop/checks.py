@@ -0,0 +1,105 @@
+"""System checks for the shop application."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+if TYPE_CHECKING:
+    from django.apps import AppConfig
+    from django.core.checks import CheckMessage
+
+# session engines that keep sessions in the default cache
+CACHED_SESSION_ENGINES = frozenset(
+    {
+        "django.contrib.sessions.backends.cache",
+        "django.contrib.sessions.backends.cached_db",
+    }
+)
+# cache backends whose entries every process keeps to itself
+LOCAL_CACHE_BACKENDS = frozenset(
+    {
+        "django.core.cache.backends.dummy.DummyCache",
+        "django.core.cache.backends.locmem.LocMemCache",
+    }
+)
+
+
+def cache_is_shared(alias: str = "default") -> bool:
+    """
+    Return whether a cache is shared by every worker process.
+
+    Args:
+        alias (str): Alias of the cache in ``CACHES``.
+
+    Returns:
+        bool: False for caches local to each process.
+    """
+    return settings.CACHES[alias]["BACKEND"] not in LOCAL_CACHE_BACKENDS
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(
+    app_configs: list[AppConfig] | None,  # noqa: ARG001
+    **kwargs: dict,  # noqa: ARG001
+) -> list[CheckMessage]:
+    """
+    Warn when deploying with a cache that worker processes don't share.
+
+    Args:
+        app_configs (list[AppConfig] | None): The checked applications.
+        kwargs (dict): Additional check arguments.
+
+    Returns:
+        list[CheckMessage]: The warnings.
+    """
+    if cache_is_shared():
+        return []
+    return [
+        Warning(
+            "The default cache is local to each process.",
+            hint=(
+                "Rate limits and search-as-you-type updates are only "
+                "shared by worker processes through a shared cache. Set "
+                "CACHE_BACKEND to a cache such as Redis or Memcached."
+            ),
+            id="shop.W001",
+        )
+    ]
+
+
+@register(Tags.caches)
+def check_session_cache(
+    app_configs: list[AppConfig] | None,  # noqa: ARG001
+    **kwargs: dict,  # noqa: ARG001
+) -> list[CheckMessage]:
+    """
+    Warn when sessions are cached in a cache local to each process.
+
+    A session ended or changed in one process would stay cached, unchanged,
+    in the others.
+
+    Args:
+        app_configs (list[AppConfig] | None): The checked applications.
+        kwargs (dict): Additional check arguments.
+
+    Returns:
+        list[CheckMessage]: The warnings.
+    """
+    if (
+        settings.SESSION_ENGINE not in CACHED_SESSION_ENGINES
+        or cache_is_shared(settings.SESSION_CACHE_ALIAS)
+    ):
+        return []
+    return [
+        Warning(
+            "Sessions are cached in a cache local to each process.",
+            hint=(
+                "Point CACHE_BACKEND at a shared cache, or set "
+                "SESSION_ENGINE to django.contrib.sessions.backends.db."
+            ),
+            id="shop.W002",
+        )
+    ]
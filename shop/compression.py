@@ -0,0 +1,154 @@
+"""
+Response compression with brotli or gzip.
+
+``CompressionMiddleware`` compresses text responses of at least
+``COMPRESS_MIN_SIZE`` bytes, streaming ones included, with brotli when the
+client accepts it and the optional ``brotli`` package is installed, and with
+gzip otherwise. Item photos and other binary files are already compressed
+and are sent as they are.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from django.http import HttpRequest, HttpResponse
+
+# brotli's quality ranges from 0 to 11; 5 compresses HTML about as fast as
+# gzip's default level, and smaller
+BROTLI_QUALITY = 5
+# content types worth compressing besides text/*
+COMPRESSIBLE_TYPES = frozenset(
+    {
+        "application/javascript",
+        "application/json",
+        "application/xml",
+        "image/svg+xml",
+    }
+)
+
+
+def accepts(request: HttpRequest, coding: str) -> bool:
+    """
+    Return whether a request accepts a content coding.
+
+    Args:
+        request (HttpRequest): The request.
+        coding (str): The content coding, e.g. ``br``.
+
+    Returns:
+        bool: Whether the ``Accept-Encoding`` header lists the coding, or
+        ``*``, without ``q=0``.
+    """
+    qualities = {}
+    for part in request.headers.get("Accept-Encoding", "").split(","):
+        name, *params = (param.strip() for param in part.split(";"))
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.lower()] = quality
+    return qualities.get(coding, qualities.get("*", 0.0)) > 0
+
+
+def compressible(response: HttpResponse) -> bool:
+    """
+    Return whether a response's content type is worth compressing.
+
+    Args:
+        response (HttpResponse): The response.
+
+    Returns:
+        bool: Whether the content is text.
+    """
+    content_type = response.get("Content-Type", "").partition(";")[0].strip()
+    return (
+        content_type.startswith("text/") or content_type in COMPRESSIBLE_TYPES
+    )
+
+
+def _brotli_sequence(sequence: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Compress streamed content with brotli, chunk by chunk.
+
+    Args:
+        sequence (Iterable[bytes]): The content.
+
+    Yields:
+        bytes: The compressed content.
+    """
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for chunk in sequence:
+        # flush so each chunk reaches the client as soon as it is produced
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Middleware that compresses text responses with brotli or gzip."""
+
+    def process_response(
+        self, request: HttpRequest, response: HttpResponse
+    ) -> HttpResponse:
+        """
+        Compress a response if it is worth it and the client accepts it.
+
+        Args:
+            request (HttpRequest): The request.
+            response (HttpResponse): The response.
+
+        Returns:
+            HttpResponse: The response, compressed or not.
+        """
+        if not response.streaming and (
+            len(response.content) < settings.COMPRESS_MIN_SIZE
+        ):
+            return response
+        if response.has_header("Content-Encoding") or not compressible(
+            response
+        ):
+            return response
+        # async streams are left to gzip
+        if (
+            brotli is None
+            or (response.streaming and response.is_async)
+            or not accepts(request, "br")
+        ):
+            return super().process_response(request, response)
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if response.streaming:
+            response.streaming_content = _brotli_sequence(
+                response.streaming_content
+            )
+            del response.headers["Content-Length"]
+        else:
+            compressed = brotli.compress(
+                response.content, quality=BROTLI_QUALITY
+            )
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = "br"
+        return response
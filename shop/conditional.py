@@ -0,0 +1,194 @@
+"""
+Conditional GETs for catalogue pages.
+
+Pages listing Items, Sellers and Orders are validated against a catalogue
+version kept in the database: a random token and the time it was set,
+replaced whenever an Item, ItemImage or Seller is saved or deleted, or an
+Order is checked out, in the transaction making the change. Every worker
+process reads the same version, so a change made by one process, such as a
+background worker, revalidates the pages served by all of them. The
+``catalogue_page`` decorators give a view an ``ETag`` built from the version,
+the user and the last change to their cart, and a matching
+``Last-Modified``, and answer repeat requests for unchanged pages with
+``304 Not Modified`` without running the view. Code that changes Items with
+``QuerySet.update()`` bypasses the signals and must call
+``bump_catalogue_version()``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import uuid
+from typing import TYPE_CHECKING
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .models import Cart, CatalogueVersion, Item, ItemImage, Seller
+from .sharding import shard_for_user
+from .signals import order_checked_out
+
+if TYPE_CHECKING:
+    from datetime import datetime
+
+    from django.http import HttpRequest
+
+    from .models import Order
+
+# primary key of the only CatalogueVersion row
+VERSION_ID = 1
+
+
+def catalogue_version() -> tuple[str, datetime]:
+    """
+    Return the current catalogue version, starting one if there is none yet.
+
+    Returns:
+        tuple[str, datetime]: The version's token and when it was set.
+    """
+    version = (
+        CatalogueVersion.objects.filter(pk=VERSION_ID)
+        .values_list("token", "changed_at")
+        .first()
+    )
+    if version is None:
+        version = bump_catalogue_version()
+    return version
+
+
+def bump_catalogue_version() -> tuple[str, datetime]:
+    """
+    Start a new catalogue version, so every cached page is revalidated.
+
+    The version is replaced in the current transaction, if any, so it only
+    changes if the change to the catalogue commits.
+
+    Returns:
+        tuple[str, datetime]: The new version's token and when it was set.
+    """
+    token, changed_at = uuid.uuid4().hex, timezone.now()
+    versions = CatalogueVersion.objects.filter(pk=VERSION_ID)
+    if not versions.update(token=token, changed_at=changed_at):
+        CatalogueVersion.objects.update_or_create(
+            pk=VERSION_ID,
+            defaults={"token": token, "changed_at": changed_at},
+        )
+    return token, changed_at
+
+
+def _validators(request: HttpRequest) -> tuple[str, datetime]:
+    """
+    Return the ``ETag`` and ``Last-Modified`` of a catalogue page.
+
+    The user's active Cart is looked up once per request, with one indexed
+    query, as the page's forms depend on it.
+
+    Args:
+        request (HttpRequest): The request for the page.
+
+    Returns:
+        tuple[str, datetime]: The weak ``ETag`` and the last modification.
+    """
+    if not hasattr(request, "catalogue_validators"):
+        token, modified = catalogue_version()
+        user_id = cart_updated = None
+        if request.user.is_authenticated:
+            user_id = request.user.pk
+            cart_updated = (
+                Cart.objects.using(shard_for_user(user_id))
+                .filter(user_id=user_id, active=True)
+                .values_list("updated_at", flat=True)
+                .first()
+            )
+            if cart_updated is not None:
+                modified = max(modified, cart_updated)
+        digest = hashlib.md5(
+            f"{token}:{user_id}:{cart_updated}".encode(),
+            usedforsecurity=False,
+        ).hexdigest()
+        request.catalogue_validators = (f'W/"{digest}"', modified)
+    return request.catalogue_validators
+
+
+def _etag(request: HttpRequest, *args: list, **kwargs: dict) -> str:  # noqa: ARG001
+    """
+    Return the ``ETag`` of a catalogue page.
+
+    Args:
+        request (HttpRequest): The request for the page.
+        args (list): The view's positional arguments.
+        kwargs (dict): The view's keyword arguments.
+
+    Returns:
+        str: The weak ``ETag``.
+    """
+    return _validators(request)[0]
+
+
+def _last_modified(
+    request: HttpRequest,
+    *args: list,  # noqa: ARG001
+    **kwargs: dict,  # noqa: ARG001
+) -> datetime:
+    """
+    Return when a catalogue page last changed.
+
+    Args:
+        request (HttpRequest): The request for the page.
+        args (list): The view's positional arguments.
+        kwargs (dict): The view's keyword arguments.
+
+    Returns:
+        datetime: The last change to the catalogue or the user's cart.
+    """
+    return _validators(request)[1]
+
+
+# decorators for a catalogue page's view; browsers must revalidate the page
+# every time rather than guess how long it stays fresh from Last-Modified
+catalogue_page = [
+    cache_control(private=True, no_cache=True),
+    condition(etag_func=_etag, last_modified_func=_last_modified),
+]
+
+
+def _bump(
+    sender: type,  # noqa: ARG001
+    **kwargs: dict,  # noqa: ARG001
+) -> None:
+    """
+    Start a new catalogue version in the transaction saving a change.
+
+    Args:
+        sender (type): The changed model.
+        kwargs (dict): Additional signal arguments.
+    """
+    bump_catalogue_version()
+
+
+for model in (Item, ItemImage, Seller):
+    post_save.connect(_bump, sender=model)
+    post_delete.connect(_bump, sender=model)
+
+
+@receiver(order_checked_out)
+def bump_on_checkout(
+    sender: type,  # noqa: ARG001
+    order: Order,  # noqa: ARG001
+    **kwargs: dict,  # noqa: ARG001
+) -> None:
+    """
+    Start a new catalogue version in the transaction checking an Order out.
+
+    Tills mark Items as sold with ``QuerySet.update()``, so the save signal
+    doesn't fire for them.
+
+    Args:
+        sender (type): The class that checked the Order out.
+        order (Order): The checked out Order.
+        kwargs (dict): Additional signal arguments.
+    """
+    bump_catalogue_version()
@@ -0,0 +1,98 @@
+"""Database helpers shared by the shop's models and bulk operations."""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+from django.contrib.postgres.indexes import OpClass
+from django.db import models
+from django.db.models.functions import Collate, Upper
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from django.db.backends.base.base import BaseDatabaseWrapper
+    from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+    from django.db.backends.ddl_references import Statement
+
+# KiB of page cache SQLite may use during bulk operations
+BULK_CACHE_KIB = 256 * 1024
+
+
+@contextmanager
+def large_cache(
+    connection: BaseDatabaseWrapper, kib: int = BULK_CACHE_KIB
+) -> Iterator[None]:
+    """
+    Give SQLite a larger page cache during a bulk operation.
+
+    Statements that touch many rows update index pages all over the file,
+    and SQLite's default cache of a few MiB evicts and rereads them over and
+    over. Other databases are left alone.
+
+    Args:
+        connection (BaseDatabaseWrapper): The database connection.
+        kib (int): Size of the page cache in KiB.
+
+    Yields:
+        None: While the larger cache is in place.
+    """
+    if connection.vendor != "sqlite":
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA cache_size")
+        (previous,) = cursor.fetchone()
+        cursor.execute(f"PRAGMA cache_size = -{int(kib)}")
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA cache_size = {int(previous)}")
+
+
+class PrefixSearchIndex(models.Index):
+    """
+    Index serving case-insensitive prefix searches on one field.
+
+    Django runs ``istartswith`` as a ``LIKE`` on SQLite, which is
+    case-insensitive and can only use an index built with the ``NOCASE``
+    collation, and as ``UPPER(column) LIKE UPPER(pattern)`` on PostgreSQL,
+    which can only use an index on the upper-cased column with a pattern
+    operator class. The index is built to suit the database it's created
+    in; other databases get a plain index.
+    """
+
+    def create_sql(
+        self,
+        model: type[models.Model],
+        schema_editor: BaseDatabaseSchemaEditor,
+        using: str = "",
+        **kwargs: dict,
+    ) -> Statement:
+        """
+        Return the statement creating the index in a database.
+
+        Args:
+            model (type[Model]): The indexed model.
+            schema_editor (BaseDatabaseSchemaEditor): The database's schema
+                editor.
+            using (str): Index method, e.g. `` USING gin``.
+            kwargs (dict): Additional ``Index.create_sql`` arguments.
+
+        Returns:
+            Statement: The ``CREATE INDEX`` statement.
+        """
+        (field,) = self.fields
+        vendor = schema_editor.connection.vendor
+        if vendor == "postgresql":
+            expression = OpClass(Upper(field), name="text_pattern_ops")
+        elif vendor == "sqlite":
+            expression = Collate(field, "nocase")
+        else:
+            expression = models.F(field)
+        index = models.Index(
+            expression, name=self.name, condition=self.condition
+        )
+        return index.create_sql(model, schema_editor, using, **kwargs)
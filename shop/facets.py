@@ -0,0 +1,291 @@
+"""
+Price facet counts for the Item list.
+
+The number of Items in each price bucket is kept in the database, one
+``PriceFacetCount`` row per bucket. Saving or deleting an Item moves it
+between the rows in the transaction making the change, so the counts are
+shared by every worker process, follow every change without counting the
+Items again, and never count a change that rolls back. Code that changes
+prices or sold state with ``QuerySet.update()`` bypasses the signals and
+must call ``invalidate_price_facets()`` or ``count_sold_items()``; after an
+invalidation the rows are counted again with one aggregate query on the
+next read.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .conditional import VERSION_ID
+from .models import CatalogueVersion, Item, PriceFacetCount, format_cents
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+# lower bounds, in cents, of each price bucket; the last bucket is open-ended
+PRICE_BUCKETS = (0, 100, 500, 1000, 2500, 5000, 10000)
+# fields that decide which price facets an Item counts in
+FACET_FIELDS = frozenset({"price_in_cents", "sold_at", "deleted_at"})
+
+
+@dataclass(frozen=True)
+class PriceFacet:
+    """A price bucket and the number of Items in it."""
+
+    min_price: int
+    max_price: int | None
+    count: int
+
+    @property
+    def label(self) -> str:
+        """
+        Return a human readable label for the bucket.
+
+        Returns:
+            str: The bucket's label.
+        """
+        if self.max_price is None:
+            return f"{format_cents(self.min_price)}+"
+        if self.min_price == 0:
+            return f"Under {format_cents(self.max_price)}"
+        return (
+            f"{format_cents(self.min_price)} - {format_cents(self.max_price)}"
+        )
+
+
+def bucket_bounds(bucket: int) -> tuple[int, int | None]:
+    """
+    Return the price range of a bucket.
+
+    Args:
+        bucket (int): Index of the bucket.
+
+    Returns:
+        tuple[int, int | None]: The inclusive lower bound and the exclusive
+        upper bound in cents, which is None for the last bucket.
+    """
+    if bucket + 1 < len(PRICE_BUCKETS):
+        return PRICE_BUCKETS[bucket], PRICE_BUCKETS[bucket + 1]
+    return PRICE_BUCKETS[bucket], None
+
+
+def bucket_for(price_in_cents: int) -> int:
+    """
+    Return the index of the bucket a price falls in.
+
+    Args:
+        price_in_cents (int): The price in cents.
+
+    Returns:
+        int: Index of the bucket.
+    """
+    for bucket in range(len(PRICE_BUCKETS) - 1, -1, -1):
+        if price_in_cents >= PRICE_BUCKETS[bucket]:
+            return bucket
+    return 0
+
+
+def _recount() -> dict[int, tuple[int, int]]:
+    """
+    Count the Items in every bucket with one aggregate query and store them.
+
+    The stale rows are deleted first, which on SQLite takes the write lock,
+    and the catalogue version row is locked, which every transaction
+    changing Items updates, so no change commits between counting the Items
+    and storing the counts.
+
+    Returns:
+        dict[int, tuple[int, int]]: The number of Items and of unsold Items
+        in each bucket.
+    """
+    aggregates = {}
+    for bucket in range(len(PRICE_BUCKETS)):
+        min_price, max_price = bucket_bounds(bucket)
+        in_bucket = Q(price_in_cents__gte=min_price)
+        if max_price is not None:
+            in_bucket &= Q(price_in_cents__lt=max_price)
+        aggregates[f"all_{bucket}"] = Count("id", filter=in_bucket)
+        aggregates[f"unsold_{bucket}"] = Count(
+            "id", filter=in_bucket & Q(sold_at__isnull=True)
+        )
+    with transaction.atomic():
+        PriceFacetCount.objects.all().delete()
+        list(
+            CatalogueVersion.objects.select_for_update().filter(pk=VERSION_ID)
+        )
+        totals = Item.objects.aggregate(**aggregates)
+        counts = {
+            bucket: (totals[f"all_{bucket}"], totals[f"unsold_{bucket}"])
+            for bucket in range(len(PRICE_BUCKETS))
+        }
+        PriceFacetCount.objects.bulk_create(
+            PriceFacetCount(
+                bucket=bucket, all_count=all_count, unsold_count=unsold_count
+            )
+            for bucket, (all_count, unsold_count) in counts.items()
+        )
+    return counts
+
+
+def price_facets(*, include_sold: bool) -> list[PriceFacet]:
+    """
+    Return the price facets, counting the Items first if needed.
+
+    Args:
+        include_sold (bool): Whether to count sold Items.
+
+    Returns:
+        list[PriceFacet]: The facets, in order of price.
+    """
+    counts = {
+        bucket: (all_count, unsold_count)
+        for bucket, all_count, unsold_count in (
+            PriceFacetCount.objects.values_list(
+                "bucket", "all_count", "unsold_count"
+            )
+        )
+    }
+    if len(counts) < len(PRICE_BUCKETS):
+        counts = _recount()
+    return [
+        PriceFacet(
+            *bucket_bounds(bucket),
+            max(0, counts[bucket][0 if include_sold else 1]),
+        )
+        for bucket in range(len(PRICE_BUCKETS))
+    ]
+
+
+def invalidate_price_facets() -> None:
+    """
+    Drop the counts so they are counted again on the next read.
+
+    The counts are dropped in the current transaction, if any, so they are
+    only counted again if the change to the Items commits.
+    """
+    PriceFacetCount.objects.all().delete()
+
+
+def count_sold_items(prices: Iterable[int]) -> None:
+    """
+    Take Items marked as sold with ``QuerySet.update()`` out of the counts.
+
+    Args:
+        prices (Iterable[int]): The prices in cents of the sold Items.
+    """
+    for bucket, sold in Counter(map(bucket_for, prices)).items():
+        PriceFacetCount.objects.filter(bucket=bucket).update(
+            unsold_count=F("unsold_count") - sold
+        )
+
+
+def _facet_state(values: dict[str, object]) -> tuple[int, bool] | None:
+    """
+    Return the fields that decide which price facets an Item counts in.
+
+    Args:
+        values (dict[str, object]): The Item's field values.
+
+    Returns:
+        tuple[int, bool] | None: The Item's price and whether it is sold, or
+        None if it is deleted and counts in no facet.
+    """
+    if values["deleted_at"] is not None:
+        return None
+    return values["price_in_cents"], values["sold_at"] is not None
+
+
+def _adjust(state: tuple[int, bool] | None, delta: int) -> None:
+    """
+    Adjust the counts an Item in a given facet state counts in.
+
+    Counts that aren't stored are left alone; they are counted from the
+    Items on the next read.
+
+    Args:
+        state (tuple[int, bool] | None): The Item's price and sold state.
+        delta (int): Amount to add to the counts.
+    """
+    if state is None:
+        return
+    price_in_cents, sold = state
+    changes = {"all_count": F("all_count") + delta}
+    if not sold:
+        changes["unsold_count"] = F("unsold_count") + delta
+    PriceFacetCount.objects.filter(bucket=bucket_for(price_in_cents)).update(
+        **changes
+    )
+
+
+@receiver(post_save, sender=Item)
+def count_saved_item(
+    sender: type,  # noqa: ARG001
+    instance: Item,
+    created: bool,  # noqa: FBT001
+    update_fields: frozenset[str] | None,
+    **kwargs: dict,  # noqa: ARG001
+) -> None:
+    """
+    Move a saved Item between the counts in the saving transaction.
+
+    Args:
+        sender (type): The Item class.
+        instance (Item): The saved Item.
+        created (bool): Whether the Item was created.
+        update_fields (frozenset[str] | None): Names of the written fields,
+            or None if every field was written.
+        kwargs (dict): Additional signal arguments.
+    """
+    current = {name: getattr(instance, name) for name in FACET_FIELDS}
+    if created:
+        _adjust(_facet_state(current), 1)
+        return
+    written = (
+        FACET_FIELDS if update_fields is None else FACET_FIELDS & update_fields
+    )
+    if not written:
+        return
+    # the Item's loaded values are only replaced once the save is done
+    loaded = instance.loaded_values or {}
+    if not loaded.keys() >= FACET_FIELDS:
+        # the previous state is unknown, so the counts can't be adjusted
+        invalidate_price_facets()
+        return
+    old_state = _facet_state(loaded)
+    new_state = _facet_state(
+        {
+            name: (current if name in written else loaded)[name]
+            for name in FACET_FIELDS
+        }
+    )
+    if old_state != new_state:
+        _adjust(old_state, -1)
+        _adjust(new_state, 1)
+
+
+@receiver(post_delete, sender=Item)
+def count_deleted_item(
+    sender: type,  # noqa: ARG001
+    instance: Item,
+    **kwargs: dict,  # noqa: ARG001
+) -> None:
+    """
+    Take a deleted Item out of the counts in the deleting transaction.
+
+    Args:
+        sender (type): The Item class.
+        instance (Item): The deleted Item.
+        kwargs (dict): Additional signal arguments.
+    """
+    loaded = instance.loaded_values or {}
+    if not loaded.keys() >= FACET_FIELDS:
+        invalidate_price_facets()
+        return
+    _adjust(_facet_state(loaded), -1)
@@ -0,0 +1,615 @@
+"""
+Bulk data factories for tests, benchmarks and local profiling.
+
+``seed()`` creates Sellers, Items with their price history, users, checked
+out Carts with their lines and Orders, and active Carts. Names, prices and
+dates are drawn from a ``random.Random`` seeded by the caller, so the same
+seed always produces the same data. Carts, cart lines and Orders are written
+to their user's shard.
+
+``bulk_create`` prepares every value through its model field, which costs
+more than the insert itself, so everything but the Sellers is written with
+plain ``executemany`` calls of database-ready values instead, with the IDs
+handed out up front, and a million rows take seconds. Nothing else may write
+to the database while it is seeded. The inserts bypass ``save()`` and the
+signals, so the caches derived from Items are invalidated once everything is
+written.
+"""
+
+from __future__ import annotations
+
+import random
+from collections import defaultdict
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .conditional import bump_catalogue_version
+from .db import large_cache
+from .facets import invalidate_price_facets
+from .models import Cart, CartItem, Item, Order, PriceChange, Seller
+from .sharding import shard_for_user
+from .typeahead import invalidate_typeahead
+
+if TYPE_CHECKING:
+    from django.db import models
+
+# number of Items, or users, written per transaction
+SEED_BATCH = 10_000
+# share of Items that were sold in an Order
+SOLD_SHARE = 0.3
+# share of users with an active Cart
+ACTIVE_CART_SHARE = 0.3
+MAX_ORDER_LINES = 4
+MAX_CART_LINES = 5
+# how far back Items are listed and Orders checked out
+HISTORY = timedelta(days=365)
+# how long sold Items were listed for, at most
+LISTED_BEFORE_SALE = timedelta(days=60)
+# how far back active Carts last changed; some are old enough to expire
+CART_HISTORY = timedelta(days=30)
+
+ADJECTIVES = (
+    "Antique",
+    "Blue",
+    "Broken",
+    "Chipped",
+    "Folding",
+    "Large",
+    "Old",
+    "Painted",
+    "Retro",
+    "Small",
+    "Vintage",
+    "Wooden",
+)
+NOUNS = (
+    "armchair",
+    "bicycle",
+    "bookcase",
+    "camera",
+    "clock",
+    "desk",
+    "guitar",
+    "kettle",
+    "lamp",
+    "mirror",
+    "record player",
+    "rug",
+    "teapot",
+    "toaster",
+    "vase",
+)
+STATES = ("as new", "barely used", "needs repair", "some scratches")
+FIRST_NAMES = (
+    "Alex",
+    "Billie",
+    "Charlie",
+    "Dana",
+    "Jo",
+    "Kim",
+    "Robin",
+    "Sam",
+)
+LAST_NAMES = ("Doe", "Garcia", "Khan", "Novak", "Okafor", "Smith", "Tanaka")
+
+
+@dataclass
+class SeedStats:
+    """Number of rows of each kind created by ``seed``."""
+
+    sellers: int = 0
+    items: int = 0
+    price_changes: int = 0
+    users: int = 0
+    carts: int = 0
+    lines: int = 0
+    orders: int = 0
+
+    @property
+    def rows(self) -> int:
+        """
+        Return the number of rows created.
+
+        Returns:
+            int: The number of rows of every kind.
+        """
+        return sum(getattr(self, each.name) for each in fields(self))
+
+
+@dataclass
+class _PendingCart:
+    """A Cart to create, with its lines as (Item ID, price, Seller ID)."""
+
+    user_id: int
+    updated_at: datetime
+    # number of Items still to be added
+    slots: int
+    lines: list[tuple[int, int, int | None]] = field(default_factory=list)
+
+
+def _ago(rng: random.Random, now: datetime, span: timedelta) -> datetime:
+    """
+    Return a random time in the span before now.
+
+    Args:
+        rng (random.Random): The source of randomness.
+        now (datetime): The end of the span.
+        span (timedelta): The length of the span.
+
+    Returns:
+        datetime: The time.
+    """
+    return now - timedelta(seconds=rng.uniform(0, span.total_seconds()))
+
+
+def _person(rng: random.Random) -> tuple[str, str]:
+    """
+    Return a random first and last name.
+
+    Args:
+        rng (random.Random): The source of randomness.
+
+    Returns:
+        tuple[str, str]: The first and last name.
+    """
+    return rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+
+
+def _next_id(model: type[models.Model], using: str) -> int:
+    """
+    Return the first ID past every one a table has handed out.
+
+    Args:
+        model (type[Model]): The model.
+        using (str): Alias of the database.
+
+    Returns:
+        int: The ID.
+    """
+    connection = connections[using]
+    table = model._meta.db_table  # noqa: SLF001
+    last = model._base_manager.using(using).aggregate(last=Max("pk"))["last"]  # noqa: SLF001
+    last = last or 0
+    if connection.vendor == "sqlite":
+        # SQLite never reuses IDs, and shards start theirs at an offset
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = %s", [table]
+            )
+            row = cursor.fetchone()
+        if row is not None:
+            last = max(last, row[0])
+    return last + 1
+
+
+def _insert(
+    model: type[models.Model],
+    columns: list[str],
+    rows: list[tuple],
+    using: str = DEFAULT_DB_ALIAS,
+) -> int:
+    """
+    Insert rows of database-ready values into a model's table.
+
+    Args:
+        model (type[Model]): The model.
+        columns (list[str]): The columns the rows' values are for.
+        rows (list[tuple]): The rows.
+        using (str): Alias of the database.
+
+    Returns:
+        int: The number of rows inserted.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {quote(model._meta.db_table)} "  # noqa: S608, SLF001
+            f"({', '.join(quote(c) for c in columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(columns))})",
+            rows,
+        )
+    return len(rows)
+
+
+def create_sellers(rng: random.Random, count: int, now: datetime) -> list[int]:
+    """
+    Create Sellers.
+
+    Args:
+        rng (random.Random): The source of randomness.
+        count (int): Number of Sellers to create.
+        now (datetime): The time the data is seeded as of.
+
+    Returns:
+        list[int]: The IDs of the new Sellers.
+    """
+    sellers = []
+    for i in range(count):
+        first_name, last_name = _person(rng)
+        sellers.append(
+            Seller(
+                name=f"{first_name} {last_name}",
+                email=f"seller{i}@example.com",
+                created_at=_ago(rng, now, HISTORY),
+            )
+        )
+    Seller.objects.bulk_create(sellers)
+    return [seller.id for seller in sellers]
+
+
+class _Seeder:
+    """Creates the users, Items, Carts and Orders of one run of ``seed``."""
+
+    def __init__(
+        self, rng: random.Random, now: datetime, seller_ids: list[int]
+    ) -> None:
+        """
+        Start seeding.
+
+        Args:
+            rng (random.Random): The source of randomness.
+            now (datetime): The time the data is seeded as of.
+            seller_ids (list[int]): The Sellers Items are listed by.
+        """
+        self.rng = rng
+        self.now = now
+        self.seller_ids = seller_ids
+        self.user_ids: list[int] = []
+        self.stats = SeedStats(sellers=len(seller_ids))
+        # Orders not written yet; only the last one may still get Items
+        self.orders: list[_PendingCart] = []
+        # (ID, price, Seller ID) of every unsold Item
+        self.unsold: list[tuple[int, int, int | None]] = []
+        # the next ID to hand out, by model and database
+        self.next_ids: dict[tuple[type[models.Model], str], int] = {}
+
+    def _ids(self, model: type[models.Model], count: int, using: str) -> range:
+        """
+        Hand out IDs for new rows.
+
+        Args:
+            model (type[Model]): The model of the rows.
+            count (int): Number of IDs.
+            using (str): Alias of the database the rows go to.
+
+        Returns:
+            range: The IDs.
+        """
+        key = (model, using)
+        if key not in self.next_ids:
+            self.next_ids[key] = _next_id(model, using)
+        start = self.next_ids[key]
+        self.next_ids[key] += count
+        return range(start, start + count)
+
+    def users(self, count: int, prefix: str, password: str | None) -> None:
+        """
+        Create users, numbered after the ones already created with the prefix.
+
+        The password is hashed once and shared by every user, as hashing one
+        per user would take minutes.
+
+        Args:
+            count (int): Number of users to create.
+            prefix (str): The start of the users' usernames.
+            password (str | None): The users' password, or None to make them
+                unable to log in.
+        """
+        ops = connections[DEFAULT_DB_ALIAS].ops
+        start = User.objects.filter(username__startswith=prefix).count()
+        hashed = make_password(password)
+        rows = []
+        for user_id in self._ids(User, count, DEFAULT_DB_ALIAS):
+            username = f"{prefix}{start}"
+            start += 1
+            first_name, last_name = _person(self.rng)
+            joined = _ago(self.rng, self.now, HISTORY)
+            rows.append(
+                (
+                    user_id,
+                    hashed,
+                    username,
+                    first_name,
+                    last_name,
+                    f"{username}@example.com",
+                    False,
+                    False,
+                    True,
+                    ops.adapt_datetimefield_value(joined),
+                )
+            )
+            self.user_ids.append(user_id)
+        columns = [
+            "id",
+            "password",
+            "username",
+            "first_name",
+            "last_name",
+            "email",
+            "is_superuser",
+            "is_staff",
+            "is_active",
+            "date_joined",
+        ]
+        with transaction.atomic():
+            self.stats.users += _insert(User, columns, rows)
+
+    def _order(self) -> _PendingCart:
+        """
+        Return the Order the next sold Item goes in, starting a new one.
+
+        Returns:
+            _PendingCart: The Order, with a slot taken for the Item.
+        """
+        if not self.orders or not self.orders[-1].slots:
+            self.orders.append(
+                _PendingCart(
+                    self.rng.choice(self.user_ids),
+                    _ago(self.rng, self.now, HISTORY),
+                    self.rng.randint(1, MAX_ORDER_LINES),
+                )
+            )
+        order = self.orders[-1]
+        order.slots -= 1
+        return order
+
+    def items(self, count: int) -> None:
+        """
+        Create Items with their price history, and the Orders they filled.
+
+        Args:
+            count (int): Number of Items to create.
+        """
+        rng = self.rng
+        ops = connections[DEFAULT_DB_ALIAS].ops
+        items = []
+        prices = []
+        for item_id in self._ids(Item, count, DEFAULT_DB_ALIAS):
+            order = sold_at = None
+            if self.user_ids and rng.random() < SOLD_SHARE:
+                order = self._order()
+                listed_at = _ago(rng, order.updated_at, LISTED_BEFORE_SALE)
+                sold_at = ops.adapt_datetimefield_value(order.updated_at)
+            else:
+                listed_at = _ago(rng, self.now, HISTORY)
+            listed_at = ops.adapt_datetimefield_value(listed_at)
+            adjective, noun = rng.choice(ADJECTIVES), rng.choice(NOUNS)
+            price = rng.randint(1, 400) * 25
+            description = f"{adjective} {noun}, {rng.choice(STATES)}"
+            seller_id = (
+                rng.choice(self.seller_ids) if self.seller_ids else None
+            )
+            items.append(
+                (
+                    item_id,
+                    f"{adjective} {noun}",
+                    description,
+                    price,
+                    listed_at,
+                    sold_at,
+                    seller_id,
+                    0,
+                )
+            )
+            prices.append((item_id, price, listed_at))
+            line = (item_id, price, seller_id)
+            (self.unsold if order is None else order.lines).append(line)
+        columns = [
+            "id",
+            "name",
+            "description",
+            "price_in_cents",
+            "listed_at",
+            "sold_at",
+            "seller_id",
+            "version",
+        ]
+        with transaction.atomic():
+            self.stats.items += _insert(Item, columns, items)
+            self.stats.price_changes += _insert(
+                PriceChange,
+                ["item_id", "price_in_cents", "effective_at"],
+                prices,
+            )
+        full = len(self.orders)
+        if self.orders and self.orders[-1].slots:
+            full -= 1
+        self.carts(self.orders[:full], active=False)
+        del self.orders[:full]
+
+    def active_carts(self, batch_size: int) -> None:
+        """
+        Give some of the users an active Cart with unsold Items in it.
+
+        Args:
+            batch_size (int): Number of users handled per transaction.
+        """
+        rng = self.rng
+        for start in range(0, len(self.user_ids), batch_size):
+            carts = []
+            for user_id in self.user_ids[start : start + batch_size]:
+                if self.unsold and rng.random() < ACTIVE_CART_SHARE:
+                    size = min(
+                        rng.randint(1, MAX_CART_LINES), len(self.unsold)
+                    )
+                    carts.append(
+                        _PendingCart(
+                            user_id,
+                            _ago(rng, self.now, CART_HISTORY),
+                            0,
+                            rng.sample(self.unsold, size),
+                        )
+                    )
+            self.carts(carts, active=True)
+
+    def carts(self, carts: list[_PendingCart], *, active: bool) -> None:
+        """
+        Create Carts with their lines, and an Order for each checked out one.
+
+        Each shard's rows are written in one transaction.
+
+        Args:
+            carts (list[_PendingCart]): The Carts to create.
+            active (bool): Whether the Carts are active rather than checked
+                out.
+        """
+        by_shard = defaultdict(list)
+        for cart in carts:
+            by_shard[shard_for_user(cart.user_id)].append(cart)
+        for using, pending in by_shard.items():
+            ops = connections[using].ops
+            rows = []
+            lines = []
+            orders = []
+            for cart_id, cart in zip(
+                self._ids(Cart, len(pending), using), pending, strict=True
+            ):
+                updated_at = ops.adapt_datetimefield_value(cart.updated_at)
+                total = sum(price for _, price, _ in cart.lines)
+                rows.append((cart_id, cart.user_id, total, active, updated_at))
+                # only checked out lines record their Seller
+                lines.extend(
+                    (
+                        cart_id,
+                        item_id,
+                        price,
+                        1,
+                        updated_at,
+                        None if active else seller_id,
+                    )
+                    for item_id, price, seller_id in cart.lines
+                )
+                if not active:
+                    first_name, last_name = _person(self.rng)
+                    email = f"{first_name}.{last_name}@example.com".lower()
+                    # receipts for seeded Orders are never sent
+                    orders.append(
+                        (
+                            cart_id,
+                            first_name,
+                            last_name,
+                            email,
+                            updated_at,
+                            updated_at,
+                            0,
+                            "",
+                        )
+                    )
+            with transaction.atomic(using=using):
+                self.stats.carts += _insert(
+                    Cart,
+                    [
+                        "id",
+                        "user_id",
+                        "total_in_cents",
+                        "active",
+                        "updated_at",
+                    ],
+                    rows,
+                    using,
+                )
+                self.stats.lines += _insert(
+                    CartItem,
+                    [
+                        "cart_id",
+                        "item_id",
+                        "price_in_cents",
+                        "quantity",
+                        "added_at",
+                        "seller_id",
+                    ],
+                    lines,
+                    using,
+                )
+                self.stats.orders += _insert(
+                    Order,
+                    [
+                        "cart_id",
+                        "first_name",
+                        "last_name",
+                        "email",
+                        "created_at",
+                        "receipt_sent_at",
+                        "receipt_attempts",
+                        "receipt_error",
+                    ],
+                    orders,
+                    using,
+                )
+
+    def finish(self) -> None:
+        """Write the last Orders, and move ID sequences past the new rows."""
+        self.carts(self.orders, active=False)
+        self.orders = []
+        by_database = defaultdict(list)
+        for model, using in self.next_ids:
+            by_database[using].append(model)
+        for using, models in by_database.items():
+            connection = connections[using]
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                    no_style(), models
+                ):
+                    cursor.execute(sql)
+
+
+def seed(  # noqa: PLR0913
+    *,
+    sellers: int = 0,
+    items: int = 0,
+    users: int = 0,
+    seed: int = 0,
+    now: datetime | None = None,
+    prefix: str = "seed-",
+    password: str | None = None,
+    batch_size: int = SEED_BATCH,
+) -> SeedStats:
+    """
+    Fill the database with realistic data.
+
+    About ``SOLD_SHARE`` of the Items were sold, in Orders of up to
+    ``MAX_ORDER_LINES`` Items each checked out by a random new user, and
+    about ``ACTIVE_CART_SHARE`` of the new users have an active Cart with
+    some unsold Items in it. Without users, no Item is sold.
+
+    Args:
+        sellers (int): Number of Sellers to create.
+        items (int): Number of Items to create, each with its price history.
+        users (int): Number of users to create.
+        seed (int): Seed of the random data.
+        now (datetime | None): The time the data is seeded as of, the
+            current time by default.
+        prefix (str): The start of the new users' usernames.
+        password (str | None): The new users' password, or None to make them
+            unable to log in.
+        batch_size (int): Number of Items, or users, written per
+            transaction.
+
+    Returns:
+        SeedStats: The number of rows of each kind created.
+    """
+    # the data only needs to look realistic, not be unpredictable
+    rng = random.Random(seed)  # noqa: S311
+    if now is None:
+        now = timezone.now()
+    with large_cache(connections[DEFAULT_DB_ALIAS]):
+        seeder = _Seeder(rng, now, create_sellers(rng, sellers, now))
+        for start in range(0, users, batch_size):
+            seeder.users(min(batch_size, users - start), prefix, password)
+        for start in range(0, items, batch_size):
+            seeder.items(min(batch_size, items - start))
+        seeder.active_carts(batch_size)
+        seeder.finish()
+    invalidate_price_facets()
+    invalidate_typeahead()
+    bump_catalogue_version()
+    return seeder.stats
@@ -1,31 +1,180 @@
 """Forms used by the shop application."""
 
+from __future__ import annotations
+
 from django import forms
+from django.db import transaction
 from django.forms.models import ModelForm
 
-from .models import Item, Order
+from .images import (
+    EXTENSIONS,
+    discard_unused,
+    schedule_thumbnails,
+    store_upload,
+)
+from .models import Item, ItemImage, Order
+
+
+class MultipleImageInput(forms.ClearableFileInput):
+    """File input widget that accepts several files at once."""
+
+    allow_multiple_selected = True
+
+
+class MultipleImageField(forms.ImageField):
+    """Image field that accepts and validates several uploaded images."""
+
+    widget = MultipleImageInput
+
+    def clean(self, data: object, initial: object = None) -> list:
+        """
+        Validate each of the uploaded images.
 
+        Args:
+            data (object): The uploaded file or files.
+            initial (object): The field's initial value.
 
-class UpdateItemForm(ModelForm):
-    """Form used to update an Item."""
+        Returns:
+            list: The validated uploaded images.
+        """
+        single_clean = super().clean
+        if isinstance(data, list | tuple):
+            images = [single_clean(image, initial) for image in data]
+        else:
+            images = [single_clean(data, initial)] if data else []
+        for image in images:
+            if image.image.format not in EXTENSIONS:
+                raise forms.ValidationError(
+                    "Upload a JPEG, PNG, GIF or WebP image."
+                )
+        return images
+
+
+class ItemForm(ModelForm):
+    """Form used to create an Item and attach images to it."""
+
+    images = MultipleImageField(required=False)
 
     class Meta:
         """Metadata class."""
 
         model = Item
-        fields = ["name", "description", "price_in_cents"]
+        fields = ["name", "description", "price_in_cents", "seller"]
+
+    def save(self, commit: bool = True) -> Item:  # noqa: FBT001, FBT002
+        """
+        Save the Item and its images in one transaction.
+
+        Image files are written before the transaction commits, so those
+        stored for a save that fails are deleted again.
+
+        Args:
+            commit (bool): Whether to save the Item and its images now.
+
+        Returns:
+            Item: The saved Item.
+        """
+        self._stored_images = []
+        if not commit:
+            return super().save(commit=False)
+        try:
+            with transaction.atomic():
+                return super().save()
+        except BaseException:
+            discard_unused(self._stored_images)
+            raise
+
+    def _save_m2m(self) -> None:
+        """
+        Save the form's related objects, including the uploaded images.
+
+        The images are stored right away, and their thumbnails are generated
+        in the background once the transaction commits.
+        """
+        super()._save_m2m()
+        for upload in self.cleaned_data.get("images", []):
+            stored = store_upload(upload)
+            self._stored_images.append(stored)
+            thumbnails_ready = ItemImage.objects.filter(
+                digest=stored.digest, thumbnails_ready=True
+            ).exists()
+            ItemImage.objects.create(
+                item=self.instance,
+                digest=stored.digest,
+                extension=stored.extension,
+                width=stored.width,
+                height=stored.height,
+                thumbnails_ready=thumbnails_ready,
+            )
+            if not thumbnails_ready:
+                schedule_thumbnails(stored.digest, stored.extension)
+
+
+class UpdateItemForm(ItemForm):
+    """
+    Form used to update an Item.
+
+    The form carries the version of the Item it was rendered with, so saving
+    it fails if someone else changed the Item in the meantime.
+    """
+
+    class Meta(ItemForm.Meta):
+        """Metadata class."""
+
+        fields = [*ItemForm.Meta.fields, "version"]
         widgets = {
             "name": forms.TextInput(),
             "description": forms.Textarea(),
             "price_in_cents": forms.NumberInput(),
+            "seller": forms.Select(),
+            "version": forms.HiddenInput(),
         }
 
+    def __init__(self, *args: list, **kwargs: dict) -> None:
+        """
+        Create the form.
+
+        Args:
+            args (list): Positional arguments for ``ModelForm``.
+            kwargs (dict): Keyword arguments for ``ModelForm``.
+        """
+        super().__init__(*args, **kwargs)
+        # without a version, the Item is compared with the one just loaded
+        self.fields["version"].required = False
+
+    def clean_version(self) -> int:
+        """
+        Return the submitted version, or the loaded Item's if there is none.
+
+        Returns:
+            int: The version the edit was made against.
+        """
+        version = self.cleaned_data["version"]
+        return self.instance.version if version is None else version
+
 
 class CheckoutForm(ModelForm):
-    """Form used to check out a customer."""
+    """
+    Form used to check out a customer.
+
+    Every field is optional, but an email address given for the receipt must
+    be valid.
+    """
 
     class Meta:
         """Metadata class."""
 
         model = Order
         fields = ["first_name", "last_name", "email"]
+
+    def __init__(self, *args: list, **kwargs: dict) -> None:
+        """
+        Create the form with every field optional.
+
+        Args:
+            args (list): Positional arguments for ``ModelForm``.
+            kwargs (dict): Keyword arguments for ``ModelForm``.
+        """
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            field.required = False
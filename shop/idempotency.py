@@ -0,0 +1,233 @@
+"""
+Idempotency keys for POST views.
+
+Forms that change a cart include a random ``idempotency_key`` (or clients send
+an ``Idempotency-Key`` header). The first request with a key runs the view and
+stores its response for a short time; replays of the same key get the stored
+response without running the view again. Keys are stored in the database
+rather than the cache, so a replay reaching another worker process is caught
+too.
+"""
+
+from __future__ import annotations
+
+import time
+from datetime import timedelta
+from functools import wraps
+from http import HTTPStatus
+from typing import TYPE_CHECKING
+
+from django.db import IntegrityError, transaction
+from django.http import HttpRequest, HttpResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+from .sharding import shard_for_user, shards
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from django.db.models import QuerySet
+
+# seconds a completed response is kept for replays
+IDEMPOTENCY_TTL = 60 * 10
+# seconds a key stays reserved while its first request is running
+IN_PROGRESS_TTL = 30
+# seconds a replay waits for the first request to finish
+IN_PROGRESS_WAIT = 2.0
+IN_PROGRESS_POLL = 0.05
+
+MAX_KEY_LENGTH = 100
+REPLAYED_HEADER = "Idempotent-Replayed"
+# response headers stored and replayed along with the status and body
+REPLAYED_HEADERS = ("Content-Type", "Location")
+
+
+def get_idempotency_key(request: HttpRequest) -> str | None:
+    """
+    Return the idempotency key sent with a request, if any.
+
+    Args:
+        request (HttpRequest): The HTTP request.
+
+    Returns:
+        str | None: The idempotency key, or None if none was sent.
+    """
+    key = request.headers.get("Idempotency-Key") or request.POST.get(
+        "idempotency_key"
+    )
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return None
+    return key
+
+
+def _lookup(request: HttpRequest, key: str) -> QuerySet[IdempotencyKey]:
+    """
+    Return the row a request's idempotency key is stored in.
+
+    Keys are scoped to the user and path, so one client can't replay another
+    client's responses, and are stored in the user's shard.
+
+    Args:
+        request (HttpRequest): The HTTP request.
+        key (str): The request's idempotency key.
+
+    Returns:
+        QuerySet[IdempotencyKey]: The matching row, if it exists.
+    """
+    return IdempotencyKey.objects.using(
+        shard_for_user(request.user.pk)
+    ).filter(user_id=request.user.pk, path=request.path, key=key)
+
+
+def _reserve(request: HttpRequest, key: str) -> IdempotencyKey | None:
+    """
+    Insert the row for a request's idempotency key.
+
+    A row left behind by an expired request is deleted and the key reserved
+    again.
+
+    Args:
+        request (HttpRequest): The HTTP request.
+        key (str): The request's idempotency key.
+
+    Returns:
+        IdempotencyKey | None: The new row, or None if another request holds
+        the key.
+    """
+    lookup = _lookup(request, key)
+    for _ in range(2):
+        try:
+            with transaction.atomic(using=lookup.db):
+                return lookup.create(
+                    user_id=request.user.pk,
+                    path=request.path,
+                    key=key,
+                    expires_at=timezone.now()
+                    + timedelta(seconds=IN_PROGRESS_TTL),
+                )
+        except IntegrityError:
+            pass
+        expired, _ = lookup.filter(expires_at__lte=timezone.now()).delete()
+        if not expired:
+            return None
+    return None
+
+
+def _replay(stored: IdempotencyKey) -> HttpResponse:
+    """
+    Rebuild a stored response.
+
+    Args:
+        stored (IdempotencyKey): The row holding the response.
+
+    Returns:
+        HttpResponse: The replayed response.
+    """
+    response = HttpResponse(bytes(stored.content), status=stored.status)
+    for header, value in stored.headers.items():
+        response[header] = value
+    response[REPLAYED_HEADER] = "true"
+    return response
+
+
+def _wait_for_result(
+    lookup: QuerySet[IdempotencyKey],
+) -> IdempotencyKey | None:
+    """
+    Wait for the first request with a key to store its response.
+
+    Args:
+        lookup (QuerySet[IdempotencyKey]): The row the response is stored in.
+
+    Returns:
+        IdempotencyKey | None: The row holding the response, or None if it
+        isn't ready in time.
+    """
+    deadline = time.monotonic() + IN_PROGRESS_WAIT
+    while True:
+        stored = lookup.first()
+        if stored is None or stored.status is not None:
+            return stored
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(IN_PROGRESS_POLL)
+
+
+def purge_expired_keys() -> int:
+    """
+    Delete expired idempotency keys from every shard.
+
+    Returns:
+        int: Number of keys deleted.
+    """
+    now = timezone.now()
+    return sum(
+        IdempotencyKey.objects.using(alias)
+        .filter(expires_at__lte=now)
+        .delete()[0]
+        for alias in shards()
+    )
+
+
+def idempotent(view: Callable) -> Callable:
+    """
+    Deduplicate POST requests to a view by their idempotency key.
+
+    Requests without a key, or from anonymous users, are passed straight to
+    the view. Only responses without server errors are stored, so a request
+    that failed can be retried. A replay that arrives while the first request
+    is still running waits briefly for its response, and gets ``409
+    Conflict`` if it isn't ready.
+
+    Args:
+        view (Callable): The view function to wrap.
+
+    Returns:
+        Callable: The wrapped view function.
+    """
+
+    @wraps(view)
+    def wrapper(request: HttpRequest, *args: list, **kwargs: dict) -> object:
+        key = (
+            get_idempotency_key(request)
+            if request.method == "POST" and request.user.is_authenticated
+            else None
+        )
+        if key is None:
+            return view(request, *args, **kwargs)
+
+        reserved = _reserve(request, key)
+        if reserved is None:
+            stored = _wait_for_result(_lookup(request, key))
+            if stored is None:
+                return HttpResponse(status=HTTPStatus.CONFLICT)
+            return _replay(stored)
+
+        try:
+            response = view(request, *args, **kwargs)
+        except BaseException:
+            reserved.delete()
+            raise
+        if (
+            response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR
+            or response.streaming
+        ):
+            reserved.delete()
+            return response
+        reserved.status = response.status_code
+        reserved.headers = {
+            header: response[header]
+            for header in REPLAYED_HEADERS
+            if header in response
+        }
+        reserved.content = response.content
+        reserved.expires_at = timezone.now() + timedelta(
+            seconds=IDEMPOTENCY_TTL
+        )
+        reserved.save(
+            update_fields=["status", "headers", "content", "expires_at"]
+        )
+        return response
+
+    return wrapper
@@ -0,0 +1,294 @@
+"""
+Content-addressed storage and background thumbnailing for Item images.
+
+Uploaded images are stored under ``MEDIA_ROOT/items`` named after the SHA-256
+digest of their contents, so the same photo uploaded twice is only stored
+once. Thumbnails are generated off of the request path by a small pool of
+background threads once the transaction that attached the image commits.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.db import connection, transaction
+from PIL import Image
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+    from typing import IO
+
+    from django.core.files.uploadedfile import UploadedFile
+
+logger = logging.getLogger(__name__)
+
+# widths, in pixels, of the thumbnails generated for each image
+THUMBNAIL_WIDTHS = (160, 320, 640)
+THUMBNAIL_FORMAT = "WEBP"
+THUMBNAIL_EXTENSION = "webp"
+THUMBNAIL_WORKERS = 2
+
+# file extensions for the image formats that can be uploaded
+EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+
+IMAGE_FILENAME_RE = re.compile(r"^[0-9a-f]{64}(-[0-9]+)?\.(jpg|png|gif|webp)$")
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class StoredImage:
+    """Description of an image saved to content-addressed storage."""
+
+    digest: str
+    extension: str
+    width: int
+    height: int
+    # whether the file was written for this upload rather than already stored
+    created: bool = field(default=False, compare=False)
+
+
+def image_filename(digest: str, extension: str, width: int | None) -> str:
+    """
+    Return the file name of an original image or one of its thumbnails.
+
+    Args:
+        digest (str): SHA-256 hex digest of the original image.
+        extension (str): File extension of the original image.
+        width (int | None): Thumbnail width, or None for the original.
+
+    Returns:
+        str: The image's file name.
+    """
+    if width is None:
+        return f"{digest}.{extension}"
+    return f"{digest}-{width}.{THUMBNAIL_EXTENSION}"
+
+
+def image_path(filename: str) -> Path:
+    """
+    Return the path an image file is stored at.
+
+    Images are spread over subdirectories named after the first two digits of
+    their digest to keep directories small.
+
+    Args:
+        filename (str): File name returned by ``image_filename``.
+
+    Returns:
+        Path: Path of the image file.
+    """
+    return Path(settings.MEDIA_ROOT) / "items" / filename[:2] / filename
+
+
+def _replace_atomically(path: Path, write: Callable[[IO], None]) -> None:
+    """
+    Write a file through a temporary file renamed into place.
+
+    Readers never see a partially written file, and concurrent writers of the
+    same content-addressed file simply replace each other's identical copies.
+
+    Args:
+        path (Path): Destination path.
+        write (Callable[[IO], None]): Writes to the open temporary file.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as tmp:
+        try:
+            write(tmp)
+        except BaseException:
+            Path(tmp.name).unlink()
+            raise
+    Path(tmp.name).replace(path)
+
+
+def store_upload(upload: UploadedFile) -> StoredImage:
+    """
+    Save an uploaded image to content-addressed storage.
+
+    The upload is hashed while it is streamed to a temporary file, which is
+    discarded if an identical image is already stored. The file is written
+    before the ItemImage that refers to it is saved, so callers should pass
+    the result to ``discard_unused`` if their transaction rolls back.
+
+    Args:
+        upload (UploadedFile): The uploaded image.
+
+    Returns:
+        StoredImage: Description of the stored image.
+
+    Raises:
+        ValueError: If the upload is not an image in a supported format.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        image_format = image.format
+        width, height = image.size
+    if image_format not in EXTENSIONS:
+        msg = f"Unsupported image format: {image_format}"
+        raise ValueError(msg)
+    extension = EXTENSIONS[image_format]
+
+    upload.seek(0)
+    tmp_dir = Path(settings.MEDIA_ROOT) / "items"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    sha256 = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False) as tmp:
+        for chunk in upload.chunks():
+            sha256.update(chunk)
+            tmp.write(chunk)
+    digest = sha256.hexdigest()
+
+    path = image_path(image_filename(digest, extension, None))
+    created = not path.exists()
+    if created:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        Path(tmp.name).replace(path)
+    else:
+        Path(tmp.name).unlink()
+    return StoredImage(digest, extension, width, height, created)
+
+
+def discard_unused(stored: Iterable[StoredImage]) -> None:
+    """
+    Delete stored images that no ItemImage ended up referring to.
+
+    Used when the transaction that was to attach freshly stored images rolls
+    back. Images that were already stored before, or that are attached to
+    another Item, are kept.
+
+    Args:
+        stored (Iterable[StoredImage]): The images stored in the transaction.
+    """
+    from .models import ItemImage
+
+    for image in stored:
+        in_use = ItemImage.objects.filter(digest=image.digest).exists()
+        if image.created and not in_use:
+            filename = image_filename(image.digest, image.extension, None)
+            image_path(filename).unlink(missing_ok=True)
+
+
+def discard_unreferenced(images: Iterable[tuple[str, str]]) -> None:
+    """
+    Delete the files of images that no ItemImage refers to anymore.
+
+    Used once the Items the images were attached to are purged. The original
+    and its thumbnails are deleted; images another Item shares are kept.
+
+    Args:
+        images (Iterable[tuple[str, str]]): Digests and extensions of the
+            images.
+    """
+    from .models import ItemImage
+
+    extensions = dict(images)
+    in_use = set(
+        ItemImage.objects.filter(digest__in=extensions).values_list(
+            "digest", flat=True
+        )
+    )
+    for digest, extension in extensions.items():
+        if digest in in_use:
+            continue
+        for width in (None, *THUMBNAIL_WIDTHS):
+            filename = image_filename(digest, extension, width)
+            image_path(filename).unlink(missing_ok=True)
+
+
+def generate_thumbnails(digest: str, extension: str) -> list[int]:
+    """
+    Generate the missing thumbnails of a stored image.
+
+    Thumbnails are only generated for widths smaller than the original.
+
+    Args:
+        digest (str): SHA-256 hex digest of the original image.
+        extension (str): File extension of the original image.
+
+    Returns:
+        list[int]: Widths of the thumbnails that were generated.
+    """
+    generated = []
+    with Image.open(image_path(image_filename(digest, extension, None))) as im:
+        image = im.convert("RGBA" if "A" in im.getbands() else "RGB")
+    for width in THUMBNAIL_WIDTHS:
+        path = image_path(image_filename(digest, extension, width))
+        if width >= image.width or path.exists():
+            continue
+        thumbnail = image.copy()
+        thumbnail.thumbnail((width, image.height))
+        _replace_atomically(
+            path, partial(thumbnail.save, format=THUMBNAIL_FORMAT)
+        )
+        generated.append(width)
+    return generated
+
+
+def process_thumbnails(digest: str, extension: str) -> None:
+    """
+    Generate an image's thumbnails and mark them as ready.
+
+    Runs on a background thread, so any error is logged instead of raised.
+
+    Args:
+        digest (str): SHA-256 hex digest of the original image.
+        extension (str): File extension of the original image.
+    """
+    from .conditional import bump_catalogue_version
+    from .models import ItemImage
+
+    try:
+        generate_thumbnails(digest, extension)
+        ItemImage.objects.filter(digest=digest).update(thumbnails_ready=True)
+        bump_catalogue_version()
+    except Exception:
+        logger.exception("Failed to generate thumbnails for %s", digest)
+    finally:
+        connection.close()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """
+    Return the thumbnail worker pool, creating it on first use.
+
+    The pool is created lazily so that it is started inside each forked
+    server worker rather than in a preloading parent process.
+
+    Returns:
+        ThreadPoolExecutor: The thumbnail worker pool.
+    """
+    global _executor  # noqa: PLW0603
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=THUMBNAIL_WORKERS,
+                thread_name_prefix="thumbnails",
+            )
+        return _executor
+
+
+def schedule_thumbnails(digest: str, extension: str) -> None:
+    """
+    Generate an image's thumbnails in the background after commit.
+
+    Args:
+        digest (str): SHA-256 hex digest of the original image.
+        extension (str): File extension of the original image.
+    """
+
+    def submit() -> Future:
+        return _get_executor().submit(process_thumbnails, digest, extension)
+
+    transaction.on_commit(submit)
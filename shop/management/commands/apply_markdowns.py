@@ -0,0 +1,28 @@
+"""Command that applies the markdown rules."""
+
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from shop.pricing import apply_markdowns
+
+
+class Command(BaseCommand):
+    """Apply every active markdown rule that has started."""
+
+    help = (
+        "Mark down the unsold items that became eligible for each active "
+        "markdown rule since it last ran. The background worker does this "
+        "every MARKDOWN_INTERVAL seconds."
+    )
+
+    def handle(self, *args: list, **options: dict) -> None:  # noqa: ARG002
+        """
+        Apply the rules.
+
+        Args:
+            args (list): Positional arguments.
+            options (dict): Parsed command line options.
+        """
+        for rule, count in apply_markdowns().items():
+            self.stdout.write(f"{rule}: marked down {count} items")
@@ -0,0 +1,74 @@
+"""Command that benchmarks the background job queue."""
+
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+
+from shop.models import Job
+from shop.tasks import enqueue, noop, run_workers
+
+
+class Command(BaseCommand):
+    """Measure enqueue cost and job throughput for several pool sizes."""
+
+    help = "Benchmark enqueueing and draining no-op background jobs."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """
+        Add the command's arguments.
+
+        Args:
+            parser (CommandParser): The command's argument parser.
+        """
+        parser.add_argument(
+            "--jobs", type=int, default=2000, help="jobs per measurement"
+        )
+        parser.add_argument(
+            "--processes",
+            default="1,2,4",
+            help="comma separated worker pool sizes to measure",
+        )
+
+    def handle(self, *args: list, **options: dict) -> None:  # noqa: ARG002
+        """
+        Run the benchmark.
+
+        Args:
+            args (list): Positional arguments.
+            options (dict): Parsed command line options.
+        """
+        jobs = options["jobs"]
+        Job.objects.filter(name=noop.task_name).delete()
+
+        start = time.perf_counter()
+        for _ in range(jobs):
+            with transaction.atomic():
+                enqueue(noop)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"enqueue: {elapsed / jobs * 1e6:.0f} us/job "
+            f"({jobs / elapsed:.0f} jobs/s)"
+        )
+        Job.objects.filter(name=noop.task_name).delete()
+
+        self.stdout.write(f"{'processes':>10}{'jobs/s':>12}{'seconds':>10}")
+        for processes in map(int, options["processes"].split(",")):
+            Job.objects.bulk_create(
+                Job(name=noop.task_name) for _ in range(jobs)
+            )
+            start = time.perf_counter()
+            # housekeeping would purge and mark down the live data
+            run_workers(
+                processes, burst=True, poll_interval=0.01, housekeeping=False
+            )
+            elapsed = time.perf_counter() - start
+            done = Job.objects.filter(
+                name=noop.task_name, status=Job.Status.DONE
+            ).count()
+            self.stdout.write(
+                f"{processes:>10}{done / elapsed:>12.0f}{elapsed:>10.2f}"
+            )
+            Job.objects.filter(name=noop.task_name).delete()
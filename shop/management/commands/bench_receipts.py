@@ -0,0 +1,101 @@
+"""Command that benchmarks sending a burst of order receipts."""
+
+from __future__ import annotations
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from django.test.utils import override_settings
+
+from shop.models import Cart, CartItem, Item, Order
+from shop.receipts import send_pending_receipts
+
+ITEMS_PER_ORDER = 3
+
+
+class Command(BaseCommand):
+    """Measure receipt throughput for a burst of checkouts."""
+
+    help = (
+        "Create a burst of orders and measure how fast their receipts are "
+        "sent for several batch sizes. The orders are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """
+        Add the command's arguments.
+
+        Args:
+            parser (CommandParser): The command's argument parser.
+        """
+        parser.add_argument(
+            "--orders", type=int, default=1000, help="orders in the burst"
+        )
+        parser.add_argument(
+            "--batch-sizes",
+            default="1,10,100",
+            help="comma separated batch sizes to measure",
+        )
+        parser.add_argument(
+            "--backend",
+            default="django.core.mail.backends.locmem.EmailBackend",
+            help=(
+                "email backend to send through, e.g. "
+                "django.core.mail.backends.smtp.EmailBackend to send to a "
+                "local SMTP stand-in"
+            ),
+        )
+
+    def handle(self, *args: list, **options: dict) -> None:  # noqa: ARG002
+        """
+        Run the benchmark.
+
+        Args:
+            args (list): Positional arguments.
+            options (dict): Parsed command line options.
+        """
+        self.stdout.write(f"{'batch size':>10}{'receipts/s':>12}{'sent':>8}")
+        with override_settings(EMAIL_BACKEND=options["backend"]):
+            for batch_size in map(int, options["batch_sizes"].split(",")):
+                with transaction.atomic():
+                    self._create_orders(options["orders"])
+                    stats = send_pending_receipts(batch_size=batch_size)
+                    transaction.set_rollback(True)
+                self.stdout.write(
+                    f"{batch_size:>10}{stats.per_second:>12.1f}"
+                    f"{stats.sent:>8}"
+                )
+
+    def _create_orders(self, count: int) -> None:
+        """
+        Create checked out orders with items in bulk.
+
+        Args:
+            count (int): Number of orders to create.
+        """
+        user = User.objects.create(username="bench-receipts")
+        items = Item.objects.bulk_create(
+            Item(name=f"Item {i}", description="", price_in_cents=100 + i)
+            for i in range(count * ITEMS_PER_ORDER)
+        )
+        lots = [
+            items[i * ITEMS_PER_ORDER : (i + 1) * ITEMS_PER_ORDER]
+            for i in range(count)
+        ]
+        carts = Cart.objects.bulk_create(
+            Cart(
+                user=user,
+                active=False,
+                total_in_cents=sum(item.price_in_cents for item in lot),
+            )
+            for lot in lots
+        )
+        CartItem.objects.bulk_create(
+            CartItem(cart=cart, item=item, price_in_cents=item.price_in_cents)
+            for cart, lot in zip(carts, lots, strict=True)
+            for item in lot
+        )
+        Order.objects.bulk_create(
+            Order(first_name="Bench", email=f"buyer{i}@example.com", cart=cart)
+            for i, cart in enumerate(carts)
+        )
@@ -0,0 +1,223 @@
+"""Command that benchmarks the cart endpoints with each session engine."""
+
+from __future__ import annotations
+
+import logging
+import statistics
+import threading
+import time
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from shop.models import Cart, Item
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+# keep the rate limits out of the way of the benchmark; admission control
+# stays on, so concurrent writes don't fail with "database is locked"
+UNLIMITED = {
+    "WRITE_RATE": 1e9,
+    "WRITE_BURST": 10**9,
+    "WRITE_IP_RATE": 1e9,
+    "WRITE_IP_BURST": 10**9,
+}
+
+
+@dataclass
+class Result:
+    """Latencies and query counts collected during a run."""
+
+    latencies: list[float] = field(default_factory=list)
+    session_queries: int = 0
+    shed: int = 0
+    errors: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def count_query(
+        self,
+        execute: Callable,
+        sql: str,
+        params: object,
+        many: bool,  # noqa: FBT001
+        context: dict,
+    ) -> object:
+        """
+        Database execute wrapper that counts session table queries.
+
+        Args:
+            execute (Callable): The wrapped execute function.
+            sql (str): The query.
+            params (object): The query's parameters.
+            many (bool): Whether this is an ``executemany`` call.
+            context (dict): The connection and cursor.
+
+        Returns:
+            object: The result of the query.
+        """
+        if "django_session" in sql:
+            with self.lock:
+                self.session_queries += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    """Compare the session table traffic of each session engine."""
+
+    help = (
+        "Drive the cart endpoints from several logged in clients with each "
+        "session engine, and report throughput, latency and how many "
+        "session table queries each request made. Creates bench users and "
+        "items, and deletes them afterwards."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """
+        Add the command's arguments.
+
+        Args:
+            parser (CommandParser): The command's argument parser.
+        """
+        parser.add_argument(
+            "--clients", type=int, default=8, help="concurrent clients"
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="requests made by each client",
+        )
+
+    def handle(self, *args: list, **options: dict) -> None:  # noqa: ARG002
+        """
+        Run the benchmark.
+
+        Args:
+            args (list): Positional arguments.
+            options (dict): Parsed command line options.
+        """
+        users = [
+            User.objects.create_user(username=f"bench-sessions-{i}")
+            for i in range(options["clients"])
+        ]
+        items = Item.objects.bulk_create(
+            Item(name=f"Bench {i}", description="", price_in_cents=100)
+            for i in range(options["clients"])
+        )
+        self.stdout.write(
+            f"{'engine':<16}{'req/s':>8}{'p50 ms':>9}{'p99 ms':>9}"
+            f"{'session q/req':>15}{'shed':>6}{'errors':>8}"
+        )
+        # don't log every failed request
+        logging.disable(logging.ERROR)
+        try:
+            for name, engine in ENGINES.items():
+                cache.clear()
+                with override_settings(
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                    SESSION_ENGINE=engine,
+                    **UNLIMITED,
+                ):
+                    start = time.perf_counter()
+                    result = self._run(users, items, options["requests"])
+                    elapsed = time.perf_counter() - start
+                self._report(name, result, elapsed)
+        finally:
+            logging.disable(logging.NOTSET)
+            Cart.objects.filter(user__in=users).delete()
+            Item.objects.filter(id__in=[item.id for item in items]).delete()
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+
+    def _run(
+        self, users: list[User], items: list[Item], requests: int
+    ) -> Result:
+        """
+        Alternate adding to and viewing carts from one thread per user.
+
+        Args:
+            users (list[User]): One user per client.
+            items (list[Item]): Items to add to the clients' carts.
+            requests (int): Requests made by each client.
+
+        Returns:
+            Result: The collected latencies and query counts.
+        """
+        result = Result()
+        add_url = reverse("cart-add")
+        checkout_url = reverse("checkout")
+
+        def client(user: User, item: Item) -> None:
+            browser = Client(raise_request_exception=False)
+            browser.force_login(user)
+            latencies = []
+            shed = errors = 0
+            try:
+                with connection.execute_wrapper(result.count_query):
+                    for i in range(requests):
+                        start = time.perf_counter()
+                        if i % 2:
+                            response = browser.get(checkout_url)
+                        else:
+                            response = browser.post(
+                                add_url, {"item_id": item.id}
+                            )
+                        latencies.append(time.perf_counter() - start)
+                        if (
+                            response.status_code
+                            == HTTPStatus.SERVICE_UNAVAILABLE
+                        ):
+                            shed += 1
+                        elif (
+                            response.status_code
+                            >= HTTPStatus.INTERNAL_SERVER_ERROR
+                        ):
+                            errors += 1
+            finally:
+                connection.close()
+            with result.lock:
+                result.latencies.extend(latencies)
+                result.shed += shed
+                result.errors += errors
+
+        threads = [
+            threading.Thread(target=client, args=(user, item))
+            for user, item in zip(users, items, strict=True)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return result
+
+    def _report(self, name: str, result: Result, elapsed: float) -> None:
+        """
+        Write a table row summarizing a run.
+
+        Args:
+            name (str): Name of the session engine.
+            result (Result): The collected latencies and query counts.
+            elapsed (float): Seconds the run took.
+        """
+        latencies = result.latencies
+        quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        self.stdout.write(
+            f"{name:<16}{len(latencies) / elapsed:>8.0f}"
+            f"{quantiles[49] * 1000:>9.1f}{quantiles[98] * 1000:>9.1f}"
+            f"{result.session_queries / len(latencies):>15.2f}"
+            f"{result.shed:>6}{result.errors:>8}"
+        )
@@ -0,0 +1,185 @@
+"""Command that benchmarks checkout throughput against the shard count."""
+
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.test.utils import override_settings
+
+from shop.models import Cart, CartItem, Item, Order
+
+USERNAME_PREFIX = "bench-shards-"
+BULK_BATCH = 10_000
+
+
+class Command(BaseCommand):
+    """Measure checkouts per second with carts spread over more shards."""
+
+    help = (
+        "Check out single-item carts from several concurrent clients, each "
+        "logged in as its own user, with carts and orders spread over an "
+        "increasing number of shards. Needs SHOP_SHARDS set to at least the "
+        "largest shard count. Everything created is deleted afterwards."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """
+        Add the command's arguments.
+
+        Args:
+            parser (CommandParser): The command's argument parser.
+        """
+        parser.add_argument(
+            "--shard-counts",
+            default="0,1,2,4",
+            help="comma separated shard counts to measure, 0 for no sharding",
+        )
+        parser.add_argument(
+            "--clients", type=int, default=8, help="concurrent clients"
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            default=5.0,
+            help="seconds to run each measurement for",
+        )
+        parser.add_argument(
+            "--items",
+            type=int,
+            default=20_000,
+            help="unsold items created for each measurement",
+        )
+
+    def handle(self, *args: list, **options: dict) -> None:  # noqa: ARG002
+        """
+        Run the benchmark.
+
+        Args:
+            args (list): Positional arguments.
+            options (dict): Parsed command line options.
+
+        Raises:
+            CommandError: If fewer shards are configured than measured.
+        """
+        counts = [int(count) for count in options["shard_counts"].split(",")]
+        aliases = list(settings.SHARD_DATABASES)
+        if max(counts) > len(aliases):
+            msg = (
+                f"Measuring {max(counts)} shards needs SHOP_SHARDS set to at "
+                f"least {max(counts)}"
+            )
+            raise CommandError(msg)
+        for alias in aliases[: max(counts)]:
+            call_command("migrate", database=alias, verbosity=0)
+        users = [
+            User.objects.create_user(username=f"{USERNAME_PREFIX}{i}")
+            for i in range(options["clients"])
+        ]
+        self.stdout.write(
+            f"{'shards':>8}{'checkouts/s':>14}{'checkouts':>11}{'errors':>8}"
+        )
+        try:
+            for count in counts:
+                with override_settings(SHARD_DATABASES=aliases[:count]):
+                    checkouts, errors, elapsed = self._measure(
+                        users, options["items"], options["duration"]
+                    )
+                self.stdout.write(
+                    f"{count:>8}{checkouts / elapsed:>14.0f}{checkouts:>11}"
+                    f"{errors:>8}"
+                )
+        finally:
+            self._clean_up(users, aliases[: max(counts)])
+
+    def _measure(
+        self, users: list[User], items: int, duration: float
+    ) -> tuple[int, int, float]:
+        """
+        Check out carts from one thread per user until time runs out.
+
+        Args:
+            users (list[User]): The users, one per client.
+            items (int): Number of unsold Items to create for the clients.
+            duration (float): Seconds to run for.
+
+        Returns:
+            tuple[int, int, float]: The number of checkouts, the number of
+            checkouts that failed, and the seconds taken.
+        """
+        first = Item.objects.order_by("-id").values_list("id", flat=True)
+        start_id = (first.first() or 0) + 1
+        for start in range(0, items, BULK_BATCH):
+            Item.objects.bulk_create(
+                Item(
+                    name=f"Bench item {start + i}",
+                    description="",
+                    price_in_cents=100,
+                )
+                for i in range(min(BULK_BATCH, items - start))
+            )
+        item_ids = iter(
+            Item.objects.filter(id__gte=start_id, sold_at__isnull=True)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        lock = threading.Lock()
+        counts = {"checkouts": 0, "errors": 0}
+        deadline = time.perf_counter() + duration
+
+        def client(user: User) -> None:
+            checkouts = errors = 0
+            try:
+                while time.perf_counter() < deadline:
+                    with lock:
+                        item_id = next(item_ids, None)
+                    if item_id is None:
+                        break
+                    try:
+                        cart = Cart.get_active_cart(user)
+                        cart.add_item(Item.objects.get(id=item_id))
+                        cart.checkout("Bench", "Client", "")
+                    except OperationalError:
+                        errors += 1
+                    else:
+                        checkouts += 1
+            finally:
+                connections.close_all()
+                with lock:
+                    counts["checkouts"] += checkouts
+                    counts["errors"] += errors
+
+        threads = [threading.Thread(target=client, args=(u,)) for u in users]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        return counts["checkouts"], counts["errors"], elapsed
+
+    @staticmethod
+    def _clean_up(users: list[User], aliases: list[str]) -> None:
+        """
+        Delete the benchmark's users, carts, orders and Items.
+
+        Args:
+            users (list[User]): The benchmark's users.
+            aliases (list[str]): The configured shards.
+        """
+        for alias in itertools.chain([DEFAULT_DB_ALIAS], aliases):
+            Order.objects.using(alias).filter(cart__user__in=users).delete()
+            CartItem.objects.using(alias).filter(cart__user__in=users).delete()
+            Cart.objects.using(alias).filter(user__in=users).delete()
+        Item.objects.filter(name__startswith="Bench item ").delete()
+        User.objects.filter(id__in=[user.id for user in users]).delete()
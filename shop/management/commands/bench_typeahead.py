@@ -0,0 +1,211 @@
+"""Command that benchmarks the typeahead index."""
+
+from __future__ import annotations
+
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from shop.models import Item
+from shop.typeahead import PrefixIndex, live_index
+
+ADJECTIVES = """
+    antique black blue broken classic compact folding giant green handmade
+    large mini modern old orange pink red retro rustic small spare tall
+    vintage white yellow
+""".split()
+MATERIALS = """
+    brass bamboo canvas ceramic copper cotton glass iron leather linen maple
+    marble oak pine plastic porcelain silver steel teak wicker wool
+""".split()
+NOUNS = """
+    armchair basket bicycle blender bookcase bowl cabinet camera candlestick
+    chair clock coat desk dresser frame gramophone guitar jacket jug kettle
+    ladder lamp mirror mug ottoman planter radio rug scarf shelf sofa stool
+    suitcase table teapot toolbox tray typewriter umbrella vase
+""".split()
+BULK_BATCH = 10_000
+
+
+class Command(BaseCommand):
+    """Measure typeahead lookup latency and index memory use."""
+
+    help = (
+        "Create unsold items, build the typeahead index over them, and "
+        "report build time, memory use and lookup latency for random "
+        "partially typed queries. The items are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """
+        Add the command's arguments.
+
+        Args:
+            parser (CommandParser): The command's argument parser.
+        """
+        parser.add_argument(
+            "--items", type=int, default=1_000_000, help="items to index"
+        )
+        parser.add_argument(
+            "--queries", type=int, default=10_000, help="lookups to time"
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=1000,
+            help="requests to time against the typeahead endpoint",
+        )
+
+    def handle(self, *args: list, **options: dict) -> None:  # noqa: ARG002
+        """
+        Run the benchmark.
+
+        Args:
+            args (list): Positional arguments.
+            options (dict): Parsed command line options.
+        """
+        rng = random.Random(0)  # noqa: S311
+        with transaction.atomic():
+            self._create_items(rng, options["items"])
+            start = time.perf_counter()
+            index = live_index.refresh()
+            self.stdout.write(
+                f"Indexed {len(index)} unsold items in "
+                f"{time.perf_counter() - start:.1f}s"
+            )
+            memory = self._measure_memory()
+            self.stdout.write(
+                f"Index memory: {memory / 2**20:.1f} MiB "
+                f"({memory / max(1, len(index)):.0f} bytes per item)"
+            )
+            queries = [self._query(rng) for _ in range(options["queries"])]
+            self.stdout.write(
+                f"{'':<12}{'p50 µs':>9}{'p99 µs':>9}{'max µs':>9}"
+            )
+            self._report("lookup", self._time_lookups(index, queries))
+            self._report(
+                "endpoint",
+                self._time_requests(queries[: options["requests"]]),
+            )
+            transaction.set_rollback(True)
+        live_index.invalidate()
+
+    def _create_items(self, rng: random.Random, count: int) -> None:
+        """
+        Create unsold Items with random names in bulk.
+
+        Args:
+            rng (Random): The random number generator.
+            count (int): Number of Items to create.
+        """
+        for start in range(0, count, BULK_BATCH):
+            Item.objects.bulk_create(
+                Item(
+                    name=(
+                        f"{rng.choice(ADJECTIVES)} {rng.choice(MATERIALS)} "
+                        f"{rng.choice(NOUNS)}"
+                    ).capitalize(),
+                    description="",
+                    price_in_cents=100,
+                )
+                for _ in range(min(BULK_BATCH, count - start))
+            )
+
+    def _measure_memory(self) -> int:
+        """
+        Build a second index and trace how much memory it holds on to.
+
+        Returns:
+            int: Bytes allocated by the index and the names it keeps.
+        """
+        rows = Item.objects.filter(sold_at__isnull=True).values_list(
+            "id", "name"
+        )
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        index = PrefixIndex(rows.iterator(chunk_size=BULK_BATCH))
+        memory = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        del index
+        return memory
+
+    @staticmethod
+    def _query(rng: random.Random) -> str:
+        """
+        Return a random partially typed query.
+
+        Args:
+            rng (Random): The random number generator.
+
+        Returns:
+            str: One or two words, the last of them cut short.
+        """
+        word = rng.choice([*ADJECTIVES, *MATERIALS, *NOUNS])
+        prefix = word[: rng.randint(1, len(word))]
+        if rng.random() < 0.5:  # noqa: PLR2004
+            return prefix
+        return f"{rng.choice([*ADJECTIVES, *MATERIALS])} {prefix}"
+
+    @staticmethod
+    def _time_lookups(index: PrefixIndex, queries: list[str]) -> list[float]:
+        """
+        Time lookups straight against an index.
+
+        Args:
+            index (PrefixIndex): The index.
+            queries (list[str]): The queries.
+
+        Returns:
+            list[float]: Seconds each lookup took.
+        """
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    @staticmethod
+    def _time_requests(queries: list[str]) -> list[float]:
+        """
+        Time requests to the typeahead endpoint through the test client.
+
+        Args:
+            queries (list[str]): The queries.
+
+        Returns:
+            list[float]: Seconds each request took.
+        """
+        browser = Client()
+        url = reverse("item-typeahead")
+        latencies = []
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+        ):
+            for query in queries:
+                start = time.perf_counter()
+                browser.get(url, {"q": query})
+                latencies.append(time.perf_counter() - start)
+        return latencies
+
+    def _report(self, name: str, latencies: list[float]) -> None:
+        """
+        Write a table row summarizing latencies.
+
+        Args:
+            name (str): Name of the measured operation.
+            latencies (list[float]): Seconds each operation took.
+        """
+        quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        self.stdout.write(
+            f"{name:<12}{quantiles[49] * 1e6:>9.0f}{quantiles[98] * 1e6:>9.0f}"
+            f"{max(latencies) * 1e6:>9.0f}"
+        )
@@ -0,0 +1,56 @@
+"""Command that expires abandoned Carts."""
+
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from shop.carts import EXPIRE_BATCH, expire_stale_carts
+
+
+class Command(BaseCommand):
+    """Expire abandoned Carts now, without waiting for a worker."""
+
+    help = (
+        "Delete the active carts, and their lines, that haven't changed for "
+        "a while, and report the rows reclaimed."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """
+        Add the command's arguments.
+
+        Args:
+            parser (CommandParser): The command's argument parser.
+        """
+        parser.add_argument(
+            "--older-than-days",
+            type=float,
+            help="days since the carts last changed, CART_EXPIRE_AFTER by "
+            "default",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=EXPIRE_BATCH,
+            help="number of carts deleted per transaction",
+        )
+
+    def handle(self, *args: list, **options: dict) -> None:  # noqa: ARG002
+        """
+        Expire the abandoned Carts.
+
+        Args:
+            args (list): Positional arguments.
+            options (dict): Parsed command line options.
+        """
+        days = options["older_than_days"]
+        stats = expire_stale_carts(
+            older_than=None if days is None else timedelta(days=days),
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(
+            f"Expired {stats.carts} carts with {stats.lines} lines, "
+            f"{stats.rows} rows reclaimed"
+        )
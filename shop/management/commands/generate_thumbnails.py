@@ -0,0 +1,48 @@
+"""Command that generates any missing Item image thumbnails."""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from shop.images import THUMBNAIL_WORKERS, process_thumbnails
+from shop.models import ItemImage
+
+
+class Command(BaseCommand):
+    """Generate thumbnails for images that don't have them yet."""
+
+    help = "Generate thumbnails for Item images that don't have them yet."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """
+        Add the command's arguments.
+
+        Args:
+            parser (CommandParser): The command's argument parser.
+        """
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=THUMBNAIL_WORKERS,
+            help="number of images to process in parallel",
+        )
+
+    def handle(self, *args: list, **options: dict) -> None:  # noqa: ARG002
+        """
+        Generate the missing thumbnails.
+
+        Args:
+            args (list): Positional arguments.
+            options (dict): Parsed command line options.
+        """
+        pending = list(
+            ItemImage.objects.filter(thumbnails_ready=False)
+            .values_list("digest", "extension")
+            .distinct()
+        )
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            for digest, extension in pending:
+                pool.submit(process_thumbnails, digest, extension)
+        self.stdout.write(f"Processed {len(pending)} images")
@@ -0,0 +1,53 @@
+"""Command that reports how well markdowns sold Items."""
+
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import DEFAULT_DB_ALIAS
+
+from shop.pricing import markdown_report
+
+
+class Command(BaseCommand):
+    """Print the markdown effectiveness report."""
+
+    help = (
+        "Report, for markdowns of each depth, how many were followed by a "
+        "sale before the next price change and how long the sale took."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """
+        Add the command's arguments.
+
+        Args:
+            parser (CommandParser): The command's argument parser.
+        """
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="database to report on",
+        )
+
+    def handle(self, *args: list, **options: dict) -> None:  # noqa: ARG002
+        """
+        Print the report.
+
+        Args:
+            args (list): Positional arguments.
+            options (dict): Parsed command line options.
+        """
+        self.stdout.write(
+            f"{'markdown':<10}{'count':>8}{'sold':>8}{'sell-through':>14}"
+            f"{'days to sell':>14}"
+        )
+        for band in markdown_report(using=options["database"]):
+            days = (
+                "-"
+                if band.time_to_sell is None
+                else f"{band.time_to_sell.total_seconds() / 86400:.1f}"
+            )
+            self.stdout.write(
+                f"{band.label:<10}{band.markdowns:>8}{band.sold:>8}"
+                f"{band.sell_through:>14.0%}{days:>14}"
+            )
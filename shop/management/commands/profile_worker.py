@@ -0,0 +1,70 @@
+"""Command that profiles a running web worker."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+
+from shop.profiler import MAX_SECONDS, request_profile
+
+
+class Command(BaseCommand):
+    """Profile a running gunicorn worker and print its collapsed stacks."""
+
+    help = (
+        "Ask a gunicorn worker started with PROFILER=true to sample the "
+        "stacks of the requests it serves for a few seconds, and print them "
+        "as collapsed stacks for flamegraph.pl or speedscope."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """
+        Add the command's arguments.
+
+        Args:
+            parser (CommandParser): The command's argument parser.
+        """
+        parser.add_argument("pid", type=int, help="the worker's process ID")
+        parser.add_argument(
+            "--seconds",
+            type=float,
+            default=10.0,
+            help="how long to profile for",
+        )
+        parser.add_argument(
+            "--output", help="file to write the stacks to instead of stdout"
+        )
+
+    def handle(self, *args: list, **options: dict) -> None:  # noqa: ARG002
+        """
+        Profile the worker.
+
+        Args:
+            args (list): Positional arguments.
+            options (dict): Parsed command line options.
+
+        Raises:
+            CommandError: If the profiler is switched off, the duration is
+                out of range or the worker didn't answer.
+        """
+        if not settings.PROFILER:
+            msg = "The profiler is switched off; set PROFILER=true"
+            raise CommandError(msg)
+        seconds = options["seconds"]
+        if not 0 < seconds <= MAX_SECONDS:
+            msg = f"--seconds must be between 0 and {MAX_SECONDS:g}"
+            raise CommandError(msg)
+        try:
+            stacks = request_profile(options["pid"], seconds)
+        except (OSError, TimeoutError) as e:
+            raise CommandError(str(e)) from e
+        if options["output"]:
+            Path(options["output"]).write_text(stacks)
+        else:
+            self.stdout.write(stacks, ending="")
@@ -0,0 +1,53 @@
+"""Command that purges soft-deleted Items."""
+
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from shop.purge import PURGE_BATCH, purge_deleted_items
+
+
+class Command(BaseCommand):
+    """Purge deleted Items now, without waiting for a worker."""
+
+    help = (
+        "Physically delete the items deleted a while ago that were never "
+        "sold, taking them out of active carts first."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """
+        Add the command's arguments.
+
+        Args:
+            parser (CommandParser): The command's argument parser.
+        """
+        parser.add_argument(
+            "--older-than-days",
+            type=float,
+            help="days since the items were deleted, ITEM_PURGE_AFTER by "
+            "default",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=PURGE_BATCH,
+            help="number of items deleted per transaction",
+        )
+
+    def handle(self, *args: list, **options: dict) -> None:  # noqa: ARG002
+        """
+        Purge the deleted Items.
+
+        Args:
+            args (list): Positional arguments.
+            options (dict): Parsed command line options.
+        """
+        days = options["older_than_days"]
+        purged = purge_deleted_items(
+            older_than=None if days is None else timedelta(days=days),
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(f"Purged {purged} deleted items")
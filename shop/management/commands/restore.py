@@ -0,0 +1,77 @@
+"""Command that restores a snapshot of the shop's inventory and orders."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+from django.db import DEFAULT_DB_ALIAS
+
+from shop.snapshots import SnapshotError, restore_snapshot
+
+
+class Command(BaseCommand):
+    """Replace the shop's tables with the contents of a snapshot."""
+
+    help = (
+        "Replace the shop's sellers, items, carts and orders with the "
+        "contents of a snapshot written by `snapshot`. Users aren't part of "
+        "the snapshot and must already exist."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """
+        Add the command's arguments.
+
+        Args:
+            parser (CommandParser): The command's argument parser.
+        """
+        parser.add_argument("path", type=Path, help="snapshot file to load")
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="database to restore into",
+        )
+        parser.add_argument(
+            "--noinput",
+            "--no-input",
+            action="store_false",
+            dest="interactive",
+            help="don't ask for confirmation before replacing the data",
+        )
+
+    def handle(self, *args: list, **options: dict) -> None:  # noqa: ARG002
+        """
+        Restore the snapshot.
+
+        Args:
+            args (list): Positional arguments.
+            options (dict): Parsed command line options.
+
+        Raises:
+            CommandError: If the snapshot can't be restored.
+        """
+        if options["interactive"]:
+            confirm = input(
+                "This will replace every seller, item, cart and order in "
+                f"the {options['database']!r} database. "
+                "Type 'yes' to continue: "
+            )
+            if confirm != "yes":
+                self.stdout.write("Restore cancelled.")
+                return
+        try:
+            stats = restore_snapshot(
+                options["path"], using=options["database"]
+            )
+        except (OSError, SnapshotError) as e:
+            raise CommandError(str(e)) from e
+        for label, count in stats.rows.items():
+            self.stdout.write(f"{label:<20}{count:>10}")
+        self.stdout.write(
+            f"Restored {stats.total_rows} rows in {stats.seconds:.2f}s"
+        )
@@ -0,0 +1,60 @@
+"""Command that runs background job worker processes."""
+
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from shop.tasks import run_workers
+
+
+class Command(BaseCommand):
+    """Run a pool of processes that execute queued background jobs."""
+
+    help = "Run worker processes that execute queued background jobs."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """
+        Add the command's arguments.
+
+        Args:
+            parser (CommandParser): The command's argument parser.
+        """
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="number of worker processes to run",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="seconds to wait between checks when the queue is empty",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="exit once the queue is empty instead of waiting for jobs",
+        )
+        parser.add_argument(
+            "--no-housekeeping",
+            action="store_false",
+            dest="housekeeping",
+            help="only run jobs, without purging, expiring carts or "
+            "applying markdowns",
+        )
+
+    def handle(self, *args: list, **options: dict) -> None:  # noqa: ARG002
+        """
+        Run the worker processes.
+
+        Args:
+            args (list): Positional arguments.
+            options (dict): Parsed command line options.
+        """
+        run_workers(
+            options["processes"],
+            burst=options["burst"],
+            poll_interval=options["poll_interval"],
+            housekeeping=options["housekeeping"],
+        )
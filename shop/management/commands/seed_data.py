@@ -0,0 +1,80 @@
+"""Command that fills the database with realistic data in bulk."""
+
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from shop.factories import SEED_BATCH, seed
+
+
+class Command(BaseCommand):
+    """Seed Sellers, Items, users, Carts and Orders for local profiling."""
+
+    help = (
+        "Create Sellers, Items with their price history, users, checked out "
+        "carts with their orders, and active carts, with bulk inserts. The "
+        "same seed always creates the same data."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """
+        Add the command's arguments.
+
+        Args:
+            parser (CommandParser): The command's argument parser.
+        """
+        parser.add_argument(
+            "--sellers", type=int, default=100, help="sellers to create"
+        )
+        parser.add_argument(
+            "--items", type=int, default=10_000, help="items to create"
+        )
+        parser.add_argument(
+            "--users", type=int, default=1_000, help="users to create"
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="seed of the random data"
+        )
+        parser.add_argument(
+            "--prefix",
+            default="seed-",
+            help="start of the new users' usernames",
+        )
+        parser.add_argument(
+            "--password",
+            help="password of the new users, who can't log in without one",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=SEED_BATCH,
+            help="number of items, or users, written per transaction",
+        )
+
+    def handle(self, *args: list, **options: dict) -> None:  # noqa: ARG002
+        """
+        Seed the database.
+
+        Args:
+            args (list): Positional arguments.
+            options (dict): Parsed command line options.
+        """
+        start = time.perf_counter()
+        stats = seed(
+            sellers=options["sellers"],
+            items=options["items"],
+            users=options["users"],
+            seed=options["seed"],
+            prefix=options["prefix"],
+            password=options["password"],
+            batch_size=options["batch_size"],
+        )
+        seconds = time.perf_counter() - start
+        self.stdout.write(
+            f"Created {stats.sellers} sellers, {stats.items} items with "
+            f"{stats.price_changes} prices, {stats.users} users, "
+            f"{stats.carts} carts with {stats.lines} lines and "
+            f"{stats.orders} orders: {stats.rows} rows in {seconds:.1f} s"
+        )
@@ -0,0 +1,55 @@
+"""Command that sends every pending order receipt."""
+
+from __future__ import annotations
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+
+from shop.receipts import (
+    RECEIPT_BATCH_SIZE,
+    ReceiptError,
+    send_pending_receipts,
+)
+
+
+class Command(BaseCommand):
+    """Send pending order receipts now, without waiting for a worker."""
+
+    help = "Send every pending order receipt and report the throughput."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """
+        Add the command's arguments.
+
+        Args:
+            parser (CommandParser): The command's argument parser.
+        """
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=RECEIPT_BATCH_SIZE,
+            help="number of receipts sent together",
+        )
+
+    def handle(self, *args: list, **options: dict) -> None:  # noqa: ARG002
+        """
+        Send the pending receipts.
+
+        Args:
+            args (list): Positional arguments.
+            options (dict): Parsed command line options.
+
+        Raises:
+            CommandError: If some receipts failed to send.
+        """
+        try:
+            stats = send_pending_receipts(batch_size=options["batch_size"])
+        except ReceiptError as error:
+            raise CommandError(error) from error
+        self.stdout.write(
+            f"Sent {stats.sent} receipts in {stats.batches} batches, "
+            f"{stats.seconds:.2f}s ({stats.per_second:.1f}/s)"
+        )
@@ -0,0 +1,61 @@
+"""Command that writes a snapshot of the shop's inventory and orders."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+from django.db import DEFAULT_DB_ALIAS
+
+from shop.snapshots import SnapshotError, take_snapshot
+
+
+class Command(BaseCommand):
+    """Write a compressed snapshot of the shop's tables to a file."""
+
+    help = (
+        "Write the shop's sellers, items, carts and orders to a compressed "
+        "columnar snapshot file, which `restore` can load into another "
+        "database."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """
+        Add the command's arguments.
+
+        Args:
+            parser (CommandParser): The command's argument parser.
+        """
+        parser.add_argument("path", type=Path, help="snapshot file to write")
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="database to snapshot",
+        )
+
+    def handle(self, *args: list, **options: dict) -> None:  # noqa: ARG002
+        """
+        Write the snapshot.
+
+        Args:
+            args (list): Positional arguments.
+            options (dict): Parsed command line options.
+
+        Raises:
+            CommandError: If the snapshot can't be taken.
+        """
+        try:
+            stats = take_snapshot(options["path"], using=options["database"])
+        except (OSError, SnapshotError) as e:
+            raise CommandError(str(e)) from e
+        for label, count in stats.rows.items():
+            self.stdout.write(f"{label:<20}{count:>10}")
+        size = options["path"].stat().st_size
+        self.stdout.write(
+            f"Wrote {stats.total_rows} rows ({size / 1024:.0f} KiB) "
+            f"in {stats.seconds:.2f}s"
+        )
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.16 on 2026-10-18 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop", "0010_job"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="receipt_sent_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                condition=models.Q(
+                    ("receipt_sent_at__isnull", True),
+                    models.Q(("email", ""), _negated=True),
+                ),
+                fields=["id"],
+                name="shop_order_receipt_pending",
+            ),
+        ),
+    ]
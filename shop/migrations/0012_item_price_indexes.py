@@ -0,0 +1,26 @@
+# Generated by Django 4.2.16 on 2026-10-19 00:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop", "0011_order_receipt_sent_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                fields=["price_in_cents"], name="shop_item_price_i_1ff271_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                condition=models.Q(("sold_at__isnull", True)),
+                fields=["price_in_cents"],
+                name="shop_item_unsold_price",
+            ),
+        ),
+    ]
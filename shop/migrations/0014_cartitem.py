@@ -0,0 +1,157 @@
+# Generated by Django 4.2.16 on 2026-10-19 01:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+# number of rows copied or updated together by the backfill
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_cart_lines(apps, schema_editor):
+    """
+    Copy the rows of the old implicit cart items table to CartItem lines.
+
+    The old table didn't record prices, so lines capture the Items' current
+    prices. Rows are copied, and cart totals recomputed, in batches so large
+    tables are never loaded at once.
+    """
+    Cart = apps.get_model("shop", "Cart")
+    CartItem = apps.get_model("shop", "CartItem")
+    OldCartItem = Cart.items.through
+    db = schema_editor.connection.alias
+
+    last_id = 0
+    while True:
+        rows = list(
+            OldCartItem.objects.using(db)
+            .filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", "cart_id", "item_id", "item__price_in_cents")[
+                :BACKFILL_BATCH_SIZE
+            ]
+        )
+        if not rows:
+            break
+        CartItem.objects.using(db).bulk_create(
+            CartItem(cart_id=cart_id, item_id=item_id, price_in_cents=price)
+            for _, cart_id, item_id, price in rows
+        )
+        last_id = rows[-1][0]
+
+    last_id = 0
+    while True:
+        carts = list(
+            Cart.objects.using(db)
+            .filter(id__gt=last_id)
+            .order_by("id")[:BACKFILL_BATCH_SIZE]
+        )
+        if not carts:
+            break
+        totals = dict(
+            CartItem.objects.using(db)
+            .filter(cart__in=carts)
+            .values("cart")
+            .annotate(
+                total=models.Sum(
+                    models.F("price_in_cents") * models.F("quantity")
+                )
+            )
+            .values_list("cart", "total")
+        )
+        for cart in carts:
+            cart.total_in_cents = totals.get(cart.id, 0)
+        Cart.objects.using(db).bulk_update(carts, ["total_in_cents"])
+        last_id = carts[-1].id
+
+
+def restore_cart_items(apps, schema_editor):
+    """Copy CartItem lines back to the implicit cart items table."""
+    Cart = apps.get_model("shop", "Cart")
+    CartItem = apps.get_model("shop", "CartItem")
+    OldCartItem = Cart.items.through
+    db = schema_editor.connection.alias
+
+    last_id = 0
+    while True:
+        rows = list(
+            CartItem.objects.using(db)
+            .filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", "cart_id", "item_id")[:BACKFILL_BATCH_SIZE]
+        )
+        if not rows:
+            break
+        OldCartItem.objects.using(db).bulk_create(
+            OldCartItem(cart_id=cart_id, item_id=item_id)
+            for _, cart_id, item_id in rows
+        )
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop", "0013_seller"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CartItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("price_in_cents", models.PositiveIntegerField()),
+                ("quantity", models.PositiveIntegerField(default=1)),
+                (
+                    "added_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "cart",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lines",
+                        to="shop.cart",
+                    ),
+                ),
+                (
+                    "item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cart_lines",
+                        to="shop.item",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["id"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="cartitem",
+            constraint=models.UniqueConstraint(
+                fields=("cart", "item"), name="shop_cartitem_unique_item"
+            ),
+        ),
+        migrations.RunPython(
+            backfill_cart_lines, restore_cart_items, elidable=True
+        ),
+        migrations.RemoveField(
+            model_name="cart",
+            name="items",
+        ),
+        migrations.AddField(
+            model_name="cart",
+            name="items",
+            field=models.ManyToManyField(
+                through="shop.CartItem", to="shop.item"
+            ),
+        ),
+    ]
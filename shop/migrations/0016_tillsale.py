@@ -0,0 +1,60 @@
+# Generated by Django 4.2.16 on 2026-10-19 00:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop", "0015_admin_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TillSale",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("till", models.CharField(max_length=64)),
+                ("sale_id", models.CharField(max_length=64)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("ok", "Ok"), ("conflict", "Conflict")],
+                        max_length=16,
+                    ),
+                ),
+                ("conflicts", models.JSONField(blank=True, default=list)),
+                (
+                    "synced_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "order",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="shop.order",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["id"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="tillsale",
+            constraint=models.UniqueConstraint(
+                fields=("till", "sale_id"), name="shop_tillsale_unique_sale"
+            ),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.2.16 on 2026-10-19 00:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+# number of Items whose prices are recorded together by the backfill
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_price_history(apps, schema_editor):
+    """
+    Record the current price of every existing Item.
+
+    Earlier prices were never recorded, so the history of existing Items
+    starts when the migration runs.
+    """
+    Item = apps.get_model("shop", "Item")
+    PriceChange = apps.get_model("shop", "PriceChange")
+    db = schema_editor.connection.alias
+    now = django.utils.timezone.now()
+
+    last_id = 0
+    while True:
+        rows = list(
+            Item.objects.using(db)
+            .filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", "price_in_cents")[:BACKFILL_BATCH_SIZE]
+        )
+        if not rows:
+            break
+        PriceChange.objects.using(db).bulk_create(
+            PriceChange(
+                item_id=item_id, price_in_cents=price, effective_at=now
+            )
+            for item_id, price in rows
+        )
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop", "0016_tillsale"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PriceChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("price_in_cents", models.PositiveIntegerField()),
+                (
+                    "effective_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "item",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="price_history",
+                        to="shop.item",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["item", "effective_at", "id"],
+                "indexes": [
+                    models.Index(
+                        fields=["item", "effective_at"],
+                        name="shop_pricechange_item_time",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(
+            backfill_price_history, migrations.RunPython.noop, elidable=True
+        ),
+    ]
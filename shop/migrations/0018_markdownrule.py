@@ -0,0 +1,82 @@
+# Generated by Django 4.2.16 on 2026-10-19 00:39
+
+import datetime
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop", "0017_pricechange"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MarkdownRule",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=200)),
+                (
+                    "percentage",
+                    models.PositiveSmallIntegerField(
+                        help_text="Percentage taken off the price",
+                        validators=[
+                            django.core.validators.MinValueValidator(1),
+                            django.core.validators.MaxValueValidator(99),
+                        ],
+                    ),
+                ),
+                (
+                    "starts_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "min_listed_for",
+                    models.DurationField(
+                        default=datetime.timedelta,
+                        help_text="How long an Item must have been listed, e.g. 3 00:00:00",
+                    ),
+                ),
+                ("active", models.BooleanField(default=True)),
+                ("applied_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "ordering": ["starts_at", "id"],
+            },
+        ),
+        migrations.AddField(
+            model_name="item",
+            name="listed_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                condition=models.Q(("sold_at__isnull", True)),
+                fields=["listed_at"],
+                name="shop_item_unsold_listed",
+            ),
+        ),
+        migrations.AddField(
+            model_name="pricechange",
+            name="rule",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="price_changes",
+                to="shop.markdownrule",
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.16 on 2026-10-19 01:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("shop", "0018_markdownrule"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="cart",
+            name="user",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="cartitem",
+            name="item",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="cart_lines",
+                to="shop.item",
+            ),
+        ),
+    ]
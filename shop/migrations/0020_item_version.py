@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-19 01:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop", "0019_cart_lines_across_databases"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="item",
+            name="version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
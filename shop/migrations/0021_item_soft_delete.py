@@ -0,0 +1,57 @@
+# Generated by Django 4.2.16 on 2026-10-19 01:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop", "0020_item_version"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="item",
+            options={"default_manager_name": "objects", "ordering": ["id"]},
+        ),
+        migrations.RemoveIndex(
+            model_name="item",
+            name="shop_item_unsold_price",
+        ),
+        migrations.RemoveIndex(
+            model_name="item",
+            name="shop_item_unsold_listed",
+        ),
+        migrations.AddField(
+            model_name="item",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                condition=models.Q(
+                    ("deleted_at__isnull", True), ("sold_at__isnull", True)
+                ),
+                fields=["price_in_cents"],
+                name="shop_item_unsold_price",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                condition=models.Q(
+                    ("deleted_at__isnull", True), ("sold_at__isnull", True)
+                ),
+                fields=["listed_at"],
+                name="shop_item_unsold_listed",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", False)),
+                fields=["deleted_at"],
+                name="shop_item_deleted",
+            ),
+        ),
+    ]
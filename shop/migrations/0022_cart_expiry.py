@@ -0,0 +1,34 @@
+# Generated by Django 4.2.16 on 2026-10-19 01:28
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop", "0021_item_soft_delete"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cart",
+            name="updated_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name="cart",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["user"],
+                name="shop_cart_active_user",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cart",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["updated_at"],
+                name="shop_cart_active_updated",
+            ),
+        ),
+    ]
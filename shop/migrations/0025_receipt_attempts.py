@@ -0,0 +1,27 @@
+# Generated by Django 4.2.16 on 2026-10-19 02:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop", "0024_idempotency_keys"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="receipt_attempts",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="receipt_claimed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="receipt_error",
+            field=models.TextField(blank=True, default=""),
+        ),
+    ]
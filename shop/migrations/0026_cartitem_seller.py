@@ -0,0 +1,84 @@
+# Generated by Django 4.2.16 on 2026-10-19 02:39
+
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, migrations, models
+import django.db.models.deletion
+
+# number of cart lines whose Sellers are recorded together by the backfill
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_sellers(apps, schema_editor):
+    """
+    Record the Seller of every checked out cart line.
+
+    The lines may live in a shard, so the Sellers are looked up from the Items
+    in the default database.
+    """
+    CartItem = apps.get_model("shop", "CartItem")
+    Item = apps.get_model("shop", "Item")
+    db = schema_editor.connection.alias
+
+    last_id = 0
+    while True:
+        rows = list(
+            CartItem.objects.using(db)
+            .filter(id__gt=last_id, cart__active=False)
+            .order_by("id")
+            .values_list("id", "item_id")[:BACKFILL_BATCH_SIZE]
+        )
+        if not rows:
+            break
+        sellers = dict(
+            Item.objects.using(DEFAULT_DB_ALIAS)
+            .filter(
+                id__in={item_id for _, item_id in rows},
+                seller__isnull=False,
+            )
+            .values_list("id", "seller_id")
+        )
+        lines = defaultdict(list)
+        for line_id, item_id in rows:
+            if item_id in sellers:
+                lines[sellers[item_id]].append(line_id)
+        for seller_id, line_ids in lines.items():
+            CartItem.objects.using(db).filter(id__in=line_ids).update(
+                seller_id=seller_id
+            )
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop", "0025_receipt_attempts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cartitem",
+            name="seller",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="shop.seller",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cartitem",
+            index=models.Index(
+                condition=models.Q(("seller__isnull", False)),
+                fields=["seller", "price_in_cents", "quantity"],
+                name="shop_cartitem_seller_sales",
+            ),
+        ),
+        migrations.RunPython(
+            backfill_sellers,
+            migrations.RunPython.noop,
+            hints={"model_name": "cartitem"},
+            elidable=True,
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-19 02:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop", "0026_cartitem_seller"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PriceFacetCount",
+            fields=[
+                (
+                    "bucket",
+                    models.PositiveSmallIntegerField(
+                        primary_key=True, serialize=False
+                    ),
+                ),
+                ("all_count", models.IntegerField()),
+                ("unsold_count", models.IntegerField()),
+            ],
+        ),
+    ]
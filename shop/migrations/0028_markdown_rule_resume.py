@@ -0,0 +1,24 @@
+# Generated by Django 4.2.16 on 2026-10-19 02:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop", "0027_price_facet_counts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="markdownrule",
+            name="resume_from",
+            field=models.PositiveBigIntegerField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="markdownrule",
+            name="run_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
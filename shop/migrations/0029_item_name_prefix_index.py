@@ -0,0 +1,19 @@
+# Generated by Django 4.2.16 on 2026-10-19 02:56
+
+from django.db import migrations
+import shop.db
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop", "0028_markdown_rule_resume"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="item",
+            index=shop.db.PrefixSearchIndex(
+                fields=["name"], name="shop_item_name_prefix"
+            ),
+        ),
+    ]
@@ -2,23 +2,217 @@
 
 from __future__ import annotations
 
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
 from django.contrib.auth.models import User
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from django.urls import reverse
 from django.utils import timezone
 
+from .db import PrefixSearchIndex
+from .images import THUMBNAIL_WIDTHS, image_filename
+from .sharding import shard_for_user, shards
+from .signals import order_checked_out
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from datetime import datetime
+
+
+def format_cents(cents: int) -> str:
+    """
+    Format an amount of money in cents as $[dollars].[cents].
+
+    Args:
+        cents (int): The amount in cents.
+
+    Returns:
+        str: The formatted amount.
+    """
+    return f"${(cents / 100.0):,.2f}"
+
+
+class Seller(models.Model):
+    """Seller model represents a person or family selling Items."""
+
+    name = models.CharField(max_length=200)
+    email = models.EmailField(blank=True, default="")
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        """Model metadata class."""
+
+        ordering = ["name", "id"]
+
+    def __str__(self) -> str:
+        """
+        Return the Seller model's string representation.
+
+        Returns:
+            str: String representation of the Seller model
+        """
+        return self.name.__str__()
+
+    @staticmethod
+    def with_sales() -> models.QuerySet[Seller]:
+        """
+        Get the Sellers annotated with their sales.
+
+        The counts are computed by the database with one grouped aggregation
+        over the Items, rather than by loading the Items. Payouts come from
+        the cart lines, which may live in the shards, so they are added to
+        the loaded Sellers by ``add_payouts()``.
+
+        Returns:
+            QuerySet[Seller]: Sellers annotated with ``items_listed`` and
+            ``items_sold``.
+        """
+        return Seller.objects.annotate(
+            items_listed=models.Count(
+                "items",
+                filter=models.Q(items__deleted_at__isnull=True),
+                distinct=True,
+            ),
+            items_sold=models.Count(
+                "items",
+                filter=models.Q(items__sold_at__isnull=False),
+                distinct=True,
+            ),
+        )
+
+    @staticmethod
+    def add_payouts(sellers: Iterable[Seller]) -> None:
+        """
+        Set ``payout_in_cents`` on Sellers.
+
+        Payouts add up the prices captured on the lines of checked out
+        Carts, which record the Seller they were sold for. Each shard's
+        database sums its lines with one grouped aggregation over an index,
+        without reading the Items.
+
+        Args:
+            sellers (Iterable[Seller]): The Sellers.
+        """
+        sellers = {seller.pk: seller for seller in sellers}
+        for seller in sellers.values():
+            seller.payout_in_cents = 0
+        for alias in shards():
+            totals = (
+                CartItem.objects.using(alias)
+                .filter(seller__in=list(sellers))
+                .values("seller_id")
+                .annotate(total=models.Sum(CartItem.line_total_expression()))
+                .values_list("seller_id", "total")
+            )
+            for seller_id, total in totals:
+                sellers[seller_id].payout_in_cents += total
+
+    def format_payout(self) -> str:
+        """
+        Return the formatted payout of a Seller passed to ``add_payouts``.
+
+        Returns:
+            str: The formatted payout.
+        """
+        return format_cents(self.payout_in_cents)
+
+
+class ItemConflictError(Exception):
+    """Raised when saving an Item that was changed since it was loaded."""
+
+
+class ItemManager(models.Manager):
+    """Manager of the Items that haven't been deleted."""
+
+    def get_queryset(self) -> models.QuerySet[Item]:
+        """
+        Get the Items, leaving out soft-deleted ones.
+
+        Returns:
+            QuerySet[Item]: The Items that haven't been deleted.
+        """
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 
 class Item(models.Model):
-    """Item model represents an item for sale in the garage sale."""
+    """
+    Item model represents an item for sale in the garage sale.
+
+    Items are updated optimistically: every save of a loaded Item only
+    writes the fields that changed, and only if the row's ``version`` still
+    matches the one that was loaded. Bulk ``QuerySet.update()`` calls must
+    bump ``version`` themselves.
+
+    Deleting an Item only sets ``deleted_at``, which hides it from
+    ``Item.objects``; ``Item.all_objects`` still sees it, and so do the
+    Orders it was sold in. Old deleted Items that were never sold are purged
+    later in the background.
+    """
 
     name = models.CharField(max_length=200)
     description = models.CharField(max_length=200)
     price_in_cents = models.PositiveIntegerField()
     sold_at = models.DateTimeField(blank=True, null=True)
+    listed_at = models.DateTimeField(default=timezone.now)
+    seller = models.ForeignKey(
+        Seller,
+        on_delete=models.PROTECT,
+        related_name="items",
+        blank=True,
+        null=True,
+    )
+    # bumped by every update, to detect concurrent changes
+    version = models.PositiveIntegerField(default=0)
+    deleted_at = models.DateTimeField(blank=True, null=True)
+
+    # field values as last loaded from or saved to the database, used to
+    # only write the fields that changed
+    loaded_values: dict[str, object] | None = None
+
+    all_objects = models.Manager()
+    objects = ItemManager()
 
     class Meta:
         """Model metadata class."""
 
+        default_manager_name = "objects"
         ordering = ["id"]
+        indexes = [
+            models.Index(fields=["price_in_cents"]),
+            models.Index(
+                fields=["price_in_cents"],
+                condition=models.Q(
+                    sold_at__isnull=True, deleted_at__isnull=True
+                ),
+                name="shop_item_unsold_price",
+            ),
+            # covers counting each Seller's sold Items
+            models.Index(
+                fields=["seller", "sold_at", "price_in_cents"],
+                name="shop_item_seller_sales",
+            ),
+            # used by the admin's sold date filter
+            models.Index(fields=["sold_at"], name="shop_item_sold_at"),
+            # finds the unsold Items a markdown rule applies to
+            models.Index(
+                fields=["listed_at"],
+                condition=models.Q(
+                    sold_at__isnull=True, deleted_at__isnull=True
+                ),
+                name="shop_item_unsold_listed",
+            ),
+            # finds the deleted Items to purge
+            models.Index(
+                fields=["deleted_at"],
+                condition=models.Q(deleted_at__isnull=False),
+                name="shop_item_deleted",
+            ),
+            # serves the admin's search by the start of the name
+            PrefixSearchIndex(fields=["name"], name="shop_item_name_prefix"),
+        ]
 
     def __str__(self) -> str:
         """
@@ -29,6 +223,213 @@ class Item(models.Model):
         """
         return self.name.__str__()
 
+    def save(self, *args: list, **kwargs: dict) -> None:
+        """
+        Save the Item, recording its price in the price history if it changed.
+
+        An Item that is already in the database is saved with a compare and
+        swap: only the fields changed since it was loaded are written, and
+        only if nobody else updated it in the meantime. Nothing is written if
+        no field changed. The Item and its price history are written in one
+        transaction.
+
+        Args:
+            args (list): Positional arguments for ``Model.save``.
+            kwargs (dict): Keyword arguments for ``Model.save``.
+
+        Raises:
+            ItemConflictError: If the Item was changed or deleted since it was
+                loaded; the Item keeps its unsaved changes.
+        """
+        update_fields = kwargs.get("update_fields")
+        loaded_price = (self.loaded_values or {}).get("price_in_cents")
+        price_changed = self.price_in_cents != loaded_price and (
+            update_fields is None or "price_in_cents" in update_fields
+        )
+        swap = not self._state.adding and not kwargs.get("force_insert")
+        if swap:
+            fields = self.changed_fields()
+            if update_fields is not None:
+                fields &= set(update_fields)
+            if not fields:
+                return
+            kwargs["update_fields"] = {*fields, "version"}
+            self.version += 1
+        try:
+            with transaction.atomic(using=kwargs.get("using")):
+                super().save(*args, **kwargs)
+                if price_changed:
+                    PriceChange.objects.create(
+                        item=self, price_in_cents=self.price_in_cents
+                    )
+        except ItemConflictError:
+            self.version -= 1
+            raise
+        self.loaded_values = self._field_values()
+
+    def _do_update(  # noqa: PLR0913
+        self,
+        base_qs: models.QuerySet,
+        using: str,
+        pk_val: object,
+        values: list[tuple],
+        update_fields: set[str] | None,
+        forced_update: bool,  # noqa: FBT001
+    ) -> bool:
+        """
+        Update the Item's row if its version is still the one last loaded.
+
+        Args:
+            base_qs (QuerySet): The Items the row is updated through.
+            using (str): Alias of the database.
+            pk_val (object): The Item's primary key.
+            values (list[tuple]): The fields and values to write.
+            update_fields (set[str] | None): Names of the written fields.
+            forced_update (bool): Whether an update was forced.
+
+        Returns:
+            bool: Whether the row was updated.
+
+        Raises:
+            ItemConflictError: If the row was changed or deleted.
+        """
+        if update_fields is None or "version" not in update_fields:
+            return super()._do_update(
+                base_qs, using, pk_val, values, update_fields, forced_update
+            )
+        base_qs = base_qs.filter(version=self.version - 1)
+        if not super()._do_update(
+            base_qs, using, pk_val, values, update_fields, forced_update
+        ):
+            msg = f"Item {pk_val} was changed by someone else"
+            raise ItemConflictError(msg)
+        return True
+
+    def _field_values(self) -> dict[str, object]:
+        """
+        Return the current values of the Item's loaded fields.
+
+        Returns:
+            dict[str, object]: Field values by attribute name.
+        """
+        return {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
+    def changed_fields(self) -> set[str]:
+        """
+        Return the fields changed since the Item was loaded or saved.
+
+        Returns:
+            set[str]: Names of the changed fields, every loaded field if the
+            Item's loaded values are unknown.
+        """
+        loaded = self.loaded_values or {}
+        return {
+            field.name
+            for field in self._meta.concrete_fields
+            if not field.primary_key
+            and field.attname in self.__dict__
+            and (
+                field.attname not in loaded
+                or loaded[field.attname] != getattr(self, field.attname)
+            )
+        }
+
+    def refresh_from_db(
+        self, using: str | None = None, fields: list[str] | None = None
+    ) -> None:
+        """
+        Reload the Item's fields and remember them as loaded.
+
+        Args:
+            using (str | None): Alias of the database to reload from.
+            fields (list[str] | None): Names of the fields to reload, all of
+                them by default.
+        """
+        super().refresh_from_db(using=using, fields=fields)
+        current = self._field_values()
+        if fields is not None:
+            names = {self._meta.get_field(name).attname for name in fields}
+            current = {k: v for k, v in current.items() if k in names}
+        self.loaded_values = {**(self.loaded_values or {}), **current}
+
+    @classmethod
+    def from_db(
+        cls, db: str, field_names: list[str], values: list[object]
+    ) -> Item:
+        """
+        Create an Item loaded from the database and remember its state.
+
+        Args:
+            db (str): Alias of the database the Item was loaded from.
+            field_names (list[str]): Names of the loaded fields.
+            values (list[object]): Values of the loaded fields.
+
+        Returns:
+            Item: The loaded Item.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_values = instance._field_values()  # noqa: SLF001
+        return instance
+
+    def soft_delete(self) -> None:
+        """
+        Delete the Item by hiding it, without touching its cart lines.
+
+        Carts holding the Item drop it when they are checked out, and the
+        Item is physically deleted by ``purge_deleted_items`` later on.
+        """
+        self.deleted_at = timezone.now()
+        self.save(update_fields=["deleted_at"])
+
+    def mark_sold(self, when: datetime) -> None:
+        """
+        Mark the Item as sold, writing only its ``sold_at``.
+
+        If another update got in since the Item was loaded, it is reloaded
+        and marked again, unless that update sold or deleted it.
+
+        Args:
+            when (datetime): When the Item was sold.
+
+        Raises:
+            ItemConflictError: If the Item is already sold or deleted.
+        """
+        for attempt in range(2):
+            if self.is_sold() or self.is_deleted():
+                msg = f"Item {self.pk} is no longer for sale"
+                raise ItemConflictError(msg)
+            self.sold_at = when
+            try:
+                self.save(update_fields=["sold_at"])
+            except ItemConflictError:
+                if attempt:
+                    raise
+                self.refresh_from_db()
+            else:
+                return
+
+    def price_at(self, when: datetime) -> int | None:
+        """
+        Return the Item's price at a point in time.
+
+        Args:
+            when (datetime): The point in time.
+
+        Returns:
+            int | None: The price in cents, or None if the Item had no price
+            yet.
+        """
+        return (
+            self.price_history.filter(effective_at__lte=when)
+            .order_by("-effective_at", "-id")
+            .values_list("price_in_cents", flat=True)
+            .first()
+        )
+
     def format_price(self) -> str:
         """
         Return the formatted price of the Item ($[dollars].[cents]).
@@ -36,7 +437,16 @@ class Item(models.Model):
         Returns:
             str: The formatted price of the Item.
         """
-        return f"${(self.price_in_cents / 100.0):,.2f}"
+        return format_cents(self.price_in_cents)
+
+    def is_deleted(self) -> bool:
+        """
+        Return whether the Item has been deleted.
+
+        Returns:
+            bool: Whether the Item has been deleted.
+        """
+        return self.deleted_at is not None
 
     def is_sold(self) -> bool:
         """
@@ -47,14 +457,265 @@ class Item(models.Model):
         """
         return self.sold_at is not None
 
+    def cover_image(self) -> ItemImage | None:
+        """
+        Return the first image attached to the Item, if any.
+
+        Uses the prefetched images when they are available.
+
+        Returns:
+            ItemImage | None: The Item's first image, or None.
+        """
+        images = list(self.images.all())
+        return images[0] if images else None
+
+
+class MarkdownRule(models.Model):
+    """
+    MarkdownRule model represents an automatic price cut on unsold Items.
+
+    From ``starts_at`` on, every unsold Item that has been listed for at
+    least ``min_listed_for`` is marked down by ``percentage`` once, e.g. 20%
+    off everything unsold after 2pm, or 50% off Items listed over 3 days.
+    ``applied_at`` records when the rule last finished a run, so each run
+    only marks down the Items that became eligible since. ``run_at`` and
+    ``resume_from`` record a run in progress and the first Item ID it
+    hasn't reached yet, so an interrupted run is resumed where it stopped.
+    """
+
+    name = models.CharField(max_length=200)
+    percentage = models.PositiveSmallIntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(99)],
+        help_text="Percentage taken off the price",
+    )
+    starts_at = models.DateTimeField(default=timezone.now)
+    min_listed_for = models.DurationField(
+        default=timedelta,
+        help_text="How long an Item must have been listed, e.g. 3 00:00:00",
+    )
+    active = models.BooleanField(default=True)
+    applied_at = models.DateTimeField(blank=True, null=True)
+    run_at = models.DateTimeField(blank=True, null=True, editable=False)
+    resume_from = models.PositiveBigIntegerField(
+        blank=True, null=True, editable=False
+    )
+
+    class Meta:
+        """Model metadata class."""
+
+        ordering = ["starts_at", "id"]
+
+    def __str__(self) -> str:
+        """
+        Return the MarkdownRule model's string representation.
+
+        Returns:
+            str: String representation of the MarkdownRule model
+        """
+        return self.name.__str__()
+
+
+class PriceChange(models.Model):
+    """
+    PriceChange model records a price an Item was listed at from a time on.
+
+    The price history is append-only: a row is added whenever an Item is
+    created or repriced, and never changed afterwards.
+    """
+
+    item = models.ForeignKey(
+        Item,
+        on_delete=models.CASCADE,
+        related_name="price_history",
+        # covered by the (item, effective_at) index
+        db_index=False,
+    )
+    price_in_cents = models.PositiveIntegerField()
+    effective_at = models.DateTimeField(default=timezone.now)
+    rule = models.ForeignKey(
+        MarkdownRule,
+        on_delete=models.SET_NULL,
+        related_name="price_changes",
+        blank=True,
+        null=True,
+        # rules are rarely deleted, so not worth indexing on every markdown
+        db_index=False,
+    )
+
+    class Meta:
+        """Model metadata class."""
+
+        ordering = ["item", "effective_at", "id"]
+        indexes = [
+            models.Index(
+                fields=["item", "effective_at"],
+                name="shop_pricechange_item_time",
+            )
+        ]
+
+    def __str__(self) -> str:
+        """
+        Return the PriceChange model's string representation.
+
+        Returns:
+            str: String representation of the PriceChange model
+        """
+        return f"{self.item_id} at {format_cents(self.price_in_cents)}"
+
+    @staticmethod
+    def price_as_of(when: datetime, item_ref: str = "pk") -> models.Subquery:
+        """
+        Get an expression for an Item's price at a point in time.
+
+        The expression is a correlated subquery that reads one entry of the
+        ``(item, effective_at)`` index, so it can annotate many Items at once.
+
+        Args:
+            when (datetime): The point in time.
+            item_ref (str): Reference to the Item's ID in the outer query.
+
+        Returns:
+            Subquery: The price in cents, or NULL if the Item had no price.
+        """
+        return models.Subquery(
+            PriceChange.objects.filter(
+                item=models.OuterRef(item_ref), effective_at__lte=when
+            )
+            .order_by("-effective_at", "-id")
+            .values("price_in_cents")[:1]
+        )
+
+    @staticmethod
+    def record(items: models.QuerySet[Item], when: datetime) -> None:
+        """
+        Record the current prices of Items changed with ``QuerySet.update()``.
+
+        Call it in the same transaction as the update.
+
+        Args:
+            items (QuerySet[Item]): The repriced Items.
+            when (datetime): When the new prices took effect.
+        """
+        PriceChange.objects.bulk_create(
+            PriceChange(
+                item_id=item_id, price_in_cents=price, effective_at=when
+            )
+            for item_id, price in items.values_list("id", "price_in_cents")
+        )
+
+    def format_price(self) -> str:
+        """
+        Return the formatted price ($[dollars].[cents]).
+
+        Returns:
+            str: The formatted price.
+        """
+        return format_cents(self.price_in_cents)
+
+
+class ItemImage(models.Model):
+    """
+    ItemImage model represents a photo attached to an Item.
+
+    Image files are content-addressed by their SHA-256 digest, so uploading the
+    same photo twice stores it only once.
+    """
+
+    item = models.ForeignKey(
+        Item, on_delete=models.CASCADE, related_name="images"
+    )
+    digest = models.CharField(max_length=64, db_index=True)
+    extension = models.CharField(max_length=8)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    thumbnails_ready = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        """Model metadata class."""
+
+        ordering = ["id"]
+
+    def __str__(self) -> str:
+        """
+        Return the ItemImage model's string representation.
+
+        Returns:
+            str: String representation of the ItemImage model
+        """
+        return f"Image {self.digest[:12]} of {self.item_id}"
+
+    def url(self, width: int | None = None) -> str:
+        """
+        Return the URL of the original image or one of its thumbnails.
+
+        Args:
+            width (int | None): Thumbnail width, or None for the original.
+
+        Returns:
+            str: URL the image is served from.
+        """
+        return reverse(
+            "item-image",
+            args=(image_filename(self.digest, self.extension, width),),
+        )
+
+    def srcset(self) -> str:
+        """
+        Return a ``srcset`` attribute value listing the image's thumbnails.
+
+        Only the original image is listed until the thumbnails are generated.
+
+        Returns:
+            str: Value for an ``<img>`` tag's ``srcset`` attribute.
+        """
+        sources = []
+        if self.thumbnails_ready:
+            sources = [
+                f"{self.url(width)} {width}w"
+                for width in THUMBNAIL_WIDTHS
+                if width < self.width
+            ]
+        sources.append(f"{self.url()} {self.width}w")
+        return ", ".join(sources)
+
 
 class Cart(models.Model):
-    """Cart model represents a customer's cart."""
+    """
+    Cart model represents a customer's cart.
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    items = models.ManyToManyField(Item)
+    Each user has at most one active Cart, created when it is first needed.
+    Active Carts left untouched for ``CART_EXPIRE_AFTER`` seconds are
+    expired by the background worker.
+    """
+
+    # Carts may live in a shard, away from the users table
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, db_constraint=False
+    )
+    items = models.ManyToManyField(Item, through="CartItem")
+    # sum of the cart's line totals, kept up to date by update_total()
     total_in_cents = models.PositiveIntegerField(default=0)
     active = models.BooleanField(default=True)
+    # when the cart was created or its lines last changed
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        """Model metadata class."""
+
+        indexes = [
+            # the active cart lookup skips every checked out Cart
+            models.Index(
+                fields=["user"],
+                condition=models.Q(active=True),
+                name="shop_cart_active_user",
+            ),
+            models.Index(
+                fields=["updated_at"],
+                condition=models.Q(active=True),
+                name="shop_cart_active_updated",
+            ),
+        ]
 
     def __str__(self) -> str:
         """
@@ -65,37 +726,110 @@ class Cart(models.Model):
         """
         return f"Cart {self.id}"
 
-    def add_item(self, item: Item) -> bool:
+    def add_item(self, item: Item, quantity: int = 1) -> bool:
         """
         Add an item to the cart.
 
+        The item's current price is captured on the cart line, so editing the
+        item later doesn't change the cart's total. Adding a single item that
+        is already in the cart leaves its line alone, so a retried request
+        doesn't add it twice, while adding a lot increases its quantity.
+
         Args:
             item (Item): Item to add to the cart.
+            quantity (int): Number of units to add, for items sold as lots.
 
         Returns:
             bool: Whether the item was able to be added to the cart.
         """
-        if item.is_sold():
+        if item.is_sold() or quantity < 1:
             return False
-        self.total_in_cents += item.price_in_cents
-        self.items.add(item)
-        self.save()
+        # a single item is only ever in the cart once
+        step = 0 if quantity == 1 else quantity
+        # starting with a write makes a busy SQLite database wait for the
+        # write lock instead of failing to upgrade a read
+        with transaction.atomic(using=self._state.db):
+            added = self.lines.filter(item=item).update(
+                quantity=models.F("quantity") + step
+            )
+            if added and not step:
+                return True
+            if not added:
+                self.lines.create(
+                    item=item,
+                    price_in_cents=item.price_in_cents,
+                    quantity=quantity,
+                )
+            self.update_total()
         return True
 
-    def remove_item(self, item: Item) -> None:
+    def remove_item(self, item: Item) -> bool:
         """
         Remove an item from the cart.
 
         Args:
             item (Item): Item to remove from the cart.
+
+        Returns:
+            bool: Whether the item was in the cart.
         """
-        if item not in self.items.all():
-            return False
-        self.total_in_cents -= item.price_in_cents
-        self.items.remove(item)
-        self.save()
+        with transaction.atomic(using=self._state.db):
+            deleted, _ = self.lines.filter(item=item).delete()
+            if not deleted:
+                return False
+            self.update_total()
         return True
 
+    def compute_total(self) -> int:
+        """
+        Compute the cart's total from its lines with one aggregate query.
+
+        Returns:
+            int: The total in cents.
+        """
+        return self.lines.aggregate(
+            total=Coalesce(models.Sum(CartItem.line_total_expression()), 0)
+        )["total"]
+
+    def update_total(self) -> None:
+        """Recompute the cached ``total_in_cents`` and save it."""
+        self.total_in_cents = self.compute_total()
+        self.updated_at = timezone.now()
+        self.save(update_fields=["total_in_cents", "updated_at"])
+
+    @staticmethod
+    def recompute_totals(carts: models.QuerySet[Cart]) -> int:
+        """
+        Recompute the cached totals of many Carts with one ``UPDATE``.
+
+        Used after their lines are changed in bulk, e.g. when Items are
+        deleted.
+
+        Args:
+            carts (QuerySet[Cart]): The Carts to update.
+
+        Returns:
+            int: Number of Carts updated.
+        """
+        totals = (
+            CartItem.objects.filter(cart=models.OuterRef("pk"))
+            .values("cart")
+            .annotate(total=models.Sum(CartItem.line_total_expression()))
+            .values("total")
+        )
+        return carts.update(
+            total_in_cents=Coalesce(models.Subquery(totals), 0)
+        )
+
+    def format_total(self) -> str:
+        """
+        Return the formatted total of the cart.
+
+        Returns:
+            str: The formatted total.
+        """
+        return format_cents(self.total_in_cents)
+
     def checkout(
         self,
         first_name: str | None,
@@ -105,6 +839,13 @@ class Cart(models.Model):
         """
         Checkout the Cart, creating an Order object in the database.
 
+        The Cart and Order may live in a shard while the Items live in the
+        default database, so both are written in nested transactions. The
+        Items are loaded up front and the Order is written first, so each
+        database's transaction starts with a write and waits for the write
+        lock rather than failing to upgrade a read. The shard always commits
+        just before the default database.
+
         Args:
             first_name (str | None): Customer's first name (optional).
             last_name (str | None): Customer's last name (optional).
@@ -112,8 +853,20 @@ class Cart(models.Model):
 
         Returns:
             Order: The Order object created by checking the Cart out.
+
+        Raises:
+            ItemConflictError: If one of the Items was sold to someone else
+                or deleted; nothing is checked out.
         """
-        with transaction.atomic():
+        item_ids = list(self.lines.values_list("item_id", flat=True))
+        items = list(Item.objects.filter(id__in=item_ids))
+        if len(items) < len(item_ids):
+            msg = f"Cart {self.pk} holds deleted Items"
+            raise ItemConflictError(msg)
+        with (
+            transaction.atomic(),
+            transaction.atomic(using=self._state.db),
+        ):
             created_at = timezone.now()
             order = Order(
                 first_name=first_name,
@@ -124,12 +877,17 @@ class Cart(models.Model):
             )
             order.save()
             self.active = False
-            for item in self.items.all():
-                item.sold_at = created_at
-                item.save()
             self.save()
-            new_active_cart = Cart(user=self.user)
-            new_active_cart.save()
+            sold_by = [
+                models.When(item_id=item.id, then=item.seller_id)
+                for item in items
+                if item.seller_id is not None
+            ]
+            if sold_by:
+                self.lines.update(seller_id=models.Case(*sold_by))
+            for item in items:
+                item.mark_sold(created_at)
+            order_checked_out.send(sender=Cart, order=order)
             return order
 
     @staticmethod
@@ -137,8 +895,8 @@ class Cart(models.Model):
         """
         Get the active cart for the current User.
 
-        If there is no active cart for the current User, create an active cart
-        and return it.
+        If there is no active cart for the current User, e.g. after a checkout
+        or once their cart expired, create an active cart and return it.
 
         Args:
             user (User): The current User.
@@ -146,12 +904,116 @@ class Cart(models.Model):
         Returns:
             Cart: The active cart for the current user.
         """
-        cart = Cart.objects.filter(user=user, active=True).first()
+        carts = Cart.objects.using(shard_for_user(user.pk))
+        cart = carts.filter(user=user, active=True).first()
         if cart is None:
-            cart = Cart.objects.create(user=user)
+            cart = carts.create(user=user)
         return cart
 
 
+class CartItem(models.Model):
+    """
+    CartItem model represents a line of a Cart.
+
+    The line captures the Item's price when it was added to the Cart, and a
+    quantity for Items sold as lots. Checking out records the Item's Seller
+    on the line, so payouts are summed without reading the Items, which may
+    live in another database.
+    """
+
+    cart = models.ForeignKey(
+        Cart, on_delete=models.CASCADE, related_name="lines"
+    )
+    # cart lines may live in a shard, away from the Items table
+    item = models.ForeignKey(
+        Item,
+        on_delete=models.CASCADE,
+        related_name="cart_lines",
+        db_constraint=False,
+    )
+    price_in_cents = models.PositiveIntegerField()
+    quantity = models.PositiveIntegerField(default=1)
+    added_at = models.DateTimeField(default=timezone.now)
+    # the Item's Seller when it was sold, empty until the Cart is checked out
+    seller = models.ForeignKey(
+        Seller,
+        on_delete=models.DO_NOTHING,
+        related_name="+",
+        blank=True,
+        null=True,
+        db_constraint=False,
+    )
+
+    class Meta:
+        """Model metadata class."""
+
+        ordering = ["id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cart", "item"], name="shop_cartitem_unique_item"
+            ),
+        ]
+        indexes = [
+            # covers the per-Seller payout aggregation without reading rows
+            models.Index(
+                fields=["seller", "price_in_cents", "quantity"],
+                condition=models.Q(seller__isnull=False),
+                name="shop_cartitem_seller_sales",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        """
+        Return the CartItem model's string representation.
+
+        Returns:
+            str: String representation of the CartItem model
+        """
+        return f"{self.quantity} x {self.item_id} in {self.cart_id}"
+
+    @staticmethod
+    def line_total_expression(prefix: str = "") -> models.Expression:
+        """
+        Return an expression computing line totals in the database.
+
+        Args:
+            prefix (str): Lookup path from the queried model to the CartItem.
+
+        Returns:
+            Expression: The line's price multiplied by its quantity.
+        """
+        return models.F(f"{prefix}price_in_cents") * models.F(
+            f"{prefix}quantity"
+        )
+
+    def line_total_in_cents(self) -> int:
+        """
+        Return the line's price multiplied by its quantity.
+
+        Returns:
+            int: The line total in cents.
+        """
+        return self.price_in_cents * self.quantity
+
+    def format_price(self) -> str:
+        """
+        Return the formatted captured unit price of the line.
+
+        Returns:
+            str: The formatted price.
+        """
+        return format_cents(self.price_in_cents)
+
+    def format_total(self) -> str:
+        """
+        Return the formatted total of the line.
+
+        Returns:
+            str: The formatted line total.
+        """
+        return format_cents(self.line_total_in_cents())
+
+
 class Order(models.Model):
     """Order model represents a Customer's order in the database."""
 
@@ -160,11 +1022,27 @@ class Order(models.Model):
     email = models.EmailField(default="")
     cart = models.OneToOneField(Cart, on_delete=models.PROTECT)
     created_at = models.DateTimeField(default=timezone.now)
+    receipt_sent_at = models.DateTimeField(blank=True, null=True)
+    # when a receipt sender claimed the Order, cleared once it is done
+    receipt_claimed_at = models.DateTimeField(blank=True, null=True)
+    receipt_attempts = models.PositiveSmallIntegerField(default=0)
+    receipt_error = models.TextField(blank=True, default="")
 
     class Meta:
         """Model metadata class."""
 
         ordering = ["id"]
+        indexes = [
+            # only orders still waiting for a receipt are indexed
+            models.Index(
+                fields=["id"],
+                condition=models.Q(receipt_sent_at__isnull=True)
+                & ~models.Q(email=""),
+                name="shop_order_receipt_pending",
+            ),
+            # used by the admin's date filter
+            models.Index(fields=["created_at"], name="shop_order_created_at"),
+        ]
 
     def __str__(self) -> str:
         """
@@ -174,3 +1052,187 @@ class Order(models.Model):
             str: String representation of the Item model
         """
         return f"Order {self.id}"
+
+
+class TillSale(models.Model):
+    """
+    TillSale model records a sale synced from an offline till.
+
+    Each sale is identified by the till that recorded it and an ID the till
+    generated, so syncing the same sale again never creates a second Order.
+    """
+
+    class Status(models.TextChoices):
+        """Outcome of syncing a sale."""
+
+        OK = "ok"
+        CONFLICT = "conflict"
+
+    till = models.CharField(max_length=64)
+    sale_id = models.CharField(max_length=64)
+    status = models.CharField(max_length=16, choices=Status.choices)
+    order = models.OneToOneField(
+        Order, on_delete=models.CASCADE, blank=True, null=True
+    )
+    # IDs of the Items that were already sold when a conflicting sale synced
+    conflicts = models.JSONField(default=list, blank=True)
+    synced_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        """Model metadata class."""
+
+        ordering = ["id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["till", "sale_id"], name="shop_tillsale_unique_sale"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        """
+        Return the TillSale model's string representation.
+
+        Returns:
+            str: String representation of the TillSale model
+        """
+        return f"Sale {self.sale_id} from {self.till}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    IdempotencyKey model records a POST request's idempotency key.
+
+    The row is inserted when the first request with a key starts, and holds
+    its response once it has finished, so a replay reaching any worker process
+    gets the stored response instead of running the view again. Keys live in
+    their user's shard and are purged by the background worker once expired.
+    """
+
+    # keys may live in a shard, away from the users table
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, db_constraint=False, related_name="+"
+    )
+    path = models.CharField(max_length=200)
+    key = models.CharField(max_length=100)
+    # the stored response, with no status while the first request is running
+    status = models.PositiveSmallIntegerField(blank=True, null=True)
+    headers = models.JSONField(default=dict, blank=True)
+    content = models.BinaryField(default=b"", blank=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        """Model metadata class."""
+
+        ordering = ["id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "path", "key"],
+                name="shop_idempotencykey_unique_key",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["expires_at"], name="shop_idempotencykey_expires"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        """
+        Return the IdempotencyKey model's string representation.
+
+        Returns:
+            str: String representation of the IdempotencyKey model
+        """
+        return f"Idempotency key {self.key} for {self.path}"
+
+
+class Job(models.Model):
+    """
+    Job model represents a task queued to run in a background worker.
+
+    Jobs are claimed by workers with a conditional ``UPDATE`` rather than row
+    locks, so the queue works on every database backend.
+    """
+
+    class Status(models.TextChoices):
+        """Lifecycle states of a Job."""
+
+        QUEUED = "queued"
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+
+    name = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.QUEUED
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True, default="")
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        """Model metadata class."""
+
+        ordering = ["id"]
+        indexes = [models.Index(fields=["status", "run_at"])]
+
+    def __str__(self) -> str:
+        """
+        Return the Job model's string representation.
+
+        Returns:
+            str: String representation of the Job model
+        """
+        return f"Job {self.id} ({self.name})"
+
+
+class CatalogueVersion(models.Model):
+    """
+    CatalogueVersion model holds the version catalogue pages are validated by.
+
+    There is only ever one row, whose token is replaced by every change to
+    the catalogue, in the changing transaction. Keeping it in the database
+    rather than in the cache lets every worker process see every change.
+    """
+
+    token = models.CharField(max_length=32)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self) -> str:
+        """
+        Return the CatalogueVersion model's string representation.
+
+        Returns:
+            str: String representation of the CatalogueVersion model
+        """
+        return f"Catalogue version {self.token}"
+
+
+class PriceFacetCount(models.Model):
+    """
+    PriceFacetCount model holds the number of Items in one price bucket.
+
+    Saving or deleting an Item moves it between the rows in the changing
+    transaction, so every worker process reads the same counts and a rolled
+    back change is never counted. The rows are deleted when Items are
+    changed in bulk and counted again on the next read.
+    """
+
+    bucket = models.PositiveSmallIntegerField(primary_key=True)
+    all_count = models.IntegerField()
+    unsold_count = models.IntegerField()
+
+    def __str__(self) -> str:
+        """
+        Return the PriceFacetCount model's string representation.
+
+        Returns:
+            str: String representation of the PriceFacetCount model
+        """
+        return f"Price bucket {self.bucket}"
@@ -0,0 +1,319 @@
+"""
+Analysis of the Items' price history.
+
+Every price an Item was listed at is recorded as a PriceChange. A markdown is
+a PriceChange that lowered the Item's price, and it is credited with the sale
+if the Item sold before its price changed again. The markdown report groups
+markdowns by how deep the cut was, and is computed by the database in one
+query over the history, with window functions, joined with the Items'
+``sold_at``.
+
+Markdown rules cut the prices of unsold Items automatically. Each rule is
+applied with set-based ``UPDATE`` statements over ranges of Item IDs, so the
+write lock is only held briefly however large the catalogue is, and the new
+prices are copied to the history with ``INSERT ... SELECT`` in the same
+transaction.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.db.models.functions import Cast, Greatest, Lag, Lead, Round
+from django.utils import timezone
+
+from .conditional import bump_catalogue_version
+from .db import large_cache
+from .facets import invalidate_price_facets
+from .models import Item, MarkdownRule, PriceChange
+
+if TYPE_CHECKING:
+    from datetime import datetime
+
+# lower bounds, in percent of the previous price, of each markdown band; the
+# last band is open-ended
+MARKDOWN_BANDS = (0, 10, 25, 50)
+# number of Item IDs covered by each UPDATE of a markdown rule
+MARKDOWN_BATCH = 50_000
+
+
+@dataclass(frozen=True)
+class MarkdownBand:
+    """How well markdowns of a given depth sold their Items."""
+
+    min_percent: int
+    max_percent: int | None
+    markdowns: int
+    sold: int
+    time_to_sell: timedelta | None
+
+    @property
+    def label(self) -> str:
+        """
+        Return a human readable label for the band.
+
+        Returns:
+            str: The band's label.
+        """
+        if self.max_percent is None:
+            return f"{self.min_percent}%+"
+        return f"{self.min_percent}-{self.max_percent}%"
+
+    @property
+    def sell_through(self) -> float:
+        """
+        Return the share of markdowns that were followed by a sale.
+
+        Returns:
+            float: The sell-through rate, between 0 and 1.
+        """
+        return self.sold / self.markdowns if self.markdowns else 0.0
+
+
+def scaled_price(percentage: int) -> models.Func:
+    """
+    Get an expression for an Item's price changed by a percentage.
+
+    Args:
+        percentage (int): Percentage to change the price by, e.g. -25.
+
+    Returns:
+        Func: The new price, rounded to the nearest cent and at least 0.
+    """
+    return Cast(
+        Greatest(
+            Round(models.F("price_in_cents") * (100 + percentage) / 100.0),
+            0,
+        ),
+        models.PositiveIntegerField(),
+    )
+
+
+def _record_markdowns(
+    items: models.QuerySet[Item], rule: MarkdownRule, when: datetime
+) -> None:
+    """
+    Copy the new prices of marked down Items to the price history.
+
+    Args:
+        items (QuerySet[Item]): The marked down Items.
+        rule (MarkdownRule): The rule that marked them down.
+        when (datetime): When the new prices took effect.
+    """
+    select, params = (
+        items.order_by()
+        .annotate(
+            when=models.Value(when, models.DateTimeField()),
+            rule_id=models.Value(rule.id, models.BigIntegerField()),
+        )
+        .values_list("id", "price_in_cents", "when", "rule_id")
+        .query.sql_with_params()
+    )
+    connection = connections[items.db]
+    quote = connection.ops.quote_name
+    columns = ", ".join(
+        quote(PriceChange._meta.get_field(name).column)  # noqa: SLF001
+        for name in ("item", "price_in_cents", "effective_at", "rule")
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(PriceChange._meta.db_table)} "  # noqa: SLF001
+            f"({columns}) {select}",
+            params,
+        )
+
+
+def apply_markdown_rule(
+    rule: MarkdownRule,
+    now: datetime | None = None,
+    batch_size: int = MARKDOWN_BATCH,
+) -> int:
+    """
+    Mark down the unsold Items that became eligible for a rule.
+
+    A run is claimed by setting the rule's ``run_at`` with a conditional
+    ``UPDATE``, so concurrent workers never start the same run twice. Each
+    batch of Items is marked down and recorded in the price history in its
+    own transaction, which also moves the rule's ``resume_from`` past the
+    batch if nobody else moved it first. A run that was interrupted is
+    resumed from there by the next call, at its original time, and
+    ``applied_at`` only moves forward once the last batch committed.
+
+    Args:
+        rule (MarkdownRule): The rule to apply.
+        now (datetime | None): Time of the run, defaults to the current time.
+            Ignored when resuming an interrupted run.
+        batch_size (int): Number of Item IDs covered by each ``UPDATE``.
+
+    Returns:
+        int: Number of Items marked down.
+    """
+    now = now or timezone.now()
+    if not rule.active or rule.starts_at > now:
+        return 0
+    rules = MarkdownRule.objects.filter(id=rule.id)
+    if rule.run_at is None:
+        claimed = rules.filter(
+            run_at__isnull=True,
+            **(
+                {"applied_at__isnull": True}
+                if rule.applied_at is None
+                else {"applied_at": rule.applied_at}
+            ),
+        ).update(run_at=now, resume_from=0)
+        if not claimed:
+            return 0
+        rule.run_at, rule.resume_from = now, 0
+    run_at = rule.run_at
+
+    eligible = Item.objects.filter(
+        sold_at__isnull=True, listed_at__lte=run_at - rule.min_listed_for
+    )
+    if rule.applied_at is not None:
+        # Items that were eligible on the previous run were marked down then
+        eligible = eligible.filter(
+            listed_at__gt=rule.applied_at - rule.min_listed_for
+        )
+    bounds = Item.objects.aggregate(
+        low=models.Min("id"), high=models.Max("id")
+    )
+    updated = 0
+    if bounds["low"] is not None:
+        start = max(rule.resume_from, bounds["low"])
+        with large_cache(connections[eligible.db]):
+            while start <= bounds["high"]:
+                end = start + batch_size
+                with transaction.atomic():
+                    if not rules.filter(
+                        run_at=run_at, resume_from=rule.resume_from
+                    ).update(resume_from=end):
+                        # another worker took the run over
+                        return updated
+                    batch = eligible.filter(id__gte=start, id__lt=end)
+                    count = batch.update(
+                        price_in_cents=scaled_price(-rule.percentage),
+                        version=models.F("version") + 1,
+                    )
+                    if count:
+                        _record_markdowns(batch, rule, run_at)
+                        bump_catalogue_version()
+                        invalidate_price_facets()
+                rule.resume_from = end
+                updated += count
+                start = end
+    if rules.filter(run_at=run_at, resume_from=rule.resume_from).update(
+        applied_at=run_at, run_at=None, resume_from=None
+    ):
+        rule.applied_at, rule.run_at, rule.resume_from = run_at, None, None
+    return updated
+
+
+def apply_markdowns(now: datetime | None = None) -> dict[MarkdownRule, int]:
+    """
+    Apply every active markdown rule that has started.
+
+    Args:
+        now (datetime | None): Time of the run, defaults to the current time.
+
+    Returns:
+        dict[MarkdownRule, int]: Number of Items each rule marked down.
+    """
+    now = now or timezone.now()
+    return {
+        rule: apply_markdown_rule(rule, now)
+        for rule in MarkdownRule.objects.filter(
+            active=True, starts_at__lte=now
+        )
+    }
+
+
+def markdowns() -> models.QuerySet[PriceChange]:
+    """
+    Get the PriceChanges annotated with the neighbouring changes.
+
+    The previous price and the time of the next change come from window
+    functions over each Item's history, so the history is read once in
+    ``(item, effective_at)`` order.
+
+    Returns:
+        QuerySet[PriceChange]: PriceChanges annotated with
+        ``previous_price``, ``next_change_at``, the Item's ``sold_at`` and
+        the ``time_to_sell`` after the change.
+    """
+    window = {
+        "partition_by": [models.F("item")],
+        "order_by": [models.F("effective_at").asc(), models.F("id").asc()],
+    }
+    return PriceChange.objects.annotate(
+        previous_price=models.Window(Lag("price_in_cents"), **window),
+        next_change_at=models.Window(Lead("effective_at"), **window),
+        sold_at=models.F("item__sold_at"),
+        time_to_sell=models.ExpressionWrapper(
+            models.F("item__sold_at") - models.F("effective_at"),
+            output_field=models.DurationField(),
+        ),
+    ).order_by()
+
+
+def markdown_report(using: str = DEFAULT_DB_ALIAS) -> list[MarkdownBand]:
+    """
+    Report how often markdowns of each depth were followed by a sale.
+
+    Markdowns are grouped into bands by the database, in one query over the
+    annotated history.
+
+    Args:
+        using (str): Alias of the database to report on.
+
+    Returns:
+        list[MarkdownBand]: One entry per markdown band, shallowest first.
+    """
+    history, params = markdowns().using(using).query.sql_with_params()
+    # bands compare the cut against multiples of the previous price, so no
+    # division is needed
+    band = " ".join(
+        f"WHEN (m.previous_price - m.price_in_cents) * 100 "
+        f">= m.previous_price * {percent} THEN {index}"
+        for index, percent in reversed(list(enumerate(MARKDOWN_BANDS)))
+    )
+    credited = (
+        "m.sold_at >= m.effective_at AND "
+        "(m.next_change_at IS NULL OR m.sold_at < m.next_change_at)"
+    )
+    sql = (
+        f"SELECT CASE {band} END AS band, COUNT(*), "  # noqa: S608
+        f"SUM(CASE WHEN {credited} THEN 1 ELSE 0 END), "
+        f"AVG(CASE WHEN {credited} THEN m.time_to_sell END) "
+        f"FROM ({history}) m "
+        "WHERE m.previous_price > m.price_in_cents "
+        "GROUP BY band"
+    )
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = {band: rest for band, *rest in cursor.fetchall()}
+    report = []
+    for index, percent in enumerate(MARKDOWN_BANDS):
+        count, sold, time_to_sell = rows.get(index, (0, 0, None))
+        if time_to_sell is not None and not isinstance(
+            time_to_sell, timedelta
+        ):
+            # backends without an interval type store durations as
+            # microseconds
+            time_to_sell = timedelta(microseconds=time_to_sell)
+        report.append(
+            MarkdownBand(
+                min_percent=percent,
+                max_percent=(
+                    MARKDOWN_BANDS[index + 1]
+                    if index + 1 < len(MARKDOWN_BANDS)
+                    else None
+                ),
+                markdowns=count,
+                sold=sold or 0,
+                time_to_sell=time_to_sell,
+            )
+        )
+    return report
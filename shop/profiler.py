@@ -0,0 +1,294 @@
+"""
+Sampling profiler for live web workers.
+
+With ``PROFILER`` switched on, ``ProfilerMiddleware`` notes which view each
+thread is serving, and a profile can be taken of a running worker for a few
+seconds, either by a staff user from the ``shop-profile`` endpoint, which
+profiles the worker serving the request, or with ``manage.py profile_worker``
+and the worker's process ID. While profiling, a thread wakes up every
+``SAMPLE_INTERVAL`` seconds and records the stack of every thread serving a
+request, under the name of its view. Nothing is sampled between profiles, and
+with ``PROFILER`` switched off the middleware isn't loaded at all.
+
+Profiles are returned as collapsed stacks, one ``view;frame;frame count`` line
+per distinct stack, which ``flamegraph.pl`` and speedscope read directly.
+"""
+
+from __future__ import annotations
+
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from types import FrameType
+
+    from django.http import HttpRequest, HttpResponse
+
+# seconds between samples
+SAMPLE_INTERVAL = 0.005
+# longest profile that can be taken; the endpoint must answer before
+# gunicorn's default 30 second worker timeout
+MAX_SECONDS = 25.0
+# asks a worker to take a profile; ignored by default, so signalling a worker
+# with the profiler switched off does no harm
+PROFILE_SIGNAL = signal.SIGURG
+
+# the view each thread is serving, by thread ID
+current_views: dict[int, str] = {}
+# only one profile is taken at a time
+_profiling = threading.Lock()
+
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when a profile is requested while another is being taken."""
+
+
+def view_name(view: Callable) -> str:
+    """
+    Return the name a view's samples are grouped under.
+
+    Args:
+        view (Callable): The view function, possibly made by ``as_view()``.
+
+    Returns:
+        str: The view's module and name, e.g. ``shop.views.ItemListView``.
+    """
+    view = getattr(view, "view_class", view)
+    return f"{view.__module__}.{view.__qualname__}"
+
+
+class ProfilerMiddleware:
+    """Middleware that notes which view each thread is serving."""
+
+    def __init__(self, get_response: Callable) -> None:
+        """
+        Wrap the rest of the middleware chain.
+
+        Args:
+            get_response (Callable): The next middleware or the view.
+
+        Raises:
+            MiddlewareNotUsed: If ``PROFILER`` is switched off.
+        """
+        if not settings.PROFILER:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        """
+        Handle a request, forgetting its view once it has been served.
+
+        Args:
+            request (HttpRequest): The request.
+
+        Returns:
+            HttpResponse: The response.
+        """
+        try:
+            return self.get_response(request)
+        finally:
+            current_views.pop(threading.get_ident(), None)
+
+    def process_view(
+        self,
+        request: HttpRequest,  # noqa: ARG002
+        view_func: Callable,
+        view_args: list,  # noqa: ARG002
+        view_kwargs: dict,  # noqa: ARG002
+    ) -> None:
+        """
+        Note the view the current thread is about to run.
+
+        Args:
+            request (HttpRequest): The request.
+            view_func (Callable): The view.
+            view_args (list): The view's positional arguments.
+            view_kwargs (dict): The view's keyword arguments.
+        """
+        current_views[threading.get_ident()] = view_name(view_func)
+
+
+def collapse(frame: FrameType) -> str:
+    """
+    Return a stack as ``;``-separated frames, outermost first.
+
+    Args:
+        frame (FrameType): The innermost frame of the stack.
+
+    Returns:
+        str: The collapsed stack.
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        module = frame.f_globals.get("__name__", code.co_filename)
+        # co_qualname is new in Python 3.11
+        name = getattr(code, "co_qualname", code.co_name)
+        names.append(f"{module}:{name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def profile(seconds: float, interval: float = SAMPLE_INTERVAL) -> Counter:
+    """
+    Sample the stacks of the threads serving requests for a while.
+
+    The calling thread does the sampling and is never sampled itself.
+
+    Args:
+        seconds (float): How long to profile for.
+        interval (float): Seconds between samples.
+
+    Returns:
+        Counter: The number of samples of each collapsed stack, prefixed with
+        its view.
+
+    Raises:
+        ProfilerBusyError: If another profile is being taken.
+    """
+    if not _profiling.acquire(blocking=False):
+        msg = "A profile is already being taken"
+        raise ProfilerBusyError(msg)
+    stacks = Counter()
+    own = threading.get_ident()
+    try:
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            time.sleep(interval)
+            frames = sys._current_frames()  # noqa: SLF001
+            for thread_id, frame in frames.items():
+                view = current_views.get(thread_id)
+                if thread_id != own and view is not None:
+                    stacks[f"{view};{collapse(frame)}"] += 1
+            # don't keep the other threads' frames alive between samples
+            del frames
+    finally:
+        _profiling.release()
+    return stacks
+
+
+def format_stacks(stacks: Counter) -> str:
+    """
+    Format sampled stacks as collapsed stack lines.
+
+    Args:
+        stacks (Counter): The number of samples of each stack.
+
+    Returns:
+        str: One ``stack count`` line per stack, most sampled first.
+    """
+    return "".join(
+        f"{stack} {count}\n" for stack, count in stacks.most_common()
+    )
+
+
+def _paths(pid: int) -> tuple[Path, Path]:
+    """
+    Return where a worker's profile is requested and written.
+
+    Args:
+        pid (int): The worker's process ID.
+
+    Returns:
+        tuple[Path, Path]: The request file, holding the seconds to profile
+        for, and the profile.
+    """
+    directory = Path(settings.PROFILE_DIR)
+    return directory / f"{pid}.request", directory / f"{pid}.folded"
+
+
+def _write_profile(seconds: float) -> None:
+    """
+    Profile this process and write the result for ``request_profile``.
+
+    Args:
+        seconds (float): How long to profile for.
+    """
+    _, output = _paths(os.getpid())
+    try:
+        text = format_stacks(profile(seconds))
+    except ProfilerBusyError:
+        return
+    partial = output.with_suffix(".partial")
+    partial.write_text(text)
+    partial.replace(output)
+
+
+def _on_signal(signum: int, frame: FrameType | None) -> None:  # noqa: ARG001
+    """
+    Start profiling in the background when asked to by ``request_profile``.
+
+    Args:
+        signum (int): The signal received.
+        frame (FrameType | None): The interrupted frame.
+    """
+    request, _ = _paths(os.getpid())
+    try:
+        seconds = min(float(request.read_text()), MAX_SECONDS)
+        request.unlink()
+    except (OSError, ValueError):
+        return
+    threading.Thread(
+        target=_write_profile, args=(seconds,), daemon=True
+    ).start()
+
+
+def install_signal_handler() -> None:
+    """
+    Let ``request_profile`` profile this process, if ``PROFILER`` is on.
+
+    Must be called from the main thread, e.g. once a gunicorn worker has
+    started.
+    """
+    if settings.PROFILER:
+        signal.signal(PROFILE_SIGNAL, _on_signal)
+
+
+def request_profile(pid: int, seconds: float, timeout: float = 5.0) -> str:
+    """
+    Profile another process on this machine and return its stacks.
+
+    Args:
+        pid (int): The process ID of a worker with the profiler switched on.
+        seconds (float): How long to profile for.
+        timeout (float): Seconds to wait for the profile beyond ``seconds``.
+
+    Returns:
+        str: The collapsed stacks.
+
+    Raises:
+        OSError: If the process can't be signalled.
+        TimeoutError: If the process didn't write a profile in time.
+    """
+    request, output = _paths(pid)
+    request.parent.mkdir(parents=True, exist_ok=True)
+    output.unlink(missing_ok=True)
+    request.write_text(str(seconds))
+    try:
+        os.kill(pid, PROFILE_SIGNAL)
+    except OSError:
+        request.unlink(missing_ok=True)
+        raise
+    deadline = time.monotonic() + seconds + timeout
+    while time.monotonic() < deadline:
+        if output.exists():
+            text = output.read_text()
+            output.unlink()
+            return text
+        time.sleep(0.1)
+    request.unlink(missing_ok=True)
+    msg = (
+        f"Process {pid} wrote no profile; is it a worker with PROFILER "
+        "switched on?"
+    )
+    raise TimeoutError(msg)
@@ -0,0 +1,132 @@
+"""
+Background purge of soft-deleted Items.
+
+Deleting an Item only hides it, so the request never has to cascade through
+the carts holding it. Items deleted more than ``ITEM_PURGE_AFTER`` seconds
+ago that were never sold are physically deleted later by the background
+worker, in small batches that each hold the write lock only briefly. Sold
+Items, and Items that are in an Order, are kept for the order history, and
+so are photo files other Items still use.
+"""
+
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from .conditional import bump_catalogue_version
+from .images import discard_unreferenced
+from .models import Cart, CartItem, Item, ItemImage, PriceChange
+from .sharding import shards
+from .typeahead import live_index
+
+# number of Items deleted per transaction
+PURGE_BATCH = 500
+
+
+def _drop_cart_lines(item_ids: list[int], using: str) -> set[int]:
+    """
+    Take Items out of the active Carts in one database.
+
+    Args:
+        item_ids (list[int]): IDs of the Items.
+        using (str): Alias of the database holding the Carts.
+
+    Returns:
+        set[int]: IDs of the Items that are in checked out Carts there.
+    """
+    lines = CartItem.objects.using(using).filter(item_id__in=item_ids)
+    ordered = set(
+        lines.filter(cart__active=False).values_list("item_id", flat=True)
+    )
+    active = lines.filter(cart__active=True)
+    cart_ids = list(active.values_list("cart_id", flat=True).distinct())
+    if cart_ids:
+        with transaction.atomic(using=using):
+            active.delete()
+            Cart.recompute_totals(
+                Cart.objects.using(using).filter(id__in=cart_ids)
+            )
+    return ordered
+
+
+def _purge_batch(item_ids: list[int]) -> int:
+    """
+    Physically delete a batch of soft-deleted Items.
+
+    The Items are taken out of active Carts first, one database at a time,
+    so deleting them doesn't cascade row by row through the cart lines. The
+    Items, their photos and their price history are then deleted with one
+    raw ``DELETE`` per table, without loading them or sending a signal per
+    row, and the catalogue version and the typeahead index are updated once
+    for the batch. Photo files no other Item uses are deleted once the
+    transaction commits.
+
+    Args:
+        item_ids (list[int]): IDs of the Items.
+
+    Returns:
+        int: Number of Items deleted.
+    """
+    ordered = set()
+    for using in dict.fromkeys([DEFAULT_DB_ALIAS, *shards()]):
+        ordered |= _drop_cart_lines(item_ids, using)
+    items = Item.all_objects.filter(
+        id__in=[item_id for item_id in item_ids if item_id not in ordered],
+        deleted_at__isnull=False,
+        sold_at__isnull=True,
+    )
+    with transaction.atomic():
+        # writing first takes SQLite's write lock before anything is read
+        bump_catalogue_version()
+        purge = list(items.values_list("id", flat=True))
+        if not purge:
+            return 0
+        images = ItemImage.objects.filter(item_id__in=purge)
+        files = set(images.values_list("digest", "extension"))
+        for dependents in (
+            images,
+            PriceChange.objects.filter(item_id__in=purge),
+        ):
+            dependents._raw_delete(dependents.db)  # noqa: SLF001
+        deleted = items.filter(id__in=purge)._raw_delete(items.db)  # noqa: SLF001
+        transaction.on_commit(lambda: live_index.update(dict.fromkeys(purge)))
+        transaction.on_commit(lambda: discard_unreferenced(files))
+    return deleted
+
+
+def purge_deleted_items(
+    older_than: timedelta | None = None, batch_size: int = PURGE_BATCH
+) -> int:
+    """
+    Physically delete the Items soft-deleted a while ago and never sold.
+
+    Args:
+        older_than (timedelta | None): How long ago the Items must have been
+            deleted, ``ITEM_PURGE_AFTER`` by default.
+        batch_size (int): Number of Items deleted per transaction.
+
+    Returns:
+        int: Number of Items deleted.
+    """
+    if older_than is None:
+        older_than = timedelta(seconds=settings.ITEM_PURGE_AFTER)
+    candidates = Item.all_objects.filter(
+        deleted_at__lt=timezone.now() - older_than, sold_at__isnull=True
+    ).order_by("id")
+    purged = last_id = 0
+    while True:
+        item_ids = list(
+            candidates.filter(id__gt=last_id).values_list("id", flat=True)[
+                :batch_size
+            ]
+        )
+        if item_ids:
+            purged += _purge_batch(item_ids)
+            last_id = item_ids[-1]
+        # a short batch was the last one
+        if len(item_ids) < batch_size:
+            return purged
@@ -0,0 +1,270 @@
+"""
+Emailed receipts for checked out Orders.
+
+Receipts are never sent inside the checkout request. Checking out an Order
+with an email address queues a background job, which sends every pending
+receipt in batches over a single reused mail server connection. When carts and
+orders are sharded, the job works through each shard in turn. Each Order
+records its attempts and last error, so a receipt that keeps failing is given
+up on without holding up the others, and receipts claimed by a worker that
+died are sent by the job's next run.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import F, Q
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Order
+from .sharding import shards
+from .signals import order_checked_out
+from .tasks import STALE_AFTER, enqueue, task
+
+if TYPE_CHECKING:
+    from django.core.mail.backends.base import BaseEmailBackend
+
+logger = logging.getLogger(__name__)
+
+# number of receipts rendered and sent together
+RECEIPT_BATCH_SIZE = 100
+# number of runs a receipt is tried in before it is given up on
+RECEIPT_MAX_ATTEMPTS = 5
+# failures in a row after which a run stops, as the mail server seems down
+RECEIPT_FAILURE_STREAK = 3
+# seconds after which a claim is assumed to be left by a sender that died;
+# shorter than STALE_AFTER, so the requeued job finds its own claims stale
+RECEIPT_CLAIM_TIMEOUT = STALE_AFTER / 2
+
+
+class ReceiptError(Exception):
+    """Raised when some receipts failed to send."""
+
+
+@dataclass(frozen=True)
+class ReceiptStats:
+    """Statistics about a run of ``send_pending_receipts``."""
+
+    sent: int
+    batches: int
+    seconds: float
+
+    @property
+    def per_second(self) -> float:
+        """
+        Return the number of receipts sent per second.
+
+        Returns:
+            float: Receipts sent per second.
+        """
+        return self.sent / self.seconds if self.seconds > 0 else 0.0
+
+
+def render_receipt(order: Order) -> EmailMultiAlternatives:
+    """
+    Render the receipt email for an Order.
+
+    Lines are listed at the prices captured when they were added to the cart.
+
+    Args:
+        order (Order): The Order, ideally with its cart's lines prefetched.
+
+    Returns:
+        EmailMultiAlternatives: The receipt email, with an HTML alternative.
+    """
+    context = {
+        "order": order,
+        "lines": list(order.cart.lines.all()),
+        "total": order.cart.format_total(),
+    }
+    message = EmailMultiAlternatives(
+        subject=f"Your garage sale receipt (order {order.id})",
+        body=render_to_string("shop/email/receipt.txt", context),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[order.email],
+    )
+    message.attach_alternative(
+        render_to_string("shop/email/receipt.html", context), "text/html"
+    )
+    return message
+
+
+def _claim_batch(size: int, using: str, skip: list[int]) -> list[Order]:
+    """
+    Claim a batch of Orders whose receipts haven't been sent.
+
+    Orders are claimed by setting ``receipt_claimed_at`` with a conditional
+    ``UPDATE``, so concurrent senders never send the same receipt twice, and
+    each claim counts as an attempt. Claims older than
+    ``RECEIPT_CLAIM_TIMEOUT`` were left by a sender that died, and are
+    claimed again.
+
+    Args:
+        size (int): Maximum number of Orders to claim.
+        using (str): Alias of the database holding the Orders.
+        skip (list[int]): IDs of Orders not to claim.
+
+    Returns:
+        list[Order]: The claimed Orders, with their cart lines prefetched.
+    """
+    orders = Order.objects.using(using)
+    stale = timezone.now() - timedelta(seconds=RECEIPT_CLAIM_TIMEOUT)
+    pending = orders.filter(
+        Q(receipt_claimed_at__isnull=True) | Q(receipt_claimed_at__lt=stale),
+        receipt_sent_at__isnull=True,
+        receipt_attempts__lt=RECEIPT_MAX_ATTEMPTS,
+    ).exclude(email="")
+    ids = list(
+        pending.exclude(id__in=skip)
+        .order_by("id")
+        .values_list("id", flat=True)[:size]
+    )
+    if not ids:
+        return []
+    claimed_at = timezone.now()
+    pending.filter(id__in=ids).update(
+        receipt_claimed_at=claimed_at,
+        receipt_attempts=F("receipt_attempts") + 1,
+    )
+    return list(
+        orders.filter(id__in=ids, receipt_claimed_at=claimed_at)
+        .select_related("cart")
+        .prefetch_related("cart__lines__item")
+    )
+
+
+def _send_receipt(connection: BaseEmailBackend, order: Order) -> bool:
+    """
+    Send a claimed Order's receipt and record the outcome on the Order.
+
+    Args:
+        connection (BaseEmailBackend): The open mail server connection.
+        order (Order): The claimed Order.
+
+    Returns:
+        bool: Whether the receipt was sent.
+    """
+    using = order._state.db  # noqa: SLF001
+    claimed = Order.objects.using(using).filter(id=order.id)
+    try:
+        connection.send_messages([render_receipt(order)])
+    except Exception as error:
+        if order.receipt_attempts >= RECEIPT_MAX_ATTEMPTS:
+            logger.exception(
+                "Giving up on the receipt of order %d after %d attempts",
+                order.id,
+                order.receipt_attempts,
+            )
+        else:
+            logger.warning(
+                "Failed to send the receipt of order %d",
+                order.id,
+                exc_info=True,
+            )
+        claimed.update(
+            receipt_claimed_at=None,
+            receipt_error=f"{type(error).__name__}: {error}",
+        )
+        return False
+    claimed.update(
+        receipt_sent_at=timezone.now(),
+        receipt_claimed_at=None,
+        receipt_error="",
+    )
+    return True
+
+
+def _release(orders: list[Order]) -> None:
+    """
+    Put claimed Orders back in the queue without counting the attempt.
+
+    Args:
+        orders (list[Order]): The claimed Orders, all from one database.
+    """
+    if orders:
+        Order.objects.using(orders[0]._state.db).filter(  # noqa: SLF001
+            id__in=[order.id for order in orders]
+        ).update(
+            receipt_claimed_at=None,
+            receipt_attempts=F("receipt_attempts") - 1,
+        )
+
+
+@task
+def send_pending_receipts(
+    batch_size: int = RECEIPT_BATCH_SIZE,
+) -> ReceiptStats:
+    """
+    Send every pending receipt, one batch at a time.
+
+    All batches are sent over the same mail server connection, one receipt
+    at a time, and each Order is marked as soon as its receipt is sent. A
+    receipt that fails is recorded on its Order and skipped for the rest of
+    the run, so it can't hold up the receipts after it, and is given up on
+    after ``RECEIPT_MAX_ATTEMPTS`` runs. After ``RECEIPT_FAILURE_STREAK``
+    failures in a row the mail server is assumed to be down, and the rest of
+    the batch is put back in the queue without using up an attempt.
+
+    Args:
+        batch_size (int): Number of receipts rendered and sent together.
+
+    Returns:
+        ReceiptStats: Statistics about the receipts that were sent.
+
+    Raises:
+        ReceiptError: If any receipt failed to send, so the job is retried.
+    """
+    start = time.perf_counter()
+    sent = batches = streak = 0
+    failed: list[int] = []
+    with get_connection() as connection:
+        for using in shards():
+            while streak < RECEIPT_FAILURE_STREAK and (
+                orders := _claim_batch(batch_size, using, failed)
+            ):
+                batches += 1
+                for i, order in enumerate(orders):
+                    if _send_receipt(connection, order):
+                        sent += 1
+                        streak = 0
+                        continue
+                    failed.append(order.id)
+                    streak += 1
+                    if streak >= RECEIPT_FAILURE_STREAK:
+                        _release(orders[i + 1 :])
+                        break
+    stats = ReceiptStats(sent, batches, time.perf_counter() - start)
+    if sent:
+        logger.info(
+            "Sent %d receipts in %d batches (%.1f/s)",
+            stats.sent,
+            stats.batches,
+            stats.per_second,
+        )
+    if failed:
+        msg = f"{len(failed)} receipts failed to send"
+        raise ReceiptError(msg)
+    return stats
+
+
+@receiver(order_checked_out)
+def queue_receipt(sender: type, order: Order, **kwargs: dict) -> None:  # noqa: ARG001
+    """
+    Queue the receipt of a checked out Order to be sent in the background.
+
+    Args:
+        sender (type): The class that sent the signal.
+        order (Order): The Order that was checked out.
+        kwargs (dict): Additional signal arguments.
+    """
+    if order.email:
+        enqueue(send_pending_receipts)
@@ -0,0 +1,260 @@
+"""
+Structured access log and slow-query log.
+
+``RequestLogMiddleware`` logs one JSON line per request to the
+``shop.access`` logger, with a request ID, the user, the view, the number of
+queries and the time spent in the view and in the database. For a sampled
+fraction of requests, queries slower than ``SLOW_QUERY_MS`` are logged to
+the ``shop.slow_query`` logger with their SQL and ``EXPLAIN`` output. The
+queries are only explained once the response is ready, so ``EXPLAIN`` never
+runs inside the request's transactions; their parameters are used to
+explain them but never logged.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import random
+import re
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, NamedTuple
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connections
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from django.db.backends.base.base import BaseDatabaseWrapper
+    from django.http import HttpRequest, HttpResponse
+
+access_logger = logging.getLogger("shop.access")
+slow_query_logger = logging.getLogger("shop.slow_query")
+
+REQUEST_ID_HEADER = "X-Request-ID"
+# request IDs passed in by a proxy are only trusted if they look like one
+REQUEST_ID_PATTERN = re.compile(r"[\w.-]{1,64}")
+# attributes every log record has, which aren't logged as extra fields
+RECORD_ATTRIBUTES = frozenset(
+    {
+        *logging.makeLogRecord({}).__dict__,
+        "message",
+        "asctime",
+    }
+)
+
+
+class JsonFormatter(logging.Formatter):
+    """Log formatter that writes each record as one line of JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        Format a record, with the fields passed in ``extra``, as JSON.
+
+        Args:
+            record (LogRecord): The record to format.
+
+        Returns:
+            str: The JSON line.
+        """
+        entry = {
+            "time": datetime.fromtimestamp(
+                record.created, tz=timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(
+            (key, value)
+            for key, value in record.__dict__.items()
+            if key not in RECORD_ATTRIBUTES
+        )
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SlowQuery(NamedTuple):
+    """A query that took longer than ``SLOW_QUERY_MS``."""
+
+    alias: str
+    sql: str
+    params: object
+    seconds: float
+
+
+class QueryTimer:
+    """Database execute wrapper that counts and times a request's queries."""
+
+    def __init__(self, slow_after: float | None) -> None:
+        """
+        Start counting.
+
+        Args:
+            slow_after (float | None): Seconds after which a query is
+                recorded as slow, or None to record none.
+        """
+        self.slow_after = slow_after
+        self.count = 0
+        self.seconds = 0.0
+        self.slow_queries: list[SlowQuery] = []
+
+    def __call__(
+        self,
+        execute: Callable,
+        sql: str,
+        params: object,
+        many: bool,  # noqa: FBT001
+        context: dict,
+    ) -> object:
+        """
+        Run and time a query.
+
+        Args:
+            execute (Callable): Runs the query.
+            sql (str): The query's SQL.
+            params (object): The query's parameters.
+            many (bool): Whether the query is run once per set of parameters.
+            context (dict): The query's connection and cursor.
+
+        Returns:
+            object: What running the query returned.
+        """
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            seconds = time.perf_counter() - start
+            self.count += 1
+            self.seconds += seconds
+            if (
+                self.slow_after is not None
+                and seconds >= self.slow_after
+                and not many
+            ):
+                self.slow_queries.append(
+                    SlowQuery(
+                        context["connection"].alias, sql, params, seconds
+                    )
+                )
+
+
+def explain(connection: BaseDatabaseWrapper, sql: str, params: object) -> str:
+    """
+    Return the database's query plan for a query.
+
+    Args:
+        connection (BaseDatabaseWrapper): The connection the query ran on.
+        sql (str): The query's SQL.
+        params (object): The query's parameters.
+
+    Returns:
+        str: The plan, one row per line, or why it couldn't be explained.
+    """
+    prefix = connection.ops.explain_query_prefix()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"{prefix} {sql}", params)
+            rows = cursor.fetchall()
+    except DatabaseError as error:
+        return f"EXPLAIN failed: {error}"
+    return "\n".join(" ".join(str(column) for column in row) for row in rows)
+
+
+def request_id(request: HttpRequest) -> str:
+    """
+    Return the ID of a request, as given by a proxy or a new one.
+
+    Args:
+        request (HttpRequest): The request.
+
+    Returns:
+        str: The request ID.
+    """
+    given = request.headers.get(REQUEST_ID_HEADER, "")
+    if REQUEST_ID_PATTERN.fullmatch(given):
+        return given
+    return uuid.uuid4().hex
+
+
+class RequestLogMiddleware:
+    """Middleware that logs every request and a sample of slow queries."""
+
+    def __init__(self, get_response: Callable) -> None:
+        """
+        Wrap the rest of the middleware chain.
+
+        Args:
+            get_response (Callable): The next middleware or the view.
+
+        Raises:
+            MiddlewareNotUsed: If ``REQUEST_LOG`` is switched off.
+        """
+        if not settings.REQUEST_LOG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        """
+        Handle a request, timing it and its queries.
+
+        Args:
+            request (HttpRequest): The request.
+
+        Returns:
+            HttpResponse: The response, with the request ID in a header.
+        """
+        request.request_id = request_id(request)
+        rate = settings.SLOW_QUERY_SAMPLE_RATE
+        # sampling needs no cryptographic randomness
+        sampled = random.random() < rate  # noqa: S311
+        timer = QueryTimer(settings.SLOW_QUERY_MS / 1000 if sampled else None)
+        start = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        seconds = time.perf_counter() - start
+        response[REQUEST_ID_HEADER] = request.request_id
+        view = request.resolver_match and request.resolver_match.view_name
+        user = getattr(request, "user", None)
+        access_logger.info(
+            "%s %s %s",
+            request.method,
+            request.path,
+            response.status_code,
+            extra={
+                "request_id": request.request_id,
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "view": view,
+                "user_id": user.pk if user and user.is_authenticated else None,
+                "duration_ms": round(seconds * 1000, 2),
+                "db_ms": round(timer.seconds * 1000, 2),
+                "queries": timer.count,
+            },
+        )
+        for query in timer.slow_queries:
+            slow_query_logger.warning(
+                "Slow query in %s: %.1f ms",
+                view,
+                query.seconds * 1000,
+                extra={
+                    "request_id": request.request_id,
+                    "view": view,
+                    "database": query.alias,
+                    "duration_ms": round(query.seconds * 1000, 2),
+                    "sql": query.sql,
+                    "plan": explain(
+                        connections[query.alias], query.sql, query.params
+                    ),
+                },
+            )
+        return response
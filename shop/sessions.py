@@ -0,0 +1,53 @@
+"""
+Housekeeping for the session store.
+
+Django never deletes expired sessions on its own. Database-backed sessions
+are purged in small batches, so the ``DELETE`` statements never hold
+SQLite's write lock for long while tills are checking out.
+"""
+
+from __future__ import annotations
+
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.utils import timezone
+
+# number of expired sessions deleted per statement
+PURGE_BATCH = 1000
+
+
+def purge_expired_sessions(batch_size: int = PURGE_BATCH) -> int:
+    """
+    Delete expired sessions from the configured session store.
+
+    Stores that keep sessions in the database, such as ``db`` and
+    ``cached_db``, are purged in batches. Other stores are asked to clear
+    their expired sessions themselves; signed cookie sessions are never
+    stored on the server, so there is nothing to do.
+
+    Args:
+        batch_size (int): Number of sessions deleted per statement.
+
+    Returns:
+        int: Number of sessions deleted from the database.
+    """
+    store = import_module(settings.SESSION_ENGINE).SessionStore
+    if not issubclass(store, DBStore):
+        store.clear_expired()
+        return 0
+    sessions = store.get_model_class().objects
+    now = timezone.now()
+    deleted = 0
+    while True:
+        keys = list(
+            sessions.filter(expire_date__lt=now).values_list(
+                "session_key", flat=True
+            )[:batch_size]
+        )
+        if keys:
+            deleted += sessions.filter(session_key__in=keys).delete()[0]
+        # a short batch was the last one
+        if len(keys) < batch_size:
+            return deleted
@@ -0,0 +1,329 @@
+"""
+Optional sharding of carts and orders by user.
+
+With ``SHARD_DATABASES`` set, every user's Carts, cart lines, Orders, till
+sales and idempotency keys live in one of several databases, picked from the
+user's ID, so checkouts by different users don't all queue on one SQLite write
+lock. Items, Sellers, users and everything else stay in the default database.
+
+Rows are routed by ``ShardRouter``. Objects loaded from a shard, and new
+objects whose Cart or Order is known, find their shard through the router's
+instance hints; queries that start from a user pick theirs with
+``shard_for_user()``. Each SQLite shard hands out IDs from its own range, so
+Cart and Order IDs stay unique across shards. Rows already in the default
+database aren't moved when sharding is switched on.
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+
+if TYPE_CHECKING:
+    from django.apps import AppConfig
+    from django.db import models
+
+# models whose rows are stored in the shards
+SHARDED_MODELS = frozenset(
+    {"cart", "cartitem", "order", "tillsale", "idempotencykey"}
+)
+# each shard's IDs start at a multiple of this
+SHARD_ID_SPAN = 10**12
+
+
+def shards() -> list[str]:
+    """
+    Return the aliases of the databases that hold carts and orders.
+
+    Returns:
+        list[str]: The shards, or just the default database when sharding is
+        switched off.
+    """
+    return list(settings.SHARD_DATABASES) or [DEFAULT_DB_ALIAS]
+
+
+def shard_for_user(user_id: int) -> str:
+    """
+    Return the alias of the database holding a user's carts and orders.
+
+    Args:
+        user_id (int): The user's ID.
+
+    Returns:
+        str: The database alias.
+    """
+    aliases = settings.SHARD_DATABASES
+    if not aliases:
+        return DEFAULT_DB_ALIAS
+    return aliases[user_id % len(aliases)]
+
+
+def _is_sharded(model: type[models.Model] | models.Model) -> bool:
+    """
+    Return whether a model's rows are stored in the shards.
+
+    Args:
+        model (type[Model] | Model): The model, or one of its objects.
+
+    Returns:
+        bool: Whether the model is sharded.
+    """
+    meta = model._meta  # noqa: SLF001
+    return meta.app_label == "shop" and meta.model_name in SHARDED_MODELS
+
+
+def _shard_of(instance: models.Model) -> str | None:
+    """
+    Return the shard an object, or the sharded rows related to it, live in.
+
+    Args:
+        instance (Model): A user, or a sharded object.
+
+    Returns:
+        str | None: The shard, or None if it can't be told without a query.
+    """
+    if isinstance(instance, User):
+        return shard_for_user(instance.pk)
+    if instance._state.db is not None:  # noqa: SLF001
+        return instance._state.db  # noqa: SLF001
+    if not _is_sharded(instance):
+        return None
+    # a new object lives next to its user, its Cart, or its Order
+    meta = instance._meta  # noqa: SLF001
+    if meta.model_name in {"cart", "idempotencykey"}:
+        if instance.user_id is None:
+            return None
+        return shard_for_user(instance.user_id)
+    field = "order" if meta.model_name == "tillsale" else "cart"
+    parent = meta.get_field(field).get_cached_value(instance, None)
+    return None if parent is None else parent._state.db  # noqa: SLF001
+
+
+class ShardRouter:
+    """Database router that sends sharded models to their user's shard."""
+
+    def _db_for(self, model: type[models.Model], **hints: dict) -> str | None:
+        """
+        Pick the database for a query or save.
+
+        Args:
+            model (type[Model]): The queried model.
+            hints (dict): Routing hints, such as a related ``instance``.
+
+        Returns:
+            str | None: The database alias, or None to let Django decide.
+        """
+        if not settings.SHARD_DATABASES:
+            return None
+        if not _is_sharded(model):
+            return DEFAULT_DB_ALIAS
+        instance = hints.get("instance")
+        return None if instance is None else _shard_of(instance)
+
+    def db_for_read(
+        self, model: type[models.Model], **hints: dict
+    ) -> str | None:
+        """
+        Pick the database to read a model from.
+
+        Args:
+            model (type[Model]): The queried model.
+            hints (dict): Routing hints.
+
+        Returns:
+            str | None: The database alias, or None to let Django decide.
+        """
+        return self._db_for(model, **hints)
+
+    def db_for_write(
+        self, model: type[models.Model], **hints: dict
+    ) -> str | None:
+        """
+        Pick the database to write a model to.
+
+        Args:
+            model (type[Model]): The written model.
+            hints (dict): Routing hints.
+
+        Returns:
+            str | None: The database alias, or None to let Django decide.
+        """
+        return self._db_for(model, **hints)
+
+    def allow_relation(
+        self,
+        obj1: models.Model,
+        obj2: models.Model,
+        **hints: dict,  # noqa: ARG002
+    ) -> bool | None:
+        """
+        Allow sharded rows to point at users and Items in other databases.
+
+        Args:
+            obj1 (Model): One side of the relation.
+            obj2 (Model): The other side.
+            hints (dict): Routing hints.
+
+        Returns:
+            bool | None: True for relations involving a sharded model.
+        """
+        if _is_sharded(obj1) or _is_sharded(obj2):
+            return True
+        return None
+
+    def allow_migrate(
+        self,
+        db: str,
+        app_label: str,
+        model_name: str | None = None,
+        **hints: dict,  # noqa: ARG002
+    ) -> bool | None:
+        """
+        Only create the sharded models' tables in the shards.
+
+        Args:
+            db (str): The database being migrated.
+            app_label (str): The migrated app.
+            model_name (str | None): The migrated model, if any.
+            hints (dict): Migration hints.
+
+        Returns:
+            bool | None: Whether the migration applies to the database.
+        """
+        if db == DEFAULT_DB_ALIAS:
+            return None
+        return app_label == "shop" and model_name in SHARDED_MODELS
+
+
+class ShardedQuerySet:
+    """
+    Read-only, sliceable view of a queryset across every shard.
+
+    Slicing fetches the first rows of every shard and merges them, so it
+    works with Django's Paginator; deep pages read more rows per shard.
+    """
+
+    ordered = True
+
+    def __init__(self, queryset: models.QuerySet, ordering: list[str]) -> None:
+        """
+        Wrap a queryset.
+
+        Args:
+            queryset (QuerySet): The queryset to run on every shard.
+            ordering (list[str]): Field names to order by, all ascending or
+                all descending, e.g. ``["-created_at", "-id"]``.
+        """
+        self.model = queryset.model
+        self._queryset = queryset.order_by(*ordering)
+        self._fields = [name.lstrip("-") for name in ordering]
+        self._reverse = ordering[0].startswith("-")
+
+    def count(self) -> int:
+        """
+        Count the rows across every shard.
+
+        Returns:
+            int: The number of rows.
+        """
+        return sum(self._queryset.using(alias).count() for alias in shards())
+
+    def __len__(self) -> int:
+        """
+        Count the rows across every shard.
+
+        Returns:
+            int: The number of rows.
+        """
+        return self.count()
+
+    def _key(self, obj: models.Model) -> tuple:
+        """
+        Return the values a row is ordered by.
+
+        Args:
+            obj (Model): The row.
+
+        Returns:
+            tuple: The row's ordering values.
+        """
+        return tuple(getattr(obj, field) for field in self._fields)
+
+    def __getitem__(self, index: slice) -> list[models.Model]:
+        """
+        Return a slice of the merged rows.
+
+        Args:
+            index (slice): The rows to return, without a step.
+
+        Returns:
+            list[Model]: The rows.
+
+        Raises:
+            TypeError: If the index isn't a slice with a stop.
+        """
+        if not isinstance(index, slice) or index.stop is None:
+            msg = "ShardedQuerySet only supports slices with a stop"
+            raise TypeError(msg)
+        start = index.start or 0
+        merged = heapq.merge(
+            *(
+                list(self._queryset.using(alias)[: index.stop])
+                for alias in shards()
+            ),
+            key=self._key,
+            reverse=self._reverse,
+        )
+        return list(itertools.islice(merged, start, index.stop))
+
+
+@receiver(post_migrate)
+def start_shard_ids(
+    sender: AppConfig,
+    using: str = DEFAULT_DB_ALIAS,
+    **kwargs: dict,  # noqa: ARG001
+) -> None:
+    """
+    Make each SQLite shard hand out IDs from its own range.
+
+    Shard ``i`` in ``SHARD_DATABASES`` starts its IDs at
+    ``(i + 1) * SHARD_ID_SPAN``, past any IDs in the default database. Other
+    databases are left alone.
+
+    Args:
+        sender (AppConfig): The migrated app.
+        using (str): Alias of the migrated database.
+        kwargs (dict): Additional signal arguments.
+    """
+    connection = connections[using]
+    if (
+        sender.label != "shop"
+        or using == DEFAULT_DB_ALIAS
+        or connection.vendor != "sqlite"
+    ):
+        return
+    aliases = [alias for alias in connections if alias != DEFAULT_DB_ALIAS]
+    start = (aliases.index(using) + 1) * SHARD_ID_SPAN
+    with connection.cursor() as cursor:
+        for model in sender.get_models():
+            if model._meta.model_name not in SHARDED_MODELS:  # noqa: SLF001
+                continue
+            table = model._meta.db_table  # noqa: SLF001
+            cursor.execute(
+                "UPDATE sqlite_sequence SET seq = %s "
+                "WHERE name = %s AND seq < %s",
+                [start, table, start],
+            )
+            cursor.execute(
+                "INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s "
+                "WHERE NOT EXISTS "
+                "(SELECT 1 FROM sqlite_sequence WHERE name = %s)",
+                [table, start, table],
+            )
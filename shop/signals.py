@@ -0,0 +1,7 @@
+"""Signals sent by the shop application."""
+
+from django.dispatch import Signal
+
+# sent inside the checkout transaction once an Order has been created and its
+# items marked as sold, with the new ``order`` as a keyword argument
+order_checked_out = Signal()
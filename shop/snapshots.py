@@ -0,0 +1,397 @@
+"""
+Compact snapshots of the shop's inventory, carts and orders.
+
+A snapshot is a sequence of length-prefixed, zlib compressed JSON blocks. The
+first block is a header; every other block holds up to ``BLOCK_ROWS`` rows of
+one table, stored column by column so that similar values compress well. Rows
+are read and written as raw database values, so a snapshot can only be
+restored into the same kind of database it was taken from.
+
+Restoring replaces the contents of the snapshotted tables with bulk
+``INSERT`` statements inside one transaction, with constraint checks deferred
+and indexes dropped until every table is loaded. The foreign keys of the
+restored tables, and of every other table pointing at them, are checked
+before the transaction commits. Users aren't part of a snapshot, so the
+users that own the snapshotted carts must already exist. Snapshots cover a
+single database, so they refuse to run while carts and orders are sharded.
+"""
+
+from __future__ import annotations
+
+import json
+import struct
+import time
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime
+from datetime import time as time_of_day
+from decimal import Decimal
+from typing import IO, TYPE_CHECKING
+from uuid import UUID
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+
+from .conditional import bump_catalogue_version
+from .db import large_cache
+from .facets import invalidate_price_facets
+from .models import (
+    Cart,
+    CartItem,
+    Item,
+    ItemImage,
+    MarkdownRule,
+    Order,
+    PriceChange,
+    Seller,
+    TillSale,
+)
+from .typeahead import invalidate_typeahead
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from django.db import models
+    from django.db.backends.base.base import BaseDatabaseWrapper
+
+MAGIC = b"GSSNAP\x01"
+VERSION = 1
+# number of rows stored in each block
+BLOCK_ROWS = 50_000
+COMPRESSION_LEVEL = 6
+# models in the order they are restored, so foreign keys point backwards
+SNAPSHOT_MODELS: tuple[type[models.Model], ...] = (
+    Seller,
+    Item,
+    MarkdownRule,
+    PriceChange,
+    ItemImage,
+    Cart,
+    CartItem,
+    Order,
+    TillSale,
+)
+_LENGTH = struct.Struct(">I")
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot can't be read or restored."""
+
+
+@dataclass(frozen=True)
+class SnapshotStats:
+    """Statistics about taking or restoring a snapshot."""
+
+    rows: dict[str, int]
+    seconds: float
+
+    @property
+    def total_rows(self) -> int:
+        """
+        Return the number of rows across every table.
+
+        Returns:
+            int: The total number of rows.
+        """
+        return sum(self.rows.values())
+
+
+def _encode(value: object) -> object:
+    """
+    Encode database values that JSON doesn't support.
+
+    Args:
+        value (object): A raw database value.
+
+    Returns:
+        object: A JSON serializable representation of the value.
+
+    Raises:
+        TypeError: If the value can't be represented.
+    """
+    if isinstance(value, datetime | date | time_of_day):
+        return value.isoformat()
+    if isinstance(value, Decimal | UUID):
+        return str(value)
+    if isinstance(value, bytes | memoryview):
+        return bytes(value).hex()
+    msg = f"Can't store {type(value).__name__} values in a snapshot"
+    raise TypeError(msg)
+
+
+def _write_block(file: IO[bytes], block: dict) -> None:
+    """
+    Compress a block and append it to a snapshot file.
+
+    Args:
+        file (IO[bytes]): The snapshot file.
+        block (dict): The block's contents.
+    """
+    data = zlib.compress(
+        json.dumps(block, separators=(",", ":"), default=_encode).encode(),
+        COMPRESSION_LEVEL,
+    )
+    file.write(_LENGTH.pack(len(data)))
+    file.write(data)
+
+
+def _read_blocks(file: IO[bytes]) -> Iterator[dict]:
+    """
+    Read and decompress the blocks of a snapshot file.
+
+    Args:
+        file (IO[bytes]): The snapshot file, positioned after the magic bytes.
+
+    Yields:
+        dict: The contents of each block.
+
+    Raises:
+        SnapshotError: If the file is truncated.
+    """
+    while prefix := file.read(_LENGTH.size):
+        if len(prefix) < _LENGTH.size:
+            msg = "Snapshot is truncated"
+            raise SnapshotError(msg)
+        (length,) = _LENGTH.unpack(prefix)
+        data = file.read(length)
+        if len(data) < length:
+            msg = "Snapshot is truncated"
+            raise SnapshotError(msg)
+        yield json.loads(zlib.decompress(data))
+
+
+def _columns(model: type[models.Model]) -> list[str]:
+    """
+    Return the database columns of a model's concrete fields.
+
+    Args:
+        model (type[Model]): The model.
+
+    Returns:
+        list[str]: The column names.
+    """
+    return [field.column for field in model._meta.concrete_fields]  # noqa: SLF001
+
+
+def _check_unsharded() -> None:
+    """
+    Refuse to snapshot carts and orders spread over several databases.
+
+    Raises:
+        SnapshotError: If sharding is switched on.
+    """
+    if settings.SHARD_DATABASES:
+        msg = (
+            "Snapshots cover a single database, but carts and orders are "
+            "sharded across SHARD_DATABASES; switch sharding off first"
+        )
+        raise SnapshotError(msg)
+
+
+def take_snapshot(path: Path, using: str = DEFAULT_DB_ALIAS) -> SnapshotStats:
+    """
+    Write a snapshot of the shop's tables to a file.
+
+    Tables are read with plain ``SELECT`` statements inside one transaction,
+    so the snapshot is consistent, and streamed to the file a block at a time.
+
+    Args:
+        path (Path): The file to write.
+        using (str): Alias of the database to snapshot.
+
+    Returns:
+        SnapshotStats: Number of rows written per model.
+
+    Raises:
+        SnapshotError: If sharding is switched on.
+    """
+    _check_unsharded()
+    start = time.perf_counter()
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    rows = {}
+    with path.open("wb") as file, transaction.atomic(using=using):
+        file.write(MAGIC)
+        _write_block(
+            file,
+            {
+                "version": VERSION,
+                "vendor": connection.vendor,
+                "models": [m._meta.label for m in SNAPSHOT_MODELS],  # noqa: SLF001
+            },
+        )
+        for model in SNAPSHOT_MODELS:
+            label = model._meta.label  # noqa: SLF001
+            columns = _columns(model)
+            rows[label] = 0
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT {', '.join(quote(c) for c in columns)} "  # noqa: S608
+                    f"FROM {quote(model._meta.db_table)} "  # noqa: SLF001
+                    f"ORDER BY {quote(model._meta.pk.column)}"  # noqa: SLF001
+                )
+                while batch := cursor.fetchmany(BLOCK_ROWS):
+                    _write_block(
+                        file,
+                        {
+                            "model": label,
+                            "columns": columns,
+                            "values": [list(c) for c in zip(*batch)],
+                        },
+                    )
+                    rows[label] += len(batch)
+    return SnapshotStats(rows, time.perf_counter() - start)
+
+
+def _read_header(file: IO[bytes], vendor: str) -> Iterator[dict]:
+    """
+    Check a snapshot's header and return its remaining blocks.
+
+    Args:
+        file (IO[bytes]): The snapshot file.
+        vendor (str): Vendor of the database being restored into.
+
+    Returns:
+        Iterator[dict]: The snapshot's table blocks.
+
+    Raises:
+        SnapshotError: If the file isn't a snapshot that can be restored.
+    """
+    if file.read(len(MAGIC)) != MAGIC:
+        msg = "Not a shop snapshot"
+        raise SnapshotError(msg)
+    blocks = _read_blocks(file)
+    header = next(blocks, None)
+    if header is None or header.get("version") != VERSION:
+        msg = "Unsupported snapshot version"
+        raise SnapshotError(msg)
+    if header["vendor"] != vendor:
+        msg = (
+            f"Snapshot was taken from a {header['vendor']} database and "
+            f"can't be restored into {vendor}"
+        )
+        raise SnapshotError(msg)
+    return blocks
+
+
+def _checked_tables(using: str) -> list[str]:
+    """
+    Return the tables whose foreign keys a restore may have broken.
+
+    These are the snapshotted tables, and every other table in the database
+    with a foreign key to one of them.
+
+    Args:
+        using (str): Alias of the database being restored into.
+
+    Returns:
+        list[str]: The table names.
+    """
+    tables = [m._meta.db_table for m in SNAPSHOT_MODELS]  # noqa: SLF001
+    for model in apps.get_models(include_auto_created=True):
+        meta = model._meta  # noqa: SLF001
+        if (
+            meta.db_table not in tables
+            and router.allow_migrate_model(using, model)
+            and any(
+                field.related_model in SNAPSHOT_MODELS
+                for field in meta.concrete_fields
+                if field.is_relation
+            )
+        ):
+            tables.append(meta.db_table)
+    return tables
+
+
+@contextmanager
+def _indexes_dropped(connection: BaseDatabaseWrapper) -> Iterator[None]:
+    """
+    Drop the snapshotted models' indexes, and rebuild them afterwards.
+
+    Building an index once over loaded rows is much faster than updating it
+    for every inserted row.
+
+    Args:
+        connection (BaseDatabaseWrapper): The database connection, inside a
+            transaction.
+
+    Yields:
+        None: While the indexes are dropped.
+    """
+    indexes = [
+        (model, index)
+        for model in SNAPSHOT_MODELS
+        for index in model._meta.indexes  # noqa: SLF001
+    ]
+    with connection.schema_editor(atomic=False) as editor:
+        for model, index in indexes:
+            editor.remove_index(model, index)
+    yield
+    with connection.schema_editor(atomic=False) as editor:
+        for model, index in indexes:
+            editor.add_index(model, index)
+
+
+def restore_snapshot(
+    path: Path, using: str = DEFAULT_DB_ALIAS
+) -> SnapshotStats:
+    """
+    Replace the shop's tables with the contents of a snapshot.
+
+    Args:
+        path (Path): The snapshot file.
+        using (str): Alias of the database to restore into.
+
+    Returns:
+        SnapshotStats: Number of rows restored per model.
+
+    Raises:
+        SnapshotError: If the snapshot is invalid or names an unknown model,
+            or sharding is switched on.
+    """
+    _check_unsharded()
+    start = time.perf_counter()
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    models_by_label = {m._meta.label: m for m in SNAPSHOT_MODELS}  # noqa: SLF001
+    rows = dict.fromkeys(models_by_label, 0)
+    with (
+        path.open("rb") as file,
+        large_cache(connection),
+        # SQLite can only disable foreign key checks outside a transaction
+        connection.constraint_checks_disabled(),
+        transaction.atomic(using=using),
+    ):
+        blocks = _read_header(file, connection.vendor)
+        with _indexes_dropped(connection), connection.cursor() as cursor:
+            for model in reversed(SNAPSHOT_MODELS):
+                cursor.execute(f"DELETE FROM {quote(model._meta.db_table)}")  # noqa: S608, SLF001
+            for block in blocks:
+                model = models_by_label.get(block.get("model"))
+                if model is None:
+                    msg = (
+                        f"Snapshot contains unknown model {block.get('model')}"
+                    )
+                    raise SnapshotError(msg)
+                columns = block["columns"]
+                cursor.executemany(
+                    f"INSERT INTO {quote(model._meta.db_table)} "  # noqa: S608, SLF001
+                    f"({', '.join(quote(c) for c in columns)}) "
+                    f"VALUES ({', '.join(['%s'] * len(columns))})",
+                    list(zip(*block["values"])),
+                )
+                rows[model._meta.label] += len(block["values"][0])  # noqa: SLF001
+        connection.check_constraints(table_names=_checked_tables(using))
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), SNAPSHOT_MODELS
+            ):
+                cursor.execute(sql)
+    transaction.on_commit(invalidate_price_facets, using=using)
+    transaction.on_commit(invalidate_typeahead, using=using)
+    transaction.on_commit(bump_catalogue_version, using=using)
+    return SnapshotStats(rows, time.perf_counter() - start)
@@ -0,0 +1,236 @@
+// Offline-capable till.
+//
+// The unsold catalogue is cached in localStorage, so the till keeps selling
+// while the network is down. Completed sales are appended to a local journal
+// and posted to the sync endpoint in batches whenever the till is online.
+
+const CATALOGUE_KEY = "till.catalogue"
+const JOURNAL_KEY = "till.journal"
+const TILL_ID_KEY = "till.id"
+const SYNC_BATCH = 100
+const SYNC_INTERVAL_MS = 30 * 1000
+const MAX_RESULTS = 10
+
+const tillElement = document.querySelector("#till")
+const statusElement = document.querySelector("#till_status")
+const pendingElement = document.querySelector("#till_pending")
+const conflictsElement = document.querySelector("#till_conflicts")
+/** @type {HTMLInputElement} */
+const searchBox = document.querySelector("#till_search")
+const resultsElement = document.querySelector("#till_results")
+const saleElement = document.querySelector("#till_sale")
+const totalElement = document.querySelector("#till_total")
+/** @type {HTMLButtonElement} */
+const completeButton = document.querySelector("#till_complete")
+const csrfToken = tillElement.querySelector("[name=csrfmiddlewaretoken]").value
+
+/** @type {Map<number, {id: number, name: string, price: number}>} */
+var catalogue = new Map()
+/** @type {{id: number, name: string, price: number, quantity: number}[]} */
+var sale = []
+var syncing = false
+
+function load(key, fallback) {
+  const value = localStorage.getItem(key)
+  return value === null ? fallback : JSON.parse(value)
+}
+
+function save(key, value) {
+  localStorage.setItem(key, JSON.stringify(value))
+}
+
+function tillId() {
+  var id = localStorage.getItem(TILL_ID_KEY)
+  if (id === null) {
+    id = crypto.randomUUID()
+    localStorage.setItem(TILL_ID_KEY, id)
+  }
+  return id
+}
+
+/** @param {number} cents */
+function formatCents(cents) {
+  return "$" + (cents / 100).toLocaleString("en-US", {
+    minimumFractionDigits: 2,
+    maximumFractionDigits: 2,
+  })
+}
+
+function setStatus(text, style) {
+  statusElement.innerText = text
+  statusElement.className = `badge text-bg-${style}`
+}
+
+function useCatalogue(rows) {
+  const sold = new Set(
+    load(JOURNAL_KEY, []).flatMap((entry) => entry.lines.map((l) => l.item_id))
+  )
+  catalogue = new Map(
+    rows
+      .filter(([id]) => !sold.has(id))
+      .map(([id, name, price]) => [id, { id, name, price }])
+  )
+}
+
+async function refreshCatalogue() {
+  try {
+    const res = await fetch(tillElement.dataset.catalogueUrl)
+    if (!res.ok) {
+      throw new Error(`catalogue request failed with ${res.status}`)
+    }
+    const data = await res.json()
+    save(CATALOGUE_KEY, data.items)
+    useCatalogue(data.items)
+    setStatus("Online", "success")
+  } catch (error) {
+    console.error(error)
+    useCatalogue(load(CATALOGUE_KEY, []))
+    setStatus("Offline", "warning")
+  }
+  renderResults()
+}
+
+function renderPending() {
+  const pending = load(JOURNAL_KEY, []).length
+  pendingElement.innerText = pending ? `${pending} sales waiting to sync` : ""
+}
+
+function renderResults() {
+  const query = searchBox.value.trim().toLowerCase()
+  const results = []
+  if (query.length > 0) {
+    for (const item of catalogue.values()) {
+      if (item.name.toLowerCase().includes(query)) {
+        results.push(item)
+        if (results.length >= MAX_RESULTS) break
+      }
+    }
+  }
+  resultsElement.replaceChildren(...results.map((item) => {
+    const button = document.createElement("button")
+    button.className = "list-group-item list-group-item-action"
+    button.innerText = `${item.name} - ${formatCents(item.price)}`
+    button.addEventListener("click", () => addToSale(item))
+    return button
+  }))
+}
+
+function addToSale(item) {
+  const line = sale.find((l) => l.id === item.id)
+  if (line) {
+    line.quantity += 1
+  } else {
+    sale.push({ ...item, quantity: 1 })
+  }
+  searchBox.value = ""
+  renderResults()
+  renderSale()
+}
+
+function removeFromSale(i) {
+  sale.splice(i, 1)
+  renderSale()
+}
+
+function renderSale() {
+  saleElement.replaceChildren(...sale.map((line, i) => {
+    const row = document.createElement("div")
+    row.className = "d-flex gap-3 p-2 border rounded align-items-center"
+    const name = document.createElement("span")
+    name.className = "flex-grow-1"
+    name.innerText = line.quantity > 1 ? `${line.name} x ${line.quantity}` : line.name
+    const price = document.createElement("span")
+    price.innerText = formatCents(line.price * line.quantity)
+    const remove = document.createElement("button")
+    remove.className = "btn btn-link"
+    remove.innerText = "Remove"
+    remove.addEventListener("click", () => removeFromSale(i))
+    row.append(name, price, remove)
+    return row
+  }))
+  const total = sale.reduce((sum, line) => sum + line.price * line.quantity, 0)
+  totalElement.innerText = `Total: ${formatCents(total)}`
+  completeButton.disabled = sale.length === 0
+}
+
+function completeSale() {
+  const journal = load(JOURNAL_KEY, [])
+  journal.push({
+    id: crypto.randomUUID(),
+    sold_at: new Date().toISOString(),
+    lines: sale.map((line) => ({
+      item_id: line.id,
+      quantity: line.quantity,
+      price_in_cents: line.price,
+    })),
+  })
+  save(JOURNAL_KEY, journal)
+  for (const line of sale) {
+    catalogue.delete(line.id)
+  }
+  sale = []
+  renderSale()
+  renderPending()
+  sync()
+}
+
+function renderConflicts(conflicts) {
+  conflictsElement.replaceChildren(...conflicts.map((result) => {
+    const alert = document.createElement("div")
+    alert.className = "alert alert-danger"
+    alert.innerText = `Sale ${result.id} was not recorded: items ${result.conflicts.join(", ")} were already sold.`
+    return alert
+  }))
+}
+
+async function sync() {
+  if (syncing) return
+  syncing = true
+  const conflicts = []
+  try {
+    var journal = load(JOURNAL_KEY, [])
+    while (journal.length > 0) {
+      const batch = journal.slice(0, SYNC_BATCH)
+      const res = await fetch(tillElement.dataset.syncUrl, {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+          "X-CSRFToken": csrfToken,
+        },
+        body: JSON.stringify({ till: tillId(), sales: batch }),
+      })
+      if (!res.ok) {
+        throw new Error(`sync request failed with ${res.status}`)
+      }
+      const data = await res.json()
+      conflicts.push(...data.results.filter((r) => r.status === "conflict"))
+      const synced = new Set(data.results.map((r) => r.id))
+      // sales may have been journaled while the request was running
+      journal = load(JOURNAL_KEY, []).filter((entry) => !synced.has(entry.id))
+      save(JOURNAL_KEY, journal)
+    }
+    setStatus("Online", "success")
+  } catch (error) {
+    console.error(error)
+    setStatus("Offline", "warning")
+  } finally {
+    syncing = false
+    renderPending()
+    if (conflicts.length > 0) {
+      renderConflicts(conflicts)
+      refreshCatalogue()
+    }
+  }
+}
+
+searchBox.addEventListener("input", renderResults)
+completeButton.addEventListener("click", completeSale)
+window.addEventListener("online", () => {
+  sync()
+  refreshCatalogue()
+})
+window.addEventListener("offline", () => setStatus("Offline", "warning"))
+setInterval(sync, SYNC_INTERVAL_MS)
+
+renderPending()
+refreshCatalogue().then(sync)
@@ -0,0 +1,45 @@
+// Search-as-you-type suggestions for the item search box.
+//
+// Suggestions are fetched from the typeahead endpoint, which answers from an
+// in-memory index, and offered through the box's datalist. Responses that
+// arrive after a newer request was sent are ignored.
+
+const DEBOUNCE_MS = 100
+
+/** @type {HTMLInputElement} */
+const typeaheadBox = document.querySelector("[data-typeahead-url]")
+const typeaheadList = document.querySelector("#" + typeaheadBox.getAttribute("list"))
+
+var typeaheadTimer = null
+var typeaheadRequest = 0
+
+async function suggest(query) {
+  const request = ++typeaheadRequest
+  const url = new URL(typeaheadBox.dataset.typeaheadUrl, location.href)
+  url.searchParams.set("q", query)
+  const response = await fetch(url)
+  if (!response.ok || request !== typeaheadRequest) {
+    return
+  }
+  const { results } = await response.json()
+  if (request !== typeaheadRequest) {
+    return
+  }
+  typeaheadList.replaceChildren(
+    ...results.map((result) => {
+      const option = document.createElement("option")
+      option.value = result.name
+      return option
+    })
+  )
+}
+
+typeaheadBox.addEventListener("input", () => {
+  clearTimeout(typeaheadTimer)
+  const query = typeaheadBox.value.trim()
+  if (query.length === 0) {
+    typeaheadList.replaceChildren()
+    return
+  }
+  typeaheadTimer = setTimeout(() => suggest(typeaheadBox.value), DEBOUNCE_MS)
+})
@@ -0,0 +1,424 @@
+"""
+Database-backed background job queue for the shop application.
+
+Functions decorated with ``@task`` can be queued with ``enqueue``, which
+inserts a Job row once the current transaction commits. Worker processes
+started by ``manage.py run_worker`` claim queued jobs, run them and retry
+failures with exponential backoff.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import time
+import traceback
+from datetime import timedelta
+from functools import partial
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.db import (
+    OperationalError,
+    close_old_connections,
+    connections,
+    transaction,
+)
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .carts import expire_stale_carts
+from .idempotency import purge_expired_keys
+from .models import Job
+from .pricing import apply_markdowns
+from .purge import purge_deleted_items
+from .sessions import purge_expired_sessions
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 5
+# seconds to wait before the first retry, doubled on each later attempt
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 600.0
+# jobs still running after this many seconds are assumed to be abandoned by a
+# crashed worker and are queued again
+STALE_AFTER = 300.0
+# number of jobs a worker claims at once
+CLAIM_BATCH = 10
+
+
+def task(
+    func: Callable | None = None, *, max_attempts: int = DEFAULT_MAX_ATTEMPTS
+) -> Callable:
+    """
+    Mark a module-level function as a task that can be queued.
+
+    Can be used as ``@task`` or ``@task(max_attempts=3)``. Task arguments are
+    stored as JSON, so they must be JSON serializable.
+
+    Args:
+        func (Callable | None): The function to mark.
+        max_attempts (int): Number of times the task is tried before failing.
+
+    Returns:
+        Callable: The marked function, or a decorator if ``func`` is None.
+    """
+    if func is None:
+        return partial(task, max_attempts=max_attempts)
+    func.is_task = True
+    func.task_name = f"{func.__module__}.{func.__qualname__}"
+    func.max_attempts = max_attempts
+    return func
+
+
+def enqueue(func: Callable, **kwargs: object) -> None:
+    """
+    Queue a task to run in a background worker after the transaction commits.
+
+    Jobs queued inside a transaction that rolls back are never created.
+
+    Args:
+        func (Callable): A function decorated with ``@task``.
+        kwargs (object): JSON serializable keyword arguments for the task.
+
+    Raises:
+        TypeError: If the function is not a task.
+    """
+    if not getattr(func, "is_task", False):
+        msg = f"{func!r} is not a task, decorate it with @task"
+        raise TypeError(msg)
+    job = Job(
+        name=func.task_name, kwargs=kwargs, max_attempts=func.max_attempts
+    )
+    transaction.on_commit(job.save)
+
+
+def retry_delay(attempts: int) -> float:
+    """
+    Return how long to wait before retrying a failed job.
+
+    Args:
+        attempts (int): Number of times the job has been tried.
+
+    Returns:
+        float: Delay in seconds, with up to 10% of random jitter.
+    """
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay + random.uniform(0, delay / 10)  # noqa: S311
+
+
+def claim_jobs(worker_id: str, limit: int = CLAIM_BATCH) -> list[Job]:
+    """
+    Claim a batch of jobs that are due to run.
+
+    The batch is claimed with a single conditional ``UPDATE`` that only
+    changes jobs that are still queued, so concurrent workers never claim the
+    same job. Candidates are sampled from a larger window of due jobs so that
+    concurrent workers rarely race for the same rows.
+
+    Args:
+        worker_id (str): Identifier of the claiming worker.
+        limit (int): Maximum number of jobs to claim.
+
+    Returns:
+        list[Job]: The claimed jobs, which may be empty.
+    """
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(status=Job.Status.QUEUED, run_at__lte=now)
+        .order_by("run_at", "id")
+        .values_list("id", flat=True)[: limit * 4]
+    )
+    if not candidates:
+        return []
+    candidates = random.sample(candidates, min(limit, len(candidates)))
+    claimed = Job.objects.filter(
+        id__in=candidates, status=Job.Status.QUEUED
+    ).update(
+        status=Job.Status.RUNNING,
+        locked_by=worker_id,
+        locked_at=now,
+        attempts=F("attempts") + 1,
+    )
+    if not claimed:
+        return []
+    return list(
+        Job.objects.filter(
+            id__in=candidates,
+            status=Job.Status.RUNNING,
+            locked_by=worker_id,
+            locked_at=now,
+        )
+    )
+
+
+def _record_failure(job: Job, error: str) -> None:
+    """
+    Queue a failed job again after a backoff delay, or mark it as failed.
+
+    Args:
+        job (Job): The job that failed.
+        error (str): Formatted traceback of the failure.
+    """
+    now = timezone.now()
+    if job.attempts >= job.max_attempts:
+        Job.objects.filter(id=job.id).update(
+            status=Job.Status.FAILED, last_error=error, finished_at=now
+        )
+    else:
+        Job.objects.filter(id=job.id).update(
+            status=Job.Status.QUEUED,
+            last_error=error,
+            run_at=now + timedelta(seconds=retry_delay(job.attempts)),
+        )
+
+
+def run_jobs(jobs: list[Job]) -> int:
+    """
+    Run claimed jobs and record their outcomes.
+
+    Failed jobs are queued again after a backoff delay until they run out of
+    attempts, at which point they are marked as failed. Successful jobs are
+    marked as done together with one ``UPDATE``.
+
+    Args:
+        jobs (list[Job]): The claimed jobs.
+
+    Returns:
+        int: Number of jobs that succeeded.
+    """
+    succeeded = []
+    for job in jobs:
+        try:
+            func = import_string(job.name)
+            if not getattr(func, "is_task", False):
+                msg = f"{job.name} is not a task"
+                raise TypeError(msg)  # noqa: TRY301
+            func(**job.kwargs)
+        except Exception:  # noqa: PERF203
+            logger.exception(
+                "Job %s failed on attempt %d", job.id, job.attempts
+            )
+            _record_failure(job, traceback.format_exc())
+        else:
+            succeeded.append(job.id)
+    if succeeded:
+        Job.objects.filter(id__in=succeeded).update(
+            status=Job.Status.DONE, finished_at=timezone.now()
+        )
+    return len(succeeded)
+
+
+def requeue_stale_jobs(stale_after: float = STALE_AFTER) -> int:
+    """
+    Queue jobs again whose worker appears to have died while running them.
+
+    Args:
+        stale_after (float): Seconds after which a running job is stale.
+
+    Returns:
+        int: Number of jobs queued again.
+    """
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    return Job.objects.filter(
+        status=Job.Status.RUNNING, locked_at__lt=cutoff
+    ).update(status=Job.Status.QUEUED, locked_by="", locked_at=None)
+
+
+def _purge_sessions() -> None:
+    """Purge expired sessions, leaving them for next time if it fails."""
+    try:
+        deleted = purge_expired_sessions()
+    except OperationalError:
+        logger.warning("Failed to purge expired sessions", exc_info=True)
+        return
+    if deleted:
+        logger.info("Purged %d expired sessions", deleted)
+
+
+def _purge_idempotency_keys() -> None:
+    """Purge expired idempotency keys, leaving them for next time on error."""
+    try:
+        deleted = purge_expired_keys()
+    except OperationalError:
+        logger.warning("Failed to purge idempotency keys", exc_info=True)
+        return
+    if deleted:
+        logger.info("Purged %d expired idempotency keys", deleted)
+
+
+def _purge_deleted_items() -> None:
+    """Purge old deleted Items, leaving them for next time if it fails."""
+    try:
+        purged = purge_deleted_items()
+    except OperationalError:
+        logger.warning("Failed to purge deleted items", exc_info=True)
+        return
+    if purged:
+        logger.info("Purged %d deleted items", purged)
+
+
+def _expire_carts() -> None:
+    """Expire abandoned Carts, leaving them for next time if it fails."""
+    try:
+        stats = expire_stale_carts()
+    except OperationalError:
+        logger.warning("Failed to expire abandoned carts", exc_info=True)
+        return
+    if stats.carts:
+        logger.info(
+            "Expired %d abandoned carts with %d lines",
+            stats.carts,
+            stats.lines,
+        )
+
+
+def _apply_markdowns() -> None:
+    """Apply the markdown rules, leaving them for next time if it fails."""
+    try:
+        applied = apply_markdowns()
+    except OperationalError:
+        logger.warning("Failed to apply markdown rules", exc_info=True)
+        return
+    for rule, count in applied.items():
+        if count:
+            logger.info("Markdown rule %s marked down %d items", rule, count)
+
+
+def worker_id() -> str:
+    """
+    Return an identifier for the current worker process.
+
+    Returns:
+        str: The host name and process ID of the worker.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def work(
+    *,
+    burst: bool = False,
+    poll_interval: float = 1.0,
+    housekeeping: bool = True,
+) -> int:
+    """
+    Claim and run jobs in a loop.
+
+    Unless housekeeping is switched off, stale jobs are queued again,
+    expired sessions, expired idempotency keys and old deleted Items are
+    purged, abandoned Carts are expired, and markdown rules are applied
+    periodically between batches.
+
+    Args:
+        burst (bool): Stop once no jobs are due instead of polling forever.
+        poll_interval (float): Seconds to sleep when no jobs are due.
+        housekeeping (bool): Whether to run the periodic housekeeping.
+
+    Returns:
+        int: Number of jobs that were run.
+    """
+    name = worker_id()
+    processed = 0
+    # housekeeping functions and the seconds between their runs
+    periodic = (
+        (
+            (requeue_stale_jobs, STALE_AFTER),
+            (_purge_sessions, settings.SESSION_PURGE_INTERVAL),
+            (_purge_idempotency_keys, settings.IDEMPOTENCY_PURGE_INTERVAL),
+            (_purge_deleted_items, settings.ITEM_PURGE_INTERVAL),
+            (_expire_carts, settings.CART_EXPIRE_INTERVAL),
+            (_apply_markdowns, settings.MARKDOWN_INTERVAL),
+        )
+        if housekeeping
+        else ()
+    )
+    last_runs = [float("-inf")] * len(periodic)
+    while True:
+        for i, (func, interval) in enumerate(periodic):
+            if time.monotonic() - last_runs[i] > interval:
+                func()
+                last_runs[i] = time.monotonic()
+        try:
+            jobs = claim_jobs(name)
+        except OperationalError:
+            # the database is busy, e.g. SQLite's write lock is held
+            logger.warning("Failed to claim a job, retrying", exc_info=True)
+            time.sleep(poll_interval / 10)
+            continue
+        if not jobs:
+            if burst:
+                return processed
+            # only recycle the database connection while idle, so a busy
+            # worker doesn't reconnect for every job
+            close_old_connections()
+            time.sleep(poll_interval)
+            continue
+        run_jobs(jobs)
+        processed += len(jobs)
+
+
+def run_workers(
+    processes: int,
+    *,
+    burst: bool = False,
+    poll_interval: float = 1.0,
+    housekeeping: bool = True,
+) -> None:
+    """
+    Run a pool of worker processes until they exit.
+
+    Only the first worker runs the periodic housekeeping, so the pool
+    doesn't purge, expire and mark down the same rows once per process.
+    Database connections are closed before forking so that no worker
+    inherits the parent's connection.
+
+    Args:
+        processes (int): Number of worker processes to start.
+        burst (bool): Stop each worker once no jobs are due.
+        poll_interval (float): Seconds a worker sleeps when no jobs are due.
+        housekeeping (bool): Whether the first worker runs the periodic
+            housekeeping.
+    """
+    if processes == 1:
+        work(
+            burst=burst,
+            poll_interval=poll_interval,
+            housekeeping=housekeeping,
+        )
+        return
+    connections.close_all()
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(
+            target=work,
+            kwargs={
+                "burst": burst,
+                "poll_interval": poll_interval,
+                "housekeeping": housekeeping and i == 0,
+            },
+            name=f"shop-worker-{i}",
+        )
+        for i in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    try:
+        for process in workers:
+            process.join()
+    finally:
+        for process in workers:
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+
+@task
+def noop() -> None:
+    """Do nothing; used to benchmark the queue itself."""
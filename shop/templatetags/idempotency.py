@@ -0,0 +1,27 @@
+"""Template tags for idempotent form submissions."""
+
+from __future__ import annotations
+
+import uuid
+
+from django import template
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+@register.simple_tag
+def idempotency_key_input() -> str:
+    """
+    Render a hidden input holding a new idempotency key.
+
+    Each rendered form gets its own key, so submitting the same form twice is
+    recognised as a replay.
+
+    Returns:
+        str: The hidden input's HTML.
+    """
+    return format_html(
+        '<input type="hidden" name="idempotency_key" value="{}"/>',
+        uuid.uuid4().hex,
+    )
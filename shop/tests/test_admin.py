@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from shop.facets import price_facets
+from shop.models import Cart, CartItem, Item, Order, PriceChange
+from shop.purge import purge_deleted_items
+from shop.sharding import shard_for_user
+
+
+class ItemAdminTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            username="admin", password="password"
+        )
+        self.client.force_login(self.admin)
+        self.items = [
+            Item.objects.create(
+                name=f"Item {i}", description="Description", price_in_cents=p
+            )
+            for i, p in enumerate((100, 999, 2500))
+        ]
+        self.url = reverse("admin:shop_item_changelist")
+
+    def run_action(self, action, items, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                self.url,
+                {
+                    "action": action,
+                    "_selected_action": [item.id for item in items],
+                    **data,
+                },
+            )
+
+    def test_changelist(self):
+        res = self.client.get(self.url, {"sold": "no"})
+        self.assertEqual(HTTPStatus.OK, res.status_code)
+        self.assertContains(res, "$9.99")
+
+    def test_unfiltered_changelist_estimates_the_count(self):
+        cache.set("admin-count:default:shop.item", 12345)
+        res = self.client.get(self.url, {"o": "2"})
+        self.assertEqual(res.context["cl"].result_count, 12345)
+        for params in ({"sold": "no"}, {"q": "Item"}):
+            res = self.client.get(self.url, params)
+            self.assertEqual(res.context["cl"].result_count, 3)
+
+    def test_only_large_counts_are_cached(self):
+        self.client.get(self.url)
+        self.assertIsNone(cache.get("admin-count:default:shop.item"))
+        with mock.patch("shop.admin.ESTIMATE_THRESHOLD", 3):
+            self.client.get(self.url)
+        self.assertEqual(cache.get("admin-count:default:shop.item"), 3)
+
+    def test_mark_sold_and_unsold(self):
+        self.assertEqual(price_facets(include_sold=False)[1].count, 1)
+        self.run_action("mark_sold", self.items[:2])
+        self.assertEqual(Item.objects.filter(sold_at__isnull=False).count(), 2)
+        # the cached facets are invalidated by the bulk update
+        self.assertEqual(price_facets(include_sold=False)[1].count, 0)
+        self.run_action("mark_unsold", self.items)
+        self.assertFalse(Item.objects.filter(sold_at__isnull=False).exists())
+
+    def test_reprice(self):
+        self.items[2].sold_at = timezone.now()
+        self.items[2].save()
+        with CaptureQueriesContext(connection) as queries:
+            self.run_action("reprice", self.items, percentage=-25)
+        updates = [
+            q for q in queries if q["sql"].startswith('UPDATE "shop_item"')
+        ]
+        self.assertEqual(len(updates), 1)
+        prices = [
+            item.price_in_cents
+            for item in Item.objects.order_by("id").only("price_in_cents")
+        ]
+        # sold items keep their prices
+        self.assertEqual(prices, [75, 749, 2500])
+        # the new prices are recorded in the price history
+        self.assertEqual(
+            list(
+                PriceChange.objects.filter(item=self.items[0]).values_list(
+                    "price_in_cents", flat=True
+                )
+            ),
+            [100, 75],
+        )
+
+    def test_reprice_needs_percentage(self):
+        res = self.run_action("reprice", self.items)
+        self.assertEqual(HTTPStatus.FOUND, res.status_code)
+        self.assertEqual(
+            Item.objects.get(id=self.items[0].id).price_in_cents, 100
+        )
+
+    def test_delete_is_soft_and_purge_updates_cart_totals(self):
+        cart = Cart.objects.create(user=self.admin)
+        for item in self.items:
+            cart.add_item(item)
+        self.run_action("delete_selected", self.items[:2], post="yes")
+        self.assertEqual(Item.objects.count(), 1)
+        self.assertEqual(Item.all_objects.count(), 3)
+        self.assertEqual(price_facets(include_sold=False)[1].count, 0)
+        self.assertEqual(purge_deleted_items(timedelta(0)), 2)
+        self.assertEqual(Item.all_objects.count(), 1)
+        self.assertEqual(CartItem.objects.filter(cart=cart).count(), 1)
+        cart.refresh_from_db()
+        self.assertEqual(cart.total_in_cents, 2500)
+
+    def test_cart_and_order_changelists(self):
+        cart = Cart.objects.create(user=self.admin)
+        cart.add_item(self.items[0])
+        Order.objects.create(cart=cart, email="buyer@example.com")
+        for name in ("cart", "order"):
+            res = self.client.get(reverse(f"admin:shop_{name}_changelist"))
+            self.assertEqual(HTTPStatus.OK, res.status_code)
+            self.assertContains(res, "$1.00")
+
+
+SHARDS = ["shard0", "shard1"]
+
+
+@override_settings(SHARD_DATABASES=SHARDS)
+class ShardedAdminTests(TestCase):
+    databases = {"default", *SHARDS}
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            username="admin", password="password"
+        )
+        self.client.force_login(self.admin)
+        item = Item.objects.create(
+            name="Lamp", description="Description", price_in_cents=100
+        )
+        # one buyer per shard
+        self.buyers = [
+            User.objects.create_user(username=f"buyer{i}") for i in range(2)
+        ]
+        self.carts = {}
+        for buyer in self.buyers:
+            cart = Cart.get_active_cart(buyer)
+            cart.add_item(item)
+            self.carts[shard_for_user(buyer.pk)] = cart
+
+    def changelist(self, name, **params):
+        return self.client.get(
+            reverse(f"admin:shop_{name}_changelist"), params
+        )
+
+    def test_changelist_lists_one_shard_at_a_time(self):
+        for shard, cart in self.carts.items():
+            res = self.changelist("cart", shard=shard)
+            self.assertEqual(HTTPStatus.OK, res.status_code)
+            self.assertEqual(list(res.context["cl"].result_list), [cart])
+            self.assertContains(res, cart.user.username)
+        # the first shard by default
+        res = self.changelist("cart")
+        self.assertEqual(
+            list(res.context["cl"].result_list), [self.carts[SHARDS[0]]]
+        )
+
+    def test_users_are_searched_in_the_default_database(self):
+        cart = self.carts[SHARDS[1]]
+        res = self.changelist("cart", shard=SHARDS[1], q=cart.user.username)
+        self.assertEqual(list(res.context["cl"].result_list), [cart])
+
+    def test_change_view_finds_objects_in_their_shard(self):
+        cart = self.carts[SHARDS[1]]
+        res = self.client.get(
+            reverse("admin:shop_cart_change", args=[cart.id])
+        )
+        self.assertEqual(HTTPStatus.OK, res.status_code)
+        self.assertEqual(res.context["original"], cart)
+        # the inline lists the Cart's lines from its shard
+        self.assertContains(res, "Lamp")
+        order = cart.checkout("Jane", "Doe", "jane@example.com")
+        res = self.client.get(
+            reverse("admin:shop_order_change", args=[order.id])
+        )
+        self.assertEqual(HTTPStatus.OK, res.status_code)
+        res = self.client.get(reverse("admin:shop_order_add"))
+        self.assertEqual(HTTPStatus.FORBIDDEN, res.status_code)
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from shop.carts import expire_stale_carts
+from shop.models import Cart, CartItem, Item, Order
+from shop.sharding import shard_for_user
+
+SHARDS = ["shard0", "shard1"]
+
+
+class CartExpiryTests(TestCase):
+    databases = {"default", *SHARDS}
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(username=f"user{i}") for i in range(4)
+        ]
+        self.item = Item.objects.create(
+            name="Lamp", description="", price_in_cents=500
+        )
+
+    def age(self, cart, days):
+        Cart.objects.using(shard_for_user(cart.user_id)).filter(
+            id=cart.id
+        ).update(updated_at=timezone.now() - timedelta(days=days))
+
+    def test_expires_stale_active_carts_in_batches(self):
+        empty, full, fresh, ordered = (
+            Cart.get_active_cart(user) for user in self.users
+        )
+        full.add_item(self.item)
+        ordered.add_item(self.item)
+        ordered.checkout("Jo", "Doe", "")
+        fresh.add_item(self.item)
+        for cart in (empty, full, ordered):
+            self.age(cart, 30)
+        self.age(fresh, 1)
+        with self.settings(CART_EXPIRE_AFTER=14 * 24 * 3600):
+            stats = expire_stale_carts(batch_size=1)
+        self.assertEqual((stats.carts, stats.lines, stats.rows), (2, 1, 3))
+        self.assertEqual(
+            sorted(Cart.objects.values_list("id", flat=True)),
+            [fresh.id, ordered.id],
+        )
+        self.assertEqual(CartItem.objects.count(), 2)
+        self.assertTrue(Order.objects.filter(cart=ordered).exists())
+        cart = Cart.get_active_cart(self.users[1])
+        self.assertNotEqual(cart.id, full.id)
+        self.assertEqual(cart.total_in_cents, 0)
+
+    def test_adding_an_item_keeps_the_cart(self):
+        cart = Cart.get_active_cart(self.users[0])
+        self.age(cart, 30)
+        cart.add_item(self.item)
+        self.assertEqual(expire_stale_carts(timedelta(days=14)).rows, 0)
+
+    def test_checkout_leaves_the_next_cart_for_later(self):
+        cart = Cart.get_active_cart(self.users[0])
+        cart.add_item(self.item)
+        cart.checkout("Jo", "Doe", "")
+        self.assertFalse(Cart.objects.filter(active=True).exists())
+
+    @override_settings(SHARD_DATABASES=SHARDS)
+    def test_command_expires_carts_in_every_shard(self):
+        for user in self.users[:2]:
+            self.age(Cart.get_active_cart(user), 30)
+        self.assertEqual(
+            {shard_for_user(user.pk) for user in self.users[:2]}, set(SHARDS)
+        )
+        out = StringIO()
+        call_command("expire_carts", "--older-than-days", "14", stdout=out)
+        self.assertIn("Expired 2 carts with 0 lines", out.getvalue())
+        for shard in SHARDS:
+            self.assertFalse(Cart.objects.using(shard).exists())
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from django.test import SimpleTestCase, override_settings
+
+from shop.checks import check_session_cache, check_shared_cache
+
+SHARED_CACHE = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": "/tmp/garage-sale-cache",
+    }
+}
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    def test_local_cache_is_reported(self):
+        [warning] = check_shared_cache(None)
+        self.assertEqual(warning.id, "shop.W001")
+
+    @override_settings(CACHES=SHARED_CACHE)
+    def test_shared_cache_passes(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+
+class SessionCacheCheckTests(SimpleTestCase):
+    def test_database_sessions_pass(self):
+        self.assertEqual(check_session_cache(None), [])
+
+    @override_settings(
+        SESSION_ENGINE="django.contrib.sessions.backends.cached_db"
+    )
+    def test_sessions_cached_per_process_are_reported(self):
+        [warning] = check_session_cache(None)
+        self.assertEqual(warning.id, "shop.W002")
+
+    @override_settings(
+        CACHES=SHARED_CACHE,
+        SESSION_ENGINE="django.contrib.sessions.backends.cached_db",
+    )
+    def test_sessions_cached_in_a_shared_cache_pass(self):
+        self.assertEqual(check_session_cache(None), [])
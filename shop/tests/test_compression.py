@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import gzip
+from http import HTTPStatus
+from unittest import skipIf
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from shop.compression import CompressionMiddleware, accepts, brotli
+
+PAGE = b"<p>Garage sale</p>" * 200
+
+
+@override_settings(COMPRESS_MIN_SIZE=1024)
+class CompressionMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def respond(self, response, accept_encoding="gzip, br"):
+        request = self.factory.get(
+            "/", headers={"Accept-Encoding": accept_encoding}
+        )
+        return CompressionMiddleware(lambda _: response)(request)
+
+    def test_gzips_large_text_responses(self):
+        response = self.respond(HttpResponse(PAGE), "gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(gzip.decompress(response.content), PAGE)
+
+    def test_leaves_small_responses(self):
+        response = self.respond(HttpResponse(b"<p>Lamp</p>"))
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, b"<p>Lamp</p>")
+
+    def test_leaves_binary_responses(self):
+        response = self.respond(HttpResponse(PAGE, content_type="image/jpeg"))
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_leaves_responses_the_client_cannot_decode(self):
+        response = self.respond(HttpResponse(PAGE), "identity")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_leaves_not_modified_responses(self):
+        response = self.respond(HttpResponse(status=HTTPStatus.NOT_MODIFIED))
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_compresses_streaming_responses(self):
+        response = self.respond(
+            StreamingHttpResponse(iter([PAGE, PAGE])), "gzip"
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        content = b"".join(response.streaming_content)
+        self.assertEqual(gzip.decompress(content), PAGE + PAGE)
+
+    @skipIf(brotli is None, "brotli is not installed")
+    def test_prefers_brotli(self):
+        response = self.respond(HttpResponse(PAGE))
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(brotli.decompress(response.content), PAGE)
+
+    @skipIf(brotli is None, "brotli is not installed")
+    def test_brotli_streaming_responses(self):
+        response = self.respond(StreamingHttpResponse(iter([PAGE, PAGE])))
+        self.assertEqual(response["Content-Encoding"], "br")
+        content = b"".join(response.streaming_content)
+        self.assertEqual(brotli.decompress(content), PAGE + PAGE)
+
+    @skipIf(brotli is None, "brotli is not installed")
+    def test_weakens_strong_etags(self):
+        page = HttpResponse(PAGE)
+        page["ETag"] = '"abc"'
+        self.assertEqual(self.respond(page)["ETag"], 'W/"abc"')
+
+
+class AcceptsTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def accepts(self, header, coding):
+        request = self.factory.get("/", headers={"Accept-Encoding": header})
+        return accepts(request, coding)
+
+    def test_listed_codings(self):
+        self.assertTrue(self.accepts("gzip, deflate, br", "br"))
+        self.assertTrue(self.accepts("gzip;q=0.5, br;q=1.0", "br"))
+        self.assertFalse(self.accepts("gzip", "br"))
+
+    def test_quality_zero_refuses(self):
+        self.assertFalse(self.accepts("gzip, br;q=0", "br"))
+        self.assertFalse(self.accepts("*, br;q=0", "br"))
+        self.assertFalse(self.accepts("br;q=oops", "br"))
+
+    def test_wildcard(self):
+        self.assertTrue(self.accepts("*", "br"))
+        self.assertFalse(self.accepts("", "br"))
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from http import HTTPStatus
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from shop.models import Cart, Item, ItemConflictError
+
+
+class ItemCompareAndSwapTests(TestCase):
+    def setUp(self):
+        self.item = Item.objects.create(
+            name="Lamp", description="Brass", price_in_cents=1000
+        )
+
+    def load(self):
+        return Item.objects.get(id=self.item.id)
+
+    def updates(self, queries):
+        return [
+            q["sql"]
+            for q in queries
+            if q["sql"].startswith('UPDATE "shop_item"')
+        ]
+
+    def test_only_changed_fields_are_written(self):
+        item = self.load()
+        item.price_in_cents = 800
+        with CaptureQueriesContext(connection) as queries:
+            item.save()
+        [sql] = self.updates(queries)
+        self.assertIn('"price_in_cents" = 800', sql)
+        self.assertIn('"version" = 0', sql.split("WHERE")[1])
+        self.assertNotIn('"name"', sql)
+        self.assertNotIn("FOR UPDATE", " ".join(q["sql"] for q in queries))
+        with CaptureQueriesContext(connection) as queries:
+            item.save()
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(self.load().version, 1)
+
+    def test_stale_edit_conflicts(self):
+        first, second = self.load(), self.load()
+        first.price_in_cents = 800
+        first.save()
+        second.price_in_cents = 900
+        with self.assertRaisesMessage(ItemConflictError, "changed by"):
+            second.save()
+        self.assertEqual(second.version, 0)
+        self.assertEqual(second.price_in_cents, 900)
+        self.assertEqual(self.load().price_in_cents, 800)
+        second.refresh_from_db()
+        second.price_in_cents = 900
+        second.save()
+        self.assertEqual(self.load().price_in_cents, 900)
+
+    def test_interleaved_edit_and_sale_lose_nothing(self):
+        editor, till = self.load(), self.load()
+        editor.name = "Brass lamp"
+        editor.save()
+        sold_at = timezone.now()
+        till.mark_sold(sold_at)
+        item = self.load()
+        self.assertEqual(item.name, "Brass lamp")
+        self.assertEqual(item.sold_at, sold_at)
+        self.assertEqual(item.version, 2)
+        editor.price_in_cents = 1
+        with self.assertRaisesMessage(ItemConflictError, "changed by"):
+            editor.save()
+        self.assertEqual(self.load().sold_at, sold_at)
+
+    def test_item_cannot_be_sold_twice(self):
+        first, second = self.load(), self.load()
+        first.mark_sold(timezone.now())
+        with self.assertRaisesMessage(ItemConflictError, "no longer for sale"):
+            second.mark_sold(timezone.now())
+        self.assertEqual(self.load().version, 1)
+
+
+class ItemConflictViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="editor", password="password"
+        )
+        self.client.force_login(self.user)
+        self.item = Item.objects.create(
+            name="Lamp", description="Brass", price_in_cents=1000
+        )
+
+    def edit(self, version, price):
+        return self.client.post(
+            reverse("item-update", args=[self.item.id]),
+            {
+                "name": "Lamp",
+                "description": "Brass",
+                "price_in_cents": price,
+                "version": version,
+            },
+        )
+
+    def test_stale_form_shows_current_details(self):
+        res = self.edit(0, 900)
+        self.assertEqual(HTTPStatus.FOUND, res.status_code)
+        res = self.edit(0, 800)
+        self.assertEqual(HTTPStatus.CONFLICT, res.status_code)
+        self.assertTrue(res.context["conflict"])
+        self.assertContains(
+            res, 'value="900"', status_code=HTTPStatus.CONFLICT
+        )
+        self.assertEqual(res.context["form"]["version"].value(), 1)
+        res = self.edit(1, 800)
+        self.assertEqual(HTTPStatus.FOUND, res.status_code)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.price_in_cents, 800)
+
+    def test_checkout_drops_items_sold_meanwhile(self):
+        other = Item.objects.create(
+            name="Rug", description="Wool", price_in_cents=500
+        )
+        cart = Cart.get_active_cart(self.user)
+        cart.add_item(self.item)
+        cart.add_item(other)
+        Item.objects.get(id=self.item.id).mark_sold(timezone.now())
+        res = self.client.post(reverse("checkout"), {"first_name": "Jo"})
+        self.assertEqual(HTTPStatus.CONFLICT, res.status_code)
+        self.assertTrue(res.context["sold_items_removed"])
+        self.assertContains(
+            res, "were just sold", count=1, status_code=HTTPStatus.CONFLICT
+        )
+        self.assertEqual(list(cart.items.all()), [other])
+        other.refresh_from_db()
+        self.assertFalse(other.is_sold())
+        res = self.client.post(reverse("checkout"), {"first_name": "Jo"})
+        self.assertEqual(HTTPStatus.FOUND, res.status_code)
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from http import HTTPStatus
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import TestCase
+from django.urls import reverse
+
+from shop.conditional import catalogue_version
+from shop.models import CatalogueVersion, Item
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.item = Item.objects.create(
+            name="Lamp", description="", price_in_cents=500
+        )
+
+    def test_unchanged_page_is_not_modified(self):
+        url = reverse("item-list")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertTrue(response["ETag"].startswith('W/"'))
+        # only the catalogue version is read
+        with self.assertNumQueries(1), self.assertTemplateNotUsed(
+            "shop/item_list.html"
+        ):
+            response = self.client.get(
+                url, headers={"If-None-Match": response["ETag"]}
+            )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+    def test_last_modified_is_honoured(self):
+        url = reverse("item-detail", args=[self.item.id])
+        response = self.client.get(url)
+        response = self.client.get(
+            url, headers={"If-Modified-Since": response["Last-Modified"]}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_saving_an_item_changes_the_version(self):
+        url = reverse("item-list")
+        etag = self.client.get(url)["ETag"]
+        token, _ = catalogue_version()
+        self.item.name = "Desk lamp"
+        self.item.save()
+        self.assertNotEqual(catalogue_version()[0], token)
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, "Desk lamp")
+
+    def test_changes_made_by_other_processes_change_the_etag(self):
+        url = reverse("item-list")
+        etag = self.client.get(url)["ETag"]
+        # a background worker starts a new version in its own process
+        CatalogueVersion.objects.update(token="0" * 32)
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_rolled_back_changes_keep_the_version(self):
+        token, _ = catalogue_version()
+        with transaction.atomic():
+            self.item.name = "Desk lamp"
+            self.item.save()
+            transaction.set_rollback(True)
+        self.assertEqual(catalogue_version()[0], token)
+
+    def test_adding_to_the_cart_changes_the_etag(self):
+        user = User.objects.create_user(username="jo", password="secret")
+        self.client.force_login(user)
+        url = reverse("item-list")
+        etag = self.client.get(url)["ETag"]
+        self.client.post(reverse("cart-add"), {"item_id": self.item.id})
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_depends_on_the_user(self):
+        url = reverse("item-list")
+        etag = self.client.get(url)["ETag"]
+        user = User.objects.create_user(username="jo", password="secret")
+        self.client.force_login(user)
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
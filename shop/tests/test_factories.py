@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db.models import Count, F, Sum
+from django.test import TestCase, override_settings
+
+from shop.factories import seed
+from shop.models import Cart, CartItem, Item, Order, PriceChange, Seller
+from shop.sharding import shard_for_user
+
+SHARDS = ["shard0", "shard1"]
+
+
+class SeedTests(TestCase):
+    databases = {"default", *SHARDS}
+
+    def test_creates_consistent_data(self):
+        stats = seed(sellers=5, items=300, users=40, batch_size=70)
+        self.assertEqual(Seller.objects.count(), stats.sellers)
+        self.assertEqual(Item.objects.count(), stats.items)
+        self.assertEqual(PriceChange.objects.count(), stats.items)
+        self.assertEqual(User.objects.count(), stats.users)
+        self.assertEqual(Cart.objects.count(), stats.carts)
+        self.assertEqual(CartItem.objects.count(), stats.lines)
+        self.assertEqual(Order.objects.count(), stats.orders)
+        self.assertEqual(
+            stats.rows,
+            5 + 300 + 300 + 40 + stats.carts + stats.lines + stats.orders,
+        )
+        sold = Item.objects.filter(sold_at__isnull=False)
+        self.assertGreater(stats.orders, 0)
+        self.assertEqual(
+            CartItem.objects.filter(cart__active=False).count(), sold.count()
+        )
+        self.assertFalse(
+            CartItem.objects.filter(
+                cart__active=True, item__sold_at__isnull=False
+            ).exists()
+        )
+        self.assertFalse(sold.filter(listed_at__gt=F("sold_at")).exists())
+        self.assertFalse(Order.objects.filter(receipt_sent_at=None).exists())
+        totals = Cart.objects.annotate(
+            lines_total=Sum(CartItem.line_total_expression("lines__"))
+        )
+        self.assertFalse(
+            totals.exclude(total_in_cents=F("lines_total")).exists()
+        )
+        active = Cart.objects.filter(active=True).values("user")
+        self.assertFalse(
+            active.annotate(carts=Count("id")).filter(carts__gt=1).exists()
+        )
+
+    def test_same_seed_same_data(self):
+        seed(items=50, users=10, seed=7)
+        seed(items=50, users=10, seed=7)
+        seed(items=50, users=10, seed=8)
+        rows = list(
+            Item.objects.order_by("id").values_list(
+                "name", "description", "price_in_cents"
+            )
+        )
+        self.assertEqual(rows[:50], rows[50:100])
+        self.assertNotEqual(rows[:50], rows[100:])
+        self.assertEqual(
+            User.objects.filter(username__startswith="seed-").count(), 30
+        )
+
+    def test_new_rows_get_new_ids(self):
+        seed(items=20, users=5)
+        last_item = Item.objects.latest("id")
+        last_user = User.objects.latest("id")
+        item = Item.objects.create(
+            name="Lamp", description="", price_in_cents=500
+        )
+        self.assertEqual(item.id, last_item.id + 1)
+        user = User.objects.create_user(username="jo")
+        self.assertEqual(user.id, last_user.id + 1)
+
+    @override_settings(SHARD_DATABASES=SHARDS)
+    def test_carts_live_in_their_users_shard(self):
+        stats = seed(items=200, users=20)
+        carts = 0
+        for shard in SHARDS:
+            for cart in Cart.objects.using(shard):
+                self.assertEqual(shard_for_user(cart.user_id), shard)
+                carts += 1
+        self.assertEqual(carts, stats.carts)
+        user = User.objects.create_user(username="jo")
+        shard = shard_for_user(user.id)
+        seeded = Cart.objects.using(shard).order_by("-id").first()
+        cart = Cart.get_active_cart(user)
+        self.assertGreater(cart.id, seeded.id)
+        cart.add_item(Item.objects.filter(sold_at=None).first())
+        cart.checkout("Jo", "Doe", "")
+
+    def test_command(self):
+        out = StringIO()
+        call_command(
+            "seed_data",
+            "--sellers",
+            "2",
+            "--items",
+            "30",
+            "--users",
+            "3",
+            stdout=out,
+        )
+        self.assertIn("Created 2 sellers, 30 items", out.getvalue())
+        self.assertEqual(Item.objects.count(), 30)
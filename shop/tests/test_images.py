@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import io
+import tempfile
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.datastructures import MultiValueDict
+from PIL import Image
+
+from shop.forms import ItemForm
+from shop.images import (
+    generate_thumbnails,
+    image_filename,
+    image_path,
+    process_thumbnails,
+    store_upload,
+)
+from shop.models import Item, ItemImage
+
+
+def make_upload(color: str, size=(800, 600), name="photo.png"):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), "image/png")
+
+
+class ImageStorageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root.name
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.media_root.cleanup()
+
+    def test_store_upload_deduplicates(self):
+        first = store_upload(make_upload("red"))
+        second = store_upload(make_upload("red", name="copy.png"))
+        other = store_upload(make_upload("blue"))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first.digest, other.digest)
+        self.assertEqual((first.width, first.height), (800, 600))
+        self.assertEqual(first.extension, "png")
+        stored = image_path(image_filename(first.digest, "png", None))
+        self.assertTrue(stored.exists())
+        self.assertEqual(len(list(stored.parent.parent.glob("*/*.png"))), 2)
+
+    def test_failed_save_deletes_new_images(self):
+        kept = store_upload(make_upload("red"))
+        ItemImage.objects.create(
+            item=Item.objects.create(
+                name="Lamp", description="Description", price_in_cents=100
+            ),
+            digest=kept.digest,
+            extension=kept.extension,
+            width=kept.width,
+            height=kept.height,
+        )
+        form = ItemForm(
+            {"name": "Chair", "description": "Chair", "price_in_cents": 500},
+            MultiValueDict(
+                {"images": [make_upload("blue"), make_upload("red")]}
+            ),
+        )
+        self.assertTrue(form.is_valid())
+        with mock.patch.object(
+            ItemImage.objects,
+            "create",
+            side_effect=[ItemImage(), DatabaseError],
+        ), self.assertRaises(DatabaseError):  # noqa: PT027
+            form.save()
+        self.assertFalse(Item.objects.filter(name="Chair").exists())
+        stored = list(image_path("ab").parent.parent.glob("*/*.png"))
+        self.assertEqual(
+            [path.name for path in stored],
+            [image_filename(kept.digest, "png", None)],
+        )
+
+    def test_generate_thumbnails(self):
+        stored = store_upload(make_upload("green", size=(400, 300)))
+        self.assertEqual(generate_thumbnails(stored.digest, "png"), [160, 320])
+        # existing thumbnails aren't generated again
+        self.assertEqual(generate_thumbnails(stored.digest, "png"), [])
+        thumbnail = image_path(image_filename(stored.digest, "png", 160))
+        with Image.open(thumbnail) as image:
+            self.assertEqual(image.size, (160, 120))
+
+    def test_process_thumbnails_marks_images_ready(self):
+        stored = store_upload(make_upload("green", size=(400, 300)))
+        item = Item.objects.create(
+            name="Lamp", description="Description", price_in_cents=100
+        )
+        image = ItemImage.objects.create(
+            item=item,
+            digest=stored.digest,
+            extension=stored.extension,
+            width=stored.width,
+            height=stored.height,
+        )
+        self.assertEqual(image.srcset(), f"{image.url()} 400w")
+        process_thumbnails(stored.digest, stored.extension)
+        image.refresh_from_db()
+        self.assertTrue(image.thumbnails_ready)
+        self.assertEqual(
+            image.srcset(),
+            f"{image.url(160)} 160w, {image.url(320)} 320w, "
+            f"{image.url()} 400w",
+        )
+
+    def test_item_image_view(self):
+        stored = store_upload(make_upload("red"))
+        filename = image_filename(stored.digest, stored.extension, None)
+        res = self.client.get(reverse("item-image", args=(filename,)))
+        self.assertEqual(HTTPStatus.OK, res.status_code)
+        self.assertEqual(res["Content-Type"], "image/png")
+        self.assertIn("immutable", res["Cache-Control"])
+        self.assertEqual(
+            b"".join(res.streaming_content),
+            image_path(filename).read_bytes(),
+        )
+        missing = image_filename("0" * 64, "png", None)
+        res = self.client.get(reverse("item-image", args=(missing,)))
+        self.assertEqual(HTTPStatus.NOT_FOUND, res.status_code)
+        res = self.client.get(reverse("item-image", args=("..%2Fsecret",)))
+        self.assertEqual(HTTPStatus.NOT_FOUND, res.status_code)
+
+    def test_create_item_with_images(self):
+        user = User.objects.create_user(username="seller", password="password")
+        self.client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            res = self.client.post(
+                reverse("item-create"),
+                {
+                    "name": "Chair",
+                    "description": "Description",
+                    "price_in_cents": 500,
+                    "images": [make_upload("red"), make_upload("blue")],
+                },
+            )
+        self.assertEqual(HTTPStatus.FOUND, res.status_code)
+        item = Item.objects.get(name="Chair")
+        self.assertEqual(item.images.count(), 2)
+        self.assertFalse(item.images.filter(thumbnails_ready=True).exists())
+        # thumbnailing is deferred until after the transaction commits
+        thumbnail_callbacks = [
+            callback
+            for callback in callbacks
+            if "schedule_thumbnails" in callback.__qualname__
+        ]
+        self.assertEqual(len(thumbnail_callbacks), 2)
+        res = self.client.get(reverse("item-list"))
+        self.assertContains(res, 'loading="lazy"')
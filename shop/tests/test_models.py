@@ -2,7 +2,7 @@ from django.contrib.auth.models import User
 from django.test import TestCase
 from django.utils import timezone
 
-from shop.models import Cart, Item
+from shop.models import Cart, CartItem, Item
 
 
 class ItemModelTests(TestCase):
@@ -155,3 +155,51 @@ class CartModelTests(TestCase):
         cart.delete()
         self.cart.active = True
         self.cart.save()
+
+
+class CartLineTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="buyer")
+        self.cart = Cart.objects.create(user=self.user)
+        self.lamp = Item.objects.create(
+            name="Lamp", description="Description", price_in_cents=250
+        )
+        self.plates = Item.objects.create(
+            name="Plates", description="Box of plates", price_in_cents=75
+        )
+
+    def test_price_is_captured(self):
+        self.assertTrue(self.cart.add_item(self.lamp))
+        self.lamp.price_in_cents = 999
+        self.lamp.save()
+        line = CartItem.objects.get(cart=self.cart, item=self.lamp)
+        self.assertEqual(line.price_in_cents, 250)
+        self.assertEqual(self.cart.compute_total(), 250)
+        self.assertTrue(self.cart.remove_item(self.lamp))
+        self.assertEqual(self.cart.total_in_cents, 0)
+
+    def test_quantities(self):
+        self.assertTrue(self.cart.add_item(self.plates, quantity=4))
+        self.assertTrue(self.cart.add_item(self.plates, quantity=2))
+        self.assertTrue(self.cart.add_item(self.lamp))
+        self.assertFalse(self.cart.add_item(self.lamp, quantity=0))
+        line = CartItem.objects.get(cart=self.cart, item=self.plates)
+        self.assertEqual(line.quantity, 6)
+        self.assertEqual(line.format_total(), "$4.50")
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.total_in_cents, 700)
+        self.assertEqual(self.cart.format_total(), "$7.00")
+
+    def test_adding_single_item_again_changes_nothing(self):
+        self.assertTrue(self.cart.add_item(self.lamp))
+        self.assertTrue(self.cart.add_item(self.lamp))
+        line = CartItem.objects.get(cart=self.cart, item=self.lamp)
+        self.assertEqual(line.quantity, 1)
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.total_in_cents, 250)
+
+    def test_total_is_one_aggregate_query(self):
+        self.cart.add_item(self.lamp)
+        self.cart.add_item(self.plates, quantity=3)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.cart.compute_total(), 475)
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from unittest import mock
+
+from django.db import DatabaseError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from shop import pricing
+from shop.models import Item, MarkdownRule, PriceChange
+from shop.pricing import apply_markdown_rule, markdown_report
+from shop.tasks import work
+
+
+class PriceHistoryTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.item = Item.objects.create(
+            name="Lamp", description="Description", price_in_cents=1000
+        )
+
+    def history(self, item):
+        return list(
+            item.price_history.values_list("price_in_cents", flat=True)
+        )
+
+    def test_price_changes_are_recorded(self):
+        self.item.name = "Desk lamp"
+        self.item.save()
+        self.item.price_in_cents = 800
+        self.item.save()
+        item = Item.objects.get(id=self.item.id)
+        item.price_in_cents = 600
+        item.save(update_fields=["price_in_cents"])
+        self.assertEqual(self.history(self.item), [1000, 800, 600])
+
+    def test_price_at(self):
+        PriceChange.objects.filter(item=self.item).update(
+            effective_at=self.now - timedelta(days=10)
+        )
+        PriceChange.objects.create(
+            item=self.item,
+            price_in_cents=500,
+            effective_at=self.now - timedelta(days=2),
+        )
+        self.assertIsNone(self.item.price_at(self.now - timedelta(days=20)))
+        self.assertEqual(
+            self.item.price_at(self.now - timedelta(days=5)), 1000
+        )
+        self.assertEqual(self.item.price_at(self.now), 500)
+        item = Item.objects.annotate(
+            then=PriceChange.price_as_of(self.now - timedelta(days=5))
+        ).get()
+        self.assertEqual(item.then, 1000)
+
+
+class MarkdownReportTests(TestCase):
+    def mark_down(self, prices, *, sold_after=None):
+        now = timezone.now()
+        item = Item.objects.create(
+            name="Item", description="", price_in_cents=prices[0]
+        )
+        PriceChange.objects.filter(item=item).update(
+            effective_at=now - timedelta(days=30)
+        )
+        for i, price in enumerate(prices[1:]):
+            PriceChange.objects.create(
+                item=item,
+                price_in_cents=price,
+                effective_at=now - timedelta(days=20 - 10 * i),
+            )
+        if sold_after is not None:
+            Item.objects.filter(id=item.id).update(
+                sold_at=now - timedelta(days=20 - 10 * sold_after - 3)
+            )
+
+    def test_markdowns_are_credited_until_the_next_change(self):
+        # a 5% cut that didn't sell
+        self.mark_down([1000, 950])
+        # a 30% cut that sold 3 days later
+        self.mark_down([1000, 700], sold_after=0)
+        # a 20% cut, then a 60% cut that sold 3 days later
+        self.mark_down([1000, 800, 320], sold_after=1)
+        # a price increase isn't a markdown
+        self.mark_down([1000, 1200])
+
+        report = {band.label: band for band in markdown_report()}
+        self.assertEqual(list(report), ["0-10%", "10-25%", "25-50%", "50%+"])
+        self.assertEqual(
+            [(b.markdowns, b.sold) for b in report.values()],
+            [(1, 0), (1, 0), (1, 1), (1, 1)],
+        )
+        self.assertEqual(report["25-50%"].time_to_sell, timedelta(days=3))
+        self.assertEqual(report["50%+"].sell_through, 1.0)
+        self.assertIsNone(report["0-10%"].time_to_sell)
+
+
+class MarkdownRuleTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.items = [
+            Item.objects.create(
+                name=f"Item {i}",
+                description="",
+                price_in_cents=1000,
+                listed_at=self.now - timedelta(days=i),
+            )
+            for i in range(5)
+        ]
+        self.items[4].sold_at = self.now
+        self.items[4].save()
+
+    def prices(self):
+        return list(
+            Item.objects.order_by("id").values_list(
+                "price_in_cents", flat=True
+            )
+        )
+
+    def test_rule_marks_down_unsold_items_once(self):
+        rule = MarkdownRule.objects.create(name="20% off", percentage=20)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(apply_markdown_rule(rule, batch_size=3), 4)
+        # one UPDATE and one INSERT ... SELECT per batch of IDs
+        statements = [
+            query["sql"].split()[0]
+            for query in queries
+            if query["sql"].startswith(
+                ('UPDATE "shop_item"', 'INSERT INTO "shop_pricechange"')
+            )
+        ]
+        self.assertEqual(statements, ["UPDATE", "INSERT"] * 2)
+        self.assertEqual(self.prices(), [800, 800, 800, 800, 1000])
+        self.assertEqual(
+            PriceChange.objects.filter(rule=rule, price_in_cents=800).count(),
+            4,
+        )
+        self.assertEqual(self.items[0].price_at(timezone.now()), 800)
+
+        # only Items listed since the last run are marked down again
+        Item.objects.create(name="New", description="", price_in_cents=500)
+        self.assertEqual(apply_markdown_rule(rule), 1)
+        self.assertEqual(self.prices(), [800, 800, 800, 800, 1000, 400])
+
+    def test_rule_waits_for_items_to_be_listed_long_enough(self):
+        rule = MarkdownRule.objects.create(
+            name="50% off after 2 days",
+            percentage=50,
+            min_listed_for=timedelta(days=2),
+        )
+        run_at = self.now + timedelta(minutes=1)
+        self.assertEqual(apply_markdown_rule(rule, run_at), 2)
+        self.assertEqual(self.prices(), [1000, 1000, 500, 500, 1000])
+        # a day later the Item listed a day before the first run qualifies
+        run_at += timedelta(days=1)
+        self.assertEqual(apply_markdown_rule(rule, run_at), 1)
+        self.assertEqual(self.prices(), [1000, 500, 500, 500, 1000])
+
+    def test_interrupted_run_is_resumed(self):
+        rule = MarkdownRule.objects.create(name="20% off", percentage=20)
+        record = pricing._record_markdowns  # noqa: SLF001
+        calls = []
+
+        def fail_second_batch(*args):
+            calls.append(args)
+            if len(calls) == 2:  # noqa: PLR2004
+                msg = "connection lost"
+                raise DatabaseError(msg)
+            record(*args)
+
+        with (
+            mock.patch.object(
+                pricing, "_record_markdowns", side_effect=fail_second_batch
+            ),
+            self.assertRaises(DatabaseError),  # noqa: PT027
+        ):
+            apply_markdown_rule(rule, batch_size=3)
+        self.assertEqual(self.prices(), [800, 800, 800, 1000, 1000])
+        rule.refresh_from_db()
+        # the run isn't finished, so it keeps its place
+        self.assertIsNone(rule.applied_at)
+        run_at = rule.run_at
+        self.assertEqual(apply_markdown_rule(rule, batch_size=3), 1)
+        self.assertEqual(self.prices(), [800, 800, 800, 800, 1000])
+        rule.refresh_from_db()
+        self.assertEqual(rule.applied_at, run_at)
+        self.assertIsNone(rule.run_at)
+        self.assertEqual(apply_markdown_rule(rule), 0)
+
+    def test_rules_that_cannot_run(self):
+        future = MarkdownRule.objects.create(
+            name="Later",
+            percentage=20,
+            starts_at=self.now + timedelta(hours=1),
+        )
+        inactive = MarkdownRule.objects.create(
+            name="Off", percentage=20, active=False
+        )
+        self.assertEqual(apply_markdown_rule(future), 0)
+        self.assertEqual(apply_markdown_rule(inactive), 0)
+        # another worker applied the rule first
+        rule = MarkdownRule.objects.create(name="20% off", percentage=20)
+        MarkdownRule.objects.filter(id=rule.id).update(applied_at=self.now)
+        self.assertEqual(apply_markdown_rule(rule), 0)
+        self.assertEqual(self.prices(), [1000] * 5)
+
+    def test_worker_applies_rules(self):
+        MarkdownRule.objects.create(name="20% off", percentage=20)
+        work(burst=True)
+        self.assertEqual(self.prices(), [800, 800, 800, 800, 1000])
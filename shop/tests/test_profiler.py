@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import os
+import signal
+import tempfile
+import threading
+from http import HTTPStatus
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from shop import profiler, views
+
+
+def spin(stop):
+    while not stop.is_set():
+        pass
+
+
+class ProfilerTests(SimpleTestCase):
+    def setUp(self):
+        self.stop = threading.Event()
+        self.addCleanup(self.stop.set)
+
+    def serve(self, view):
+        def run():
+            profiler.current_views[threading.get_ident()] = view
+            try:
+                spin(self.stop)
+            finally:
+                profiler.current_views.pop(threading.get_ident())
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def test_samples_threads_serving_requests(self):
+        self.serve("shop.views.checkout")
+        threading.Thread(target=spin, args=(self.stop,), daemon=True).start()
+        stacks = profiler.profile(0.1, interval=0.001)
+        self.assertTrue(stacks)
+        for stack in stacks:
+            self.assertTrue(stack.startswith("shop.views.checkout;"))
+            self.assertIn(";shop.tests.test_profiler:spin", stack)
+        line = profiler.format_stacks(stacks).splitlines()[0]
+        self.assertRegex(line, r"^shop\.views\.checkout;\S+ \d+$")
+
+    def test_one_profile_at_a_time(self):
+        with (
+            profiler._profiling,  # noqa: SLF001
+            self.assertRaisesMessage(profiler.ProfilerBusyError, "already"),
+        ):
+            profiler.profile(0.01)
+
+    def test_view_names(self):
+        self.assertEqual(
+            profiler.view_name(views.ItemListView.as_view()),
+            "shop.views.ItemListView",
+        )
+        self.assertEqual(
+            profiler.view_name(views.checkout), "shop.views.checkout"
+        )
+
+    def test_signalled_worker_writes_its_profile(self):
+        previous = signal.getsignal(profiler.PROFILE_SIGNAL)
+        self.addCleanup(signal.signal, profiler.PROFILE_SIGNAL, previous)
+        self.serve("shop.views.ItemListView")
+        with (
+            tempfile.TemporaryDirectory() as directory,
+            override_settings(PROFILER=True, PROFILE_DIR=directory),
+        ):
+            profiler.install_signal_handler()
+            stacks = profiler.request_profile(os.getpid(), 0.1)
+            self.assertIn("shop.views.ItemListView;", stacks)
+            self.assertEqual(os.listdir(directory), [])
+
+
+class ProfileViewTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            username="staff", password="password", is_staff=True
+        )
+        self.url = reverse("shop-profile")
+
+    def test_switched_off_by_default(self):
+        self.client.force_login(self.staff)
+        res = self.client.get(self.url)
+        self.assertEqual(HTTPStatus.NOT_FOUND, res.status_code)
+
+    @override_settings(PROFILER=True)
+    def test_staff_only(self):
+        user = User.objects.create_user(username="user", password="password")
+        self.client.force_login(user)
+        res = self.client.get(self.url)
+        self.assertEqual(HTTPStatus.FOUND, res.status_code)
+
+    @override_settings(PROFILER=True)
+    def test_profile(self):
+        self.client.force_login(self.staff)
+        res = self.client.get(self.url, {"seconds": "0.01"})
+        self.assertEqual(HTTPStatus.OK, res.status_code)
+        self.assertEqual(res["Content-Type"], "text/plain")
+        res = self.client.get(self.url, {"seconds": "600"})
+        self.assertEqual(HTTPStatus.BAD_REQUEST, res.status_code)
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import tempfile
+from datetime import timedelta
+from http import HTTPStatus
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from shop import typeahead
+from shop.facets import price_facets
+from shop.images import THUMBNAIL_WIDTHS, image_filename, image_path
+from shop.models import Cart, CartItem, Item, ItemImage, PriceChange
+from shop.purge import purge_deleted_items
+from shop.typeahead import LiveIndex
+
+
+class SoftDeleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="seller", password="password"
+        )
+        self.client.force_login(self.user)
+        self.items = [
+            Item.objects.create(
+                name=name, description="", price_in_cents=price
+            )
+            for name, price in (("Teapot", 800), ("Tea towel", 300))
+        ]
+        patcher = mock.patch.object(typeahead, "live_index", LiveIndex())
+        self.addCleanup(patcher.stop)
+        patcher.start().refresh()
+
+    def test_delete_view_hides_the_item(self):
+        item = self.items[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(reverse("item-delete", args=[item.id]))
+        self.assertRedirects(res, reverse("item-list"))
+        self.assertFalse(Item.objects.filter(id=item.id).exists())
+        self.assertTrue(Item.all_objects.get(id=item.id).is_deleted())
+        self.assertEqual(
+            [name for _, name in typeahead.search("tea")], ["Tea towel"]
+        )
+        self.assertEqual(
+            sum(facet.count for facet in price_facets(include_sold=False)), 1
+        )
+        res = self.client.get(reverse("item-detail", args=[item.id]))
+        self.assertEqual(HTTPStatus.NOT_FOUND, res.status_code)
+
+    def test_checkout_drops_deleted_items(self):
+        cart = Cart.get_active_cart(self.user)
+        for item in self.items:
+            cart.add_item(item)
+        self.items[0].soft_delete()
+        res = self.client.post(reverse("checkout"), {"first_name": "Jo"})
+        self.assertEqual(HTTPStatus.CONFLICT, res.status_code)
+        self.assertEqual(list(cart.items.all()), [self.items[1]])
+        res = self.client.post(reverse("checkout"), {"first_name": "Jo"})
+        self.assertEqual(HTTPStatus.FOUND, res.status_code)
+
+
+class PurgeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer")
+        self.items = [
+            Item.objects.create(
+                name=f"Item {i}", description="", price_in_cents=100 * i
+            )
+            for i in range(1, 6)
+        ]
+
+    def delete(self, item, days_ago):
+        Item.objects.get(id=item.id).soft_delete()
+        Item.all_objects.filter(id=item.id).update(
+            deleted_at=timezone.now() - timedelta(days=days_ago)
+        )
+
+    def test_purges_old_unsold_deletions_in_batches(self):
+        ordered = Cart.get_active_cart(self.user)
+        ordered.add_item(self.items[0])
+        ordered.checkout("Jo", "Doe", "")
+        cart = Cart.get_active_cart(self.user)
+        cart.add_item(self.items[1])
+        cart.add_item(self.items[4])
+        sold = self.items[2]
+        sold.mark_sold(timezone.now())
+        for item in self.items[:3]:
+            self.delete(item, 40)
+        self.delete(self.items[3], 1)
+        with self.settings(ITEM_PURGE_AFTER=30 * 24 * 3600):
+            self.assertEqual(purge_deleted_items(batch_size=1), 1)
+        self.assertEqual(
+            sorted(Item.all_objects.values_list("id", flat=True)),
+            [self.items[i].id for i in (0, 2, 3, 4)],
+        )
+        self.assertEqual(
+            list(CartItem.objects.filter(cart=cart).values_list("item_id")),
+            [(self.items[4].id,)],
+        )
+        cart.refresh_from_db()
+        self.assertEqual(cart.total_in_cents, 500)
+        self.assertEqual(ordered.lines.count(), 1)
+
+    def test_command(self):
+        self.delete(self.items[0], 1)
+        out = StringIO()
+        call_command(
+            "purge_deleted_items", "--older-than-days", "0", stdout=out
+        )
+        self.assertIn("Purged 1 deleted items", out.getvalue())
+        self.assertFalse(Item.all_objects.filter(id=self.items[0].id).exists())
+
+    def test_purge_skips_signals_and_deletes_unused_photos(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        paths = {}
+        for digest, item in (("a" * 64, 0), ("b" * 64, 0), ("b" * 64, 3)):
+            ItemImage.objects.create(
+                item=self.items[item],
+                digest=digest,
+                extension="png",
+                width=800,
+                height=600,
+            )
+            paths[digest] = [
+                image_path(image_filename(digest, "png", width))
+                for width in (None, *THUMBNAIL_WIDTHS)
+            ]
+            for path in paths[digest]:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.touch()
+        self.items[0].price_in_cents = 50
+        self.items[0].save()
+        for item in self.items[:3]:
+            self.delete(item, 1)
+        live_index = mock.Mock()
+        with (
+            mock.patch("shop.purge.live_index", live_index),
+            CaptureQueriesContext(connection) as queries,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            self.assertEqual(purge_deleted_items(timedelta(0)), 3)
+        self.assertEqual(
+            sum(
+                query["sql"].startswith('UPDATE "shop_catalogueversion"')
+                for query in queries
+            ),
+            1,
+        )
+        live_index.update.assert_called_once_with(
+            dict.fromkeys(item.id for item in self.items[:3])
+        )
+        self.assertEqual(
+            list(ItemImage.objects.values_list("item_id", flat=True)),
+            [self.items[3].id],
+        )
+        self.assertFalse(
+            PriceChange.objects.filter(item_id=self.items[0].id).exists()
+        )
+        self.assertFalse(any(path.exists() for path in paths["a" * 64]))
+        self.assertTrue(all(path.exists() for path in paths["b" * 64]))
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import contextlib
+import difflib
+import os
+import re
+from pathlib import Path
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.db import connections
+from django.test import RequestFactory, TestCase
+
+from shop.admin import ItemAdmin
+from shop.factories import seed
+from shop.models import Cart, Item, Seller
+from shop.views import ItemListView
+
+PLANS_DIR = Path(__file__).parent / "plans"
+# set to rewrite the golden plans from the current ones
+UPDATE_ENV = "UPDATE_QUERY_PLANS"
+# plan steps that read a whole table, or sort rows outside an index
+REGRESSIONS = {
+    "sqlite": re.compile(r"\bSCAN \S+$|TEMP B-TREE"),
+    "postgresql": re.compile(r"Seq Scan|(^|->)\s*Sort\b"),
+}
+EXPLAINED = ("SELECT", "UPDATE", "DELETE")
+# SQLite lists a query's columns before FROM; they don't affect its plan
+COLUMNS = re.compile(r"^SELECT (DISTINCT )?.*? FROM ", re.DOTALL)
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith(EXPLAINED):
+            self.queries.append((context["connection"].alias, sql, params))
+        return execute(sql, params, many, context)
+
+
+def explain(alias, sql, params):
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            depths = {0: -1}
+            lines = []
+            for node, parent, _, detail in cursor.fetchall():
+                depths[node] = depths.get(parent, -1) + 1
+                lines.append("  " * depths[node] + detail)
+            return lines
+        cursor.execute(f"EXPLAIN (COSTS OFF) {sql}", params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+class QueryPlanTests(TestCase):
+    databases = {"default", "shard0", "shard1"}
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(sellers=20, items=2_000, users=100)
+        cls.factory = RequestFactory()
+
+    @contextlib.contextmanager
+    def check_plans(self, name):
+        recorder = QueryRecorder()
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            yield
+        vendor = connections["default"].vendor
+        lines = []
+        for alias, sql, params in recorder.queries:
+            lines.append(f"-- {COLUMNS.sub('SELECT … FROM ', sql)}")
+            lines.extend(explain(alias, sql, params))
+        text = "\n".join(lines) + "\n"
+        path = PLANS_DIR / vendor / f"{name}.txt"
+        if os.environ.get(UPDATE_ENV):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(text)
+            return
+        self.assertTrue(
+            path.exists(),
+            f"No golden plans in {path}; run the tests with {UPDATE_ENV}=1",
+        )
+        golden = path.read_text()
+        pattern = REGRESSIONS[vendor]
+        regressions = [
+            line
+            for line in text.splitlines()
+            if pattern.search(line) and line not in golden.splitlines()
+        ]
+        if regressions:
+            self.fail(
+                f"{name} now scans or sorts without an index: {regressions}"
+            )
+        diff = "".join(
+            difflib.unified_diff(
+                golden.splitlines(keepends=True),
+                text.splitlines(keepends=True),
+                str(path),
+                "current",
+            )
+        )
+        if diff:
+            self.fail(
+                f"Query plans changed; review them and run the tests with "
+                f"{UPDATE_ENV}=1 to accept them:\n{diff}",
+            )
+
+    def item_list(self, query):
+        view = ItemListView()
+        view.setup(self.factory.get("/shop/", query))
+        paginator = Paginator(view.get_queryset(), view.paginate_by)
+        return list(paginator.get_page(2).object_list)
+
+    def test_item_list(self):
+        with self.check_plans("item_list"):
+            self.item_list({})
+
+    def test_item_list_by_price(self):
+        with self.check_plans("item_list_by_price"):
+            self.item_list({"sort": "price", "price_min": "1000"})
+
+    def test_item_list_newest_including_sold(self):
+        with self.check_plans("item_list_newest_including_sold"):
+            self.item_list({"sort": "newest", "include_sold": "true"})
+
+    def test_get_active_cart(self):
+        user = User.objects.latest("id")
+        with self.check_plans("get_active_cart"):
+            Cart.get_active_cart(user)
+
+    def test_checkout(self):
+        cart = Cart.get_active_cart(User.objects.create_user(username="jo"))
+        for item in Item.objects.filter(sold_at=None)[:3]:
+            cart.add_item(item)
+        with self.check_plans("checkout"):
+            cart.checkout("Jo", "Doe", "jo@example.com")
+
+    def test_seller_payouts(self):
+        sellers = list(Seller.objects.all())
+        with self.check_plans("seller_payouts"):
+            Seller.add_payouts(sellers)
+
+    def test_item_admin_search(self):
+        request = self.factory.get("/admin/shop/item/", {"q": "Vintage"})
+        request.user = User.objects.create_superuser(username="admin")
+        changelist = ItemAdmin(Item, admin.site).get_changelist_instance(
+            request
+        )
+        with self.check_plans("item_admin_search"):
+            list(changelist.get_queryset(request)[:100])
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from smtplib import SMTPRecipientsRefused
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase
+from django.utils import timezone
+
+from shop.models import Cart, Item, Job, Order
+from shop.receipts import (
+    RECEIPT_CLAIM_TIMEOUT,
+    RECEIPT_MAX_ATTEMPTS,
+    ReceiptError,
+    render_receipt,
+    send_pending_receipts,
+)
+
+
+class ReceiptTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="buyer", password="password"
+        )
+
+    def checkout(self, email, prices=(150, 2599)):
+        cart = Cart.get_active_cart(self.user)
+        for i, price in enumerate(prices):
+            cart.add_item(
+                Item.objects.create(
+                    name=f"Item {i}",
+                    description="Description",
+                    price_in_cents=price,
+                )
+            )
+        return cart.checkout("Jane", "Doe", email)
+
+    def test_render_receipt(self):
+        order = self.checkout("jane@example.com")
+        message = render_receipt(order)
+        self.assertEqual(message.to, ["jane@example.com"])
+        self.assertIn(f"order {order.id}", message.subject)
+        self.assertIn("Item 0: $1.50", message.body)
+        self.assertIn("Item 1: $25.99", message.body)
+        self.assertIn("Total: $27.49", message.body)
+        html, mimetype = message.alternatives[0]
+        self.assertEqual(mimetype, "text/html")
+        self.assertIn("$27.49", html)
+
+    def test_checkout_queues_receipt(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.checkout("jane@example.com")
+        self.assertEqual(
+            Job.objects.get().name, "shop.receipts.send_pending_receipts"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.checkout("")
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_send_pending_receipts_in_batches(self):
+        orders = [self.checkout(f"buyer{i}@example.com") for i in range(5)]
+        self.checkout("")
+        with mock.patch.object(
+            EmailBackend, "send_messages", autospec=True
+        ) as send_messages:
+            send_messages.side_effect = lambda _backend, messages: len(
+                messages
+            )
+            stats = send_pending_receipts(batch_size=2)
+        self.assertEqual(stats.sent, 5)
+        self.assertEqual(stats.batches, 3)
+        # every batch is sent over the same connection
+        self.assertEqual(
+            len({call.args[0] for call in send_messages.call_args_list}), 1
+        )
+        self.assertFalse(
+            Order.objects.filter(
+                id__in=[o.id for o in orders], receipt_sent_at__isnull=True
+            ).exists()
+        )
+
+    def test_receipts_are_sent_once(self):
+        self.checkout("jane@example.com")
+        self.assertEqual(send_pending_receipts().sent, 1)
+        self.assertEqual(send_pending_receipts().sent, 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failed_receipt_is_retried(self):
+        order = self.checkout("jane@example.com")
+        failing = mock.patch.object(
+            EmailBackend, "send_messages", side_effect=OSError("down")
+        )
+        with (
+            failing,
+            self.assertLogs("shop.receipts", "WARNING"),
+            self.assertRaises(ReceiptError),  # noqa: PT027
+        ):
+            send_pending_receipts()
+        order.refresh_from_db()
+        self.assertIsNone(order.receipt_sent_at)
+        self.assertIsNone(order.receipt_claimed_at)
+        self.assertEqual(order.receipt_attempts, 1)
+        self.assertEqual(order.receipt_error, "OSError: down")
+        self.assertEqual(send_pending_receipts().sent, 1)
+        order.refresh_from_db()
+        self.assertEqual(order.receipt_error, "")
+
+    def test_failing_receipt_does_not_hold_up_others(self):
+        orders = [self.checkout(f"buyer{i}@example.com") for i in range(3)]
+        refused = SMTPRecipientsRefused({"buyer0@example.com": (550, b"")})
+
+        def send(_backend, messages):
+            if messages[0].to == ["buyer0@example.com"]:
+                raise refused
+            mail.outbox.extend(messages)
+            return len(messages)
+
+        with mock.patch.object(
+            EmailBackend, "send_messages", autospec=True, side_effect=send
+        ), self.assertLogs("shop.receipts", "WARNING") as logs:
+            for _ in range(RECEIPT_MAX_ATTEMPTS):
+                with self.assertRaises(ReceiptError):  # noqa: PT027
+                    send_pending_receipts()
+            # the bad address is given up on
+            self.assertEqual(send_pending_receipts().sent, 0)
+        self.assertIn("Giving up on the receipt", logs.output[-1])
+        for order in orders:
+            order.refresh_from_db()
+        self.assertIsNone(orders[0].receipt_sent_at)
+        self.assertEqual(orders[0].receipt_attempts, RECEIPT_MAX_ATTEMPTS)
+        self.assertIsNotNone(orders[1].receipt_sent_at)
+        self.assertIsNotNone(orders[2].receipt_sent_at)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_mail_server_outage_keeps_attempts(self):
+        orders = [self.checkout(f"buyer{i}@example.com") for i in range(5)]
+        failing = mock.patch.object(
+            EmailBackend, "send_messages", side_effect=OSError
+        )
+        with (
+            failing,
+            self.assertLogs("shop.receipts", "WARNING"),
+            self.assertRaises(ReceiptError),  # noqa: PT027
+        ):
+            send_pending_receipts()
+        attempts = [
+            Order.objects.get(id=order.id).receipt_attempts for order in orders
+        ]
+        self.assertEqual(attempts, [1, 1, 1, 0, 0])
+
+    def test_claims_of_a_dead_worker_are_sent(self):
+        order = self.checkout("jane@example.com")
+        Order.objects.filter(id=order.id).update(
+            receipt_claimed_at=timezone.now(), receipt_attempts=1
+        )
+        self.assertEqual(send_pending_receipts().sent, 0)
+        Order.objects.filter(id=order.id).update(
+            receipt_claimed_at=timezone.now()
+            - timedelta(seconds=RECEIPT_CLAIM_TIMEOUT + 1)
+        )
+        self.assertEqual(send_pending_receipts().sent, 1)
+        order.refresh_from_db()
+        self.assertEqual(order.receipt_attempts, 2)
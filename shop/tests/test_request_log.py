@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import json
+import logging
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from shop.models import Item
+from shop.request_log import JsonFormatter
+
+
+@override_settings(REQUEST_LOG=True, SLOW_QUERY_SAMPLE_RATE=1)
+class RequestLogTests(TestCase):
+    def setUp(self):
+        Item.objects.create(name="Lamp", description="", price_in_cents=500)
+        self.user = User.objects.create_user(
+            username="shopper", password="password"
+        )
+        self.client.force_login(self.user)
+
+    def get(self, headers=None):
+        with self.assertLogs("shop.access", "INFO") as logs:
+            res = self.client.get(reverse("item-list"), headers=headers)
+        return res, logs
+
+    def test_access_log(self):
+        res, logs = self.get({"X-Request-ID": "abc-123"})
+        self.assertEqual(res["X-Request-ID"], "abc-123")
+        [record] = logs.records
+        self.assertEqual(record.getMessage(), "GET /shop/ 200")
+        self.assertEqual(record.request_id, "abc-123")
+        self.assertEqual(record.view, "item-list")
+        self.assertEqual(record.user_id, self.user.id)
+        self.assertGreater(record.queries, 0)
+        self.assertGreaterEqual(record.duration_ms, record.db_ms)
+
+    def test_untrusted_request_ids_are_replaced(self):
+        res, _ = self.get({"X-Request-ID": "a b\nc"})
+        self.assertRegex(res["X-Request-ID"], r"^[0-9a-f]{32}$")
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_slow_queries_are_explained(self):
+        with self.assertLogs("shop.slow_query") as logs:
+            self.get()
+        record = next(r for r in logs.records if "shop_item" in r.sql)
+        self.assertEqual(record.view, "item-list")
+        self.assertEqual(record.database, "default")
+        self.assertIn("shop_item", record.plan)
+        self.assertNotIn("EXPLAIN failed", record.plan)
+
+    @override_settings(SLOW_QUERY_MS=0, SLOW_QUERY_SAMPLE_RATE=0)
+    def test_unsampled_requests_log_no_queries(self):
+        with self.assertNoLogs("shop.slow_query"):
+            self.get()
+
+    @override_settings(REQUEST_LOG=False)
+    def test_can_be_switched_off(self):
+        with self.assertNoLogs("shop.access"):
+            res = self.client.get(reverse("item-list"))
+        self.assertNotIn("X-Request-ID", res)
+
+
+class JsonFormatterTests(SimpleTestCase):
+    def test_formats_extra_fields(self):
+        record = logging.makeLogRecord(
+            {"name": "shop.access", "msg": "GET %s", "args": ("/",)}
+        )
+        record.queries = 3
+        entry = json.loads(JsonFormatter().format(record))
+        self.assertEqual(entry["message"], "GET /")
+        self.assertEqual(entry["logger"], "shop.access")
+        self.assertEqual(entry["queries"], 3)
+        self.assertNotIn("args", entry)
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.contrib.sessions.models import Session
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from shop.sessions import purge_expired_sessions
+from shop.tasks import work
+
+
+class PurgeExpiredSessionsTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            Session(
+                session_key=f"expired{i}",
+                session_data="",
+                expire_date=now - timedelta(days=1),
+            )
+            for i in range(5)
+        )
+        Session.objects.create(
+            session_key="live",
+            session_data="",
+            expire_date=now + timedelta(days=1),
+        )
+
+    def test_expired_sessions_are_purged_in_batches(self):
+        with self.assertNumQueries(6):
+            self.assertEqual(purge_expired_sessions(batch_size=2), 5)
+        self.assertQuerySetEqual(
+            Session.objects.values_list("session_key", flat=True), ["live"]
+        )
+
+    @override_settings(
+        SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies"
+    )
+    def test_cookie_sessions_need_no_purge(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(purge_expired_sessions(), 0)
+        self.assertEqual(Session.objects.count(), 6)
+
+    def test_worker_purges_expired_sessions(self):
+        work(burst=True)
+        self.assertEqual(Session.objects.get().session_key, "live")
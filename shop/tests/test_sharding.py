@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import json
+from datetime import timedelta
+from http import HTTPStatus
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from shop.models import (
+    Cart,
+    IdempotencyKey,
+    Item,
+    Order,
+    Seller,
+    TillSale,
+)
+from shop.receipts import send_pending_receipts
+from shop.sharding import SHARD_ID_SPAN, ShardedQuerySet, shard_for_user
+
+SHARDS = ["shard0", "shard1"]
+
+
+@override_settings(SHARD_DATABASES=SHARDS)
+class ShardingTests(TestCase):
+    databases = {"default", *SHARDS}
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(username=f"user{i}", password="password")
+            for i in range(2)
+        ]
+
+    def item(self, name="Lamp", price=500):
+        return Item.objects.create(
+            name=name, description="", price_in_cents=price
+        )
+
+    def checkout(self, user, email="", created_at=None):
+        cart = Cart.get_active_cart(user)
+        cart.add_item(self.item())
+        order = cart.checkout("Jane", "Doe", email)
+        if created_at is not None:
+            order.created_at = created_at
+            order.save()
+        return order
+
+    def test_carts_and_orders_live_in_the_users_shard(self):
+        self.assertEqual(
+            {shard_for_user(user.pk) for user in self.users}, set(SHARDS)
+        )
+        for user in self.users:
+            shard = shard_for_user(user.pk)
+            order = self.checkout(user)
+            self.assertGreaterEqual(order.id, SHARD_ID_SPAN)
+            self.assertTrue(
+                Cart.objects.using(shard)
+                .filter(id=Cart.get_active_cart(user).id, active=True)
+                .exists()
+            )
+            self.assertEqual(
+                Order.objects.using(shard).get(id=order.id).cart.user, user
+            )
+        self.assertFalse(Order.objects.using("default").exists())
+        self.assertFalse(Cart.objects.using("default").exists())
+
+    def test_checkout_marks_items_sold_in_the_default_database(self):
+        cart = Cart.get_active_cart(self.users[0])
+        items = [self.item(), self.item("Rug", 2500)]
+        for item in items:
+            cart.add_item(item)
+        cart.update_total()
+        self.assertEqual(cart.total_in_cents, 3000)
+        cart.checkout("Jane", "Doe", "")
+        for item in items:
+            item.refresh_from_db()
+            self.assertTrue(item.is_sold())
+        self.assertEqual(
+            sorted(cart.lines.values_list("item", flat=True)),
+            [item.id for item in items],
+        )
+
+    def test_seller_payouts_add_up_every_shard(self):
+        seller = Seller.objects.create(name="Alice")
+        for user, price in zip(self.users, (500, 1250)):
+            cart = Cart.get_active_cart(user)
+            cart.add_item(
+                Item.objects.create(
+                    name="Lamp",
+                    description="",
+                    price_in_cents=price,
+                    seller=seller,
+                )
+            )
+            cart.checkout("Jane", "Doe", "")
+        sellers = list(Seller.with_sales())
+        Seller.add_payouts(sellers)
+        self.assertEqual(sellers[0].payout_in_cents, 1750)
+        self.client.force_login(self.users[0])
+        res = self.client.get(reverse("seller-detail", args=(seller.id,)))
+        self.assertContains(res, "$17.50")
+
+    def test_till_sync_writes_to_the_users_shard(self):
+        user = self.users[1]
+        item = self.item()
+        self.client.force_login(user)
+        res = self.client.post(
+            reverse("till-sync"),
+            json.dumps(
+                {
+                    "till": "till-1",
+                    "sales": [
+                        {
+                            "id": "a",
+                            "sold_at": "2026-10-18T10:00:00Z",
+                            "lines": [{"item_id": item.id}],
+                        }
+                    ],
+                }
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(HTTPStatus.OK, res.status_code)
+        shard = shard_for_user(user.pk)
+        till_sale = TillSale.objects.using(shard).get()
+        self.assertEqual(
+            res.json()["results"][0]["order_id"], till_sale.order_id
+        )
+        self.assertEqual(till_sale.order.cart.lines.get().item_id, item.id)
+        item.refresh_from_db()
+        self.assertTrue(item.is_sold())
+
+    def test_idempotency_keys_live_in_the_users_shard(self):
+        user = self.users[1]
+        self.client.force_login(user)
+        data = {"item_id": self.item().id, "idempotency_key": "add-1"}
+        self.client.post(reverse("cart-add"), data)
+        res = self.client.post(reverse("cart-add"), data)
+        self.assertEqual(res["Idempotent-Replayed"], "true")
+        shard = shard_for_user(user.pk)
+        self.assertEqual(
+            IdempotencyKey.objects.using(shard).get().key, "add-1"
+        )
+        self.assertFalse(IdempotencyKey.objects.using("default").exists())
+
+    def test_order_list_merges_shards(self):
+        now = timezone.now()
+        orders = [
+            self.checkout(
+                self.users[i % 2], created_at=now - timedelta(minutes=i)
+            )
+            for i in range(5)
+        ]
+        merged = ShardedQuerySet(Order.objects.all(), ["-created_at", "-id"])
+        self.assertEqual(merged.count(), 5)
+        self.assertEqual(merged[1:4], orders[1:4])
+        self.client.force_login(self.users[0])
+        res = self.client.get(reverse("order-list"), {"page": 1})
+        self.assertEqual(HTTPStatus.OK, res.status_code)
+        self.assertEqual(list(res.context["object_list"]), orders)
+
+    def test_receipts_are_sent_from_every_shard(self):
+        for user in self.users:
+            self.checkout(user, email=f"{user.username}@example.com")
+        stats = send_pending_receipts()
+        self.assertEqual(stats.sent, 2)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ["user0@example.com", "user1@example.com"],
+        )
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+
+from shop.models import (
+    Cart,
+    CartItem,
+    Item,
+    Order,
+    PriceChange,
+    Seller,
+    TillSale,
+)
+from shop.snapshots import SnapshotError, restore_snapshot, take_snapshot
+
+
+class SnapshotTests(TransactionTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "shop.snapshot"
+        self.user = User.objects.create_user(username="buyer")
+        seller = Seller.objects.create(name="Alice")
+        self.items = [
+            Item.objects.create(
+                name=f"Item {i}",
+                description="Description",
+                price_in_cents=100 * (i + 1),
+                seller=seller,
+            )
+            for i in range(3)
+        ]
+        cart = Cart.get_active_cart(self.user)
+        cart.add_item(self.items[0], quantity=2)
+        cart.add_item(self.items[1])
+        self.order = cart.checkout("Jane", "Doe", "jane@example.com")
+        TillSale.objects.create(
+            till="till-1",
+            sale_id="sale-1",
+            status=TillSale.Status.OK,
+            order=self.order,
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def rows(self):
+        return {
+            model: list(model.objects.order_by("pk").values())
+            for model in (
+                Seller,
+                Item,
+                PriceChange,
+                Cart,
+                CartItem,
+                Order,
+                TillSale,
+            )
+        }
+
+    def test_round_trip(self):
+        before = self.rows()
+        stats = take_snapshot(self.path)
+        self.assertEqual(stats.rows["shop.Item"], 3)
+        self.assertEqual(stats.rows["shop.CartItem"], 2)
+        Item.objects.create(name="New", description="", price_in_cents=1)
+        Order.objects.all().delete()
+        stats = restore_snapshot(self.path)
+        self.assertEqual(stats.total_rows, 1 + 3 + 3 + 1 + 2 + 1 + 1)
+        self.assertEqual(self.rows(), before)
+        # the indexes dropped while loading are rebuilt
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, "shop_item"
+            )
+        self.assertIn("shop_item_unsold_price", constraints)
+        self.assertIn("shop_item_sold_at", constraints)
+        # sequences continue after the restored rows
+        item = Item.objects.create(
+            name="Next", description="", price_in_cents=1
+        )
+        self.assertGreater(item.id, self.items[-1].id)
+
+    def test_restore_leaves_no_till_sale_dangling(self):
+        take_snapshot(self.path)
+        cart = Cart.get_active_cart(self.user)
+        cart.add_item(self.items[2])
+        order = cart.checkout("Jane", "Doe", "")
+        TillSale.objects.create(
+            till="till-1",
+            sale_id="sale-2",
+            status=TillSale.Status.OK,
+            order=order,
+        )
+        restore_snapshot(self.path)
+        self.assertEqual(
+            list(TillSale.objects.values_list("order", flat=True)),
+            [self.order.id],
+        )
+
+    def test_commands(self):
+        out = StringIO()
+        call_command("snapshot", str(self.path), stdout=out)
+        self.assertIn("Wrote 12 rows", out.getvalue())
+        Item.objects.filter(sold_at__isnull=True).delete()
+        call_command("restore", str(self.path), "--noinput", stdout=out)
+        self.assertEqual(Item.objects.count(), 3)
+
+    def test_restore_rejects_other_files(self):
+        self.path.write_bytes(b"not a snapshot")
+        with self.assertRaisesMessage(CommandError, "Not a shop snapshot"):
+            call_command("restore", str(self.path), "--noinput")
+        self.assertEqual(Item.objects.count(), 3)
+
+    @override_settings(SHARD_DATABASES=["shard0", "shard1"])
+    def test_sharded_shop_is_refused(self):
+        with self.assertRaisesMessage(SnapshotError, "sharded"):
+            take_snapshot(self.path)
+        with self.assertRaisesMessage(CommandError, "sharded"):
+            call_command("snapshot", str(self.path))
+        self.assertFalse(self.path.exists())
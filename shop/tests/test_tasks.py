@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from shop import tasks
+from shop.models import Cart, Item, Job
+from shop.signals import order_checked_out
+from shop.tasks import (
+    claim_jobs,
+    enqueue,
+    requeue_stale_jobs,
+    run_jobs,
+    run_workers,
+    task,
+    work,
+)
+
+calls = []
+
+
+@task
+def record(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def explode():
+    msg = "boom"
+    raise RuntimeError(msg)
+
+
+def not_a_task():
+    pass
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_waits_for_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            enqueue(record, value=1)
+            self.assertFalse(Job.objects.exists())
+        for callback in callbacks:
+            callback()
+        job = Job.objects.get()
+        self.assertEqual(job.name, "shop.tests.test_tasks.record")
+        self.assertEqual(job.kwargs, {"value": 1})
+
+    def test_enqueue_rejects_plain_functions(self):
+        with self.assertRaises(TypeError):  # noqa: PT027
+            enqueue(not_a_task)
+
+    def test_claim_and_run_job(self):
+        for value in range(3):
+            Job.objects.create(name=record.task_name, kwargs={"value": value})
+        jobs = claim_jobs("worker", limit=2)
+        self.assertEqual(len(jobs), 2)
+        for job in jobs:
+            self.assertEqual(job.status, Job.Status.RUNNING)
+            self.assertEqual(job.attempts, 1)
+        self.assertEqual(len(claim_jobs("other worker")), 1)
+        self.assertEqual(claim_jobs("third worker"), [])
+        self.assertEqual(run_jobs(jobs), 2)
+        self.assertEqual(Job.objects.filter(status=Job.Status.DONE).count(), 2)
+        self.assertCountEqual(calls, [job.kwargs["value"] for job in jobs])
+
+    def test_jobs_are_not_claimed_before_run_at(self):
+        Job.objects.create(
+            name=record.task_name,
+            kwargs={"value": 3},
+            run_at=timezone.now() + timezone.timedelta(minutes=1),
+        )
+        self.assertEqual(claim_jobs("worker"), [])
+
+    def test_failed_job_is_retried_then_failed(self):
+        Job.objects.create(name=explode.task_name, max_attempts=2)
+        before = timezone.now()
+        self.assertEqual(run_jobs(claim_jobs("worker")), 0)
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.Status.QUEUED)
+        self.assertGreater(job.run_at, before)
+        self.assertIn("RuntimeError: boom", job.last_error)
+
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(run_jobs(claim_jobs("worker")), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_unregistered_job_fails(self):
+        Job.objects.create(
+            name="shop.tests.test_tasks.not_a_task", max_attempts=1
+        )
+        self.assertEqual(run_jobs(claim_jobs("worker")), 0)
+        self.assertEqual(Job.objects.get().status, Job.Status.FAILED)
+
+    def test_requeue_stale_jobs(self):
+        Job.objects.create(
+            name=record.task_name,
+            status=Job.Status.RUNNING,
+            locked_at=timezone.now() - timezone.timedelta(hours=1),
+        )
+        self.assertEqual(requeue_stale_jobs(), 1)
+        self.assertEqual(Job.objects.get().status, Job.Status.QUEUED)
+
+    def test_housekeeping_can_be_switched_off(self):
+        stale = Job.objects.create(
+            name=record.task_name,
+            status=Job.Status.RUNNING,
+            locked_at=timezone.now() - timezone.timedelta(hours=1),
+        )
+        with mock.patch.object(tasks, "_apply_markdowns") as markdowns:
+            self.assertEqual(work(burst=True, housekeeping=False), 0)
+        markdowns.assert_not_called()
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, Job.Status.RUNNING)
+
+    def test_only_the_first_worker_does_housekeeping(self):
+        context = mock.Mock()
+        with (
+            mock.patch.object(
+                tasks.multiprocessing, "get_context", return_value=context
+            ),
+            mock.patch.object(tasks.connections, "close_all"),
+        ):
+            run_workers(3, burst=True)
+        self.assertEqual(
+            [
+                call.kwargs["kwargs"]["housekeeping"]
+                for call in context.Process.call_args_list
+            ],
+            [True, False, False],
+        )
+
+    def test_checkout_enqueues_side_effects_after_commit(self):
+        def on_checkout(order, **_kwargs):
+            enqueue(record, value=order.id)
+
+        order_checked_out.connect(on_checkout)
+        self.addCleanup(order_checked_out.disconnect, on_checkout)
+        user = User.objects.create_user(username="buyer", password="password")
+        cart = Cart.get_active_cart(user)
+        cart.add_item(
+            Item.objects.create(
+                name="Item", description="Description", price_in_cents=100
+            )
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            order = cart.checkout("John", "Doe", "john.doe@gmail.com")
+        job = Job.objects.get(name=record.task_name)
+        self.assertEqual(job.kwargs, {"value": order.id})
+        run_jobs(claim_jobs("worker"))
+        self.assertEqual(calls, [order.id])
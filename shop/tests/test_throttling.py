@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import tempfile
+import threading
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from shop import throttling
+from shop.models import Item
+from shop.throttling import (
+    acquire_slot,
+    client_ip,
+    release_slot,
+    slot_paths,
+    take_token,
+)
+
+
+@override_settings(
+    WRITE_RATE=1,
+    WRITE_BURST=3,
+    WRITE_IP_RATE=1,
+    WRITE_IP_BURST=5,
+    MAX_CONCURRENT_WRITES=2,
+    WRITE_QUEUE_TIMEOUT=0,
+)
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.slot_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            WRITE_SLOT_DIR=self.slot_dir.name
+        )
+        self.settings_override.enable()
+        self.user = User.objects.create_user(username="till")
+        self.client.force_login(self.user)
+        self.item = Item.objects.create(
+            name="Item", description="Description", price_in_cents=100
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.slot_dir.cleanup()
+
+    def add(self):
+        return self.client.post(reverse("cart-add"), {"item_id": self.item.id})
+
+    def test_token_bucket_refills(self):
+        with mock.patch("shop.throttling.time.time", return_value=1000.0):
+            for _ in range(3):
+                self.assertEqual(take_token("bucket", 2, 3), 0)
+            self.assertAlmostEqual(take_token("bucket", 2, 3), 0.5)
+        with mock.patch("shop.throttling.time.time", return_value=1000.5):
+            self.assertEqual(take_token("bucket", 2, 3), 0)
+
+    def test_users_are_rate_limited(self):
+        for _ in range(3):
+            self.assertEqual(HTTPStatus.FOUND, self.add().status_code)
+        res = self.add()
+        self.assertEqual(HTTPStatus.TOO_MANY_REQUESTS, res.status_code)
+        self.assertEqual(res["Retry-After"], "1")
+        # reads aren't limited
+        res = self.client.get(reverse("checkout"))
+        self.assertEqual(HTTPStatus.OK, res.status_code)
+
+    def test_ips_are_rate_limited(self):
+        for i in range(5):
+            user = User.objects.create_user(username=f"user{i}")
+            self.client.force_login(user)
+            self.assertEqual(HTTPStatus.FOUND, self.add().status_code)
+        self.client.force_login(self.user)
+        self.assertEqual(HTTPStatus.TOO_MANY_REQUESTS, self.add().status_code)
+
+    def test_load_is_shed_at_the_concurrency_cap(self):
+        held = [acquire_slot(0) for _ in range(2)]
+        self.assertNotIn(None, held)
+        res = self.add()
+        self.assertEqual(HTTPStatus.SERVICE_UNAVAILABLE, res.status_code)
+        self.assertEqual(res["Retry-After"], "1")
+        release_slot(held.pop())
+        self.assertEqual(HTTPStatus.FOUND, self.add().status_code)
+        # the slot is released once the request finishes
+        slot = acquire_slot(0)
+        self.assertIsNotNone(slot)
+        release_slot(slot)
+        release_slot(held.pop())
+
+    @override_settings(WRITE_QUEUE_TIMEOUT=5)
+    def test_requests_wait_for_a_slot(self):
+        held = [acquire_slot(0) for _ in range(2)]
+        timer = threading.Timer(0.1, release_slot, held[:1])
+        timer.start()
+        self.assertEqual(HTTPStatus.FOUND, self.add().status_code)
+        timer.join()
+        release_slot(held[1])
+
+    @override_settings(MAX_CONCURRENT_WRITES=0)
+    def test_cap_can_be_switched_off(self):
+        self.assertEqual(HTTPStatus.FOUND, self.add().status_code)
+        self.assertEqual(slot_paths(), [])
+
+    def test_body_is_read_before_taking_a_slot(self):
+        events = []
+
+        def take_slot(timeout):
+            events.append("slot")
+            return acquire_slot(timeout)
+
+        def read_body(request):
+            events.append("body")
+            read(request)
+
+        read = throttling._read_body  # noqa: SLF001
+        with (
+            mock.patch.object(throttling, "acquire_slot", take_slot),
+            mock.patch.object(throttling, "_read_body", read_body),
+        ):
+            self.assertEqual(HTTPStatus.FOUND, self.add().status_code)
+        self.assertEqual(events, ["body", "slot"])
+
+    def test_client_ip_behind_proxies(self):
+        request = RequestFactory().post(
+            "/",
+            REMOTE_ADDR="10.0.0.1",
+            HTTP_X_FORWARDED_FOR="6.6.6.6, 1.2.3.4, 10.0.0.2",
+        )
+        self.assertEqual(client_ip(request), "10.0.0.1")
+        with override_settings(TRUSTED_PROXIES=1):
+            self.assertEqual(client_ip(request), "10.0.0.2")
+        with override_settings(TRUSTED_PROXIES=2):
+            self.assertEqual(client_ip(request), "1.2.3.4")
+        # a request that didn't pass through every proxy
+        with override_settings(TRUSTED_PROXIES=4):
+            self.assertEqual(client_ip(request), "10.0.0.1")
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import json
+from http import HTTPStatus
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from shop.facets import price_facets
+from shop.models import CartItem, Item, Order, Seller, TillSale
+
+
+class TillSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="till", password="password"
+        )
+        self.client.force_login(self.user)
+        self.items = [
+            Item.objects.create(
+                name=f"Item {i}", description="", price_in_cents=100 * (i + 1)
+            )
+            for i in range(4)
+        ]
+
+    def sale(self, sale_id, *items, **extra):
+        return {
+            "id": sale_id,
+            "sold_at": "2026-10-18T10:00:00Z",
+            "lines": [{"item_id": item.id} for item in items],
+            **extra,
+        }
+
+    def sync(self, *sales, till="till-1"):
+        return self.client.post(
+            reverse("till-sync"),
+            json.dumps({"till": till, "sales": list(sales)}),
+            content_type="application/json",
+        )
+
+    def test_catalogue_lists_unsold_items(self):
+        self.items[0].sold_at = timezone.now()
+        self.items[0].save()
+        res = self.client.get(reverse("till-catalogue"))
+        self.assertEqual(HTTPStatus.OK, res.status_code)
+        self.assertEqual(
+            res.json()["items"],
+            [
+                [item.id, item.name, item.price_in_cents]
+                for item in self.items[1:]
+            ],
+        )
+
+    def test_sync_checks_out_sales(self):
+        charged = self.sale("a", self.items[0])
+        charged["lines"][0].update(price_in_cents=50, quantity=2)
+        res = self.sync(charged, self.sale("b", self.items[1], self.items[2]))
+        self.assertEqual(HTTPStatus.OK, res.status_code)
+        results = res.json()["results"]
+        self.assertEqual([r["status"] for r in results], ["ok", "ok"])
+        order = Order.objects.get(id=results[0]["order_id"])
+        self.assertEqual(order.cart.total_in_cents, 100)
+        self.assertFalse(order.cart.active)
+        self.assertEqual(
+            Order.objects.get(id=results[1]["order_id"]).cart.total_in_cents,
+            500,
+        )
+        self.assertEqual(Item.objects.filter(sold_at__isnull=True).count(), 1)
+
+    def test_sales_leave_the_unsold_price_facets(self):
+        self.assertEqual(price_facets(include_sold=False)[1].count, 4)
+        self.sync(self.sale("a", self.items[0], self.items[1]))
+        with self.assertNumQueries(1):
+            self.assertEqual(price_facets(include_sold=False)[1].count, 2)
+        self.assertEqual(price_facets(include_sold=True)[1].count, 4)
+
+    def test_sales_count_towards_seller_payouts(self):
+        seller = Seller.objects.create(name="Alice")
+        Item.objects.filter(id=self.items[1].id).update(seller=seller)
+        self.sync(self.sale("a", self.items[0], self.items[1]))
+        Seller.add_payouts([seller])
+        self.assertEqual(seller.payout_in_cents, 200)
+
+    def test_resync_is_not_applied_twice(self):
+        first = self.sync(self.sale("a", self.items[0])).json()
+        second = self.sync(self.sale("a", self.items[0])).json()
+        self.assertEqual(first, second)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(CartItem.objects.count(), 1)
+        # sale IDs are scoped to their till
+        other = self.sync(self.sale("a", self.items[0]), till="till-2").json()
+        self.assertEqual(other["results"][0]["status"], "conflict")
+
+    def test_items_sold_twice_conflict(self):
+        res = self.sync(
+            self.sale("a", self.items[0]),
+            self.sale("b", self.items[1], self.items[0]),
+            self.sale("c", self.items[2]),
+        )
+        results = res.json()["results"]
+        self.assertEqual(
+            [r["status"] for r in results], ["ok", "conflict", "ok"]
+        )
+        self.assertEqual(results[1]["conflicts"], [self.items[0].id])
+        # the conflicting sale is rolled back entirely
+        self.assertIsNone(Item.objects.get(id=self.items[1].id).sold_at)
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(
+            TillSale.objects.get(sale_id="b").status, TillSale.Status.CONFLICT
+        )
+
+    def test_missing_items_conflict(self):
+        res = self.sync(self.sale("a", Item(id=999)))
+        self.assertEqual(res.json()["results"][0]["conflicts"], [999])
+
+    def test_malformed_requests(self):
+        res = self.client.post(
+            reverse("till-sync"), "{", content_type="application/json"
+        )
+        self.assertEqual(HTTPStatus.BAD_REQUEST, res.status_code)
+        res = self.sync({"id": "a", "sold_at": "yesterday", "lines": []})
+        self.assertEqual(HTTPStatus.BAD_REQUEST, res.status_code)
+        self.assertIn("sold_at", res.json()["error"])
+        self.assertFalse(Order.objects.exists())
+
+    def test_till_page(self):
+        res = self.client.get(reverse("till"))
+        self.assertContains(res, reverse("till-sync"))
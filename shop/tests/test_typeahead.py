@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import json
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from shop import typeahead
+from shop.models import Item
+from shop.typeahead import LiveIndex, PrefixIndex, invalidate_typeahead
+
+
+class PrefixIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = PrefixIndex(
+            [
+                (1, "Desk lamp"),
+                (2, "Flat pack desk"),
+                (3, "Lampshade"),
+                (4, "Blue desk LAMP"),
+            ]
+        )
+
+    def test_matches_the_start_of_any_word(self):
+        self.assertEqual(
+            self.index.search("la"),
+            [(4, "Blue desk LAMP"), (1, "Desk lamp"), (3, "Lampshade")],
+        )
+        self.assertEqual(self.index.search("ask"), [])
+
+    def test_earlier_words_must_match_in_full(self):
+        self.assertEqual(
+            self.index.search("Desk la"),
+            [(4, "Blue desk LAMP"), (1, "Desk lamp")],
+        )
+        self.assertEqual(self.index.search("des la"), [])
+        self.assertEqual(
+            self.index.search("lamp "),
+            [(4, "Blue desk LAMP"), (1, "Desk lamp")],
+        )
+
+    def test_limit(self):
+        self.assertEqual(len(self.index.search("d", limit=2)), 2)
+        self.assertEqual(self.index.search("  "), [])
+
+    def test_remove_and_rename(self):
+        self.index.remove(1)
+        self.index.add(3, "Floor light")
+        self.index.add(5, "Lamp oil")
+        self.assertEqual(
+            self.index.search("la"), [(4, "Blue desk LAMP"), (5, "Lamp oil")]
+        )
+        self.assertEqual(
+            self.index.search("fl"),
+            [(2, "Flat pack desk"), (3, "Floor light")],
+        )
+        self.assertEqual(len(self.index), 4)
+
+
+class LiveIndexTests(TestCase):
+    def setUp(self):
+        self.items = [
+            Item.objects.create(name=name, description="", price_in_cents=100)
+            for name in ("Teapot", "Tea towel", "Toaster")
+        ]
+        patcher = mock.patch.object(typeahead, "live_index", LiveIndex())
+        self.live_index = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.live_index.refresh()
+
+    def names(self, query):
+        return [name for _, name in typeahead.search(query)]
+
+    def test_saves_and_deletes_update_the_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Item.objects.create(
+                name="Teacup", description="", price_in_cents=1
+            )
+            self.items[2].name = "Tea tray"
+            self.items[2].save()
+            self.items[0].delete()
+        self.assertEqual(
+            self.names("tea"), ["Tea towel", "Tea tray", "Teacup"]
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.items[1].sold_at = self.items[1].listed_at
+            self.items[1].save()
+        self.assertEqual(self.names("tea"), ["Tea tray", "Teacup"])
+
+    def test_till_checkout_removes_sold_items(self):
+        user = User.objects.create_user(username="till", password="password")
+        self.client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(
+                reverse("till-sync"),
+                json.dumps(
+                    {
+                        "till": "till-1",
+                        "sales": [
+                            {
+                                "id": "a",
+                                "sold_at": "2026-10-18T10:00:00Z",
+                                "lines": [{"item_id": self.items[0].id}],
+                            }
+                        ],
+                    }
+                ),
+                content_type="application/json",
+            )
+        self.assertEqual(HTTPStatus.OK, res.status_code)
+        self.assertEqual(self.names("t"), ["Tea towel", "Toaster"])
+
+    def test_changes_from_other_processes_trigger_a_rebuild(self):
+        with mock.patch.object(
+            self.live_index, "refresh_in_background"
+        ) as refresh:
+            self.live_index.get()
+            refresh.assert_not_called()
+            invalidate_typeahead()
+            self.live_index.get()
+            refresh.assert_called_once()
+
+    def test_endpoint(self):
+        res = self.client.get(reverse("item-typeahead"), {"q": "tea"})
+        self.assertEqual(HTTPStatus.OK, res.status_code)
+        self.assertEqual(
+            res.json()["results"],
+            [
+                {
+                    "id": item.id,
+                    "name": item.name,
+                    "url": reverse("item-detail", args=[item.id]),
+                }
+                for item in self.items[1::-1]
+            ],
+        )
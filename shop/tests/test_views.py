@@ -1,13 +1,25 @@
 from __future__ import annotations
 
+from datetime import timedelta
 from http import HTTPStatus
+from unittest import mock
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
 from django.test import RequestFactory, TestCase
 from django.urls import reverse
 from django.utils import timezone
 
-from shop.models import Cart, Item, Order
+from shop.facets import invalidate_price_facets, price_facets
+from shop.idempotency import purge_expired_keys
+from shop.models import (
+    Cart,
+    IdempotencyKey,
+    Item,
+    Order,
+    Seller,
+)
 from shop.views import (
     ItemCreateView,
     ItemUpdateView,
@@ -249,3 +261,339 @@ class CartViewsTests(TestCase):
             self.assertGreaterEqual(item.sold_at, before)
         order.delete()
         cart.delete()
+
+
+class IdempotentCartViewsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="test_user", password="password"
+        )
+        self.client.force_login(self.user)
+        self.item = Item.objects.create(
+            name="Item", description="Description", price_in_cents=250
+        )
+
+    def test_replayed_checkout_runs_once(self):
+        self.client.post(reverse("cart-add"), {"item_id": self.item.id})
+        data = {"first_name": "John", "idempotency_key": "checkout-1"}
+        first = self.client.post(reverse("checkout"), data)
+        second = self.client.post(reverse("checkout"), data)
+        self.assertEqual(HTTPStatus.FOUND, first.status_code)
+        self.assertEqual(HTTPStatus.FOUND, second.status_code)
+        self.assertEqual(first["Location"], second["Location"])
+        self.assertNotIn("Idempotent-Replayed", first)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_replayed_add_to_cart_runs_once(self):
+        data = {"item_id": self.item.id, "idempotency_key": "add-1"}
+        self.client.post(reverse("cart-add"), data)
+        self.client.post(reverse("cart-add"), data)
+        cart = Cart.get_active_cart(self.user)
+        self.assertEqual(cart.total_in_cents, 250)
+
+    def test_idempotency_key_header(self):
+        self.client.post(
+            reverse("cart-add"),
+            {"item_id": self.item.id},
+            headers={"Idempotency-Key": "add-2"},
+        )
+        res = self.client.post(
+            reverse("cart-add"),
+            {"item_id": self.item.id},
+            headers={"Idempotency-Key": "add-2"},
+        )
+        self.assertEqual(res["Idempotent-Replayed"], "true")
+        self.assertEqual(Cart.get_active_cart(self.user).total_in_cents, 250)
+
+    def test_keys_are_scoped_to_users(self):
+        data = {"item_id": self.item.id, "idempotency_key": "shared"}
+        self.client.post(reverse("cart-add"), data)
+        other = User.objects.create_user(username="other", password="pw")
+        self.client.force_login(other)
+        res = self.client.post(reverse("cart-add"), data)
+        self.assertNotIn("Idempotent-Replayed", res)
+        self.assertEqual(Cart.get_active_cart(other).total_in_cents, 250)
+
+    def test_in_progress_replay_conflicts(self):
+        IdempotencyKey.objects.create(
+            user=self.user,
+            path=reverse("checkout"),
+            key="busy",
+            expires_at=timezone.now() + timedelta(seconds=30),
+        )
+        with mock.patch("shop.idempotency.IN_PROGRESS_WAIT", 0):
+            res = self.client.post(
+                reverse("checkout"), {"idempotency_key": "busy"}
+            )
+        self.assertEqual(HTTPStatus.CONFLICT, res.status_code)
+
+    def test_keys_are_shared_by_worker_processes(self):
+        data = {"item_id": self.item.id, "idempotency_key": "add-3"}
+        self.client.post(reverse("cart-add"), data)
+        # another worker process doesn't share this one's cache
+        cache.clear()
+        res = self.client.post(reverse("cart-add"), data)
+        self.assertEqual(res["Idempotent-Replayed"], "true")
+        self.assertEqual(Cart.get_active_cart(self.user).total_in_cents, 250)
+
+    def test_expired_keys_are_reused_and_purged(self):
+        IdempotencyKey.objects.create(
+            user=self.user,
+            path=reverse("cart-add"),
+            key="add-4",
+            status=HTTPStatus.BAD_REQUEST,
+            expires_at=timezone.now(),
+        )
+        res = self.client.post(
+            reverse("cart-add"),
+            {"item_id": self.item.id, "idempotency_key": "add-4"},
+        )
+        self.assertEqual(HTTPStatus.FOUND, res.status_code)
+        self.assertNotIn("Idempotent-Replayed", res)
+        self.assertEqual(purge_expired_keys(), 0)
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        self.assertEqual(purge_expired_keys(), 1)
+
+    def test_add_single_item_twice_without_key(self):
+        self.client.post(reverse("cart-add"), {"item_id": self.item.id})
+        self.client.post(reverse("cart-add"), {"item_id": self.item.id})
+        cart = Cart.get_active_cart(self.user)
+        self.assertEqual(cart.lines.get().quantity, 1)
+        self.assertEqual(cart.total_in_cents, 250)
+
+    def test_add_lot_to_cart(self):
+        self.client.post(
+            reverse("cart-add"), {"item_id": self.item.id, "quantity": 3}
+        )
+        self.assertEqual(Cart.get_active_cart(self.user).total_in_cents, 750)
+        res = self.client.post(
+            reverse("cart-add"), {"item_id": self.item.id, "quantity": "x"}
+        )
+        self.assertEqual(HTTPStatus.BAD_REQUEST, res.status_code)
+        res = self.client.get(reverse("checkout"))
+        self.assertContains(res, "Total: $7.50")
+
+    def test_checkout_rejects_invalid_email(self):
+        self.client.post(reverse("cart-add"), {"item_id": self.item.id})
+        res = self.client.post(
+            reverse("checkout"),
+            {"first_name": "John", "email": "not-an-email"},
+        )
+        self.assertContains(
+            res, "Enter a valid email address.", status_code=400
+        )
+        self.assertFalse(Order.objects.exists())
+
+    def test_empty_cart_checkout_is_rejected(self):
+        res = self.client.post(reverse("checkout"), {"first_name": "John"})
+        self.assertEqual(HTTPStatus.BAD_REQUEST, res.status_code)
+        self.assertFalse(Order.objects.exists())
+
+    def test_forms_include_idempotency_keys(self):
+        res = self.client.get(reverse("item-list"))
+        self.assertContains(res, 'name="idempotency_key"')
+        res = self.client.get(reverse("checkout"))
+        self.assertContains(res, 'name="idempotency_key"')
+
+
+class ItemListFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        prices = [50, 150, 450, 900, 2000, 12000]
+        self.items = [
+            Item.objects.create(
+                name=f"Item {price}",
+                description="Description",
+                price_in_cents=price,
+            )
+            for price in prices
+        ]
+        self.items[1].sold_at = timezone.now()
+        self.items[1].save()
+
+    def get_items(self, **params):
+        res = self.client.get(reverse("item-list"), params)
+        self.assertEqual(HTTPStatus.OK, res.status_code)
+        return [item for item, *_ in res.context["object_list"]]
+
+    def test_price_range(self):
+        self.assertEqual(
+            self.get_items(price_min=100, price_max=1000),
+            [self.items[2], self.items[3]],
+        )
+        self.assertEqual(
+            self.get_items(price_min=100, price_max=1000, include_sold="true"),
+            self.items[1:4],
+        )
+        self.assertEqual(self.get_items(price_min=10000), [self.items[5]])
+
+    def test_sort(self):
+        unsold = [item for item in self.items if not item.is_sold()]
+        self.assertEqual(self.get_items(sort="-price"), unsold[::-1])
+        self.assertEqual(self.get_items(sort="newest"), unsold[::-1])
+        self.assertEqual(self.get_items(sort="price"), unsold)
+
+    def test_filter_applies_with_other_params(self):
+        self.assertEqual(
+            self.get_items(filter="Item 2", include_sold="false"),
+            [self.items[4]],
+        )
+
+    def test_price_facets(self):
+        res = self.client.get(reverse("item-list"))
+        counts = [facet.count for facet, *_ in res.context["price_facets"]]
+        self.assertEqual(counts, [1, 1, 1, 1, 0, 0, 1])
+        res = self.client.get(reverse("item-list"), {"include_sold": "true"})
+        counts = [facet.count for facet, *_ in res.context["price_facets"]]
+        self.assertEqual(counts, [1, 2, 1, 1, 0, 0, 1])
+
+    def test_price_facets_are_cached(self):
+        self.client.get(reverse("item-list"))
+        with self.assertNumQueries(6):
+            # the catalogue version for the validators, the stored facet
+            # counts, the list view's and the page's counts, the page's items
+            # and their prefetched images, but no counting Items per facet
+            self.client.get(reverse("item-list"))
+
+
+class PriceFacetUpdateTests(TestCase):
+    def counts(self, *, include_sold=False):
+        return [
+            facet.count for facet in price_facets(include_sold=include_sold)
+        ]
+
+    def test_counts_follow_item_changes(self):
+        item = Item.objects.create(
+            name="Lamp", description="Description", price_in_cents=150
+        )
+        self.assertEqual(self.counts(), [0, 1, 0, 0, 0, 0, 0])
+        item.price_in_cents = 3000
+        item.save()
+        Item.objects.create(
+            name="Rug", description="Description", price_in_cents=20
+        )
+        with self.assertNumQueries(1):
+            # the stored counts were adjusted, not counted again
+            self.assertEqual(self.counts(), [1, 0, 0, 0, 1, 0, 0])
+        item.mark_sold(timezone.now())
+        self.assertEqual(self.counts(), [1, 0, 0, 0, 0, 0, 0])
+        self.assertEqual(self.counts(include_sold=True), [1, 0, 0, 0, 1, 0, 0])
+        Item.objects.get(id=item.id).delete()
+        self.assertEqual(self.counts(include_sold=True), [1, 0, 0, 0, 0, 0, 0])
+        with self.assertNumQueries(1):
+            self.counts()
+
+    def test_changes_made_by_other_processes_are_counted(self):
+        item = Item.objects.create(
+            name="Lamp", description="Description", price_in_cents=150
+        )
+        self.assertEqual(self.counts(), [0, 1, 0, 0, 0, 0, 0])
+        # a background worker marks the Item down in its own process
+        other = Item.objects.get(id=item.id)
+        other.price_in_cents = 50
+        other.save()
+        self.assertEqual(self.counts(), [1, 0, 0, 0, 0, 0, 0])
+
+    def test_bulk_updates_are_counted_again(self):
+        item = Item.objects.create(
+            name="Lamp", description="Description", price_in_cents=150
+        )
+        self.assertEqual(self.counts(), [0, 1, 0, 0, 0, 0, 0])
+        Item.objects.filter(id=item.id).update(price_in_cents=50)
+        invalidate_price_facets()
+        self.assertEqual(self.counts(), [1, 0, 0, 0, 0, 0, 0])
+
+    def test_rolled_back_changes_are_not_counted(self):
+        self.assertEqual(self.counts(), [0] * 7)
+        with transaction.atomic():
+            Item.objects.create(
+                name="Lamp", description="Description", price_in_cents=150
+            )
+            transaction.set_rollback(True)
+        self.assertEqual(self.counts(), [0] * 7)
+
+
+class SellerViewsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="user", password="password"
+        )
+        self.client.force_login(self.user)
+        self.alice = Seller.objects.create(name="Alice")
+        self.bob = Seller.objects.create(name="Bob")
+        cart = Cart.get_active_cart(self.user)
+        for name, price in (("Lamp", 500), ("Chair", 1250)):
+            cart.add_item(
+                Item.objects.create(
+                    name=name,
+                    description="Description",
+                    price_in_cents=price,
+                    seller=self.alice,
+                )
+            )
+        # payouts use the prices captured in the cart
+        Item.objects.filter(name="Lamp").update(price_in_cents=9900)
+        cart.checkout("John", "Doe", "")
+        Item.objects.create(
+            name="Table",
+            description="Description",
+            price_in_cents=4000,
+            seller=self.alice,
+        )
+        Item.objects.create(
+            name="Rug", description="Description", price_in_cents=300
+        )
+        Item.objects.create(
+            name="Vase",
+            description="Description",
+            price_in_cents=700,
+            seller=self.bob,
+        )
+
+    def test_with_sales_aggregates_in_the_database(self):
+        with self.assertNumQueries(2):
+            sellers = list(Seller.with_sales())
+            Seller.add_payouts(sellers)
+        sellers = {seller.name: seller for seller in sellers}
+        self.assertEqual(sellers["Alice"].items_listed, 3)
+        self.assertEqual(sellers["Alice"].items_sold, 2)
+        self.assertEqual(sellers["Alice"].payout_in_cents, 1750)
+        self.assertEqual(sellers["Bob"].items_sold, 0)
+        self.assertEqual(sellers["Bob"].format_payout(), "$0.00")
+
+    def test_seller_list(self):
+        res = self.client.get(reverse("seller-list"))
+        self.assertEqual(HTTPStatus.OK, res.status_code)
+        self.assertContains(res, "$17.50")
+
+    def test_seller_dashboard_lists_only_their_items(self):
+        res = self.client.get(reverse("seller-detail", args=(self.alice.id,)))
+        self.assertEqual(HTTPStatus.OK, res.status_code)
+        names = [item.name for item, _, _ in res.context["items"]]
+        self.assertEqual(names, ["Lamp", "Chair", "Table"])
+        self.assertContains(res, "$17.50")
+
+    def test_create_seller(self):
+        res = self.client.post(
+            reverse("seller-create"),
+            {"name": "Carol", "email": "carol@example.com"},
+        )
+        seller = Seller.objects.get(name="Carol")
+        self.assertRedirects(res, reverse("seller-detail", args=(seller.id,)))
+
+    def test_create_item_for_seller(self):
+        res = self.client.post(
+            reverse("item-create"),
+            {
+                "name": "Clock",
+                "description": "Description",
+                "price_in_cents": 900,
+                "seller": self.bob.id,
+            },
+        )
+        self.assertEqual(HTTPStatus.FOUND, res.status_code)
+        self.assertEqual(Item.objects.get(name="Clock").seller, self.bob)
+        res = self.client.get(reverse("item-create"))
+        self.assertContains(res, f'<option value="{self.bob.id}">Bob</option>')
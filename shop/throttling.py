@@ -0,0 +1,242 @@
+"""
+Rate limiting and admission control for the shop's write endpoints.
+
+Every write request spends a token from a bucket for its user and one for its
+client IP address. Buckets refill at a steady rate up to a burst size, and a
+request that finds a bucket empty is rejected with ``429 Too Many Requests``.
+On top of that, a cap on the number of write requests in flight makes
+excess requests wait briefly for a slot, and sheds them with
+``503 Service Unavailable`` if none frees up, before requests pile up waiting
+for SQLite's write lock. The request body is read before a slot is taken,
+so a client uploading photos over a slow connection doesn't hold one.
+
+The buckets live in the cache, so they are shared by every worker process
+when the cache is. The in-flight slots are locks on files in
+``WRITE_SLOT_DIR``, which every process and thread on the server shares, and
+which the operating system releases if a worker dies while holding one.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from functools import wraps
+from http import HTTPStatus
+from pathlib import Path
+from typing import IO, TYPE_CHECKING
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import locks
+from django.http import HttpRequest, HttpResponse
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS", "TRACE")
+# seconds between attempts to take a write slot while waiting for one
+SLOT_POLL_INTERVAL = 0.01
+# seconds clients are asked to wait before retrying a shed request
+SHED_RETRY_AFTER = 1
+
+
+def take_token(key: str, rate: float, burst: int) -> float:
+    """
+    Take a token from a bucket in the cache.
+
+    The bucket is stored as its token count and the time it was last
+    updated, and refilled lazily whenever a token is taken. Concurrent
+    requests may occasionally both take the last token; the limit is a
+    safeguard, not an exact quota.
+
+    Args:
+        key (str): The bucket's cache key.
+        rate (float): Tokens added to the bucket per second.
+        burst (int): Maximum number of tokens in the bucket.
+
+    Returns:
+        float: 0 if a token was taken, otherwise the number of seconds until
+        the next token is available.
+    """
+    now = time.time()
+    tokens, updated_at = cache.get(key, (burst, now))
+    tokens = min(burst, tokens + (now - updated_at) * rate)
+    if tokens < 1:
+        return (1 - tokens) / rate
+    # buckets that are full again don't need to be kept
+    cache.set(key, (tokens - 1, now), math.ceil(burst / rate))
+    return 0.0
+
+
+def client_ip(request: HttpRequest) -> str:
+    """
+    Return the IP address of the client that sent a request.
+
+    Behind ``TRUSTED_PROXIES`` proxies, each of which appends the address it
+    received the request from to ``X-Forwarded-For``, the client is the
+    address the outermost proxy appended; anything before it was sent by
+    the client and can't be trusted.
+
+    Args:
+        request (HttpRequest): The HTTP request.
+
+    Returns:
+        str: The client's IP address.
+    """
+    proxies = settings.TRUSTED_PROXIES
+    if proxies:
+        forwarded = [
+            address.strip()
+            for address in request.META.get("HTTP_X_FORWARDED_FOR", "").split(
+                ","
+            )
+            if address.strip()
+        ]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def _read_body(request: HttpRequest) -> None:
+    """
+    Read a request's whole body from the client.
+
+    Uploaded files are streamed to temporary files as usual, and other
+    bodies are kept in memory up to ``DATA_UPLOAD_MAX_MEMORY_SIZE``.
+
+    Args:
+        request (HttpRequest): The HTTP request.
+    """
+    if request.content_type == "multipart/form-data":
+        request.FILES  # noqa: B018
+    else:
+        request.body  # noqa: B018
+
+
+def _retry_after(delay: float) -> HttpResponse:
+    """
+    Build a ``429 Too Many Requests`` response.
+
+    Args:
+        delay (float): Seconds until the client may retry.
+
+    Returns:
+        HttpResponse: The response, with a ``Retry-After`` header.
+    """
+    response = HttpResponse(status=HTTPStatus.TOO_MANY_REQUESTS)
+    response["Retry-After"] = str(max(1, math.ceil(delay)))
+    return response
+
+
+def slot_paths() -> list[Path]:
+    """
+    Return the lock files of the in-flight write slots.
+
+    Returns:
+        list[Path]: One file per slot, ``MAX_CONCURRENT_WRITES`` in all.
+    """
+    directory = Path(settings.WRITE_SLOT_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    return [
+        directory / f"slot{i}.lock"
+        for i in range(settings.MAX_CONCURRENT_WRITES)
+    ]
+
+
+def _try_lock(path: Path) -> IO[bytes] | None:
+    """
+    Lock a slot's file if nobody else holds it.
+
+    Args:
+        path (Path): The slot's lock file.
+
+    Returns:
+        IO[bytes] | None: The locked file, or None if the slot is taken.
+    """
+    slot = path.open("ab")
+    if locks.lock(slot, locks.LOCK_EX | locks.LOCK_NB):
+        return slot
+    slot.close()
+    return None
+
+
+def acquire_slot(timeout: float) -> IO[bytes] | None:
+    """
+    Take one of the in-flight write slots, waiting for one if they're taken.
+
+    Args:
+        timeout (float): Seconds to wait for a slot to free up.
+
+    Returns:
+        IO[bytes] | None: The slot, to pass to ``release_slot()``, or None
+        if no slot freed up in time.
+    """
+    paths = slot_paths()
+    deadline = time.monotonic() + timeout
+    while True:
+        for path in paths:
+            slot = _try_lock(path)
+            if slot is not None:
+                return slot
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(SLOT_POLL_INTERVAL)
+
+
+def release_slot(slot: IO[bytes]) -> None:
+    """
+    Release an in-flight write slot.
+
+    Args:
+        slot (IO[bytes]): The slot returned by ``acquire_slot()``.
+    """
+    locks.unlock(slot)
+    slot.close()
+
+
+def throttled(view: Callable) -> Callable:
+    """
+    Rate limit and admission control unsafe requests to a view.
+
+    Safe requests such as ``GET`` are passed straight to the view.
+
+    Args:
+        view (Callable): The view function to wrap.
+
+    Returns:
+        Callable: The wrapped view function.
+    """
+
+    @wraps(view)
+    def wrapper(request: HttpRequest, *args: list, **kwargs: dict) -> object:
+        if request.method in SAFE_METHODS:
+            return view(request, *args, **kwargs)
+
+        delay = take_token(
+            f"throttle:ip:{client_ip(request)}",
+            settings.WRITE_IP_RATE,
+            settings.WRITE_IP_BURST,
+        )
+        if not delay and request.user.is_authenticated:
+            delay = take_token(
+                f"throttle:user:{request.user.pk}",
+                settings.WRITE_RATE,
+                settings.WRITE_BURST,
+            )
+        if delay:
+            return _retry_after(delay)
+
+        if not settings.MAX_CONCURRENT_WRITES:
+            return view(request, *args, **kwargs)
+        _read_body(request)
+        slot = acquire_slot(settings.WRITE_QUEUE_TIMEOUT)
+        if slot is None:
+            response = HttpResponse(status=HTTPStatus.SERVICE_UNAVAILABLE)
+            response["Retry-After"] = str(SHED_RETRY_AFTER)
+            return response
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            release_slot(slot)
+
+    return wrapper
@@ -0,0 +1,366 @@
+"""
+Offline till support.
+
+A till downloads the unsold catalogue once, keeps selling from its local copy
+while the network is down, and records each sale in a local journal. When it
+is back online it posts the journal in batches to the sync endpoint, which
+turns every sale into a checked out Cart and Order in one request.
+
+Each sale marks its Items as sold with a conditional ``UPDATE``. If another
+till or the web shop sold one of the Items first, the sale is rolled back and
+reported as a conflict instead. When carts and orders are sharded, a sale's
+Cart and Order are written to the till user's shard before its Items are
+marked, in a savepoint on both databases. Sales carry an ID generated by the
+till, so a batch that is posted again after a lost response is never applied
+twice.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .facets import count_sold_items
+from .models import Cart, CartItem, Item, Order, TillSale
+from .sharding import shard_for_user
+from .signals import order_checked_out
+
+if TYPE_CHECKING:
+    from datetime import datetime
+
+    from django.contrib.auth.models import User
+
+# maximum number of sales accepted in one sync request
+MAX_SYNC_BATCH = 200
+MAX_ID_LENGTH = 64
+
+
+class SyncError(ValueError):
+    """Raised when a sync request is malformed."""
+
+
+@dataclass(frozen=True)
+class SaleLine:
+    """An Item sold by a till, at the price the till charged."""
+
+    item_id: int
+    quantity: int
+    price_in_cents: int | None
+
+
+@dataclass(frozen=True)
+class Sale:
+    """A sale recorded in a till's journal."""
+
+    sale_id: str
+    lines: tuple[SaleLine, ...]
+    sold_at: datetime
+    first_name: str = ""
+    last_name: str = ""
+    email: str = ""
+
+
+def catalogue() -> list[list]:
+    """
+    Return the unsold catalogue in the compact form tills cache.
+
+    Returns:
+        list[list]: ``[id, name, price_in_cents]`` for every unsold Item.
+    """
+    return [
+        list(row)
+        for row in Item.objects.filter(sold_at__isnull=True)
+        .order_by("id")
+        .values_list("id", "name", "price_in_cents")
+    ]
+
+
+def _parse_id(value: object, name: str) -> str:
+    """
+    Validate an identifier sent by a till.
+
+    Args:
+        value (object): The identifier.
+        name (str): Name of the field, used in error messages.
+
+    Returns:
+        str: The identifier.
+
+    Raises:
+        SyncError: If the identifier is missing or too long.
+    """
+    if not isinstance(value, str) or not 0 < len(value) <= MAX_ID_LENGTH:
+        msg = f"{name} must be a string of 1 to {MAX_ID_LENGTH} characters"
+        raise SyncError(msg)
+    return value
+
+
+def _parse_count(value: object, name: str, *, minimum: int) -> int:
+    """
+    Validate a whole number sent by a till.
+
+    Args:
+        value (object): The number.
+        name (str): Name of the field, used in error messages.
+        minimum (int): Smallest allowed value.
+
+    Returns:
+        int: The number.
+
+    Raises:
+        SyncError: If the value isn't a whole number of at least ``minimum``.
+    """
+    if (
+        isinstance(value, bool)
+        or not isinstance(value, int)
+        or value < minimum
+    ):
+        msg = f"{name} must be a whole number of at least {minimum}"
+        raise SyncError(msg)
+    return value
+
+
+def _parse_lines(data: object) -> tuple[SaleLine, ...]:
+    """
+    Validate the lines of a sale, merging lines for the same Item.
+
+    Args:
+        data (object): The decoded lines.
+
+    Returns:
+        tuple[SaleLine, ...]: The sale's lines.
+
+    Raises:
+        SyncError: If the lines are malformed.
+    """
+    if not isinstance(data, list) or not data:
+        msg = "lines must be a non-empty list"
+        raise SyncError(msg)
+    lines: dict[int, SaleLine] = {}
+    for line in data:
+        if not isinstance(line, dict):
+            msg = "every line must be an object"
+            raise SyncError(msg)
+        item_id = _parse_count(line.get("item_id"), "item_id", minimum=1)
+        quantity = _parse_count(line.get("quantity", 1), "quantity", minimum=1)
+        price = line.get("price_in_cents")
+        if price is not None:
+            price = _parse_count(price, "price_in_cents", minimum=0)
+        if item_id in lines:
+            quantity += lines[item_id].quantity
+            price = lines[item_id].price_in_cents
+        lines[item_id] = SaleLine(item_id, quantity, price)
+    return tuple(lines.values())
+
+
+def parse_sales(data: object) -> tuple[str, list[Sale]]:
+    """
+    Validate a decoded sync request.
+
+    Args:
+        data (object): The decoded JSON body of the request.
+
+    Returns:
+        tuple[str, list[Sale]]: The till's ID and its journaled sales.
+
+    Raises:
+        SyncError: If the request is malformed.
+    """
+    if not isinstance(data, dict):
+        msg = "request body must be an object"
+        raise SyncError(msg)
+    till = _parse_id(data.get("till"), "till")
+    entries = data.get("sales")
+    if not isinstance(entries, list):
+        msg = "sales must be a list"
+        raise SyncError(msg)
+    if len(entries) > MAX_SYNC_BATCH:
+        msg = f"at most {MAX_SYNC_BATCH} sales can be synced at once"
+        raise SyncError(msg)
+    sales = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            msg = "every sale must be an object"
+            raise SyncError(msg)
+        sold_at = entry.get("sold_at")
+        sold_at = parse_datetime(sold_at) if isinstance(sold_at, str) else None
+        if sold_at is None:
+            msg = "sold_at must be an ISO 8601 date and time"
+            raise SyncError(msg)
+        if timezone.is_naive(sold_at):
+            sold_at = timezone.make_aware(sold_at)
+        sales.append(
+            Sale(
+                sale_id=_parse_id(entry.get("id"), "id"),
+                lines=_parse_lines(entry.get("lines")),
+                sold_at=sold_at,
+                first_name=str(entry.get("first_name", ""))[:100],
+                last_name=str(entry.get("last_name", ""))[:100],
+                email=str(entry.get("email", ""))[:254],
+            )
+        )
+    return till, sales
+
+
+def _result(till_sale: TillSale) -> dict:
+    """
+    Return the result reported to a till for a synced sale.
+
+    Args:
+        till_sale (TillSale): The synced sale.
+
+    Returns:
+        dict: The sale's ID, status, and Order ID or conflicting Items.
+    """
+    result = {"id": till_sale.sale_id, "status": till_sale.status}
+    if till_sale.status == TillSale.Status.OK:
+        result["order_id"] = till_sale.order_id
+    else:
+        result["conflicts"] = till_sale.conflicts
+    return result
+
+
+class _ConflictError(Exception):
+    """Raised inside a sale's savepoint to roll the sale back."""
+
+
+def _apply_sale(
+    user: User,
+    till: str,
+    sale: Sale,
+    prices: dict[int, int],
+    sellers: dict[int, int | None],
+) -> TillSale:
+    """
+    Check out a sale, or record it as a conflict if an Item is gone.
+
+    Args:
+        user (User): The user operating the till.
+        till (str): The till's ID.
+        sale (Sale): The sale.
+        prices (dict[int, int]): Current prices of the sale's Items.
+        sellers (dict[int, int | None]): Seller IDs of the sale's Items.
+
+    Returns:
+        TillSale: The synced sale, not yet saved.
+    """
+    item_ids = [line.item_id for line in sale.lines]
+    using = shard_for_user(user.pk)
+    try:
+        with transaction.atomic(), transaction.atomic(using=using):
+            if not prices.keys() >= set(item_ids):
+                raise _ConflictError  # noqa: TRY301
+            lines = [
+                CartItem(
+                    item_id=line.item_id,
+                    quantity=line.quantity,
+                    price_in_cents=(
+                        prices[line.item_id]
+                        if line.price_in_cents is None
+                        else line.price_in_cents
+                    ),
+                    added_at=sale.sold_at,
+                    seller_id=sellers[line.item_id],
+                )
+                for line in sale.lines
+            ]
+            cart = Cart.objects.using(using).create(
+                user=user,
+                active=False,
+                total_in_cents=sum(
+                    line.line_total_in_cents() for line in lines
+                ),
+            )
+            for line in lines:
+                line.cart = cart
+            CartItem.objects.using(using).bulk_create(lines)
+            order = Order.objects.using(using).create(
+                first_name=sale.first_name,
+                last_name=sale.last_name,
+                email=sale.email,
+                cart=cart,
+                created_at=sale.sold_at,
+            )
+            marked = Item.objects.filter(
+                id__in=item_ids, sold_at__isnull=True
+            ).update(sold_at=sale.sold_at, version=models.F("version") + 1)
+            if marked != len(item_ids):
+                raise _ConflictError  # noqa: TRY301
+            count_sold_items(prices[item_id] for item_id in item_ids)
+            order_checked_out.send(sender=TillSale, order=order)
+    except _ConflictError:
+        sold = set(
+            Item.objects.filter(
+                id__in=item_ids, sold_at__isnull=False
+            ).values_list("id", flat=True)
+        )
+        conflicts = [i for i in item_ids if i in sold or i not in prices]
+        return TillSale(
+            till=till,
+            sale_id=sale.sale_id,
+            status=TillSale.Status.CONFLICT,
+            conflicts=conflicts,
+        )
+    return TillSale(
+        till=till, sale_id=sale.sale_id, status=TillSale.Status.OK, order=order
+    )
+
+
+def sync_sales(user: User, till: str, sales: list[Sale]) -> list[dict]:
+    """
+    Apply a batch of sales journaled by an offline till.
+
+    Sales that were synced before are reported with their earlier result.
+    The other sales are applied in order, each in its own savepoint, so a
+    conflicting sale doesn't undo the rest of the batch.
+
+    Args:
+        user (User): The user operating the till.
+        till (str): The till's ID.
+        sales (list[Sale]): The journaled sales.
+
+    Returns:
+        list[dict]: The result of each sale, in the order they were sent.
+
+    Raises:
+        SyncError: If another request synced the same sales concurrently.
+    """
+    using = shard_for_user(user.pk)
+    sale_ids = [sale.sale_id for sale in sales]
+    synced = {
+        till_sale.sale_id: till_sale
+        for till_sale in TillSale.objects.using(using).filter(
+            till=till, sale_id__in=sale_ids
+        )
+    }
+    item_ids = {
+        line.item_id
+        for sale in sales
+        if sale.sale_id not in synced
+        for line in sale.lines
+    }
+    catalogue = list(
+        Item.objects.filter(id__in=item_ids).values_list(
+            "id", "price_in_cents", "seller_id"
+        )
+    )
+    prices = {item_id: price for item_id, price, _ in catalogue}
+    sellers = {item_id: seller_id for item_id, _, seller_id in catalogue}
+    created = []
+    try:
+        with transaction.atomic(), transaction.atomic(using=using):
+            for sale in sales:
+                if sale.sale_id in synced:
+                    continue
+                till_sale = _apply_sale(user, till, sale, prices, sellers)
+                synced[sale.sale_id] = till_sale
+                created.append(till_sale)
+            TillSale.objects.using(using).bulk_create(created)
+    except IntegrityError as e:
+        msg = "these sales are already being synced"
+        raise SyncError(msg) from e
+    return [_result(synced[sale_id]) for sale_id in sale_ids]
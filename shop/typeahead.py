@@ -0,0 +1,480 @@
+"""
+In-process prefix index of unsold Item names for search-as-you-type.
+
+Every worker process keeps the names of the unsold Items in memory, with a
+sorted array of the distinct words in those names and, for every word, the
+IDs of the Items whose names contain it. A query is matched word by word:
+every word of the query must appear in an Item's name, except the last one,
+which only has to start a word. Looking up a query is a binary search in the
+word array plus a scan of a few posting lists, so it never touches the
+database.
+
+The index is built when a worker starts, or on first use, and kept up to date
+by the Item save and delete signals and by the checkout signal. Every change
+also bumps a version counter in the cache; a process that finds the counter
+changed by someone else rebuilds its index in the background, so workers
+converge when the cache is shared. Code that changes names or sold state with
+``QuerySet.update()`` bypasses the signals and must call
+``invalidate_typeahead()``.
+"""
+
+from __future__ import annotations
+
+import bisect
+import contextlib
+import itertools
+import logging
+import re
+import threading
+import time
+from array import array
+from typing import TYPE_CHECKING
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Item
+from .signals import order_checked_out
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from .models import Order
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "typeahead:version"
+# seconds between checks of the shared version, so lookups rarely wait on
+# the cache
+VERSION_CHECK_INTERVAL = 1.0
+# maximum number of candidate Items checked for one query
+MAX_SCAN = 500
+# fraction of dead posting list entries that triggers a rebuild
+MAX_STALE_FRACTION = 0.25
+LOAD_CHUNK_SIZE = 10_000
+_WORD_RE = re.compile(r"\w+")
+
+
+def words(text: str) -> list[str]:
+    """
+    Split text into the case-insensitive words the index matches on.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        list[str]: The casefolded words, in order.
+    """
+    return _WORD_RE.findall(text.casefold())
+
+
+class PrefixIndex:
+    """
+    Word prefix index of Item names.
+
+    Posting lists are only ever appended to. Removing or renaming an Item
+    leaves its old entries behind, which lookups skip by checking each
+    candidate against its current name, until the index is rebuilt.
+    """
+
+    def __init__(self, rows: Iterable[tuple[int, str]] = ()) -> None:
+        """
+        Build an index.
+
+        Args:
+            rows (Iterable[tuple[int, str]]): IDs and names of the Items to
+                index.
+        """
+        self._lock = threading.Lock()
+        self._names: dict[int, str] = {}
+        self._postings: dict[str, array] = {}
+        self._entries = 0
+        self._live = 0
+        for item_id, name in rows:
+            self._add(item_id, name)
+        self._vocabulary = sorted(self._postings)
+
+    def __len__(self) -> int:
+        """
+        Return the number of indexed Items.
+
+        Returns:
+            int: The number of Items.
+        """
+        return len(self._names)
+
+    @property
+    def stale(self) -> bool:
+        """
+        Return whether enough posting list entries are dead to rebuild.
+
+        Returns:
+            bool: Whether the index should be rebuilt.
+        """
+        dead = self._entries - self._live
+        return dead > max(self._live * MAX_STALE_FRACTION, MAX_SCAN)
+
+    def _add(self, item_id: int, name: str) -> list[str]:
+        """
+        Index an Item without taking the lock or updating the vocabulary.
+
+        Args:
+            item_id (int): The Item's ID.
+            name (str): The Item's name.
+
+        Returns:
+            list[str]: Words that weren't in the index before.
+        """
+        old_name = self._names.get(item_id)
+        if old_name == name:
+            return []
+        if old_name is not None:
+            self._live -= len(set(words(old_name)))
+        self._names[item_id] = name
+        new_words = []
+        name_words = set(words(name))
+        self._live += len(name_words)
+        self._entries += len(name_words)
+        for word in name_words:
+            postings = self._postings.get(word)
+            if postings is None:
+                postings = self._postings[word] = array("q")
+                new_words.append(word)
+            postings.append(item_id)
+        return new_words
+
+    def add(self, item_id: int, name: str) -> None:
+        """
+        Add an Item to the index, or update its name.
+
+        Args:
+            item_id (int): The Item's ID.
+            name (str): The Item's name.
+        """
+        with self._lock:
+            for word in self._add(item_id, name):
+                bisect.insort(self._vocabulary, word)
+
+    def remove(self, item_id: int) -> None:
+        """
+        Remove an Item from the index, if it is in it.
+
+        Args:
+            item_id (int): The Item's ID.
+        """
+        with self._lock:
+            name = self._names.pop(item_id, None)
+            if name is not None:
+                self._live -= len(set(words(name)))
+
+    def _candidates(self, terms: list[str], prefix: str) -> Iterable[int]:
+        """
+        Return the IDs of Items that may match a query.
+
+        Candidates come from the shortest posting list of the query's whole
+        words, or from the posting lists of every word starting with the
+        prefix if they are shorter together.
+
+        Args:
+            terms (list[str]): Words that must appear in full.
+            prefix (str): Word that must start a word, or an empty string.
+
+        Returns:
+            Iterable[int]: Candidate IDs, possibly with duplicates.
+        """
+        shortest = min(
+            (self._postings.get(term, ()) for term in terms),
+            key=len,
+            default=None,
+        )
+        if not prefix:
+            return shortest
+        vocabulary = self._vocabulary
+        start = bisect.bisect_left(vocabulary, prefix)
+        end = bisect.bisect_left(vocabulary, prefix + "\U0010ffff")
+        if shortest is not None:
+            matching = 0
+            for i in range(start, end):
+                matching += len(self._postings[vocabulary[i]])
+                if matching >= len(shortest):
+                    return shortest
+        return (
+            item_id
+            for i in range(start, end)
+            for item_id in self._postings[vocabulary[i]]
+        )
+
+    def search(self, query: str, limit: int = 10) -> list[tuple[int, str]]:
+        """
+        Find Items whose names match a partially typed query.
+
+        At most ``MAX_SCAN`` candidates are checked, so a query whose words
+        rarely appear together may miss some matches.
+
+        Args:
+            query (str): The query.
+            limit (int): Maximum number of Items to return.
+
+        Returns:
+            list[tuple[int, str]]: IDs and names of the matching Items,
+            ordered by name.
+        """
+        terms = words(query)
+        if not terms:
+            return []
+        # the last word is still being typed unless the query ends after it
+        prefix = terms.pop() if _WORD_RE.match(query, len(query) - 1) else ""
+        patterns = [rf"\b{re.escape(term)}\b" for term in terms]
+        if prefix:
+            patterns.append(rf"\b{re.escape(prefix)}")
+        searches = [re.compile(pattern).search for pattern in patterns]
+        results: dict[int, str] = {}
+        with self._lock:
+            candidates = self._candidates(terms, prefix)
+            for item_id in itertools.islice(candidates, MAX_SCAN):
+                name = self._names.get(item_id)
+                if name is None:
+                    continue
+                folded = name.casefold()
+                for search in searches:
+                    if not search(folded):
+                        break
+                else:
+                    results[item_id] = name
+                    if len(results) == limit:
+                        break
+        return sorted(
+            results.items(),
+            key=lambda result: (result[1].casefold(), result[0]),
+        )
+
+
+def _current_version() -> int | None:
+    """
+    Return the shared version counter, creating it if needed.
+
+    Returns:
+        int | None: The version, or None if the cache dropped it.
+    """
+    cache.add(VERSION_KEY, 0, None)
+    return cache.get(VERSION_KEY)
+
+
+class LiveIndex:
+    """The process's PrefixIndex of unsold Items, kept in step with changes."""
+
+    def __init__(self) -> None:
+        """Create an empty holder; the index is built on first use."""
+        self._index: PrefixIndex | None = None
+        self._version: int | None = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._refreshing = False
+
+    def _build(self) -> PrefixIndex:
+        """
+        Build the index from the database and make it current.
+
+        Returns:
+            PrefixIndex: The new index.
+        """
+        start = time.perf_counter()
+        # read the version first, so changes made while loading are picked
+        # up by the next refresh
+        version = _current_version()
+        index = PrefixIndex(
+            Item.objects.filter(sold_at__isnull=True)
+            .values_list("id", "name")
+            .iterator(chunk_size=LOAD_CHUNK_SIZE)
+        )
+        self._index, self._version = index, version
+        logger.info(
+            "Built typeahead index of %d items in %.1fs",
+            len(index),
+            time.perf_counter() - start,
+        )
+        return index
+
+    def refresh(self) -> PrefixIndex:
+        """
+        Rebuild the index from the database.
+
+        Returns:
+            PrefixIndex: The new index.
+        """
+        with self._build_lock:
+            return self._build()
+
+    def _refresh_in_thread(self) -> None:
+        """Rebuild the index, then release the thread's connection."""
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception("Couldn't rebuild the typeahead index")
+        finally:
+            self._refreshing = False
+            connection.close()
+
+    def refresh_in_background(self) -> None:
+        """Rebuild the index in a thread, unless a rebuild is running."""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(
+            target=self._refresh_in_thread,
+            name="typeahead-refresh",
+            daemon=True,
+        ).start()
+
+    def get(self) -> PrefixIndex:
+        """
+        Return the index, building it if this process has none yet.
+
+        At most once every ``VERSION_CHECK_INTERVAL`` seconds, the shared
+        version is checked, and the index is rebuilt in the background if
+        another process changed it or too many entries are dead. The old
+        index keeps answering until the new one is ready.
+
+        Returns:
+            PrefixIndex: The index.
+        """
+        index = self._index
+        if index is None:
+            with self._build_lock:
+                index = self._index
+                if index is None:
+                    index = self._build()
+        now = time.monotonic()
+        if now - self._checked_at >= VERSION_CHECK_INTERVAL:
+            self._checked_at = now
+            if cache.get(VERSION_KEY) != self._version or index.stale:
+                self.refresh_in_background()
+        return index
+
+    def update(self, changes: dict[int, str | None]) -> None:
+        """
+        Apply changes to Items and tell other processes about them.
+
+        Args:
+            changes (dict[int, str | None]): Names of the changed Items by
+                ID, or None for Items that were sold or deleted.
+        """
+        index = self._index
+        if index is not None:
+            for item_id, name in changes.items():
+                if name is None:
+                    index.remove(item_id)
+                else:
+                    index.add(item_id, name)
+        with self._lock:
+            cache.add(VERSION_KEY, 0, None)
+            try:
+                version = cache.incr(VERSION_KEY)
+            except ValueError:
+                # the counter was dropped, so every process will rebuild
+                return
+            # only skip our own rebuild if nobody else changed anything
+            if self._version == version - 1:
+                self._version = version
+
+    def invalidate(self) -> None:
+        """Make every process rebuild its index on its next lookup."""
+        with self._lock:
+            cache.add(VERSION_KEY, 0, None)
+            with contextlib.suppress(ValueError):
+                cache.incr(VERSION_KEY)
+            self._version = None
+            self._checked_at = float("-inf")
+
+
+live_index = LiveIndex()
+
+
+def search(query: str, limit: int = 10) -> list[tuple[int, str]]:
+    """
+    Find unsold Items whose names match a partially typed query.
+
+    Args:
+        query (str): The query.
+        limit (int): Maximum number of Items to return.
+
+    Returns:
+        list[tuple[int, str]]: IDs and names of the matching Items, ordered
+        by name.
+    """
+    return live_index.get().search(query, limit)
+
+
+def warm_typeahead() -> None:
+    """Start building the index in the background, e.g. at worker start."""
+    live_index.refresh_in_background()
+
+
+def invalidate_typeahead() -> None:
+    """Make every process rebuild its index after a bulk change to Items."""
+    live_index.invalidate()
+
+
+@receiver(post_save, sender=Item)
+def update_typeahead_on_save(
+    sender: type,  # noqa: ARG001
+    instance: Item,
+    **kwargs: dict,  # noqa: ARG001
+) -> None:
+    """
+    Index a saved Item, or drop a sold or deleted one, once the save commits.
+
+    Args:
+        sender (type): The Item class.
+        instance (Item): The saved Item.
+        kwargs (dict): Additional signal arguments.
+    """
+    item_id = instance.pk
+    name = (
+        None if instance.is_sold() or instance.is_deleted() else instance.name
+    )
+    transaction.on_commit(lambda: live_index.update({item_id: name}))
+
+
+@receiver(post_delete, sender=Item)
+def update_typeahead_on_delete(
+    sender: type,  # noqa: ARG001
+    instance: Item,
+    **kwargs: dict,  # noqa: ARG001
+) -> None:
+    """
+    Drop a deleted Item from the index once the deletion commits.
+
+    Args:
+        sender (type): The Item class.
+        instance (Item): The deleted Item.
+        kwargs (dict): Additional signal arguments.
+    """
+    item_id = instance.pk
+    transaction.on_commit(lambda: live_index.update({item_id: None}))
+
+
+@receiver(order_checked_out)
+def update_typeahead_on_checkout(
+    sender: type,  # noqa: ARG001
+    order: Order,
+    **kwargs: dict,  # noqa: ARG001
+) -> None:
+    """
+    Drop the Items of a checked out Order once the checkout commits.
+
+    Tills mark Items as sold with ``QuerySet.update()``, so the save signal
+    doesn't cover them.
+
+    Args:
+        sender (type): The class that sent the signal.
+        order (Order): The Order that was checked out.
+        kwargs (dict): Additional signal arguments.
+    """
+    item_ids = order.cart.lines.values_list("item_id", flat=True)
+    changes = dict.fromkeys(item_ids)
+    transaction.on_commit(lambda: live_index.update(changes))
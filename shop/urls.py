@@ -3,18 +3,49 @@
 from django.urls import path
 
 from . import views
+from .throttling import throttled
 
 urlpatterns = [
     path("", views.ItemListView.as_view(), name="item-list"),
-    path("create/", views.ItemCreateView.as_view(), name="item-create"),
     path(
-        "<int:pk>/update/", views.ItemUpdateView.as_view(), name="item-update"
+        "create/",
+        throttled(views.ItemCreateView.as_view()),
+        name="item-create",
+    ),
+    path(
+        "<int:pk>/update/",
+        throttled(views.ItemUpdateView.as_view()),
+        name="item-update",
     ),
     path("<int:pk>/", views.ItemDetailView.as_view(), name="item-detail"),
+    path("typeahead/", views.item_typeahead, name="item-typeahead"),
+    path(
+        "<int:pk>/delete/",
+        throttled(views.ItemDeleteView.as_view()),
+        name="item-delete",
+    ),
+    path("sellers/", views.SellerListView.as_view(), name="seller-list"),
+    path(
+        "sellers/create/",
+        throttled(views.SellerCreateView.as_view()),
+        name="seller-create",
+    ),
+    path(
+        "sellers/<int:pk>/",
+        views.SellerDetailView.as_view(),
+        name="seller-detail",
+    ),
+    path("orders/", views.OrderListView.as_view(), name="order-list"),
+    path("checkout/", throttled(views.checkout), name="checkout"),
+    path("cart/add/", throttled(views.add_item_to_cart), name="cart-add"),
     path(
-        "<int:pk>/delete/", views.ItemDeleteView.as_view(), name="item-delete"
+        "cart/remove/",
+        throttled(views.remove_item_from_cart),
+        name="cart-remove",
     ),
-    path("checkout/", views.checkout, name="checkout"),
-    path("cart/add/", views.add_item_to_cart, name="cart-add"),
-    path("cart/remove/", views.remove_item_from_cart, name="cart-remove"),
+    path("images/<str:filename>", views.item_image, name="item-image"),
+    path("till/", views.till, name="till"),
+    path("till/catalogue/", views.till_catalogue, name="till-catalogue"),
+    path("till/sync/", throttled(views.till_sync), name="till-sync"),
+    path("profile/", views.profile, name="shop-profile"),
 ]
@@ -2,32 +2,65 @@
 
 from __future__ import annotations
 
+import json
 from http import HTTPStatus
 from typing import TYPE_CHECKING
 
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.paginator import Paginator
-from django.http import HttpRequest, HttpResponse, HttpResponseNotAllowed
+from django.db.models import Q
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    HttpResponseNotAllowed,
+    JsonResponse,
+)
 from django.shortcuts import redirect, render
 from django.urls import reverse, reverse_lazy
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_POST, require_safe
 from django.views.generic import DetailView
 from django.views.generic.edit import CreateView, DeleteView, UpdateView
 from django.views.generic.list import ListView
 
-from .forms import CheckoutForm, UpdateItemForm
-from .models import Cart, Item, Order
+from . import profiler, typeahead
+from .conditional import catalogue_page
+from .facets import PriceFacet, price_facets
+from .forms import CheckoutForm, ItemForm, UpdateItemForm
+from .idempotency import idempotent
+from .images import IMAGE_FILENAME_RE, image_path
+from .models import Cart, Item, ItemConflictError, Order, Seller
+from .sharding import ShardedQuerySet
+from .till import SyncError, catalogue, parse_sales, sync_sales
 
 if TYPE_CHECKING:
     from django.db.models import QuerySet
+    from django.forms import Form
 
+# longest typeahead query that is looked up
+MAX_TYPEAHEAD_QUERY = 100
 
+
+@method_decorator(catalogue_page, name="get")
 class ItemListView(ListView):
     """List view used to display and paginate Items."""
 
     model = Item
     paginate_by = 20
 
+    # orderings that can be selected with the ``sort`` query parameter
+    SORT_ORDERINGS = {
+        "price": ("price_in_cents", "id"),
+        "-price": ("-price_in_cents", "-id"),
+        "newest": ("-id",),
+    }
+
     def get_context_data(self, **kwargs: dict) -> dict[str, any]:
         """
         Get context data object used to render the view template.
@@ -46,10 +79,61 @@ class ItemListView(ListView):
         objects = page_obj.object_list
         costs = [item.format_price() for item in objects]
         sold = [item.is_sold() for item in objects]
-        context["object_list"] = list(zip(objects, costs, sold))
+        images = [item.cover_image() for item in objects]
+        context["object_list"] = list(zip(objects, costs, sold, images))
         context["page_obj"] = page_obj
+        context["price_facets"] = self.get_price_facets()
+        query = self.request.GET.copy()
+        query.pop("page", None)
+        context["query_params"] = query.urlencode()
+        query.pop("price_min", None)
+        query.pop("price_max", None)
+        context["any_price_query"] = query.urlencode()
         return context
 
+    def get_price_facets(self) -> list[tuple[PriceFacet, str, bool]]:
+        """
+        Get the cached price facets with links that select them.
+
+        Returns:
+            list[tuple[PriceFacet, str, bool]]: Each facet, the query string
+            selecting it, and whether it is currently selected.
+        """
+        include_sold = self.request.GET.get("include_sold") == "true"
+        min_price, max_price = self.get_price_range()
+        facets = []
+        for facet in price_facets(include_sold=include_sold):
+            query = self.request.GET.copy()
+            query.pop("page", None)
+            query["price_min"] = facet.min_price
+            if facet.max_price is None:
+                query.pop("price_max", None)
+            else:
+                query["price_max"] = facet.max_price
+            selected = (min_price, max_price) == (
+                facet.min_price,
+                facet.max_price,
+            )
+            facets.append((facet, query.urlencode(), selected))
+        return facets
+
+    def get_price_range(self) -> tuple[int | None, int | None]:
+        """
+        Get the price range selected with the query parameters.
+
+        The range is selected with the ``price_min`` and ``price_max`` query
+        parameters, both in cents.
+
+        Returns:
+            tuple[int | None, int | None]: The inclusive lower and exclusive
+            upper bounds in cents, or None where no bound was selected.
+        """
+        bounds = []
+        for param in ("price_min", "price_max"):
+            value = self.request.GET.get(param, "")
+            bounds.append(int(value) if value.isdigit() else None)
+        return bounds[0], bounds[1]
+
     def get_queryset(self) -> QuerySet:
         """
         Get the queryset used to paginate Item models.
@@ -59,19 +143,25 @@ class ItemListView(ListView):
         """
         filter_val = self.request.GET.get("filter")
         include_sold = self.request.GET.get("include_sold")
-        if include_sold == "true" and filter_val and len(filter_val) > 0:
-            return Item.objects.filter(name__contains=filter_val)
-        if include_sold == "true" and (
-            filter_val is None or len(filter_val) == 0
-        ):
-            return Item.objects.all()
-        if include_sold is None and filter_val and len(filter_val) > 0:
-            return Item.objects.filter(
-                name__contains=filter_val, sold_at__isnull=True
-            )
-        return Item.objects.filter(sold_at__isnull=True)
-
-
+        items = Item.objects.select_related("seller").prefetch_related(
+            "images"
+        )
+        if include_sold != "true":
+            items = items.filter(sold_at__isnull=True)
+        if filter_val and len(filter_val) > 0:
+            items = items.filter(name__contains=filter_val)
+        min_price, max_price = self.get_price_range()
+        if min_price is not None:
+            items = items.filter(price_in_cents__gte=min_price)
+        if max_price is not None:
+            items = items.filter(price_in_cents__lt=max_price)
+        ordering = self.SORT_ORDERINGS.get(self.request.GET.get("sort", ""))
+        if ordering is not None:
+            items = items.order_by(*ordering)
+        return items
+
+
+@method_decorator(catalogue_page, name="get")
 class ItemDetailView(DetailView):
     """Detail view for the Item model."""
 
@@ -90,6 +180,7 @@ class ItemDetailView(DetailView):
         """
         context = super().get_context_data(**kwargs)
         context["price_formatted"] = context["object"].format_price()
+        context["images"] = list(context["object"].images.all())
         return context
 
 
@@ -97,7 +188,7 @@ class ItemCreateView(LoginRequiredMixin, CreateView):
     """View used to create Item models in the database."""
 
     model = Item
-    fields = ["name", "description", "price_in_cents"]
+    form_class = ItemForm
 
     def get_success_url(self) -> str:
         """
@@ -116,6 +207,32 @@ class ItemUpdateView(LoginRequiredMixin, UpdateView):
     form_class = UpdateItemForm
     template_name_suffix = "_update_form"
 
+    def form_valid(self, form: UpdateItemForm) -> HttpResponse:
+        """
+        Save the Item, unless someone else changed it since the form loaded.
+
+        On a conflict the form is shown again with the Item's current
+        details, so the edit can be made again on top of them.
+
+        Args:
+            form (UpdateItemForm): The valid form.
+
+        Returns:
+            HttpResponse: A redirect to the Item, or the form with a conflict
+            message.
+        """
+        try:
+            return super().form_valid(form)
+        except ItemConflictError:
+            self.object = self.get_object()
+            return self.render_to_response(
+                self.get_context_data(
+                    form=self.get_form_class()(instance=self.object),
+                    conflict=True,
+                ),
+                status=HTTPStatus.CONFLICT,
+            )
+
     def get_success_url(self) -> str:
         """
         Get the URL that the view should redirect to upon success.
@@ -130,13 +247,132 @@ class ItemDeleteView(LoginRequiredMixin, DeleteView):
     """View used to delete an Item model from the database."""
 
     model = Item
-    success_url = reverse_lazy("item-index")
+    success_url = reverse_lazy("item-list")
+
+    def form_valid(self, form: Form) -> HttpResponse:  # noqa: ARG002
+        """
+        Soft-delete the Item, leaving its cart lines to the background purge.
+
+        Args:
+            form (Form): The deletion confirmation form.
+
+        Returns:
+            HttpResponse: A redirect to the success URL.
+        """
+        self.object.soft_delete()
+        return redirect(self.get_success_url())
+
+
+@method_decorator(catalogue_page, name="get")
+class SellerListView(LoginRequiredMixin, ListView):
+    """List view showing every Seller's sales and payout."""
+
+    model = Seller
+    # named here, since it can't be derived from a list of Sellers
+    template_name = "shop/seller_list.html"
+
+    def get_queryset(self) -> list[Seller]:
+        """
+        Get the Sellers with their sales and payouts.
+
+        Returns:
+            list[Seller]: The annotated Sellers.
+        """
+        sellers = list(Seller.with_sales())
+        Seller.add_payouts(sellers)
+        return sellers
+
+
+@method_decorator(catalogue_page, name="get")
+class SellerDetailView(LoginRequiredMixin, DetailView):
+    """Dashboard view listing a Seller's Items and payout."""
+
+    model = Seller
+    paginate_by = 20
+
+    def get_queryset(self) -> QuerySet:
+        """
+        Get the Sellers annotated with their sales.
+
+        Returns:
+            QuerySet: The annotated Sellers.
+        """
+        return Seller.with_sales()
+
+    def get_object(self, queryset: QuerySet | None = None) -> Seller:
+        """
+        Get the Seller with their sales and payout.
+
+        Args:
+            queryset (QuerySet | None): The queryset to look the Seller up
+                in.
+
+        Returns:
+            Seller: The annotated Seller.
+        """
+        seller = super().get_object(queryset)
+        Seller.add_payouts([seller])
+        return seller
+
+    def get_context_data(self, **kwargs: dict) -> dict[str, any]:
+        """
+        Get context data object used to render the view template.
+
+        The Seller's Items are paginated with the index on the Item's seller,
+        so the dashboard doesn't slow down as the shared catalogue grows.
+
+        Args:
+            kwargs (dict[str, any]): Keyword arguments.
+
+        Returns:
+            dict[str, any]: The context data object used to render the view
+            template.
+        """
+        context = super().get_context_data(**kwargs)
+        items = Item.objects.filter(seller=self.object).order_by("id")
+        paginator = Paginator(items, self.paginate_by)
+        page_obj = paginator.get_page(self.request.GET.get("page"))
+        context["page_obj"] = page_obj
+        context["items"] = [
+            (item, item.format_price(), item.is_sold())
+            for item in page_obj.object_list
+        ]
+        return context
+
+
+class SellerCreateView(LoginRequiredMixin, CreateView):
+    """View used to create Seller models in the database."""
+
+    model = Seller
+    fields = ["name", "email"]
+
+    def get_success_url(self) -> str:
+        """
+        Get the URL that the view should redirect to upon success.
+
+        Returns:
+            str: URL to redirect to.
+        """
+        return reverse("seller-detail", args=(self.object.id,))
 
 
+@method_decorator(catalogue_page, name="get")
 class OrderListView(LoginRequiredMixin, ListView):
-    """List view for the Order model."""
+    """List view for the Order model, newest first, across every shard."""
 
     model = Order
+    paginate_by = 20
+
+    def get_queryset(self) -> ShardedQuerySet:
+        """
+        Get the Orders of every shard, merged newest first.
+
+        Returns:
+            ShardedQuerySet: The Orders with their Carts.
+        """
+        return ShardedQuerySet(
+            Order.objects.select_related("cart"), ["-created_at", "-id"]
+        )
 
 
 def shop_index(request: HttpRequest) -> HttpResponse:
@@ -153,7 +389,68 @@ def shop_index(request: HttpRequest) -> HttpResponse:
     return render(request, "index.html", context={"items": items})
 
 
+@require_safe
+def item_image(request: HttpRequest, filename: str) -> FileResponse:  # noqa: ARG001
+    """
+    Serve an Item image or one of its thumbnails.
+
+    Image files are content-addressed, so they can be cached forever. The file
+    is handed to the WSGI server's file wrapper, which sends it with
+    ``sendfile`` instead of copying it through Python.
+
+    Args:
+        request (HttpRequest): The HTTP request to this view.
+        filename (str): File name of the image.
+
+    Returns:
+        FileResponse: The response streaming the image file.
+
+    Raises:
+        Http404: If the image does not exist.
+    """
+    if not IMAGE_FILENAME_RE.match(filename):
+        raise Http404
+    try:
+        image_file = image_path(filename).open("rb")
+    except FileNotFoundError as e:
+        raise Http404 from e
+    response = FileResponse(image_file)
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+
+@require_safe
+def item_typeahead(request: HttpRequest) -> JsonResponse:
+    """
+    View suggesting unsold Items whose names match a partially typed query.
+
+    Suggestions come from the in-process prefix index, so the view doesn't
+    query the database.
+
+    Args:
+        request (HttpRequest): The HTTP request to this view, with the query
+            in the ``q`` parameter.
+
+    Returns:
+        JsonResponse: The matching Items' IDs, names and detail page URLs.
+    """
+    query = request.GET.get("q", "")[:MAX_TYPEAHEAD_QUERY]
+    return JsonResponse(
+        {
+            "results": [
+                {
+                    "id": item_id,
+                    "name": name,
+                    "url": reverse("item-detail", args=[item_id]),
+                }
+                for item_id, name in typeahead.search(query)
+            ]
+        }
+    )
+
+
 @login_required
+@idempotent
 def add_item_to_cart(request: HttpRequest) -> HttpResponse:
     """
     View used to add an item to the currently active cart.
@@ -168,12 +465,17 @@ def add_item_to_cart(request: HttpRequest) -> HttpResponse:
         return HttpResponseNotAllowed(["POST"])
     cart = Cart.get_active_cart(request.user)
     item = Item.objects.get(id=request.POST.get("item_id"))
-    if cart.add_item(item):
+    try:
+        quantity = int(request.POST.get("quantity", 1))
+    except ValueError:
+        return HttpResponse(status=HTTPStatus.BAD_REQUEST)
+    if cart.add_item(item, quantity):
         return redirect(reverse("item-list"))
     return HttpResponse(status=HTTPStatus.BAD_REQUEST)
 
 
 @login_required
+@idempotent
 def remove_item_from_cart(request: HttpRequest) -> HttpResponse:
     """
     View used to remove an item from the currently active cart.
@@ -187,13 +489,15 @@ def remove_item_from_cart(request: HttpRequest) -> HttpResponse:
     if request.method != "POST":
         return HttpResponseNotAllowed(["POST"])
     cart = Cart.get_active_cart(request.user)
-    item = Item.objects.get(id=request.POST.get("item_id"))
+    # deleted Items can still be taken out of a cart
+    item = Item.all_objects.get(id=request.POST.get("item_id"))
     if cart.remove_item(item):
         return redirect(reverse("checkout"))
     return HttpResponse(status=HTTPStatus.BAD_REQUEST)
 
 
 @login_required
+@idempotent
 def checkout(request: HttpRequest) -> HttpResponse:
     """
     View for checking out a customer.
@@ -211,14 +515,141 @@ def checkout(request: HttpRequest) -> HttpResponse:
             "shop/checkout.html",
             context={
                 "form": CheckoutForm,
-                "cart_items": list(cart.items.all()),
+                "cart": cart,
+                "cart_lines": list(cart.lines.prefetch_related("item")),
             },
         )
     if request.method == "POST":
-        cart.checkout(
-            first_name=request.POST.get("first_name"),
-            last_name=request.POST.get("last_name"),
-            email=request.POST.get("email"),
-        )
+        if not cart.lines.exists():
+            return HttpResponse(status=HTTPStatus.BAD_REQUEST)
+        form = CheckoutForm(request.POST)
+        if not form.is_valid():
+            return render(
+                request,
+                "shop/checkout.html",
+                context={
+                    "form": form,
+                    "cart": cart,
+                    "cart_lines": list(cart.lines.prefetch_related("item")),
+                },
+                status=HTTPStatus.BAD_REQUEST,
+            )
+        try:
+            cart.checkout(**form.cleaned_data)
+        except ItemConflictError:
+            # drop the Items sold or deleted in the meantime so the customer
+            # can retry
+            item_ids = list(cart.lines.values_list("item_id", flat=True))
+            for item in Item.all_objects.filter(id__in=item_ids).filter(
+                Q(sold_at__isnull=False) | Q(deleted_at__isnull=False)
+            ):
+                cart.remove_item(item)
+            return render(
+                request,
+                "shop/checkout.html",
+                context={
+                    "form": form,
+                    "cart": cart,
+                    "cart_lines": list(cart.lines.prefetch_related("item")),
+                    "sold_items_removed": True,
+                },
+                status=HTTPStatus.CONFLICT,
+            )
         return redirect(reverse("item-list"))
     return HttpResponseNotAllowed(["GET", "POST"])
+
+
+@login_required
+@require_safe
+def till(request: HttpRequest) -> HttpResponse:
+    """
+    View rendering the offline-capable till.
+
+    Args:
+        request (HttpRequest): The HTTP request to this view.
+
+    Returns:
+        HttpResponse: The till page.
+    """
+    return render(request, "shop/till.html")
+
+
+@login_required
+@require_safe
+def till_catalogue(request: HttpRequest) -> JsonResponse:  # noqa: ARG001
+    """
+    View returning the unsold catalogue for tills to cache.
+
+    Args:
+        request (HttpRequest): The HTTP request to this view.
+
+    Returns:
+        JsonResponse: The unsold Items as ``[id, name, price_in_cents]``.
+    """
+    return JsonResponse(
+        {"generated_at": timezone.now().isoformat(), "items": catalogue()}
+    )
+
+
+@login_required
+@require_POST
+def till_sync(request: HttpRequest) -> JsonResponse:
+    """
+    View applying a batch of sales journaled by an offline till.
+
+    Args:
+        request (HttpRequest): The HTTP request to this view, with a JSON
+            body holding the till's ID and its sales.
+
+    Returns:
+        JsonResponse: The result of each sale, or the error if the request
+        is malformed.
+    """
+    try:
+        till_id, sales = parse_sales(json.loads(request.body))
+        results = sync_sales(request.user, till_id, sales)
+    except (json.JSONDecodeError, SyncError) as e:
+        return JsonResponse({"error": str(e)}, status=HTTPStatus.BAD_REQUEST)
+    return JsonResponse({"results": results})
+
+
+@staff_member_required
+@require_safe
+def profile(request: HttpRequest) -> HttpResponse:
+    """
+    View profiling the worker process serving it, for staff.
+
+    The request takes as long as the profile, so other requests must be
+    served by other threads of the same worker to show up in it.
+
+    Args:
+        request (HttpRequest): The HTTP request to this view, with the
+            seconds to profile for in the ``seconds`` parameter.
+
+    Returns:
+        HttpResponse: The collapsed stacks as plain text.
+
+    Raises:
+        Http404: If ``PROFILER`` is switched off.
+    """
+    if not settings.PROFILER:
+        raise Http404
+    try:
+        seconds = float(request.GET.get("seconds", "10"))
+    except ValueError:
+        seconds = 0
+    if not 0 < seconds <= profiler.MAX_SECONDS:
+        return HttpResponse(
+            f"seconds must be between 0 and {profiler.MAX_SECONDS:g}",
+            content_type="text/plain",
+            status=HTTPStatus.BAD_REQUEST,
+        )
+    try:
+        stacks = profiler.profile(seconds)
+    except profiler.ProfilerBusyError as e:
+        return HttpResponse(
+            str(e), content_type="text/plain", status=HTTPStatus.CONFLICT
+        )
+    return HttpResponse(
+        profiler.format_stacks(stacks), content_type="text/plain"
+    )